@@ -0,0 +1,321 @@
+"""
+Hourly and daily throughput rollups
+An incremental job folds new rows from qr_scans, scanned_codes and
+package_information into analytics_hourly and analytics_daily, tracking a
+per-source id watermark so each row is read exactly once. /api/analytics
+queries only the rollup tables, so it stays fast however large the raw tables
+grow.
+
+Buckets are UTC hours and days. Timestamps written by the app
+(datetime.now().isoformat(), local time) are converted to UTC; SQLite
+CURRENT_TIMESTAMP columns (scanned_at, created_at) already are UTC.
+
+Weight percentiles come from a fixed-bin histogram kept per bucket (bins merge
+by addition); step latencies are stored as count/sum pairs.
+"""
+
+import json
+import sqlite3
+import logging
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_BATCH_SIZE = 5000
+ANALYTICS_REQUEST_BATCH_SIZE = 500  # Rows per source a read request may fold in before querying
+WEIGHT_BIN_KG = 0.05      # 50 g histogram bins
+WEIGHT_BIN_COUNT = 200    # 0-10 kg, heavier packages land in the last bin
+PACKAGE_SIZES = ('small', 'medium', 'large')
+
+# Granularity -> (table, length of the 'YYYY-MM-DD HH' prefix used as bucket key)
+ANALYTICS_GRANULARITIES = {
+    'hour': ('analytics_hourly', 13),
+    'day': ('analytics_daily', 10),
+}
+
+COUNTER_COLUMNS = (
+    'scans', 'valid_scans', 'invalid_scans', 'verified_scans', 'packages',
+    'size_small', 'size_medium', 'size_large', 'size_unknown',
+    'weight_count', 'weight_sum',
+    'weigh_to_measure_count', 'weigh_to_measure_seconds',
+    'measure_to_scan_count', 'measure_to_scan_seconds',
+)
+
+
+def init_analytics_tables(c):
+    """Create the rollup and watermark tables (called from migrations.py)"""
+    for table, _ in ANALYTICS_GRANULARITIES.values():
+        counters = ',\n'.join(f'{column} REAL NOT NULL DEFAULT 0' for column in COUNTER_COLUMNS)
+        c.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                bucket TEXT PRIMARY KEY,
+                {counters},
+                weight_histogram TEXT
+            )
+        ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS analytics_watermarks (
+            source TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL
+        )
+    ''')
+
+
+def _parse_utc(timestamp, naive_is_utc=False):
+    """Aware UTC datetime for an ISO or SQLite timestamp, or None if it cannot be parsed.
+
+    Naive values are local time (the app's datetime.now().isoformat()) unless
+    naive_is_utc, as for SQLite CURRENT_TIMESTAMP columns.
+    """
+    if not timestamp:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(timestamp))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc) if naive_is_utc else parsed.astimezone()
+    return parsed.astimezone(timezone.utc)
+
+
+def _bucket_time(timestamp, naive_is_utc=False):
+    """Normalise a timestamp to 'YYYY-MM-DD HH:MM:SS' in UTC"""
+    parsed = _parse_utc(timestamp, naive_is_utc)
+    return parsed.strftime('%Y-%m-%d %H:%M:%S') if parsed else None
+
+
+def _seconds_between(start, end):
+    start, end = _parse_utc(start), _parse_utc(end)
+    if start is None or end is None:
+        return None
+    return (end - start).total_seconds()
+
+
+def _weight_bin(weight):
+    return min(int(weight / WEIGHT_BIN_KG), WEIGHT_BIN_COUNT - 1)
+
+
+def _read_new_rows(c, batch_size):
+    """New rows per source since the stored watermarks: {source: rows}"""
+    c.execute('SELECT source, last_id FROM analytics_watermarks')
+    watermarks = dict(c.fetchall())
+    queries = {
+        'qr_scans': '''
+            SELECT id, timestamp, created_at, is_valid
+            FROM qr_scans WHERE id > ? ORDER BY id LIMIT ?
+        ''',
+        'scanned_codes': '''
+            SELECT id, scanned_at
+            FROM scanned_codes WHERE id > ? AND isverified = 'yes' ORDER BY id LIMIT ?
+        ''',
+        'package_information': '''
+            SELECT id, timestamp, created_at, package_size, weight,
+                   loadcell_timestamp, box_dimensions_timestamp
+            FROM package_information WHERE id > ? ORDER BY id LIMIT ?
+        ''',
+    }
+    rows_by_source = {}
+    for source, query in queries.items():
+        c.execute(query, (watermarks.get(source, 0), batch_size))
+        rows_by_source[source] = c.fetchall()
+    return rows_by_source
+
+
+def _aggregate(rows_by_source, prefix_length):
+    """Fold raw rows into {bucket: {counter: value, 'histogram': {...}}}"""
+    buckets = {}
+
+    def bucket_for(timestamp, created_at=None):
+        # The app's own timestamp (local time) if usable, else the row's UTC created_at
+        key = _bucket_time(timestamp) or _bucket_time(created_at, naive_is_utc=True)
+        if key is None:
+            return None
+        key = key[:prefix_length]
+        if key not in buckets:
+            buckets[key] = {column: 0 for column in COUNTER_COLUMNS}
+            buckets[key]['histogram'] = {}
+        return buckets[key]
+
+    for _, timestamp, created_at, is_valid in rows_by_source['qr_scans']:
+        bucket = bucket_for(timestamp, created_at)
+        if bucket is None:
+            continue
+        bucket['scans'] += 1
+        bucket['valid_scans' if is_valid else 'invalid_scans'] += 1
+
+    for _, scanned_at in rows_by_source['scanned_codes']:
+        # Orders claimed by a verified scan (validations with skip_print included)
+        bucket = bucket_for(None, scanned_at)
+        if bucket is not None:
+            bucket['verified_scans'] += 1
+
+    for _, timestamp, created_at, package_size, weight, loadcell_ts, box_ts in rows_by_source['package_information']:
+        bucket = bucket_for(timestamp, created_at)
+        if bucket is None:
+            continue
+        bucket['packages'] += 1
+        size = (package_size or '').lower()
+        bucket[f'size_{size}' if size in PACKAGE_SIZES else 'size_unknown'] += 1
+        if weight is not None:
+            bucket['weight_count'] += 1
+            bucket['weight_sum'] += weight
+            weight_bin = str(_weight_bin(weight))
+            bucket['histogram'][weight_bin] = bucket['histogram'].get(weight_bin, 0) + 1
+        weigh_to_measure = _seconds_between(loadcell_ts, box_ts)
+        if weigh_to_measure is not None and weigh_to_measure >= 0:
+            bucket['weigh_to_measure_count'] += 1
+            bucket['weigh_to_measure_seconds'] += weigh_to_measure
+        measure_to_scan = _seconds_between(box_ts, timestamp)
+        if measure_to_scan is not None and measure_to_scan >= 0:
+            bucket['measure_to_scan_count'] += 1
+            bucket['measure_to_scan_seconds'] += measure_to_scan
+
+    return buckets
+
+
+def _merge_bucket(c, table, bucket_key, values):
+    c.execute(f'SELECT weight_histogram FROM {table} WHERE bucket = ?', (bucket_key,))
+    row = c.fetchone()
+    histogram = json.loads(row[0]) if row and row[0] else {}
+    for weight_bin, count in values['histogram'].items():
+        histogram[weight_bin] = histogram.get(weight_bin, 0) + count
+
+    columns = ', '.join(COUNTER_COLUMNS)
+    placeholders = ', '.join('?' for _ in COUNTER_COLUMNS)
+    updates = ', '.join(f'{column} = {column} + excluded.{column}' for column in COUNTER_COLUMNS)
+    c.execute(f'''
+        INSERT INTO {table} (bucket, {columns}, weight_histogram)
+        VALUES (?, {placeholders}, ?)
+        ON CONFLICT(bucket) DO UPDATE SET {updates}, weight_histogram = excluded.weight_histogram
+    ''', (bucket_key, *(values[column] for column in COUNTER_COLUMNS), json.dumps(histogram)))
+
+
+def refresh_rollups(db_path='database.db', batch_size=ANALYTICS_BATCH_SIZE, max_batches=None):
+    """Fold rows added since the last run into the rollups; returns rows processed.
+
+    Runs in one IMMEDIATE transaction per batch, so concurrent refreshes from
+    several threads or processes never count a row twice. max_batches bounds
+    the work for callers on a request path; the rest is left for the next run.
+    """
+    processed = 0
+    batches = 0
+    conn = sqlite3.connect(db_path, timeout=10, isolation_level=None)
+    try:
+        c = conn.cursor()
+        while True:
+            c.execute('BEGIN IMMEDIATE')
+            try:
+                rows_by_source = _read_new_rows(c, batch_size)
+                batch_rows = sum(len(rows) for rows in rows_by_source.values())
+                if batch_rows == 0:
+                    c.execute('COMMIT')
+                    break
+
+                for table, prefix_length in ANALYTICS_GRANULARITIES.values():
+                    for bucket_key, values in _aggregate(rows_by_source, prefix_length).items():
+                        _merge_bucket(c, table, bucket_key, values)
+
+                for source, rows in rows_by_source.items():
+                    if rows:
+                        c.execute('''
+                            INSERT INTO analytics_watermarks (source, last_id) VALUES (?, ?)
+                            ON CONFLICT(source) DO UPDATE SET last_id = excluded.last_id
+                        ''', (source, rows[-1][0]))
+                c.execute('COMMIT')
+            except Exception:
+                c.execute('ROLLBACK')
+                raise
+            processed += batch_rows
+            batches += 1
+            if batch_rows < batch_size or (max_batches and batches >= max_batches):
+                break
+    finally:
+        conn.close()
+
+    if processed:
+        logger.debug(f"Analytics rollups updated with {processed} new rows")
+    return processed
+
+
+def _percentile(histogram, total, fraction):
+    """Upper edge (kg) of the histogram bin containing the given fraction of samples"""
+    if not total:
+        return None
+    threshold = fraction * total
+    running = 0
+    for weight_bin in sorted(histogram, key=int):
+        running += histogram[weight_bin]
+        if running >= threshold:
+            return round((int(weight_bin) + 1) * WEIGHT_BIN_KG, 3)
+    return None
+
+
+def summarize(values, histogram):
+    """Derived metrics for one bucket (or a merged range of buckets)"""
+    scans = values['scans']
+    weight_count = values['weight_count']
+    return {
+        'scans': int(scans),
+        'valid_scans': int(values['valid_scans']),
+        'invalid_scans': int(values['invalid_scans']),
+        'rejection_rate': round(values['invalid_scans'] / scans, 4) if scans else None,
+        'verified_scans': int(values['verified_scans']),
+        'packages': int(values['packages']),
+        'size_mix': {size: int(values[f'size_{size}']) for size in (*PACKAGE_SIZES, 'unknown')},
+        'weight': {
+            'count': int(weight_count),
+            'avg': round(values['weight_sum'] / weight_count, 4) if weight_count else None,
+            'p50': _percentile(histogram, weight_count, 0.50),
+            'p90': _percentile(histogram, weight_count, 0.90),
+            'p99': _percentile(histogram, weight_count, 0.99),
+        },
+        'avg_step_seconds': {
+            'weigh_to_measure': round(values['weigh_to_measure_seconds'] / values['weigh_to_measure_count'], 2)
+                                if values['weigh_to_measure_count'] else None,
+            'measure_to_scan': round(values['measure_to_scan_seconds'] / values['measure_to_scan_count'], 2)
+                               if values['measure_to_scan_count'] else None,
+        },
+    }
+
+
+def query_rollups(c, granularity='hour', since=None, until=None, limit=168):
+    """Rollup rows for a bucket range, oldest first, plus a summary of the whole range.
+
+    since/until are ISO dates or datetimes, taken as UTC unless they carry an offset.
+    """
+    if granularity not in ANALYTICS_GRANULARITIES:
+        raise ValueError(f"Unknown granularity: {granularity}")
+    table, prefix_length = ANALYTICS_GRANULARITIES[granularity]
+
+    where, params = [], []
+    for name, value, operator in (('since', since, '>='), ('until', until, '<=')):
+        if not value:
+            continue
+        bucket = _bucket_time(value, naive_is_utc=True)
+        if bucket is None:
+            raise ValueError(f"Invalid {name}: {value}")
+        where.append(f'bucket {operator} ?')
+        params.append(bucket[:prefix_length])
+    where_clause = f"WHERE {' AND '.join(where)}" if where else ''
+
+    c.execute(f'''
+        SELECT * FROM (
+            SELECT bucket, {', '.join(COUNTER_COLUMNS)}, weight_histogram
+            FROM {table} {where_clause}
+            ORDER BY bucket DESC LIMIT ?
+        ) ORDER BY bucket
+    ''', (*params, limit))
+
+    buckets = []
+    totals = {column: 0 for column in COUNTER_COLUMNS}
+    total_histogram = {}
+    for row in c.fetchall():
+        values = dict(zip(COUNTER_COLUMNS, row[1:-1]))
+        histogram = json.loads(row[-1]) if row[-1] else {}
+        buckets.append({'bucket': row[0], **summarize(values, histogram)})
+        for column in COUNTER_COLUMNS:
+            totals[column] += values[column]
+        for weight_bin, count in histogram.items():
+            total_histogram[weight_bin] = total_histogram.get(weight_bin, 0) + count
+
+    return buckets, summarize(totals, total_histogram)
@@ -1,4 +1,4 @@
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, Response
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit
 import time
@@ -13,16 +13,19 @@ import logging
 import paho.mqtt.client as mqtt
 import json
 from products_data import products_data
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('app.log'),
-        logging.StreamHandler()
-    ]
-)
+from resource_versions import ResourceVersions
+from event_stream import EventStream
+from telemetry import TelemetryStore, now_ms
+from exporter import stream_export, EXPORT_FORMATS, EXPORT_TABLES
+from retention import archive_qr_scans, vacuum_database, RETENTION_CONFIG
+from analytics import refresh_rollups, query_rollups, ANALYTICS_GRANULARITIES, ANALYTICS_REQUEST_BATCH_SIZE
+from metrics import instrument_flask, timed_connect, InstrumentedSession
+from log_pipeline import setup_logging
+from migrations import migrate
+from order_numbers import allocate_order_numbers, sync_order_number_sequence
+
+# Configure logging (JSON lines to app.log with rotation, written off the request threads)
+log_pipeline = setup_logging('app.log', service='app')
 logger = logging.getLogger(__name__)
 
 load_dotenv()
@@ -31,232 +34,70 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key'  # Change this to a secure secret key
 CORS(app)  # Enable CORS for all routes
 
+# Request, SQLite and outgoing HTTP metrics, scraped from /metrics
+instrument_flask(app)
+
 # Initialize SocketIO with CORS enabled
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
 
 # Track application startup time for uptime calculation
 app_startup_time = datetime.now()
 
-# Database setup
-def init_db():
-    conn = sqlite3.connect('database.db')
-    c = conn.cursor()
-    
-    # Check if orders table exists with old schema (has status column)
-    c.execute("PRAGMA table_info(orders)")
-    columns = [column[1] for column in c.fetchall()]
-    
-    # If status column exists, we need to migrate the table
-    if 'status' in columns:
-        logger.info("Migrating orders table to remove status column...")
-        
-        # Create backup of existing data
-        c.execute("SELECT * FROM orders")
-        existing_orders = c.fetchall()
-        
-        # Drop the old table
-        c.execute("DROP TABLE IF EXISTS orders")
-        
-        # Create new table without status column
-        c.execute('''
-            CREATE TABLE orders (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                order_number TEXT NOT NULL,
-                customer_name TEXT NOT NULL,
-                email TEXT,
-                contact_number TEXT NOT NULL,
-                address TEXT NOT NULL,
-                product_id TEXT NOT NULL,
-                product_name TEXT NOT NULL,
-                amount REAL NOT NULL,
-                date TEXT NOT NULL
-            )
-        ''')
-        
-        # Restore data (excluding status column)
-        for order in existing_orders:
-            c.execute('''
-                INSERT INTO orders (
-                    id, order_number, customer_name, email, contact_number, 
-                    address, product_id, product_name, amount, date
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', order[:10])  # Take first 10 columns (excluding status which was the last)
-        
-        logger.info("Migration completed successfully!")
-    else:
-        # Create table if it doesn't exist
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS orders (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                order_number TEXT NOT NULL,
-                customer_name TEXT NOT NULL,
-                contact_number TEXT NOT NULL,
-                address TEXT NOT NULL,
-                product_id TEXT NOT NULL,
-                product_name TEXT NOT NULL,
-                amount REAL NOT NULL,
-                date TEXT NOT NULL
-            )
-        ''')
-    
-    # Create QR scans table to store scan history
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS qr_scans (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            qr_data TEXT NOT NULL,
-            timestamp TEXT NOT NULL,
-            device TEXT NOT NULL,
-            is_valid BOOLEAN NOT NULL,
-            order_id INTEGER,
-            validation_message TEXT,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Create package information table to store physical package data
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS package_information (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            order_id INTEGER,
-            order_number TEXT,
-            weight REAL,
-            width REAL,
-            height REAL,
-            length REAL,
-            timestamp TEXT NOT NULL,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (order_id) REFERENCES orders (id)
-        )
-    ''')
-    
-    # Create scanned_codes table to track verified scanned QR codes
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS scanned_codes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            order_id INTEGER NOT NULL,
-            order_number TEXT NOT NULL,
-            isverified TEXT NOT NULL CHECK(isverified IN ('yes', 'no')),
-            scanned_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            device TEXT DEFAULT 'raspberry_pi',
-            FOREIGN KEY (order_id) REFERENCES orders (id),
-            UNIQUE(order_id) -- Prevent duplicate entries for same order
-        )
-    ''')
-    
-    # Create index for faster lookups
-    try:
-        c.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_scanned_codes_order_id ON scanned_codes(order_id)')
-    except sqlite3.OperationalError:
-        # Index might already exist
-        pass
-    
-    # Clean up any duplicate entries that might exist (keep the oldest scan)
-    c.execute('''
-        DELETE FROM scanned_codes 
-        WHERE id NOT IN (
-            SELECT MIN(id) 
-            FROM scanned_codes 
-            GROUP BY order_id
-        )
-    ''')
-    
-    if c.rowcount > 0:
-        logger.info(f"Cleaned up {c.rowcount} duplicate scanned codes")
-    
-    conn.commit()
-    
-    # Create loaded_sensor_data table to store MQTT sensor data temporarily
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS loaded_sensor_data (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            weight REAL,
-            width REAL,
-            height REAL,
-            length REAL,
-            package_size TEXT,
-            loadcell_timestamp TEXT,
-            box_dimensions_timestamp TEXT,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Add package_size column if it doesn't exist (migration)
-    try:
-        c.execute("PRAGMA table_info(loaded_sensor_data)")
-        columns = [column[1] for column in c.fetchall()]
-        if 'package_size' not in columns:
-            c.execute("ALTER TABLE loaded_sensor_data ADD COLUMN package_size TEXT")
-            logger.debug("Added package_size column to loaded_sensor_data table")
-    except Exception as e:
-        logger.debug(f"Could not add package_size column (may already exist): {e}")
-    
-    # Add package_size column to package_information table if it doesn't exist (migration)
-    try:
-        c.execute("PRAGMA table_info(package_information)")
-        columns = [column[1] for column in c.fetchall()]
-        if 'package_size' not in columns:
-            c.execute("ALTER TABLE package_information ADD COLUMN package_size TEXT")
-            logger.debug("Added package_size column to package_information table")
-    except Exception as e:
-        logger.debug(f"Could not add package_size column to package_information (may already exist): {e}")
-    
-    conn.commit()
-    conn.close()
+# Versions of polled read resources, exposed as ETags for conditional GETs
+response_versions = ResourceVersions()
+
+# Typed state-change events pushed to dashboards over /api/stream
+event_stream = EventStream()
 
-def migrate_database():
-    """Remove email column from existing orders table if it exists"""
+# Append-only sensor history (telemetry.db) with 1 s / 1 min rollups
+telemetry = TelemetryStore()
+
+def database_version(resource):
+    """Version of a database-backed resource for its ETag.
+
+    Combines the in-process counter with the database file's modification
+    time so writes made by other processes (maintenance scripts, a second
+    worker) also invalidate cached responses.
+    """
     try:
-        conn = sqlite3.connect('database.db')
-        c = conn.cursor()
-        
-        # Check if email column exists
-        c.execute("PRAGMA table_info(orders)")
-        columns = [column[1] for column in c.fetchall()]
-        
-        if 'email' in columns:
-            logger.info("Removing email column from orders table...")
-            
-            # Create new table without email column
-            c.execute('''
-                CREATE TABLE orders_new (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    order_number TEXT NOT NULL,
-                    customer_name TEXT NOT NULL,
-                    contact_number TEXT NOT NULL,
-                    address TEXT NOT NULL,
-                    product_id TEXT NOT NULL,
-                    product_name TEXT NOT NULL,
-                    amount REAL NOT NULL,
-                    date TEXT NOT NULL
-                )
-            ''')
-            
-            # Copy data from old table to new table (excluding email)
-            c.execute('''
-                INSERT INTO orders_new (
-                    id, order_number, customer_name, contact_number, address,
-                    product_id, product_name, amount, date
+        db_mtime = os.stat('database.db').st_mtime_ns
+    except OSError:
+        db_mtime = 0
+    return f"{response_versions.get(resource)}.{db_mtime:x}"
+
+def insert_order(columns, values):
+    """Insert an order under a freshly allocated order number and return the stored row"""
+    conn = timed_connect('database.db', timeout=10)
+    try:
+        for attempt in range(3):
+            c = conn.cursor()
+            try:
+                order_number = allocate_order_numbers(c)[0]
+                placeholders = ', '.join('?' for _ in range(len(columns) + 1))
+                c.execute(
+                    f"INSERT INTO orders (order_number, {', '.join(columns)}) VALUES ({placeholders})",
+                    (order_number, *values)
                 )
-                SELECT id, order_number, customer_name, contact_number, address,
-                       product_id, product_name, amount, date
-                FROM orders
-            ''')
-            
-            # Drop old table and rename new table
-            c.execute('DROP TABLE orders')
-            c.execute('ALTER TABLE orders_new RENAME TO orders')
-            
-            conn.commit()
-            
+                order_id = c.lastrowid
+                conn.commit()
+                break
+            except sqlite3.IntegrityError:
+                # An order number was written outside the allocator (e.g. a seeding script)
+                conn.rollback()
+                if attempt == 2:
+                    raise
+                sync_order_number_sequence(c)
+                conn.commit()
+        
+        conn.row_factory = dict_factory
+        c = conn.cursor()
+        c.execute('SELECT * FROM orders WHERE id = ?', (order_id,))
+        return c.fetchone()
+    finally:
         conn.close()
-    except Exception as e:
-        logger.error(f"Database migration failed: {e}")
 
-# Initialize database
-init_db()
-
-# Run database migration
-migrate_database()
+# Bring database.db up to the current schema (a single version check once it is current)
+migrate('database.db')
 
 # Helper function to convert row to dictionary
 def dict_factory(cursor, row):
@@ -265,9 +106,90 @@ def dict_factory(cursor, row):
         d[col[0]] = row[idx]
     return d
 
+# Keyset pagination settings for list endpoints
+MAX_PAGE_SIZE = 500
+
+def build_list_query(columns, key_field, default_limit=None, unpaged_order_by=None):
+    """Parse fields=, cursor=, since= and limit= query parameters for a list endpoint.
+
+    columns maps each public field name to its SQL expression and key_field is
+    the monotonically increasing id used for keyset pagination. Rows are
+    returned newest first; cursor=<id> continues below that id and since=<id>
+    only returns rows newer than it. A request without cursor=, since= or
+    limit= (and no default_limit) is ordered by unpaged_order_by instead, if
+    given, so existing callers keep the endpoint's original ordering.
+    Raises ValueError for unknown fields.
+    """
+    fields_param = request.args.get('fields')
+    if fields_param:
+        fields = [field.strip() for field in fields_param.split(',') if field.strip()]
+        unknown_fields = [field for field in fields if field not in columns]
+        if unknown_fields:
+            raise ValueError(f"Unknown fields: {', '.join(unknown_fields)}")
+    else:
+        fields = list(columns)
+    
+    select_fields = list(fields)
+    if key_field not in select_fields:
+        select_fields.append(key_field)  # Needed for the next cursor, stripped from the response
+    
+    conditions = []
+    params = []
+    cursor = request.args.get('cursor', type=int)
+    if cursor is not None:
+        conditions.append(f"{columns[key_field]} < ?")
+        params.append(cursor)
+    since = request.args.get('since', type=int)
+    if since is not None:
+        conditions.append(f"{columns[key_field]} > ?")
+        params.append(since)
+    
+    limit = request.args.get('limit', default_limit, type=int)
+    if limit is not None:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+    
+    order_by = f"ORDER BY {columns[key_field]} DESC"
+    if unpaged_order_by and not conditions and limit is None:
+        order_by = f"ORDER BY {unpaged_order_by}"
+    
+    return {
+        'select': ', '.join(f"{columns[field]} AS {field}" for field in select_fields),
+        'where': f"WHERE {' AND '.join(conditions)}" if conditions else '',
+        'order_by': order_by,
+        'limit': limit,
+        'params': params,
+        'fields': fields,
+        'key_field': key_field
+    }
+
+def fetch_list_page(cursor, from_clause, list_query):
+    """Run a query built by build_list_query and return (rows, next_cursor)"""
+    sql = f"SELECT {list_query['select']} {from_clause} {list_query['where']} {list_query['order_by']}"
+    params = list(list_query['params'])
+    if list_query['limit'] is not None:
+        sql += ' LIMIT ?'
+        params.append(list_query['limit'])
+    
+    cursor.execute(sql, params)
+    rows = cursor.fetchall()
+    
+    key_field = list_query['key_field']
+    next_cursor = None
+    if list_query['limit'] is not None and len(rows) == list_query['limit']:
+        next_cursor = rows[-1][key_field]
+    
+    if key_field not in list_query['fields']:
+        for row in rows:
+            del row[key_field]
+    
+    return rows, next_cursor
+
 # Configuration for Raspberry Pi
 RASPBERRY_PI_URL = os.getenv('RASPBERRY_PI_URL', 'http://10.194.125.227:5001')  # Default value if not set
 
+# Calls to the Raspberry Pi reuse connections and are timed in http_client_request_duration_seconds
+pi_http = InstrumentedSession()
+
 def send_print_request_to_raspi(order_data):
     """Send print request to Raspberry Pi with order details"""
     try:
@@ -286,7 +208,7 @@ def send_print_request_to_raspi(order_data):
         logger.info(f"Sending print request to Raspberry Pi for order {order_data['order_number']}")
         
         # Send print request to Raspberry Pi
-        response = requests.post(
+        response = pi_http.post(
             f"{RASPBERRY_PI_URL}/print-receipt",
             json=print_data,
             timeout=10
@@ -335,7 +257,7 @@ def get_system_uptime():
 def get_real_time_dashboard_data():
     """Get real-time dashboard data from database"""
     try:
-        conn = sqlite3.connect('database.db')
+        conn = timed_connect('database.db')
         c = conn.cursor()
         
         # Get today's date for filtering
@@ -497,7 +419,7 @@ def receive_qr_scans():
         if not scans:
             return jsonify({'error': 'No scan data provided'}), 400
         
-        conn = sqlite3.connect('database.db')
+        conn = timed_connect('database.db')
         c = conn.cursor()
         
         # Store each scan in the database
@@ -519,6 +441,9 @@ def receive_qr_scans():
         
         conn.commit()
         conn.close()
+        response_versions.bump('qr_scans')
+        for scan in scans:
+            event_stream.publish('qr_scan', scan)
         
         return jsonify({
             'message': f'Successfully stored {len(scans)} scan records',
@@ -528,27 +453,43 @@ def receive_qr_scans():
     except Exception as e:
         return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
 
+QR_SCAN_COLUMNS = {
+    'id': 'id',
+    'qr_data': 'qr_data',
+    'timestamp': 'timestamp',
+    'device': 'device',
+    'is_valid': 'is_valid',
+    'order_id': 'order_id',
+    'validation_message': 'validation_message',
+    'created_at': 'created_at'
+}
+
 @app.route('/api/qr-scans', methods=['GET'])
 @app.route('/api/qr-history', methods=['GET'])  # Alias for frontend compatibility
 def get_qr_scans():
-    """Get QR scan history"""
+    """Get QR scan history (supports fields=, cursor=, since= and limit=)"""
+    return response_versions.conditional_response(
+        'qr_scans', build_qr_scans_response, version=database_version('qr_scans'))
+
+def build_qr_scans_response():
+    """Query the QR scan history page requested by the current request"""
     try:
-        limit = request.args.get('limit', 50, type=int)
-        
-        conn = sqlite3.connect('database.db')
+        list_query = build_list_query(QR_SCAN_COLUMNS, 'id', default_limit=50)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        conn = timed_connect('database.db')
         conn.row_factory = dict_factory
         c = conn.cursor()
         
-        c.execute('''
-            SELECT * FROM qr_scans 
-            ORDER BY created_at DESC 
-            LIMIT ?
-        ''', (limit,))
-        
-        scans = c.fetchall()
+        scans, next_cursor = fetch_list_page(c, 'FROM qr_scans', list_query)
         conn.close()
         
-        return jsonify(scans), 200
+        response = jsonify(scans)
+        if next_cursor is not None:
+            response.headers['X-Next-Cursor'] = str(next_cursor)
+        return response, 200
         
     except Exception as e:
         return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
@@ -563,7 +504,7 @@ def print_qr_code():
             return jsonify({'error': 'Order ID is required'}), 400
 
         # Get order details from database
-        conn = sqlite3.connect('database.db')
+        conn = timed_connect('database.db')
         conn.row_factory = dict_factory
         c = conn.cursor()
         c.execute('SELECT * FROM orders WHERE id = ?', (order_id,))
@@ -593,7 +534,7 @@ def print_qr_code():
         for attempt in range(max_retries):
             try:
                 logger.info(f"Attempting to print QR code (attempt {attempt + 1}/{max_retries})")
-                response = requests.post(
+                response = pi_http.post(
                     f"{RASPBERRY_PI_URL}/print-qr",
                     json=printer_data,
                     headers={'Content-Type': 'application/json'},
@@ -681,7 +622,7 @@ def print_receipt():
             order_number = qr_data
 
         # Get order details from database using order_number
-        conn = sqlite3.connect('database.db')
+        conn = timed_connect('database.db')
         conn.row_factory = dict_factory
         c = conn.cursor()
         c.execute('SELECT * FROM orders WHERE order_number = ?', (order_number,))
@@ -707,7 +648,7 @@ def print_receipt():
         # Forward the print request to the Raspberry Pi
         try:
             logger.info(f"Printing receipt for QR validation - Order: {order_number}")
-            response = requests.post(
+            response = pi_http.post(
                 f"{RASPBERRY_PI_URL}/print-receipt",
                 json=printer_data,
                 headers={'Content-Type': 'application/json'},
@@ -747,15 +688,36 @@ def print_receipt():
 def get_products():
     return jsonify(products_data)
 
+ORDER_COLUMNS = {
+    'id': 'id',
+    'order_number': 'order_number',
+    'customer_name': 'customer_name',
+    'contact_number': 'contact_number',
+    'address': 'address',
+    'product_id': 'product_id',
+    'product_name': 'product_name',
+    'amount': 'amount',
+    'date': 'date'
+}
+
 @app.route('/api/orders', methods=['GET'])
 def get_orders():
-    conn = sqlite3.connect('database.db')
+    """Get orders, latest date first (supports fields=, cursor=, since= and limit=; pages are in id order)"""
+    try:
+        list_query = build_list_query(ORDER_COLUMNS, 'id', unpaged_order_by='date DESC, id DESC')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    conn = timed_connect('database.db')
     conn.row_factory = dict_factory
     c = conn.cursor()
-    c.execute('SELECT * FROM orders ORDER BY date DESC')
-    orders = c.fetchall()
+    orders, next_cursor = fetch_list_page(c, 'FROM orders', list_query)
     conn.close()
-    return jsonify(orders)
+    
+    response = jsonify(orders)
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+    return response
 
 @app.route('/api/orders', methods=['POST'])
 def create_order():
@@ -773,23 +735,11 @@ def create_order():
         if not product:
             return jsonify({'error': 'Invalid product ID'}), 400
 
-        # Connect to database
-        conn = sqlite3.connect('database.db')
-        c = conn.cursor()
-
-        # Get the next order ID
-        c.execute('SELECT COUNT(*) FROM orders')
-        order_count = c.fetchone()[0]
-        new_order_number = f"ORD-{str(order_count + 1).zfill(3)}"
-
-        # Insert new order
-        c.execute('''
-            INSERT INTO orders (
-                order_number, customer_name, email, contact_number, address,
-                product_id, product_name, amount, date
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            new_order_number,
+        # Insert new order under the next order number
+        new_order = insert_order((
+            'customer_name', 'email', 'contact_number', 'address',
+            'product_id', 'product_name', 'amount', 'date'
+        ), (
             data['customerName'],
             data['email'],
             data['contactNumber'],
@@ -800,17 +750,6 @@ def create_order():
             datetime.now().strftime("%Y-%m-%d")
         ))
 
-        # Get the inserted order
-        order_id = c.lastrowid
-        conn.commit()
-
-        # Fetch the created order
-        conn.row_factory = dict_factory
-        c = conn.cursor()
-        c.execute('SELECT * FROM orders WHERE id = ?', (order_id,))
-        new_order = c.fetchone()
-        conn.close()
-
         return jsonify({
             'message': 'Order created successfully',
             'order': new_order
@@ -838,23 +777,11 @@ def create_manual_order():
         except ValueError:
             return jsonify({'error': 'Invalid price format'}), 400
 
-        # Connect to database
-        conn = sqlite3.connect('database.db')
-        c = conn.cursor()
-
-        # Get the next order ID
-        c.execute('SELECT COUNT(*) FROM orders')
-        order_count = c.fetchone()[0]
-        new_order_number = f"ORD-{str(order_count + 1).zfill(3)}"
-
-        # Insert new manual order
-        c.execute('''
-            INSERT INTO orders (
-                order_number, customer_name, contact_number, address,
-                product_id, product_name, amount, date
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            new_order_number,
+        # Insert new manual order under the next order number
+        new_order = insert_order((
+            'customer_name', 'contact_number', 'address',
+            'product_id', 'product_name', 'amount', 'date'
+        ), (
             data['customerName'],
             data['contactNumber'],
             data['address'],
@@ -864,17 +791,6 @@ def create_manual_order():
             datetime.now().strftime("%Y-%m-%d")
         ))
 
-        # Get the inserted order
-        order_id = c.lastrowid
-        conn.commit()
-
-        # Fetch the created order
-        conn.row_factory = dict_factory
-        c = conn.cursor()
-        c.execute('SELECT * FROM orders WHERE id = ?', (order_id,))
-        new_order = c.fetchone()
-        conn.close()
-
         return jsonify({
             'message': 'Manual order created successfully',
             'order': new_order
@@ -887,7 +803,7 @@ def create_manual_order():
 def get_camera_status():
     """Get the status of the Raspberry Pi camera"""
     try:
-        response = requests.get(f"{RASPBERRY_PI_URL}/camera/status")
+        response = pi_http.get(f"{RASPBERRY_PI_URL}/camera/status")
         return jsonify(response.json()), response.status_code
     except requests.RequestException as e:
         return jsonify({
@@ -899,7 +815,9 @@ def get_camera_status():
 def start_camera():
     """Start the Raspberry Pi camera"""
     try:
-        response = requests.post(f"{RASPBERRY_PI_URL}/camera/start")
+        response = pi_http.post(f"{RASPBERRY_PI_URL}/camera/start")
+        if response.ok:
+            event_stream.publish('camera_status', {'camera_running': True, 'action': 'start'})
         return jsonify(response.json()), response.status_code
     except requests.RequestException as e:
         return jsonify({
@@ -911,7 +829,9 @@ def start_camera():
 def stop_camera():
     """Stop the Raspberry Pi camera"""
     try:
-        response = requests.post(f"{RASPBERRY_PI_URL}/camera/stop")
+        response = pi_http.post(f"{RASPBERRY_PI_URL}/camera/stop")
+        if response.ok:
+            event_stream.publish('camera_status', {'camera_running': False, 'action': 'stop'})
         return jsonify(response.json()), response.status_code
     except requests.RequestException as e:
         return jsonify({
@@ -923,7 +843,7 @@ def stop_camera():
 def get_last_scanned_qr():
     """Get the last QR code scanned by the camera"""
     try:
-        response = requests.get(f"{RASPBERRY_PI_URL}/camera/last-qr")
+        response = pi_http.get(f"{RASPBERRY_PI_URL}/camera/last-qr")
         return jsonify(response.json()), response.status_code
     except requests.RequestException as e:
         return jsonify({
@@ -936,7 +856,7 @@ def get_camera_stream_url():
     """Get the URL for the camera stream"""
     try:
         # Test if camera is accessible
-        status_response = requests.get(f"{RASPBERRY_PI_URL}/camera/status")
+        status_response = pi_http.get(f"{RASPBERRY_PI_URL}/camera/status")
         if status_response.status_code == 200:
             camera_status = status_response.json()
             if camera_status.get('camera_running', False):
@@ -959,7 +879,7 @@ def get_camera_stream_url():
 def get_scanning_status():
     """Get current QR scanning delay status"""
     try:
-        response = requests.get(f"{RASPBERRY_PI_URL}/camera/scanning-status")
+        response = pi_http.get(f"{RASPBERRY_PI_URL}/camera/scanning-status")
         if response.status_code == 200:
             return jsonify(response.json())
         else:
@@ -977,7 +897,7 @@ def get_scanning_status():
 def reset_scan_cycle():
     """Reset the scanning cycle (countdown + scanning session)"""
     try:
-        response = requests.post(f"{RASPBERRY_PI_URL}/camera/reset-cycle")
+        response = pi_http.post(f"{RASPBERRY_PI_URL}/camera/reset-cycle")
         if response.status_code == 200:
             return jsonify(response.json())
         else:
@@ -995,7 +915,7 @@ def reset_scan_cycle():
 def start_scanning_session_immediately():
     """Start scanning session immediately, skipping countdown"""
     try:
-        response = requests.post(f"{RASPBERRY_PI_URL}/camera/start-session")
+        response = pi_http.post(f"{RASPBERRY_PI_URL}/camera/start-session")
         if response.status_code == 200:
             return jsonify(response.json())
         else:
@@ -1013,7 +933,7 @@ def start_scanning_session_immediately():
 def handle_camera_session_start():
     """Handle when a new session/page load occurs - reset scanning delay"""
     try:
-        response = requests.post(f"{RASPBERRY_PI_URL}/camera/session-start")
+        response = pi_http.post(f"{RASPBERRY_PI_URL}/camera/session-start")
         if response.status_code == 200:
             return jsonify(response.json())
         else:
@@ -1032,11 +952,11 @@ def get_full_system_status():
     """Get status of all system components including camera"""
     try:
         # Get camera status
-        camera_response = requests.get(f"{RASPBERRY_PI_URL}/camera/status", timeout=2)
+        camera_response = pi_http.get(f"{RASPBERRY_PI_URL}/camera/status", timeout=2)
         camera_status = camera_response.json() if camera_response.ok else {'error': 'Camera service unavailable'}
         
         # Get printer status
-        printer_response = requests.get(f"{RASPBERRY_PI_URL}/", timeout=2)
+        printer_response = pi_http.get(f"{RASPBERRY_PI_URL}/", timeout=2)
         printer_status = printer_response.json() if printer_response.ok else {'error': 'Printer service unavailable'}
         
         # Combine with existing system status
@@ -1065,7 +985,7 @@ def start_system():
     """Start the motor system via Raspberry Pi"""
     try:
         # Check if Raspberry Pi is reachable
-        health_response = requests.get(f"{RASPBERRY_PI_URL}/", timeout=5)
+        health_response = pi_http.get(f"{RASPBERRY_PI_URL}/", timeout=5)
         if not health_response.ok:
             return jsonify({
                 'error': 'Raspberry Pi unreachable',
@@ -1073,7 +993,7 @@ def start_system():
             }), 503
         
         # Send start command to Raspberry Pi
-        start_response = requests.post(f"{RASPBERRY_PI_URL}/api/start-motor", timeout=10)
+        start_response = pi_http.post(f"{RASPBERRY_PI_URL}/api/start-motor", timeout=10)
         
         if start_response.ok:
             response_data = start_response.json()
@@ -1124,7 +1044,7 @@ def stop_system():
     """Stop the motor system via Raspberry Pi"""
     try:
         # Check if Raspberry Pi is reachable
-        health_response = requests.get(f"{RASPBERRY_PI_URL}/", timeout=5)
+        health_response = pi_http.get(f"{RASPBERRY_PI_URL}/", timeout=5)
         if not health_response.ok:
             return jsonify({
                 'error': 'Raspberry Pi unreachable',
@@ -1132,7 +1052,7 @@ def stop_system():
             }), 503
         
         # Send stop command to Raspberry Pi
-        stop_response = requests.post(f"{RASPBERRY_PI_URL}/api/stop-motor", timeout=10)
+        stop_response = pi_http.post(f"{RASPBERRY_PI_URL}/api/stop-motor", timeout=10)
         
         if stop_response.ok:
             response_data = stop_response.json()
@@ -1193,7 +1113,7 @@ def handle_start_camera(data=None):
     """Start camera and begin streaming QR code data"""
     try:
         # Start camera via HTTP request to Raspberry Pi
-        response = requests.post(f"{RASPBERRY_PI_URL}/camera/start", timeout=5)
+        response = pi_http.post(f"{RASPBERRY_PI_URL}/camera/start", timeout=5)
         if response.ok:
             emit('camera_status', {'status': 'started'})
             # Start background thread for QR code polling
@@ -1207,7 +1127,7 @@ def handle_start_camera(data=None):
 def handle_stop_camera(data=None):
     """Stop camera streaming"""
     try:
-        response = requests.post(f"{RASPBERRY_PI_URL}/camera/stop", timeout=5)
+        response = pi_http.post(f"{RASPBERRY_PI_URL}/camera/stop", timeout=5)
         if response.ok:
             emit('camera_status', {'status': 'stopped'})
         else:
@@ -1220,7 +1140,7 @@ def handle_get_system_status(data=None):
     """Get current system status and emit to client"""
     try:
         # Get camera status
-        camera_response = requests.get(f"{RASPBERRY_PI_URL}/camera/status", timeout=2)
+        camera_response = pi_http.get(f"{RASPBERRY_PI_URL}/camera/status", timeout=2)
         camera_status = camera_response.json() if camera_response.ok else {'error': 'Camera service unavailable'}
         
         system_status = {
@@ -1256,7 +1176,7 @@ def qr_polling_task():
     last_qr_data = None
     while True:
         try:
-            response = requests.get(f"{RASPBERRY_PI_URL}/camera/last-qr", timeout=2)
+            response = pi_http.get(f"{RASPBERRY_PI_URL}/camera/last-qr", timeout=2)
             if response.ok:
                 data = response.json()
                 if data.get('last_qr_data') and data['last_qr_data'] != last_qr_data:
@@ -1290,7 +1210,7 @@ def create_package_information():
         if not any(data.get(field) is not None for field in measurements):
             return jsonify({'error': 'At least one measurement (weight, width, height, or length) must be provided'}), 400
         
-        conn = sqlite3.connect('database.db')
+        conn = timed_connect('database.db')
         c = conn.cursor()
         
         # Check if package information already exists for this order
@@ -1331,9 +1251,10 @@ def create_package_information():
         
         conn.commit()
         conn.close()
+        response_versions.bump('package_information')
         
-        # Emit update via WebSocket to notify clients
-        socketio.emit('package_information_updated', {
+        # Emit update via WebSocket and the event stream to notify clients
+        package_update = {
             'order_id': data['order_id'],
             'order_number': data['order_number'],
             'weight': data.get('weight'),
@@ -1341,7 +1262,9 @@ def create_package_information():
             'height': data.get('height'),
             'length': data.get('length'),
             'timestamp': data['timestamp']
-        })
+        }
+        socketio.emit('package_information_updated', package_update)
+        event_stream.publish('package_info', package_update)
         
         return jsonify({
             'message': message,
@@ -1359,7 +1282,7 @@ def create_package_information():
 def get_package_information(order_id):
     """Get package information for a specific order"""
     try:
-        conn = sqlite3.connect('database.db')
+        conn = timed_connect('database.db')
         conn.row_factory = dict_factory
         c = conn.cursor()
         
@@ -1379,28 +1302,51 @@ def get_package_information(order_id):
             'details': str(e)
         }), 500
 
+PACKAGE_INFORMATION_COLUMNS = {
+    'id': 'pi.id',
+    'order_id': 'pi.order_id',
+    'order_number': 'pi.order_number',
+    'weight': 'pi.weight',
+    'width': 'pi.width',
+    'height': 'pi.height',
+    'length': 'pi.length',
+    'timestamp': 'pi.timestamp',
+    'created_at': 'pi.created_at',
+    'package_size': 'pi.package_size',
+    'customer_name': 'o.customer_name',
+    'product_name': 'o.product_name'
+}
+
 @app.route('/api/package-information', methods=['GET'])
 def get_all_package_information():
-    """Get all package information records"""
+    """Get package information records (supports fields=, cursor=, since= and limit=)"""
+    return response_versions.conditional_response(
+        'package_information', build_package_information_response,
+        version=database_version('package_information'))
+
+def build_package_information_response():
+    """Query the package information page requested by the current request"""
     try:
-        conn = sqlite3.connect('database.db')
+        list_query = build_list_query(PACKAGE_INFORMATION_COLUMNS, 'id', default_limit=50)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        conn = timed_connect('database.db')
         conn.row_factory = dict_factory
         c = conn.cursor()
         
-        c.execute('''
-            SELECT pi.*, o.customer_name, o.product_name 
+        package_info, next_cursor = fetch_list_page(c, '''
             FROM package_information pi
             LEFT JOIN orders o ON pi.order_id = o.id
-            ORDER BY pi.created_at DESC
-            LIMIT 50
-        ''')
-        package_info = c.fetchall()
+        ''', list_query)
         
         conn.close()
         
         return jsonify({
             'packages': package_info,
             'count': len(package_info),
+            'next_cursor': next_cursor,
             'timestamp': datetime.now().isoformat()
         })
         
@@ -1414,7 +1360,7 @@ def get_all_package_information():
 def get_package_information_by_order_number(order_number):
     """Get package information for a specific order by order number"""
     try:
-        conn = sqlite3.connect('database.db')
+        conn = timed_connect('database.db')
         conn.row_factory = dict_factory
         c = conn.cursor()
         
@@ -1444,7 +1390,7 @@ def get_package_information_by_order_number(order_number):
 def delete_scanned_code(order_id):
     """Delete a scanned code entry to allow rescanning"""
     try:
-        conn = sqlite3.connect('database.db')
+        conn = timed_connect('database.db')
         c = conn.cursor()
         
         # Check if the scanned code exists
@@ -1471,6 +1417,76 @@ def delete_scanned_code(order_id):
             'details': str(e)
         }), 500
 
+def claim_order_scan(qr_data, device='raspberry_pi'):
+    """Claim an order for scanning in a single write transaction.
+
+    Looks up the order, inserts the scanned_codes row (the unique index on
+    order_id decides the winner), attaches the latest loaded sensor data as
+    package information and clears the sensor buffer - all inside one
+    BEGIN IMMEDIATE transaction so concurrent validations of the same order
+    (threads or processes) cannot both claim it.
+
+    Returns (order, claimed, scanned_at, package_info, sensor_data_applied).
+    order is None when the QR data does not match any order.
+    """
+    conn = timed_connect('database.db', timeout=10, isolation_level=None)
+    conn.row_factory = dict_factory
+    c = conn.cursor()
+    try:
+        c.execute('BEGIN IMMEDIATE')
+        
+        c.execute('SELECT * FROM orders WHERE order_number = ?', (qr_data,))
+        order = c.fetchone()
+        if not order:
+            c.execute('COMMIT')
+            return None, False, None, None, False
+        
+        # The unique index on scanned_codes.order_id makes this the claim:
+        # a row is only returned when this call inserted it
+        c.execute('''
+            INSERT INTO scanned_codes (order_id, order_number, isverified, device)
+            VALUES (?, ?, 'yes', ?)
+            ON CONFLICT(order_id) DO NOTHING
+            RETURNING scanned_at
+        ''', (order['id'], order['order_number'], device))
+        claimed_scan = c.fetchone()
+        
+        if not claimed_scan:
+            c.execute('SELECT scanned_at FROM scanned_codes WHERE order_id = ?', (order['id'],))
+            existing_scan = c.fetchone()
+            c.execute('COMMIT')
+            return order, False, existing_scan['scanned_at'] if existing_scan else 'Unknown', None, False
+        
+        # Attach the latest sensor reading (if any) as package information
+        c.execute('''
+            INSERT INTO package_information
+            (order_id, order_number, weight, width, height, length, package_size, timestamp,
+             loadcell_timestamp, box_dimensions_timestamp)
+            SELECT ?, ?, weight, width, height, length, package_size, ?,
+                   loadcell_timestamp, box_dimensions_timestamp
+            FROM loaded_sensor_data
+            ORDER BY created_at DESC, id DESC
+            LIMIT 1
+            RETURNING *
+        ''', (order['id'], order['order_number'], datetime.now().isoformat()))
+        package_info = c.fetchone()
+        
+        if package_info:
+            # Clear sensor data after successful validation
+            c.execute('DELETE FROM loaded_sensor_data')
+            logger.info(f"Applied sensor data to order {qr_data} and cleared sensor buffer")
+        
+        c.execute('COMMIT')
+        if package_info:
+            response_versions.bump('package_information')
+        return order, True, claimed_scan['scanned_at'], package_info, package_info is not None
+    except Exception:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
 @app.route('/api/validate-qr', methods=['POST'])
 def validate_qr_code():
     """Validate QR code against orders database and record in scanned_codes table"""
@@ -1479,6 +1495,7 @@ def validate_qr_code():
         qr_data = data.get('qr_data')
         source = data.get('source', 'web')  # Default to 'web' if not specified
         skip_print = data.get('skip_print', False)  # Default to False if not specified
+        parcel_id = request.headers.get('X-Parcel-Id')  # Set by the Pi when the scan belongs to a traced parcel
         
         if not qr_data:
             return jsonify({'error': 'No QR data provided'}), 400
@@ -1486,169 +1503,76 @@ def validate_qr_code():
         # Clean the QR data
         qr_data = str(qr_data).strip()
         
-        conn = sqlite3.connect('database.db')
-        conn.row_factory = dict_factory
-        c = conn.cursor()
+        order, claimed, scanned_at, package_info, sensor_data_applied = claim_order_scan(qr_data)
         
-        # Check if QR data matches any order number
-        c.execute('SELECT * FROM orders WHERE order_number = ?', (qr_data,))
-        order = c.fetchone()
-        
-        if order:
-            # Valid order found - Check if this order is already scanned
-            # Use a more comprehensive check to prevent any duplicates
-            c.execute('SELECT * FROM scanned_codes WHERE order_id = ?', (order['id'],))
-            already_scanned = c.fetchone()
-            
-            if already_scanned:
-                # Order already scanned - return existing scan info WITHOUT printing or sound
-                # This prevents duplicate printing and sound for the same QR code
-                logger.info(f"QR code {qr_data} already scanned at {already_scanned['scanned_at']} - No print or sound triggered")
-                response_data = {
-                    'valid': True,
-                    'already_scanned': True,
-                    'order_id': order['id'],
-                    'order_number': order['order_number'],
-                    'customer_name': order['customer_name'],
-                    'product_name': order['product_name'],
-                    'amount': order['amount'],
-                    'date': order['date'],
-                    'address': order.get('address', 'N/A'),
-                    'contact_number': order.get('contact_number', 'N/A'),
-                    'email': order.get('email', ''),
-                    'message': f'Order {qr_data} already scanned successfully',
-                    'scanned_at': already_scanned['scanned_at']
-                }
-            else:
-                # Valid order, not yet scanned - process it
-                # Double-check one more time to prevent race conditions
-                c.execute('SELECT COUNT(*) as count FROM scanned_codes WHERE order_id = ?', (order['id'],))
-                existing_count = c.fetchone()['count']
-                
-                if existing_count > 0:
-                    # Another process already scanned this while we were processing
-                    logger.warning(f"Race condition: QR code {qr_data} was scanned by another process")
-                    c.execute('SELECT * FROM scanned_codes WHERE order_id = ?', (order['id'],))
-                    existing_scan = c.fetchone()
-                    response_data = {
-                        'valid': True,
-                        'already_scanned': True,
-                        'order_id': order['id'],
-                        'order_number': order['order_number'],
-                        'customer_name': order['customer_name'],
-                        'product_name': order['product_name'],
-                        'amount': order['amount'],
-                        'date': order['date'],
-                        'message': f'Order {qr_data} was already scanned successfully',
-                        'scanned_at': existing_scan['scanned_at']
-                    }
-                else:
-                    # Safe to insert - Get sensor data if available
-                    c.execute('SELECT * FROM loaded_sensor_data ORDER BY created_at DESC LIMIT 1')
-                    sensor_data = c.fetchone()
-                    
-                    # Insert into scanned_codes table as verified to prevent duplicates
-                    try:
-                        c.execute('''
-                            INSERT INTO scanned_codes (order_id, order_number, isverified, device)
-                            VALUES (?, ?, ?, ?)
-                        ''', (order['id'], order['order_number'], 'yes', 'raspberry_pi'))
-                        
-                        # If sensor data exists, create package information and then clear sensor data
-                        package_info = None
-                        if sensor_data:
-                            # Create package information record
-                            c.execute('''
-                                INSERT INTO package_information 
-                                (order_id, order_number, weight, width, height, length, package_size, timestamp)
-                                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                            ''', (
-                                order['id'],
-                                order['order_number'],
-                                sensor_data['weight'],
-                                sensor_data['width'],
-                                sensor_data['height'],
-                                sensor_data['length'],
-                                sensor_data.get('package_size', 'Unknown'),
-                                datetime.now().isoformat()
-                            ))
-                            
-                            # Get the created package info
-                            c.execute('SELECT * FROM package_information WHERE order_id = ? ORDER BY created_at DESC LIMIT 1', (order['id'],))
-                            package_info = c.fetchone()
-                            
-                            # Clear sensor data after successful validation
-                            c.execute('DELETE FROM loaded_sensor_data')
-                            logger.info(f"Applied sensor data to order {qr_data} and cleared sensor buffer")
-                        
-                        conn.commit()
-                        logger.info(f"Successfully scanned QR code {qr_data} for order {order['order_number']}")
-                        
-                        # Send print request to Raspberry Pi for successful scan (only if not skipped)
-                        if not skip_print:
-                            logger.info(f"Attempting to send print request for order {order['order_number']}")
-                            try:
-                                print_success, print_message = send_print_request_to_raspi(order)
-                                if print_success:
-                                    logger.info(f"Print request sent successfully for order {order['order_number']}")
-                                else:
-                                    logger.warning(f"Print request failed for order {order['order_number']}: {print_message}")
-                            except Exception as e:
-                                print_success, print_message = False, f"Print function error: {str(e)}"
-                                logger.error(f"Exception in print request for order {order['order_number']}: {e}")
-                        else:
-                            # Skip print request as requested (likely handled by local camera system)
-                            print_success, print_message = True, "Print request skipped (handled locally)"
-                            logger.info(f"Print request skipped for order {order['order_number']} - handled by {source}")
-                        
-                        response_data = {
-                            'valid': True,
-                            'already_scanned': False,
-                            'order_id': order['id'],
-                            'order_number': order['order_number'],
-                            'customer_name': order['customer_name'],
-                            'product_name': order['product_name'],
-                            'amount': order['amount'],
-                            'date': order['date'],
-                            'address': order.get('address', 'N/A'),
-                            'contact_number': order.get('contact_number', 'N/A'),
-                            'email': order.get('email', ''),
-                            'message': f'Order {qr_data} scanned successfully!',
-                            'package_information': package_info,
-                            'sensor_data_applied': sensor_data is not None,
-                            'print_requested': print_success,
-                            'print_message': print_message
-                        }
-                    except sqlite3.IntegrityError as ie:
-                        # Handle UNIQUE constraint violation
-                        logger.warning(f"UNIQUE constraint violation for QR code {qr_data}: {ie}")
-                        c.execute('SELECT * FROM scanned_codes WHERE order_id = ?', (order['id'],))
-                        existing_scan = c.fetchone()
-                        response_data = {
-                            'valid': True,
-                            'already_scanned': True,
-                            'order_id': order['id'],
-                            'order_number': order['order_number'],
-                            'customer_name': order['customer_name'],
-                            'product_name': order['product_name'],
-                            'amount': order['amount'],
-                            'date': order['date'],
-                            'address': order.get('address', 'N/A'),
-                            'contact_number': order.get('contact_number', 'N/A'),
-                            'email': order.get('email', ''),
-                            'message': f'Order {qr_data} was already scanned successfully',
-                            'scanned_at': existing_scan['scanned_at'] if existing_scan else 'Unknown'
-                        }
-        else:
+        if not order:
             # Invalid QR code - order not found in database
             logger.warning(f"QR code {qr_data} not found in orders database")
-            response_data = {
+            return jsonify({
                 'valid': False, 
                 'already_scanned': False,
                 'message': f'QR code {qr_data} not found in orders database'
-            }
+            }), 200
+        
+        response_data = {
+            'valid': True,
+            'already_scanned': not claimed,
+            'order_id': order['id'],
+            'order_number': order['order_number'],
+            'customer_name': order['customer_name'],
+            'product_name': order['product_name'],
+            'amount': order['amount'],
+            'date': order['date'],
+            'address': order.get('address', 'N/A'),
+            'contact_number': order.get('contact_number', 'N/A'),
+            'email': order.get('email', '')
+        }
         
-        conn.close()
+        if not claimed:
+            # Order already scanned - return existing scan info WITHOUT printing or sound
+            # This prevents duplicate printing and sound for the same QR code
+            logger.info(f"QR code {qr_data} already scanned at {scanned_at} - No print or sound triggered")
+            response_data['message'] = f'Order {qr_data} already scanned successfully'
+            response_data['scanned_at'] = scanned_at
+            return jsonify(response_data), 200
+        
+        logger.info(f"Successfully scanned QR code {qr_data} for order {order['order_number']}"
+                    + (f" (parcel {parcel_id})" if parcel_id else ""))
+        event_stream.publish('qr_scan', {
+            'qr_data': qr_data,
+            'order_id': order['id'],
+            'order_number': order['order_number'],
+            'device': source,
+            'scanned_at': scanned_at
+        })
+        if package_info:
+            event_stream.publish('package_info', package_info)
+        
+        # Send print request to Raspberry Pi for successful scan (only if not skipped)
+        if not skip_print:
+            logger.info(f"Attempting to send print request for order {order['order_number']}")
+            try:
+                print_success, print_message = send_print_request_to_raspi(order)
+                if print_success:
+                    logger.info(f"Print request sent successfully for order {order['order_number']}")
+                else:
+                    logger.warning(f"Print request failed for order {order['order_number']}: {print_message}")
+            except Exception as e:
+                print_success, print_message = False, f"Print function error: {str(e)}"
+                logger.error(f"Exception in print request for order {order['order_number']}: {e}")
+        else:
+            # Skip print request as requested (likely handled by local camera system)
+            print_success, print_message = True, "Print request skipped (handled locally)"
+            logger.info(f"Print request skipped for order {order['order_number']} - handled by {source}")
+        
+        response_data.update({
+            'message': f'Order {qr_data} scanned successfully!',
+            'scanned_at': scanned_at,
+            'package_information': package_info,
+            'sensor_data_applied': sensor_data_applied,
+            'print_requested': print_success,
+            'print_message': print_message
+        })
         return jsonify(response_data), 200
             
     except Exception as e:
@@ -1665,7 +1589,25 @@ def store_sensor_data():
     try:
         data = request.get_json()
         
-        conn = sqlite3.connect('database.db')
+        # Readings are numbers or absent (weight-only and dimension-only posts)
+        for field in ('weight', 'width', 'height', 'length'):
+            value = data.get(field)
+            if value is None:
+                continue
+            try:
+                float(value)
+            except (TypeError, ValueError):
+                return jsonify({'error': 'Invalid sensor data', 'details': f"{field} must be a number, got {value!r}"}), 400
+        
+        # Keep the history in the telemetry store; loaded_sensor_data only stages
+        # the reading for the next claimed order
+        if data.get('width') is None:
+            telemetry.record('loadcell_weight', data.get('weight'))
+        else:
+            for dimension in ('width', 'height', 'length'):
+                telemetry.record(f'box_{dimension}', data.get(dimension))
+        
+        conn = timed_connect('database.db')
         c = conn.cursor()
         
         # Clear any existing sensor data first (overwrite behavior)
@@ -1698,8 +1640,15 @@ def store_sensor_data():
         
         if data.get('width') is None:
             logger.info(f"STEP 3: Weight-only data stored: {weight}kg")
+            workflow_step = {'step': 3, 'status': 'weight_captured',
+                             'message': f"Weight captured: {weight}kg. Ready for grabber to move package."}
         else:
             logger.info(f"STEP 5: Complete package data stored: {weight}kg, {width}x{height}x{length}cm ({package_size})")
+            workflow_step = {'step': 5, 'status': 'complete',
+                             'message': f"Package complete: {weight}kg, {width}x{height}x{length}cm ({package_size})"}
+        
+        event_stream.publish('sensor_data', data)
+        event_stream.publish('workflow_progress', dict(workflow_step, timestamp=datetime.now().isoformat()))
         
         return jsonify({
             'message': 'Sensor data stored successfully',
@@ -1718,44 +1667,51 @@ def store_sensor_data():
             'details': str(e)
         }), 500
 
+SCANNED_CODE_COLUMNS = {
+    'scan_id': 'sc.id',
+    'order_id': 'sc.order_id',
+    'order_number': 'sc.order_number',
+    'isverified': 'sc.isverified',
+    'scanned_at': 'sc.scanned_at',
+    'device': 'sc.device',
+    'customer_name': 'o.customer_name',
+    'product_name': 'o.product_name',
+    'amount': 'o.amount',
+    'order_date': 'o.date',
+    'weight': 'pi.weight',
+    'width': 'pi.width',
+    'height': 'pi.height',
+    'length': 'pi.length',
+    'package_timestamp': 'pi.timestamp'
+}
+
 @app.route('/api/scanned-codes', methods=['GET'])
 def get_scanned_codes():
-    """Get all scanned QR codes with their order information"""
+    """Get scanned QR codes with their order information (supports fields=, cursor=, since= and limit=)"""
+    try:
+        list_query = build_list_query(SCANNED_CODE_COLUMNS, 'scan_id')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     try:
-        conn = sqlite3.connect('database.db')
+        conn = timed_connect('database.db')
         conn.row_factory = dict_factory
         c = conn.cursor()
         
-        # Get all scanned codes with order details and package information
-        c.execute('''
-            SELECT 
-                sc.id as scan_id,
-                sc.order_id,
-                sc.order_number,
-                sc.isverified,
-                sc.scanned_at,
-                sc.device,
-                o.customer_name,
-                o.product_name,
-                o.amount,
-                o.date as order_date,
-                pi.weight,
-                pi.width,
-                pi.height,
-                pi.length,
-                pi.timestamp as package_timestamp
+        # Scanned codes with order details and the latest package row of each order (one row per scan)
+        scanned_codes, next_cursor = fetch_list_page(c, '''
             FROM scanned_codes sc
             LEFT JOIN orders o ON sc.order_id = o.id
-            LEFT JOIN package_information pi ON sc.order_id = pi.order_id
-            ORDER BY sc.scanned_at DESC
-        ''')
-        
-        scanned_codes = c.fetchall()
+            LEFT JOIN package_information pi ON pi.id = (
+                SELECT MAX(id) FROM package_information WHERE order_id = sc.order_id
+            )
+        ''', list_query)
         conn.close()
         
         return jsonify({
             'scanned_codes': scanned_codes,
-            'total_count': len(scanned_codes)
+            'total_count': len(scanned_codes),
+            'next_cursor': next_cursor
         })
         
     except Exception as e:
@@ -1778,7 +1734,7 @@ def reset_scanned_codes():
                 'message': 'Set confirm=true to reset all scanned codes'
             }), 400
         
-        conn = sqlite3.connect('database.db')
+        conn = timed_connect('database.db')
         c = conn.cursor()
         
         # Count before deletion
@@ -1808,7 +1764,7 @@ def reset_scanned_codes():
 def remove_scanned_code(order_number):
     """Remove a specific scanned code to allow re-scanning"""
     try:
-        conn = sqlite3.connect('database.db')
+        conn = timed_connect('database.db')
         c = conn.cursor()
         
         # Check if the order exists in scanned codes
@@ -1844,7 +1800,7 @@ def remove_scanned_code(order_number):
 def check_duplicates():
     """Check for duplicate scanned codes"""
     try:
-        conn = sqlite3.connect('database.db')
+        conn = timed_connect('database.db')
         conn.row_factory = dict_factory
         c = conn.cursor()
         
@@ -1896,7 +1852,7 @@ def clean_duplicates():
                 'message': 'Set confirm=true to clean duplicates'
             }), 400
         
-        conn = sqlite3.connect('database.db')
+        conn = timed_connect('database.db')
         c = conn.cursor()
         
         # Count duplicates before cleaning
@@ -1943,7 +1899,7 @@ def clean_duplicates():
 def get_sensor_data():
     """Get current sensor data"""
     try:
-        conn = sqlite3.connect('database.db')
+        conn = timed_connect('database.db')
         conn.row_factory = dict_factory
         c = conn.cursor()
         
@@ -1968,13 +1924,21 @@ def get_sensor_data():
 def clear_sensor_data():
     """Clear all sensor data"""
     try:
-        conn = sqlite3.connect('database.db')
+        conn = timed_connect('database.db')
         c = conn.cursor()
         
         c.execute('DELETE FROM loaded_sensor_data')
         conn.commit()
         conn.close()
         
+        event_stream.publish('sensor_data', {'cleared': True})
+        event_stream.publish('workflow_progress', {
+            'step': 0,
+            'status': 'waiting',
+            'message': 'Waiting for QR scan to start workflow',
+            'timestamp': datetime.now().isoformat()
+        })
+        
         return jsonify({
             'message': 'Sensor data cleared successfully',
             'timestamp': datetime.now().isoformat()
@@ -1991,27 +1955,34 @@ def clear_sensor_data():
 def get_all_sensor_data():
     """Get all sensor data records for package display"""
     try:
-        conn = sqlite3.connect('database.db')
+        conn = timed_connect('database.db')
         conn.row_factory = dict_factory
         c = conn.cursor()
         
-        # Get all sensor data records, ordered by most recent first
+        # Measured packages with their real order numbers, plus the staged reading
+        # that has not been claimed by an order yet (order_number is None)
         c.execute('''
-            SELECT id, weight, width, height, length, package_size, 
-                   loadcell_timestamp, box_dimensions_timestamp, created_at
-            FROM loaded_sensor_data 
-            ORDER BY created_at DESC 
+            SELECT * FROM (
+                SELECT 'pending-' || id AS id, NULL AS order_number, NULL AS order_id,
+                       weight, width, height, length, package_size, created_at
+                FROM loaded_sensor_data
+                UNION ALL
+                SELECT pi.id, pi.order_number, pi.order_id,
+                       pi.weight, pi.width, pi.height, pi.length, pi.package_size, pi.created_at
+                FROM package_information pi
+            )
+            ORDER BY created_at DESC
             LIMIT 50
         ''')
         sensor_records = c.fetchall()
         
         # Format the data to match what the frontend expects
         packages = []
-        for i, record in enumerate(sensor_records):
+        for record in sensor_records:
             packages.append({
                 'id': record['id'],
-                'order_number': f"ORD-{str(i + 1).zfill(3)}",  # Generate order numbers like ORD-001, ORD-002
-                'order_id': f"ORD-{str(i + 1).zfill(3)}",
+                'order_number': record['order_number'],
+                'order_id': record['order_id'],
                 'weight': record['weight'],
                 'width': record['width'],
                 'height': record['height'],
@@ -2038,11 +2009,195 @@ def get_all_sensor_data():
             'details': str(e)
         }), 500
 
+@app.route('/api/telemetry', methods=['POST'])
+def receive_telemetry():
+    """Append a batch of raw sensor readings (IR, stepper, loadcell stream) from the Raspberry Pi"""
+    try:
+        readings = (request.get_json() or {}).get('readings', [])
+        if not readings:
+            return jsonify({'error': 'No readings provided'}), 400
+        
+        for reading in readings:
+            telemetry.record(reading['channel'], reading['value'], reading.get('timestamp_ms'))
+        
+        return jsonify({'message': f'Recorded {len(readings)} readings', 'count': len(readings)}), 200
+        
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': 'Invalid telemetry reading', 'details': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error recording telemetry: {e}")
+        return jsonify({'error': 'Failed to record telemetry', 'details': str(e)}), 500
+
+@app.route('/api/telemetry', methods=['GET'])
+def get_telemetry():
+    """Sensor history for charts: channel=, resolution=raw|1s|1m, since=/until= (ms), limit="""
+    try:
+        channel = request.args.get('channel', 'loadcell_weight')
+        resolution = request.args.get('resolution', '1m')
+        since = request.args.get('since', type=int)
+        until = request.args.get('until', type=int)
+        limit = min(request.args.get('limit', 1000, type=int), 10000)
+        
+        if since is None:
+            since = now_ms() - 24 * 60 * 60 * 1000  # Default to the last 24 hours
+        
+        points = telemetry.query(channel, since, until, resolution=resolution, limit=limit)
+        return jsonify({
+            'channel': channel,
+            'resolution': resolution,
+            'points': points,
+            'count': len(points)
+        })
+        
+    except ValueError as e:
+        return jsonify({'error': 'Invalid telemetry query', 'details': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error querying telemetry: {e}")
+        return jsonify({'error': 'Failed to query telemetry', 'details': str(e)}), 500
+
+@app.route('/api/export/<table>', methods=['GET'])
+def export_table(table):
+    """Stream a table as CSV or NDJSON for reconciliation.
+
+    format=csv|ndjson, since=/until= (ISO date or datetime), gzip=1 for a
+    compressed download. Rows are streamed in chunks, never loaded at once.
+    """
+    try:
+        if table not in EXPORT_TABLES:
+            return jsonify({'error': f'Unknown export table: {table}', 'tables': list(EXPORT_TABLES)}), 404
+        fmt = request.args.get('format', 'csv')
+        compress = request.args.get('gzip', '0').lower() in ('1', 'true', 'yes')
+        
+        body = stream_export(
+            table, fmt,
+            since=request.args.get('since'),
+            until=request.args.get('until'),
+            compress=compress
+        )
+        
+        filename = f"{table}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+        if compress:
+            filename += '.gz'
+        return Response(body, mimetype='application/gzip' if compress else EXPORT_FORMATS[fmt], headers={
+            'Content-Disposition': f'attachment; filename="{filename}"'
+        })
+        
+    except ValueError as e:
+        return jsonify({'error': 'Invalid export request', 'details': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error exporting {table}: {e}")
+        return jsonify({'error': 'Failed to export table', 'details': str(e)}), 500
+
+@app.route('/api/analytics', methods=['GET'])
+def get_analytics():
+    """Throughput analytics from the hourly/daily rollups.
+
+    granularity=hour|day, since=/until= (ISO date or datetime, UTC unless an
+    offset is given), limit= buckets. analytics_rollup_task keeps the rollups
+    current; a request folds in at most one small batch of new rows first, so
+    its cost does not grow with a backlog.
+    """
+    try:
+        granularity = request.args.get('granularity', 'hour')
+        if granularity not in ANALYTICS_GRANULARITIES:
+            return jsonify({'error': f'Unknown granularity: {granularity}'}), 400
+        limit = min(request.args.get('limit', 168 if granularity == 'hour' else 90, type=int), 5000)
+        
+        refresh_rollups(batch_size=ANALYTICS_REQUEST_BATCH_SIZE, max_batches=1)
+        
+        conn = timed_connect('database.db')
+        try:
+            buckets, summary = query_rollups(
+                conn.cursor(), granularity,
+                since=request.args.get('since'),
+                until=request.args.get('until'),
+                limit=limit
+            )
+        finally:
+            conn.close()
+        
+        return jsonify({
+            'granularity': granularity,
+            'buckets': buckets,
+            'summary': summary,
+            'timezone': 'UTC',
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except ValueError as e:
+        return jsonify({'error': 'Invalid analytics request', 'details': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error getting analytics: {e}")
+        return jsonify({'error': 'Failed to get analytics', 'details': str(e)}), 500
+
+def analytics_rollup_task(interval=60):
+    """Keep the analytics rollups current in the background"""
+    while True:
+        try:
+            refresh_rollups()
+        except Exception as e:
+            logger.error(f"Analytics rollup failed: {e}")
+        time.sleep(interval)
+
+# Report from the most recent retention run
+last_retention_report = None
+
+def run_retention():
+    """Archive old qr_scans rows and reclaim database space; returns a report"""
+    global last_retention_report
+    started = time.time()
+    # Fold pending rows into the analytics rollups before they leave the main database
+    refresh_rollups()
+    report = {
+        'archive': archive_qr_scans(),
+        'vacuum': vacuum_database(),
+        'timestamp': datetime.now().isoformat()
+    }
+    report['duration_seconds'] = round(time.time() - started, 2)
+    last_retention_report = report
+    if report['archive']['rows_archived']:
+        response_versions.bump('qr_scans')
+    logger.info(f"🧹 RETENTION: Archived {report['archive']['rows_archived']} scans, "
+                f"reclaimed {report['vacuum']['bytes_reclaimed'] / 1024:.1f} KB")
+    return report
+
+def retention_task():
+    """Run the retention job on its configured interval"""
+    while True:
+        try:
+            run_retention()
+        except Exception as e:
+            logger.error(f"Retention job failed: {e}")
+        time.sleep(RETENTION_CONFIG['interval_hours'] * 3600)
+
+@app.route('/api/maintenance/retention', methods=['GET'])
+def get_retention_status():
+    """Retention configuration and the report from the last run"""
+    return jsonify({
+        'config': RETENTION_CONFIG,
+        'last_report': last_retention_report
+    })
+
+@app.route('/api/maintenance/retention', methods=['POST'])
+def trigger_retention():
+    """Run the retention job now and return what it reclaimed"""
+    try:
+        return jsonify(run_retention())
+    except Exception as e:
+        logger.error(f"Retention job failed: {e}")
+        return jsonify({'error': 'Retention job failed', 'details': str(e)}), 500
+
+@app.route('/api/stream')
+def stream_events():
+    """Server-Sent Events stream of qr_scan, package_info, sensor_data,
+    workflow_progress and camera_status events (resumes via Last-Event-ID)"""
+    return event_stream.response()
+
 @app.route('/api/workflow-status', methods=['GET'])
 def get_workflow_status():
     """Get current workflow status based on sensor data"""
     try:
-        conn = sqlite3.connect('database.db')
+        conn = timed_connect('database.db')
         conn.row_factory = dict_factory
         c = conn.cursor()
         
@@ -2101,6 +2256,8 @@ def get_workflow_status():
         }), 500
 
 if __name__ == '__main__':
+    threading.Thread(target=analytics_rollup_task, daemon=True).start()
+    threading.Thread(target=retention_task, daemon=True).start()
     logger.info("Starting Flask application with SocketIO...")
     socketio.run(app, debug=False, 
                 host=os.getenv('BACKEND_HOST', '0.0.0.0'), 
@@ -0,0 +1,185 @@
+"""
+Preloaded audio cue engine shared by server.py and print.py
+The pygame mixer is initialised once per process (pygame itself is only
+imported then, as it is slow to load) and every cue is decoded into memory.
+Cues are played on reserved mixer channels by a single worker thread fed
+from a bounded queue, with a per-cue cooldown so repeated triggers (e.g. the
+metal detector alarm) cannot spam the speaker.
+"""
+
+import os
+import queue
+import threading
+import time
+import logging
+
+pygame = None  # Imported by AudioCueEngine.start()
+
+logger = logging.getLogger(__name__)
+
+
+def _import_pygame():
+    """The pygame module, or None if it is not installed"""
+    global pygame
+    if pygame is None:
+        try:
+            import pygame as pygame_module
+        except ImportError:
+            return None
+        pygame = pygame_module
+    return pygame
+
+# Cue name -> sound file, reserved mixer channel and cooldown between plays (seconds)
+AUDIO_CUES = {
+    'alarm': {
+        'path': os.getenv('ALARM_SOUND_PATH', '/sound/alarm.mp3'),
+        'channel': 0,
+        'cooldown': 15  # Metallic item alarm, previously alarm_cooldown in server.py
+    },
+    'success': {
+        'path': os.getenv('SUCCESS_SOUND_PATH', '/home/test/Desktop/sound/success.mp3'),
+        'channel': 1,
+        'cooldown': 0
+    },
+    'success_receipt': {
+        'path': os.getenv('RECEIPT_SOUND_PATH', '/home/test/Desktop/sound/success_receipt.mp3'),
+        'channel': 2,
+        'cooldown': 0
+    }
+}
+
+AUDIO_QUEUE_SIZE = 8
+MIXER_BUFFER_SIZE = 512  # Smaller buffer = lower trigger-to-speaker latency
+
+
+class AudioCueEngine:
+    """Decodes cues once and plays them from one worker thread"""
+
+    def __init__(self, cues=None, queue_size=AUDIO_QUEUE_SIZE):
+        self.cues = cues or AUDIO_CUES
+        self.available = False
+        self.sounds = {}
+        self.last_played = {}
+        self.stats = {name: {'played': 0, 'skipped_cooldown': 0, 'dropped': 0,
+                             'last_latency_ms': None, 'max_latency_ms': 0.0, 'total_latency_ms': 0.0}
+                      for name in self.cues}
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def start(self):
+        """Initialise the mixer, preload every cue and start the worker (idempotent)"""
+        with self._lock:
+            if self._worker is not None:
+                return self.available
+            self._worker = threading.Thread(target=self._run, name='audio-cues', daemon=True)
+
+            if _import_pygame() is None:
+                logger.warning("⚠️ Audio cues disabled: pygame is not installed")
+            else:
+                try:
+                    if not pygame.mixer.get_init():
+                        pygame.mixer.pre_init(buffer=MIXER_BUFFER_SIZE)
+                        pygame.mixer.init()
+                    pygame.mixer.set_reserved(max(cue['channel'] for cue in self.cues.values()) + 1)
+                    self.available = True
+                    logger.info("✅ Pygame mixer initialized for audio cues")
+                except Exception as e:
+                    logger.warning(f"⚠️ Pygame mixer not available: {e}")
+
+            if self.available:
+                for name, cue in self.cues.items():
+                    if not os.path.exists(cue['path']):
+                        logger.warning(f"⚠️ Sound file not found for cue '{name}': {cue['path']}")
+                        continue
+                    try:
+                        self.sounds[name] = pygame.mixer.Sound(cue['path'])
+                    except Exception as e:
+                        logger.error(f"❌ Failed to load sound for cue '{name}': {e}")
+                logger.info(f"Preloaded {len(self.sounds)}/{len(self.cues)} audio cues")
+
+            self._worker.start()
+            return self.available
+
+    @property
+    def started(self):
+        return self._worker is not None
+
+    def cooldown_remaining(self, name):
+        """Seconds until the cue can play again (0 if it is ready)"""
+        last = self.last_played.get(name)
+        if last is None:
+            return 0.0
+        return max(0.0, self.cues[name]['cooldown'] - (time.monotonic() - last))
+
+    def play(self, name):
+        """Queue a cue for playback.
+
+        Returns False if the cue is still in its cooldown window or the queue is
+        full, True once it has been accepted (even if the mixer is unavailable,
+        matching the previous alarm behaviour).
+        """
+        if self._worker is None:
+            self.start()
+
+        with self._lock:
+            if self.cooldown_remaining(name) > 0:
+                self.stats[name]['skipped_cooldown'] += 1
+                return False
+            try:
+                self._queue.put_nowait((name, time.perf_counter()))
+            except queue.Full:
+                # A dropped cue must not start its cooldown, or the next real trigger is lost too
+                self.stats[name]['dropped'] += 1
+                logger.warning(f"⚠️ Audio queue full, dropped cue '{name}'")
+                return False
+            self.last_played[name] = time.monotonic()
+        return True
+
+    def _run(self):
+        while True:
+            name, triggered_at = self._queue.get()
+            try:
+                sound = self.sounds.get(name)
+                if sound is None:
+                    logger.warning(f"⚠️ Audio cue '{name}' unavailable (mixer or sound file missing)")
+                    continue
+                pygame.mixer.Channel(self.cues[name]['channel']).play(sound)
+                latency_ms = (time.perf_counter() - triggered_at) * 1000
+                stats = self.stats[name]
+                stats['played'] += 1
+                stats['last_latency_ms'] = round(latency_ms, 3)
+                stats['max_latency_ms'] = round(max(stats['max_latency_ms'], latency_ms), 3)
+                stats['total_latency_ms'] += latency_ms
+                logger.debug(f"Audio cue '{name}' played {latency_ms:.2f}ms after trigger")
+            except Exception as e:
+                logger.error(f"❌ Failed to play audio cue '{name}': {e}")
+            finally:
+                self._queue.task_done()
+
+    def get_status(self):
+        """Mixer availability, loaded cues and per-cue latency statistics"""
+        cues = {}
+        for name, stats in self.stats.items():
+            played = stats['played']
+            cues[name] = {
+                'loaded': name in self.sounds,
+                'cooldown': self.cues[name]['cooldown'],
+                'cooldown_remaining': round(self.cooldown_remaining(name), 1),
+                'played': played,
+                'skipped_cooldown': stats['skipped_cooldown'],
+                'dropped': stats['dropped'],
+                'last_latency_ms': stats['last_latency_ms'],
+                'max_latency_ms': stats['max_latency_ms'],
+                'avg_latency_ms': round(stats['total_latency_ms'] / played, 3) if played else None
+            }
+        return {
+            'started': self.started,
+            'available': self.available,
+            'queued': self._queue.qsize(),
+            'cues': cues
+        }
+
+
+# One engine per process, shared by server.py and print.py
+audio_cues = AudioCueEngine()
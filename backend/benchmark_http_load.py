@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+HTTP Load Benchmark for app.py
+Seeds a scratch database.db with realistic volumes of orders, scanned codes,
+package information and QR scans, starts app.py on it, and drives a mix of
+concurrent clients against the endpoints the dashboard, scanner and Pi poll:
+/api/validate-qr, /api/dashboard, /api/orders, /api/scanned-codes,
+/api/sensor-data and /api/qr-scans. Reports p50/p95/p99 latency, throughput
+and errors per endpoint, with JSON output that --compare can diff against an
+earlier run to spot regressions between versions.
+
+The seeded database is kept in --workdir and reused on later runs with the
+same volumes (--reseed forces a rebuild); each run works on a fresh copy of
+it, so runs are comparable. Use --url to load an already
+running backend instead; nothing is seeded then.
+
+Usage:
+    python benchmark_http_load.py --orders 100000 --scans 200000 --clients 16 --duration 30
+    python benchmark_http_load.py --orders 1000000 --scans 10000000 --json after.json --compare before.json
+    python benchmark_http_load.py --url http://10.194.125.225:5000 --clients 8 --duration 60
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import sqlite3
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from datetime import datetime, timedelta
+
+import numpy as np
+import requests
+
+from products_data import products_data
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CUSTOMERS = [
+    ("John Doe", "123-456-7890", "123 Main St"),
+    ("Jane Smith", "987-654-3210", "456 Oak Ave"),
+    ("Bob Johnson", "555-123-4567", "789 Pine St"),
+    ("Alice Brown", "444-555-6666", "321 Elm St"),
+    ("Charlie Wilson", "777-888-9999", "654 Maple Dr"),
+]
+
+# (weight kg, width, height, length, size) as in insert_test_data.py
+PACKAGES = [
+    (0.25, 15.0, 10.0, 8.0, "Small"),
+    (0.18, 12.0, 8.0, 6.0, "Small"),
+    (1.2, 25.0, 20.0, 15.0, "Large"),
+    (0.8, 20.0, 15.0, 12.0, "Medium"),
+    (2.1, 30.0, 25.0, 18.0, "Large"),
+    (0.9, 22.0, 16.0, 14.0, "Medium"),
+]
+
+# Seeded rows are spread over this many days (inside the qr_scans retention window)
+SEED_DAYS = 60
+
+
+def order_number(n):
+    return f"ORD-{str(n).zfill(3)}"
+
+
+def seed_database(db_path, orders, scans, scanned_fraction=0.3, batch_size=50000, seed=1):
+    """Bulk-insert orders, scanned codes with package information, and QR scans"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA synchronous = OFF')
+    c = conn.cursor()
+    for table in ('qr_scans', 'package_information', 'scanned_codes', 'loaded_sensor_data', 'orders'):
+        c.execute(f'DELETE FROM {table}')
+    conn.commit()
+
+    def timestamp(index, total):
+        # Oldest first, so ids and timestamps grow together like production data
+        return (now - timedelta(days=SEED_DAYS * (1 - index / max(total, 1)))).isoformat(timespec='seconds')
+
+    def insert_batches(sql, rows, total, label):
+        started = time.perf_counter()
+        batch = []
+        done = 0
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                c.executemany(sql, batch)
+                conn.commit()
+                done += len(batch)
+                batch = []
+                print(f"   {label}: {done:,}/{total:,}", end='\r', flush=True)
+        if batch:
+            c.executemany(sql, batch)
+            conn.commit()
+            done += len(batch)
+        print(f"   {label}: {done:,} rows in {time.perf_counter() - started:.1f}s")
+
+    def order_rows():
+        for n in range(1, orders + 1):
+            customer, phone, address = rng.choice(CUSTOMERS)
+            product = rng.choice(products_data)
+            yield (order_number(n), customer, phone, address, product['id'], product['name'],
+                   round(rng.uniform(50, 2000), 2), timestamp(n, orders))
+
+    insert_batches('''
+        INSERT INTO orders (order_number, customer_name, contact_number, address,
+                            product_id, product_name, amount, date)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', order_rows(), orders, 'orders')
+
+    scanned = int(orders * scanned_fraction)
+
+    def scanned_rows():
+        for n in range(1, scanned + 1):
+            yield (n, order_number(n), 'yes', timestamp(n, orders).replace('T', ' '), 'raspberry_pi')
+
+    def package_rows():
+        for n in range(1, scanned + 1):
+            weight, width, height, length, _ = rng.choice(PACKAGES)
+            yield (n, order_number(n), weight, width, height, length, timestamp(n, orders))
+
+    insert_batches('''
+        INSERT INTO scanned_codes (order_id, order_number, isverified, scanned_at, device)
+        VALUES (?, ?, ?, ?, ?)
+    ''', scanned_rows(), scanned, 'scanned_codes')
+    insert_batches('''
+        INSERT INTO package_information (order_id, order_number, weight, width, height, length, timestamp)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', package_rows(), scanned, 'package_information')
+
+    def scan_rows():
+        for i in range(scans):
+            n = rng.randint(1, max(orders, 1))
+            valid = rng.random() < 0.9
+            ts = timestamp(i, scans)
+            yield (order_number(n) if valid else f'JUNK-{i}', ts, 'raspberry_pi_camera', valid,
+                   n if valid else None, 'Valid order' if valid else 'Order not found', ts.replace('T', ' '))
+
+    insert_batches('''
+        INSERT INTO qr_scans (qr_data, timestamp, device, is_valid, order_id, validation_message, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', scan_rows(), scans, 'qr_scans')
+
+    weight, width, height, length, size = PACKAGES[0]
+    c.execute('''
+        INSERT INTO loaded_sensor_data (weight, width, height, length, package_size,
+                                        loadcell_timestamp, box_dimensions_timestamp)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (weight, width, height, length, size, now.isoformat(), now.isoformat()))
+    c.execute('''
+        INSERT INTO order_number_sequence (name, value) VALUES ('orders', ?)
+        ON CONFLICT(name) DO UPDATE SET value = excluded.value
+    ''', (orders,))
+    conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+
+
+def dataset_counts(db_path):
+    if not os.path.exists(db_path):
+        return None
+    conn = sqlite3.connect(db_path)
+    try:
+        return {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                for table in ('orders', 'scanned_codes', 'qr_scans')}
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+
+
+def prepare_database(workdir, orders, scans, reseed=False):
+    """Seed seeded.db once (schema from migrations.py via importing app) and copy it to a fresh database.db.
+
+    Every run starts from an identical copy, since the load itself claims orders and adds scans.
+    """
+    seeded_path = os.path.join(workdir, 'seeded.db')
+    db_path = os.path.join(workdir, 'database.db')
+    counts = dataset_counts(seeded_path)
+    if not reseed and counts and counts['orders'] == orders and counts['qr_scans'] == scans:
+        print(f"♻️ Reusing seeded database in {workdir}: {counts}")
+    else:
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        env = dict(os.environ, PYTHONPATH=BACKEND_DIR)
+        subprocess.run([sys.executable, '-c', 'import app'], cwd=workdir, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        print(f"🌱 Seeding {orders:,} orders and {scans:,} QR scans into {seeded_path}")
+        seed_database(db_path, orders, scans)
+        os.replace(db_path, seeded_path)
+        counts = dataset_counts(seeded_path)
+    shutil.copyfile(seeded_path, db_path)
+    return counts
+
+
+# Serves app.py's Flask app with Werkzeug's threaded server (what socketio.run falls back to
+# without eventlet), without the rollup and retention threads so they don't skew the numbers
+BACKEND_BOOTSTRAP = (
+    "import os, app; from werkzeug.serving import run_simple; "
+    "run_simple('127.0.0.1', int(os.environ['BACKEND_PORT']), app.app, threaded=True)"
+)
+
+
+def start_backend(workdir, port):
+    """Run app.py on the seeded database; returns (process, base URL)"""
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR, BACKEND_PORT=str(port))
+    log = open(os.path.join(workdir, 'benchmark_backend.log'), 'w')
+    process = subprocess.Popen([sys.executable, '-c', BACKEND_BOOTSTRAP], cwd=workdir,
+                               env=env, stdout=log, stderr=subprocess.STDOUT)
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"app.py exited with code {process.returncode}, see {log.name}")
+        try:
+            requests.get(f'{url}/', timeout=1)
+            return process, url
+        except requests.RequestException:
+            time.sleep(0.25)
+    process.terminate()
+    raise RuntimeError("app.py did not start within 60s")
+
+
+# Request mix: name -> (weight, builder); builders return (method, path, json body)
+def _validate_qr(rng, orders):
+    qr_data = order_number(rng.randint(1, orders)) if rng.random() < 0.9 else f'JUNK-{rng.randint(1, 10 ** 6)}'
+    return 'POST', '/api/validate-qr', {'qr_data': qr_data, 'source': 'benchmark', 'skip_print': True}
+
+
+def _post_sensor_data(rng, orders):
+    weight, width, height, length, _ = rng.choice(PACKAGES)
+    if rng.random() < 0.5:
+        width = height = length = None  # Weight-only update, as the Pi sends first
+    return 'POST', '/api/sensor-data', {'weight': weight, 'width': width, 'height': height, 'length': length,
+                                        'loadcell_timestamp': datetime.now().isoformat()}
+
+
+def _post_qr_scans(rng, orders):
+    scans = []
+    for _ in range(rng.randint(1, 5)):
+        n = rng.randint(1, orders)
+        scans.append({'qr_data': order_number(n), 'timestamp': datetime.now().isoformat(),
+                      'device': 'benchmark', 'validation': {'valid': True, 'order_id': n, 'message': 'Valid order'}})
+    return 'POST', '/api/qr-scans', {'scans': scans}
+
+
+LOAD_MIX = {
+    'dashboard': (20, lambda rng, orders: ('GET', '/api/dashboard', None)),
+    'orders': (15, lambda rng, orders: ('GET', '/api/orders?limit=50', None)),
+    'scanned_codes': (15, lambda rng, orders: ('GET', '/api/scanned-codes?limit=50', None)),
+    'qr_scans': (15, lambda rng, orders: ('GET', '/api/qr-scans?limit=50', None)),
+    'sensor_data': (10, lambda rng, orders: ('GET', '/api/sensor-data', None)),
+    'validate_qr': (10, _validate_qr),
+    'post_sensor_data': (5, _post_sensor_data),
+    'post_qr_scans': (10, _post_qr_scans),
+}
+
+
+def run_load(url, orders, clients, duration, mix=None, seed=1):
+    """Drive the mix from `clients` threads for `duration` seconds; returns per-endpoint samples"""
+    mix = mix or LOAD_MIX
+    names = list(mix)
+    weights = [mix[name][0] for name in names]
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client(index):
+        rng = random.Random(seed * 1000 + index)
+        session = requests.Session()
+        local = {name: [] for name in names}
+        local_errors = {name: 0 for name in names}
+        while time.monotonic() < stop_at:
+            name = rng.choices(names, weights)[0]
+            method, path, body = mix[name][1](rng, max(orders, 1))
+            started = time.perf_counter()
+            try:
+                response = session.request(method, url + path, json=body, timeout=30)
+                ok = response.status_code < 400
+            except requests.RequestException:
+                ok = False
+            elapsed = (time.perf_counter() - started) * 1000
+            if ok:
+                local[name].append(elapsed)
+            else:
+                local_errors[name] += 1
+        with lock:
+            for name in names:
+                samples[name].extend(local[name])
+                errors[name] += local_errors[name]
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(clients)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, errors, time.monotonic() - started
+
+
+def latency_summary(latencies, errors, elapsed):
+    summary = {'requests': len(latencies), 'errors': errors,
+               'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else None}
+    if latencies:
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        summary.update({'mean_ms': round(float(np.mean(latencies)), 2), 'p50_ms': round(float(p50), 2),
+                        'p95_ms': round(float(p95), 2), 'p99_ms': round(float(p99), 2),
+                        'max_ms': round(float(max(latencies)), 2)})
+    return summary
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def print_results(results):
+    print(f"\n{'endpoint':<18} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    print("-" * 72)
+    rows = list(results['endpoints'].items()) + [('overall', results['overall'])]
+    for name, r in rows:
+        print(f"{name:<18} {r['requests']:>9} {r['errors']:>7} {r['throughput_rps'] or 0:>8} "
+              f"{r.get('p50_ms', '-'):>8} {r.get('p95_ms', '-'):>8} {r.get('p99_ms', '-'):>8}")
+
+
+def compare_results(results, baseline, threshold):
+    """Print p95/throughput changes against a baseline run; returns the regressed endpoints"""
+    print(f"\n📊 Compared with {baseline.get('meta', {}).get('revision') or 'baseline'} "
+          f"(regression threshold {threshold:.0%})")
+    regressions = []
+    for name, current in list(results['endpoints'].items()) + [('overall', results['overall'])]:
+        before = baseline['endpoints'].get(name) if name != 'overall' else baseline.get('overall')
+        if not before or 'p95_ms' not in before or 'p95_ms' not in current:
+            continue
+        change = (current['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0
+        regressed = change > threshold
+        if regressed:
+            regressions.append(name)
+        print(f"   {'⚠️' if regressed else '✅'} {name:<18} p95 {before['p95_ms']:>8} → {current['p95_ms']:>8} ms "
+              f"({change:+.0%}), {before['throughput_rps']} → {current['throughput_rps']} req/s")
+    return regressions
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(
+        description="Load-test app.py's API endpoints on a seeded database",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__
+    )
+    parser.add_argument('--orders', type=int, default=100000, help='Orders to seed')
+    parser.add_argument('--scans', type=int, default=100000, help='QR scans to seed')
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'parcel_benchmark'),
+                       help='Directory holding the seeded database.db')
+    parser.add_argument('--reseed', action='store_true', help='Rebuild the database even if it matches')
+    parser.add_argument('--url', help='Benchmark an already running backend instead of starting app.py')
+    parser.add_argument('--port', type=int, default=5055, help='Port for the benchmark app.py')
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent clients')
+    parser.add_argument('--duration', type=float, default=30, help='Measured seconds')
+    parser.add_argument('--warmup', type=float, default=5, help='Unmeasured seconds before the run')
+    parser.add_argument('--json', dest='json_path', help='Write the results to this JSON file')
+    parser.add_argument('--compare', help='Baseline JSON from an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                       help='p95 increase that counts as a regression with --compare (default 0.2 = 20%%)')
+    args = parser.parse_args()
+
+    process = None
+    dataset = None
+    if args.url:
+        url = args.url.rstrip('/')
+    else:
+        os.makedirs(args.workdir, exist_ok=True)
+        dataset = prepare_database(args.workdir, args.orders, args.scans, args.reseed)
+        process, url = start_backend(args.workdir, args.port)
+        print(f"🚀 app.py running at {url}")
+
+    try:
+        if args.warmup:
+            print(f"🔥 Warming up for {args.warmup:g}s")
+            run_load(url, args.orders, args.clients, args.warmup, seed=0)
+        print(f"⏱️ {args.clients} clients for {args.duration:g}s")
+        samples, errors, elapsed = run_load(url, args.orders, args.clients, args.duration)
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=10)
+
+    all_latencies = [ms for values in samples.values() for ms in values]
+    results = {
+        'meta': {
+            'revision': git_revision(),
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'url': args.url,
+        },
+        'dataset': dataset,
+        'config': {'clients': args.clients, 'duration_s': args.duration,
+                   'mix': {name: weight for name, (weight, _) in LOAD_MIX.items()}},
+        'endpoints': {name: latency_summary(samples[name], errors[name], elapsed) for name in LOAD_MIX},
+        'overall': latency_summary(all_latencies, sum(errors.values()), elapsed),
+    }
+    print_results(results)
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_results(results, json.load(f), args.threshold)
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results written to {args.json_path}")
+    if regressions:
+        print(f"❌ p95 regressions: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
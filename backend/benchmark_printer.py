@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Receipt Printer Throughput Benchmark
+Drives create_receipt → print_receipt against the loopback ESC/POS emulator
+and reports receipts per minute and time-to-first-byte (from the start of
+create_receipt until the first byte reaches the printer), along with the time
+spent rendering the receipt and transferring the job.
+
+The emulator can throttle to a serial baud rate and inject transient IOErrors
+to measure the cost of the retry path. With --fifo the jobs go through a named
+pipe (FifoPrinterSink), i.e. the same file path a real device uses. Package
+weight/size lookups are answered locally unless --live-api is given, so the
+numbers are not dominated by the backend being unreachable.
+
+Usage:
+    python benchmark_printer.py --receipts 50
+    python benchmark_printer.py --baud 19200 --receipts 10
+    python benchmark_printer.py --error-rate 0.2 --retry-delay 0.1 --png-dir printed
+    python benchmark_printer.py --fifo /tmp/printer_bench --json printer.json
+"""
+
+import sys
+import json
+import time
+import argparse
+import logging
+
+import numpy as np
+
+from escpos_emulator import EscPosEmulator, raster_images
+from printer_sink import FifoPrinterSink
+
+SAMPLE_ORDER = {
+    'orderNumber': 'ORD-BENCH-0001',
+    'customerName': 'Juan Dela Cruz',
+    'email': 'juan@example.com',
+    'contactNumber': '+639171234567',
+    'address': '123 Rizal St, Manila',
+    'productName': 'Wireless Mouse',
+    'amount': '799.00',
+    'date': '2025-10-01',
+}
+
+
+def latency_summary(values):
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'mean': round(float(np.mean(values)), 2), 'p50': round(float(p50), 2),
+            'p95': round(float(p95), 2), 'p99': round(float(p99), 2), 'max': round(float(max(values)), 2)}
+
+
+def run_benchmark(printer, emulator, receipts, verify=True):
+    """Print `receipts` receipts back to back; returns the summary dict"""
+    create_ms, print_ms, ttfb_ms, total_ms, job_bytes = [], [], [], [], []
+    failed = mismatched = 0
+    wall_started = time.perf_counter()
+    for i in range(receipts):
+        order = dict(SAMPLE_ORDER, orderNumber=f'ORD-BENCH-{i + 1:04d}')
+        jobs_before = emulator.jobs_printed
+        started = time.perf_counter()
+        receipt = printer.create_receipt(order)
+        created = time.perf_counter()
+        success, _ = printer.print_receipt(receipt)
+        finished = time.perf_counter()
+
+        if isinstance(printer.sink, FifoPrinterSink):
+            deadline = time.monotonic() + 5
+            while emulator.jobs_printed == jobs_before and time.monotonic() < deadline:
+                time.sleep(0.001)  # Reader thread finishes the job after the writer closes
+        job = emulator.last_job() if emulator.jobs_printed > jobs_before else None
+        if not success or job is None:
+            failed += 1
+            continue
+
+        create_ms.append((created - started) * 1000)
+        print_ms.append((finished - created) * 1000)
+        ttfb_ms.append((job['first_byte'] - started) * 1000)
+        total_ms.append((max(finished, job['finished']) - started) * 1000)
+        job_bytes.append(job['bytes'])
+        if verify:
+            printed = raster_images(job['data'])
+            expected = receipt.convert('1')
+            if not printed or printed[0].crop((0, 0, expected.width, expected.height)).tobytes() != expected.tobytes():
+                mismatched += 1
+    wall = time.perf_counter() - wall_started
+
+    printed_count = len(total_ms)
+    return {
+        'receipts': receipts,
+        'printed': printed_count,
+        'failed': failed,
+        'raster_mismatches': mismatched if verify else None,
+        'injected_errors': emulator.errors,
+        'wall_seconds': round(wall, 2),
+        'receipts_per_minute': round(printed_count * 60 / wall, 1) if wall else None,
+        'ttfb_ms': latency_summary(ttfb_ms) if ttfb_ms else None,
+        'create_ms': latency_summary(create_ms) if create_ms else None,
+        'print_ms': latency_summary(print_ms) if print_ms else None,
+        'total_ms': latency_summary(total_ms) if total_ms else None,
+        'job_bytes': int(np.mean(job_bytes)) if job_bytes else None,
+    }
+
+
+def print_results(results):
+    print(f"\n🧾 {results['printed']}/{results['receipts']} receipts printed in {results['wall_seconds']}s "
+          f"→ {results['receipts_per_minute']} receipts/min")
+    if results['injected_errors']:
+        print(f"⚠️ {results['injected_errors']} injected I/O errors, {results['failed']} receipts failed")
+    if results['raster_mismatches']:
+        print(f"❌ {results['raster_mismatches']} printed rasters differ from the rendered receipt")
+    print(f"{'stage':<10} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    print("-" * 60)
+    for name in ('ttfb_ms', 'create_ms', 'print_ms', 'total_ms'):
+        stats = results[name]
+        if stats:
+            print(f"{name:<10} {stats['mean']:>9.2f} {stats['p50']:>9.2f} {stats['p95']:>9.2f} "
+                  f"{stats['p99']:>9.2f} {stats['max']:>9.2f}")
+    if results['job_bytes']:
+        print(f"📦 {results['job_bytes']} bytes per job")
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(
+        description="Benchmark receipt rendering and printing against an emulated ESC/POS printer",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__
+    )
+    parser.add_argument('--receipts', type=int, default=30, help='Receipts to print')
+    parser.add_argument('--baud', type=int, help='Simulated serial baud rate (default: unlimited, like USB)')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                       help='Fraction of print attempts that fail with a transient IOError')
+    parser.add_argument('--retry-delay', type=float,
+                       help="Override the printer's delay between attempts (PRINTER_RETRY_DELAY)")
+    parser.add_argument('--seed', type=int, default=1, help='Random seed for error injection')
+    parser.add_argument('--fifo', help='Send jobs through this named pipe instead of in-process')
+    parser.add_argument('--png-dir', help='Render every printed job to PNG in this directory')
+    parser.add_argument('--live-api', action='store_true',
+                       help='Fetch package info from BACKEND_URL instead of a local stub')
+    parser.add_argument('--no-verify', action='store_true',
+                       help='Skip checking each printed raster against the rendered receipt')
+    parser.add_argument('--json', dest='json_path', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    if args.receipts < 1:
+        print("❌ --receipts must be at least 1")
+        sys.exit(1)
+
+    from print import ReceiptPrinter, PRINTER_CONFIG
+    logging.getLogger().setLevel(logging.WARNING)
+
+    config = dict(PRINTER_CONFIG, backup_dir='')  # Don't measure the /tmp backup PNGs
+    if args.retry_delay is not None:
+        config['retry_delay'] = args.retry_delay
+    emulator = EscPosEmulator(baud=args.baud, error_rate=args.error_rate, seed=args.seed, output_dir=args.png_dir)
+
+    if args.fifo:
+        if args.error_rate:
+            print("⚠️ --error-rate only applies to the in-process emulator; ignored with --fifo")
+        emulator.serve_fifo(args.fifo)
+        sink = FifoPrinterSink(args.fifo)
+        time.sleep(0.1)  # Let the reader attach
+    else:
+        sink = emulator
+
+    printer = ReceiptPrinter(sink=sink, config=config)
+    if not args.live_api:
+        printer._get_package_info_from_api = lambda order_number: (1250.0, 'Medium')
+
+    print(f"🖨️ Printing {args.receipts} receipts via {'FIFO ' + args.fifo if args.fifo else 'loopback emulator'} "
+          f"({f'{args.baud} baud' if args.baud else 'unlimited speed'}, error rate {args.error_rate:.0%})")
+    try:
+        results = run_benchmark(printer, emulator, args.receipts, verify=not args.no_verify)
+    finally:
+        if args.fifo:
+            emulator.stop_fifo(args.fifo)
+    results.update({'baud': args.baud, 'error_rate': args.error_rate, 'sink': 'fifo' if args.fifo else 'emulator'})
+    print_results(results)
+
+    if args.png_dir:
+        print(f"🖼️ Rendered jobs saved to {args.png_dir}/")
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
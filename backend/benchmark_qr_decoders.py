@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+QR Decoder Benchmark
+Runs each decoder backend over a directory of recorded frames and reports the
+decode rate, latency percentiles and CPU time per frame.
+
+Frames are read with ReplaySource, so a video file works as well as an image
+directory. Frames saved by the scanner (qr_images/qr_<timestamp>_<data>.jpg)
+carry their expected QR data in the filename, so accuracy is reported for them
+too; other frames can be labelled with a JSON file (see replay_source.py).
+
+Usage:
+    python benchmark_qr_decoders.py --frames qr_images
+    python benchmark_qr_decoders.py --frames recordings --backends pyzbar opencv --repeat 3
+    python benchmark_qr_decoders.py --frames recordings --labels labels.json --json results.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+import cv2
+import numpy as np
+
+from qr_decoders import create_decoder, available_backends
+from replay_source import ReplaySource, clean_label
+
+
+def load_frames(path, labels=None, gray=True):
+    """[(frame index, image, expected label or None)] for every frame of a directory or video"""
+    source = ReplaySource(path, fps=0, loop=False, labels=labels)
+    frames = []
+    try:
+        while True:
+            image, expected = source.next_frame()
+            if image is None:
+                break
+            if gray:
+                image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            frames.append((source.index, image, expected))
+    finally:
+        source.close()
+    return frames
+
+
+def benchmark_backend(spec, frames, repeat=1):
+    """Decode every frame `repeat` times with one backend and summarise"""
+    decoder = create_decoder(spec)
+    decoder.decode(frames[0][1])  # Warm-up (lazy initialisation, caches)
+
+    latencies = []
+    decoded_frames = correct = labelled = 0
+    wall_started = time.perf_counter()
+    cpu_started = time.process_time()
+    for _ in range(repeat):
+        for _, image, expected in frames:
+            started = time.perf_counter()
+            results = decoder.decode(image)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if results:
+                decoded_frames += 1
+            if expected is not None:
+                labelled += 1
+                found = {clean_label(obj.data.decode('utf-8', errors='replace')) for obj in results}
+                correct += clean_label(expected) in found
+    wall = time.perf_counter() - wall_started
+    cpu = time.process_time() - cpu_started
+
+    total = len(latencies)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        'backend': spec,
+        'frames': total,
+        'decode_rate': round(decoded_frames / total, 4),
+        'accuracy': round(correct / labelled, 4) if labelled else None,
+        'latency_ms': {
+            'mean': round(float(np.mean(latencies)), 3),
+            'p50': round(float(p50), 3),
+            'p95': round(float(p95), 3),
+            'p99': round(float(p99), 3),
+        },
+        'cpu_ms_per_frame': round(cpu * 1000 / total, 3),
+        'cpu_percent': round(100 * cpu / wall, 1) if wall else None,
+        'fps': round(total / wall, 1) if wall else None,
+    }
+
+
+def print_results(results):
+    print(f"{'backend':<20} {'frames':>7} {'decoded':>8} {'accuracy':>9} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'cpu ms':>8} {'fps':>7}")
+    print("-" * 91)
+    for r in results:
+        accuracy = f"{r['accuracy']:.1%}" if r['accuracy'] is not None else '-'
+        print(f"{r['backend']:<20} {r['frames']:>7} {r['decode_rate']:>8.1%} {accuracy:>9} "
+              f"{r['latency_ms']['p50']:>8.2f} {r['latency_ms']['p95']:>8.2f} {r['latency_ms']['p99']:>8.2f} "
+              f"{r['cpu_ms_per_frame']:>8.2f} {r['fps']:>7}")
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(
+        description="Benchmark QR decoder backends on recorded frames",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__
+    )
+    parser.add_argument('--frames', default='qr_images',
+                       help='Directory of recorded frames or a video file (default: qr_images)')
+    parser.add_argument('--backends', nargs='+',
+                       help='Backends to compare (default: every available backend)')
+    parser.add_argument('--repeat', type=int, default=1,
+                       help='Passes over the frame set per backend')
+    parser.add_argument('--labels',
+                       help='JSON file mapping frame filename -> expected QR data')
+    parser.add_argument('--color', action='store_true',
+                       help='Decode BGR frames instead of grayscale (the camera decodes the lores Y plane)')
+    parser.add_argument('--json', dest='json_path',
+                       help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.frames):
+        print(f"❌ Frames not found: {args.frames}")
+        sys.exit(1)
+    try:
+        frames = load_frames(args.frames, args.labels, gray=not args.color)
+    except ValueError:
+        frames = []
+    if not frames:
+        print(f"❌ No readable frames in {args.frames}")
+        sys.exit(1)
+
+    backends = args.backends or available_backends()
+    print(f"📷 {len(frames)} frames from {args.frames}, {args.repeat} pass(es), "
+          f"{'color' if args.color else 'grayscale'} input")
+
+    results = []
+    for spec in backends:
+        try:
+            results.append(benchmark_backend(spec, frames, args.repeat))
+        except Exception as e:
+            print(f"⚠️ Skipping {spec}: {e}")
+
+    print_results(results)
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({'frames_dir': args.frames, 'frame_count': len(frames), 'results': results}, f, indent=2)
+        print(f"\n💾 Results written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
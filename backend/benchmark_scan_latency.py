@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+End-to-end Scan Latency Benchmark
+Runs the real CameraManager capture loop (dual-stream capture, decoder, QR
+processing, image writer, callbacks) over a replayed frame source and measures,
+for every labelled QR code, the time from the first frame showing it to the QR
+callback firing. Also reports pipeline throughput and codes that were missed.
+
+By default codes are validated against the backend (BACKEND_URL); --offline
+accepts every decoded code as a valid order so no backend is needed.
+
+Usage:
+    python benchmark_scan_latency.py --source qr_images --fps 15 --offline
+    python benchmark_scan_latency.py --source conveyor.mp4 --fps 0 --decoder multiscale:opencv --json latency.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import logging
+
+import numpy as np
+
+import camera
+from camera import CameraManager
+from qr_decoders import create_decoder
+from replay_source import ReplaySource, clean_label
+
+logging.basicConfig(level=logging.WARNING)
+
+
+def percentiles(values):
+    if not values:
+        return None
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'mean': round(float(np.mean(values)), 1), 'p50': round(float(p50), 1),
+            'p95': round(float(p95), 1), 'p99': round(float(p99), 1), 'max': round(float(max(values)), 1)}
+
+
+def run_benchmark(source, decoder=None, offline=False, timeout=None):
+    """Replay the source once through CameraManager; returns the results dict"""
+    manager = CameraManager()
+    manager.use_replay_source(source)
+    # Keep the benchmark's QR crops out of qr_images (which may be the source being replayed)
+    manager.image_writer.directory = tempfile.mkdtemp(prefix='scan_benchmark_')
+    if decoder:
+        manager.decoder = create_decoder(decoder)
+    if offline:
+        manager.validate_qr_with_database = lambda qr_data: {
+            'valid': True, 'order_number': qr_data, 'message': 'Replay (offline)'}
+        manager.sync_qr_history_to_backend = lambda: None
+
+    callbacks = {}
+    lock = threading.Lock()
+
+    def on_qr(qr_data, validation_result):
+        with lock:
+            callbacks.setdefault(clean_label(qr_data), time.monotonic())
+
+    manager.add_qr_callback(on_qr)
+    manager.start_camera()
+    manager.start_scanning_session_immediately()
+    manager.scanning_duration = float('inf')
+
+    started = time.monotonic()
+    deadline = started + timeout if timeout else None
+    while source.loops == 0 and manager.running:
+        if deadline and time.monotonic() > deadline:
+            break
+        time.sleep(0.05)
+    time.sleep(0.5)  # Let callbacks for the last frames land
+    manager.stop_camera()
+    manager.image_writer.flush(timeout=5)
+    shutil.rmtree(manager.image_writer.directory, ignore_errors=True)
+    elapsed = time.monotonic() - started
+
+    latencies = []
+    missed = []
+    for label, first_served in source.first_served.items():
+        fired = callbacks.get(clean_label(label))
+        if fired is None:
+            missed.append(label)
+        else:
+            latencies.append((fired - first_served) * 1000)
+
+    return {
+        'source': source.path,
+        'decoder': manager.decoder.name,
+        'fps_requested': source.fps,
+        'frames': source.frames_served,
+        'pipeline_fps': round(source.frames_served / elapsed, 1) if elapsed else None,
+        'labelled_codes': len(source.first_served),
+        'detected_codes': len(latencies),
+        'missed_codes': sorted(missed),
+        'scan_latency_ms': percentiles(latencies),
+        'image_writer': manager.image_writer.get_status(),
+    }
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(
+        description="Measure end-to-end QR scan latency on a replayed frame source",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__
+    )
+    parser.add_argument('--source', default='qr_images',
+                       help='Image directory or video file to replay (default: qr_images)')
+    parser.add_argument('--fps', type=float,
+                       help='Replay rate; 0 for unthrottled (default: the source rate)')
+    parser.add_argument('--labels',
+                       help='JSON ground-truth labels (see replay_source.py)')
+    parser.add_argument('--decoder',
+                       help='Decoder backend, e.g. pyzbar, opencv, multiscale:opencv (default: QR_DECODER)')
+    parser.add_argument('--offline', action='store_true',
+                       help='Treat every decoded code as a valid order instead of calling the backend')
+    parser.add_argument('--timeout', type=float, default=600,
+                       help='Give up after this many seconds')
+    parser.add_argument('--json', dest='json_path',
+                       help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.source):
+        print(f"❌ Replay source not found: {args.source}")
+        sys.exit(1)
+
+    # The benchmark attaches its own source; don't let CameraManager open CAMERA_REPLAY too
+    camera.CAMERA_REPLAY['path'] = None
+    source = ReplaySource(args.source, fps=args.fps, loop=True, labels=args.labels)
+    results = run_benchmark(source, args.decoder, args.offline, args.timeout)
+
+    print(f"📷 {results['frames']} frames from {results['source']} with {results['decoder']} "
+          f"({results['pipeline_fps']} fps through the pipeline)")
+    print(f"🎯 Detected {results['detected_codes']}/{results['labelled_codes']} labelled codes")
+    if results['scan_latency_ms']:
+        latency = results['scan_latency_ms']
+        print(f"⏱️ Scan latency ms: p50 {latency['p50']}  p95 {latency['p95']}  "
+              f"p99 {latency['p99']}  max {latency['max']}")
+    if results['missed_codes']:
+        print(f"⚠️ Missed: {', '.join(results['missed_codes'][:20])}")
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
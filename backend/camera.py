@@ -6,18 +6,105 @@ import numpy as np
 from datetime import datetime
 import requests
 import json
-import base64
 import os
-import sys
-import warnings
-import tempfile
 from dotenv import load_dotenv
+from qr_image_writer import QRImageWriter, QRImageHandle
+from qr_decoders import default_decoder
+from replay_source import ReplaySource
+from metrics import metrics
+from tracing import TracedSession
 
 # Load environment variables
 load_dotenv()
 
 # Backend server URL (your website)
 BACKEND_SERVER = os.getenv('BACKEND_URL', 'http://10.194.125.225:5000')
+backend_http = TracedSession()
+
+# Capture FPS is rate(camera_frames_captured_total); decode FPS is rate(camera_decode_seconds_count)
+CAMERA_FRAMES = metrics.counter('camera_frames_captured', 'Frames captured by the camera loop')
+CAMERA_DECODE_SECONDS = metrics.histogram('camera_decode_seconds', 'Time to decode QR codes in one frame')
+CAMERA_CODES = metrics.counter('camera_qr_codes_decoded', 'QR codes found in decoded frames')
+
+def _parse_size(value):
+    width, height = value.lower().split('x')
+    return (int(width), int(height))
+
+# Stream layout: 'main' feeds the MJPEG preview, 'lores' (YUV420) feeds the QR
+# decoder through its Y plane. lores must not be larger than main.
+CAMERA_STREAMS = {
+    'dual_stream': os.getenv('CAMERA_DUAL_STREAM', 'true').lower() != 'false',
+    'main_size': _parse_size(os.getenv('CAMERA_MAIN_SIZE', '640x480')),
+    'main_format': 'RGB888',
+    'lores_size': _parse_size(os.getenv('CAMERA_LORES_SIZE', '640x480')),
+    'lores_format': 'YUV420',
+}
+
+# Replay recorded frames instead of using the camera (see replay_source.py)
+CAMERA_REPLAY = {
+    'path': os.getenv('CAMERA_REPLAY'),
+    'fps': float(os.getenv('CAMERA_REPLAY_FPS')) if os.getenv('CAMERA_REPLAY_FPS') else None,
+}
+
+
+class MockPicamera2:
+    """Off-device stand-in for Picamera2 with the same main/lores stream shapes.
+
+    frame_source, if given, is a callable returning BGR frames to serve from
+    'main' (resized to the configured size); lores is derived from it as YUV420.
+    """
+
+    def __init__(self, message="MOCK CAMERA - NO RASPBERRY PI", color=(255, 255, 255), frame_source=None):
+        self.message = message
+        self.color = color
+        self.frame_source = frame_source
+        self.config = {}
+
+    def create_video_configuration(self, main=None, lores=None, **kwargs):
+        config = {'main': dict(main or {'size': (640, 480)})}
+        if lores:
+            config['lores'] = dict(lores)
+        return config
+
+    def configure(self, config):
+        self.config = config or {}
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def _main_frame(self):
+        width, height = self.config.get('main', {}).get('size', (640, 480))
+        if self.frame_source is not None:
+            frame = self.frame_source()
+            if frame.shape[:2] != (height, width):
+                frame = cv2.resize(frame, (width, height))
+            return frame
+        frame = np.zeros((height, width, 3), dtype=np.uint8)
+        cv2.putText(frame, self.message, (50, height // 2),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.8, self.color, 2)
+        return frame
+
+    def capture_arrays(self, names=('main',)):
+        main = self._main_frame()
+        arrays = []
+        for name in names:
+            if name == 'main':
+                arrays.append(main)
+            elif name == 'lores' and 'lores' in self.config:
+                width, height = self.config['lores']['size']
+                small = main if main.shape[:2] == (height, width) else cv2.resize(main, (width, height))
+                # I420 layout: Y plane (height rows) followed by the U and V planes
+                arrays.append(cv2.cvtColor(small, cv2.COLOR_BGR2YUV_I420))
+            else:
+                raise RuntimeError(f"Stream '{name}' is not configured")
+        return arrays, {}
+
+    def capture_array(self, name='main'):
+        return self.capture_arrays([name])[0][0]
+
 
 # Try to import Raspberry Pi specific modules, fall back to mock if not available
 try:
@@ -33,199 +120,12 @@ try:
 except ImportError:
     MOCK_CAMERA = True
     PICAMERA2_VERSION = None
-    
-    class Picamera2:
-        def __init__(self):
-            pass
-        
-        def configure(self, config):
-            pass
-        
-        def create_video_configuration(self, main=None):
-            return {}
-        
-        def start(self):
-            pass
-        
-        def stop(self):
-            pass
-        
-        def capture_array(self):
-            # Return a mock frame with some text
-            frame = np.zeros((480, 640, 3), dtype=np.uint8)
-            cv2.putText(frame, "MOCK CAMERA - NO RASPBERRY PI", (50, 240), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
-            return frame
-
-# Try to import QR code decoder
-try:
-    from pyzbar.pyzbar import decode
-except ImportError:
-    def decode(frame):
-        # Mock QR code detection - return empty list
-        return []
+    Picamera2 = MockPicamera2
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class ZBarWarningFilter(logging.Filter):
-    """Filter to suppress ZBar decoder warnings"""
-    
-    def filter(self, record):
-        if hasattr(record, 'getMessage'):
-            message = record.getMessage()
-            zbar_patterns = [
-                '_zbar_decode_databar: Assertion',
-                'decoder/databar.c',
-                'WARNING: decoder/databar.c',
-                'failed.',
-                'f=-1(010) part=0'
-            ]
-            if any(pattern in message for pattern in zbar_patterns):
-                return False
-        return True
-
-class StderrFilter:
-    """Custom stderr filter to suppress ZBar warnings"""
-    
-    def __init__(self):
-        self.original_stderr = sys.stderr
-        self.buffer = ""
-        
-    def write(self, s):
-        self.buffer += s
-        
-        while '\n' in self.buffer:
-            line, self.buffer = self.buffer.split('\n', 1)
-            
-            zbar_patterns = [
-                '_zbar_decode_databar: Assertion',
-                'decoder/databar.c',
-                'WARNING: decoder/databar.c',
-                'failed.\n        i=',
-                'f=-1(010) part=0'
-            ]
-            
-            should_filter = any(pattern in line for pattern in zbar_patterns)
-            
-            if not should_filter:
-                self.original_stderr.write(line + '\n')
-    
-    def flush(self):
-        if self.buffer:
-            zbar_patterns = [
-                '_zbar_decode_databar: Assertion',
-                'decoder/databar.c',
-                'WARNING: decoder/databar.c',
-                'failed.\n        i=',
-                'f=-1(010) part=0'
-            ]
-            
-            should_filter = any(pattern in self.buffer for pattern in zbar_patterns)
-            if not should_filter:
-                self.original_stderr.write(self.buffer)
-            self.buffer = ""
-            
-        self.original_stderr.flush()
-
-class OSLevelStderrFilter:
-    """OS-level stderr filter for ZBar warnings"""
-    
-    def __init__(self):
-        self.original_stderr = sys.stderr
-        self.temp_file = None
-        
-    def __enter__(self):
-        self.temp_file = tempfile.NamedTemporaryFile(mode='w+', delete=False)
-        self.original_stderr_fd = os.dup(2)
-        os.dup2(self.temp_file.fileno(), 2)
-        return self
-        
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        os.dup2(self.original_stderr_fd, 2)
-        os.close(self.original_stderr_fd)
-        
-        if self.temp_file:
-            self.temp_file.seek(0)
-            content = self.temp_file.read()
-            self.temp_file.close()
-            
-            if content:
-                lines = content.split('\n')
-                for line in lines:
-                    zbar_patterns = [
-                        '_zbar_decode_databar: Assertion',
-                        'decoder/databar.c',
-                        'WARNING: decoder/databar.c',
-                        'failed.',
-                        'f=-1(010) part=0'
-                    ]
-                    
-                    if not any(pattern in line for pattern in zbar_patterns) and line.strip():
-                        self.original_stderr.write(line + '\n')
-            
-            try:
-                os.unlink(self.temp_file.name)
-            except:
-                pass
-
-def suppress_zbar_fd_warnings():
-    """Temporarily redirect stderr to null device during ZBar operations"""
-    try:
-        original_stderr_fd = os.dup(2)
-        null_fd = os.open(os.devnull, os.O_WRONLY)
-        os.dup2(null_fd, 2)
-        os.close(null_fd)
-        return original_stderr_fd
-    except (ImportError, OSError, AttributeError):
-        return None
-
-def restore_stderr_fd(original_fd):
-    """Restore original stderr file descriptor"""
-    if original_fd is not None:
-        try:
-            os.dup2(original_fd, 2)
-            os.close(original_fd)
-        except:
-            pass
-
-# Initialize warning suppression
-logger.info("ZBar warning suppression activated - decoder warnings will be filtered")
-
-# Suppress warnings at various levels
-warnings.filterwarnings("ignore", message=".*zbar.*")
-warnings.filterwarnings("ignore", message=".*databar.*")
-
-# Set environment variables to suppress ZBar debug output
-os.environ['ZBAR_DEBUG'] = '0'
-os.environ['ZBAR_QUIET'] = '1'
-os.environ['ZBAR_SILENCE'] = '1'
-
-# Apply stderr filter
-sys.stderr = StderrFilter()
-
-# Try to suppress ZBar warnings at library level
-try:
-    import zbar
-    if hasattr(zbar, 'set_verbosity'):
-        zbar.set_verbosity(0)
-except (ImportError, AttributeError):
-    pass
-
-# Try to configure libzbar using ctypes
-try:
-    import ctypes
-    import ctypes.util
-    
-    libzbar_path = ctypes.util.find_library('zbar')
-    if libzbar_path:
-        libzbar = ctypes.CDLL(libzbar_path)
-        if hasattr(libzbar, 'zbar_set_verbosity'):
-            libzbar.zbar_set_verbosity(0)
-except (ImportError, OSError, AttributeError):
-    pass
-
 class CameraManager:
     """
     Camera manager for QR code scanning with Raspberry Pi or mock camera
@@ -234,17 +134,26 @@ class CameraManager:
     def __init__(self):
         # Camera setup
         self.picam2 = None
+        self.dual_stream = False
+        self.replay_source = None
+        self.frame_interval = 0.03  # Capture loop pause between frames (~30 FPS)
         self.frame = None
         self.running = False
         self.lock = threading.Lock()
         self.capture_thread = None
         self.initialization_error = None
         
+        # Versions bumped on every status/history change (used as ETags by server.py)
+        self.status_version = 0
+        self.history_version = 0
+        
         # QR code detection and validation
+        self.decoder = default_decoder()
         self.last_qr_data = None
         self.last_qr_time = None
         self.qr_cooldown = 3  # Minimum seconds between same QR detections
         self.qr_callbacks = []
+        self.status_callbacks = []
         self.scanned_qr_codes = set()
         self.duplicate_prevention_enabled = True
         
@@ -279,57 +188,95 @@ class CameraManager:
         self._initialize_camera()
 
     def _setup_qr_images_directory(self):
-        """Create directory for storing QR code images"""
+        """Create directory for storing QR code images and the writer that fills it"""
         self.qr_images_dir = 'qr_images'
-        if not os.path.exists(self.qr_images_dir):
-            os.makedirs(self.qr_images_dir)
+        # The history already references the handle, so a finished image is a history change
+        self.image_writer = QRImageWriter(self.qr_images_dir, on_written=lambda handle: self._mark_history_changed())
+
+    def _stream_configuration(self, dual_stream):
+        """Video configuration for the main (preview) and optional lores (decode) streams"""
+        main = {"size": CAMERA_STREAMS['main_size'], "format": CAMERA_STREAMS['main_format']}
+        if not dual_stream:
+            return self.picam2.create_video_configuration(main=main)
+        lores = {"size": CAMERA_STREAMS['lores_size'], "format": CAMERA_STREAMS['lores_format']}
+        return self.picam2.create_video_configuration(main=main, lores=lores)
+
+    def _configure_streams(self):
+        """Configure dual-stream capture, falling back to a single main stream"""
+        if CAMERA_STREAMS['dual_stream']:
+            try:
+                self.picam2.configure(self._stream_configuration(dual_stream=True))
+                self.dual_stream = True
+                return
+            except Exception as dual_error:
+                logger.warning(f"Dual-stream configuration failed, using single stream: {dual_error}")
+        self.picam2.configure(self._stream_configuration(dual_stream=False))
+        self.dual_stream = False
 
     def _initialize_camera(self):
         """Initialize the camera (Raspberry Pi or mock) with version compatibility"""
         try:
+            if CAMERA_REPLAY['path']:
+                self.use_replay_source(ReplaySource(CAMERA_REPLAY['path'], fps=CAMERA_REPLAY['fps']))
+                return
             self.picam2 = Picamera2()
-            if not MOCK_CAMERA:
-                # Handle different PiCamera2 versions
+            try:
+                self._configure_streams()
+            except Exception as config_error:
+                logger.warning(f"New API failed, trying compatibility mode: {config_error}")
                 try:
-                    # Try newer PiCamera2 API (v0.3.13+)
-                    config = self.picam2.create_video_configuration(main={"size": (640, 480)})
-                    self.picam2.configure(config)
-                except Exception as config_error:
-                    logger.warning(f"New API failed, trying compatibility mode: {config_error}")
-                    try:
-                        # Fallback for older versions
-                        self.picam2.configure(self.picam2.create_video_configuration(main={"size": (640, 480)}))
-                    except Exception as fallback_error:
-                        logger.error(f"Both camera configuration methods failed: {fallback_error}")
-                        raise fallback_error
+                    # Fallback for older versions
+                    self.picam2.configure(self.picam2.create_video_configuration(main={"size": (640, 480)}))
+                    self.dual_stream = False
+                except Exception as fallback_error:
+                    logger.error(f"Both camera configuration methods failed: {fallback_error}")
+                    raise fallback_error
                         
-            logger.info(f"Camera initialized successfully {'(MOCK MODE)' if MOCK_CAMERA else ''} - PiCamera2 version: {PICAMERA2_VERSION or 'Unknown'}")
+            logger.info(f"Camera initialized successfully {'(MOCK MODE)' if MOCK_CAMERA else ''} - PiCamera2 version: {PICAMERA2_VERSION or 'Unknown'} - "
+                        f"{'dual stream (lores Y plane for decoding)' if self.dual_stream else 'single stream'}")
         except Exception as e:
             self.initialization_error = str(e)
+            self._mark_status_changed()
             logger.error(f"Camera initialization failed: {e}")
             # Try to create a mock camera as fallback
             if not MOCK_CAMERA:
                 logger.info("Attempting to create mock camera as fallback")
                 try:
-                    self.picam2 = type('MockPicam2', (), {
-                        'configure': lambda self, config: None,
-                        'create_video_configuration': lambda self, main=None: {},
-                        'start': lambda self: None,
-                        'stop': lambda self: None,
-                        'capture_array': lambda self: self._mock_frame()
-                    })()
-                    
-                    def _mock_frame():
-                        frame = np.zeros((480, 640, 3), dtype=np.uint8)
-                        cv2.putText(frame, "CAMERA ERROR - USING MOCK", (50, 240), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
-                        return frame
-                    
-                    self.picam2._mock_frame = _mock_frame
+                    self.picam2 = MockPicamera2("CAMERA ERROR - USING MOCK", color=(0, 0, 255))
+                    self._configure_streams()
                     logger.info("Mock camera fallback created")
                 except Exception as mock_error:
                     logger.error(f"Failed to create mock camera fallback: {mock_error}")
 
+    def use_replay_source(self, source):
+        """Capture from a ReplaySource instead of the camera; the source does its own pacing"""
+        self.replay_source = source
+        self.picam2 = MockPicamera2(frame_source=source.read)
+        self._configure_streams()
+        self.frame_interval = 0
+        self.initialization_error = None
+        logger.info(f"Camera replaying {source.path} at {source.fps or 'unthrottled'} fps")
+
+    def _mark_status_changed(self):
+        """Bump the status version and notify status listeners (ETags, event stream)"""
+        self.status_version += 1
+        if not self.status_callbacks:
+            return
+        status = self.get_status()
+        for callback in self.status_callbacks:
+            try:
+                callback(status)
+            except Exception as e:
+                logger.error(f"Camera status callback error: {e}")
+
+    def _mark_history_changed(self):
+        """Bump the QR history version so cached history responses are refreshed"""
+        self.history_version += 1
+
+    def add_status_callback(self, callback):
+        """Add a callback function to be called with get_status() whenever it changes"""
+        self.status_callbacks.append(callback)
+
     # QR Code Callback Management
     def add_qr_callback(self, callback):
         """Add a callback function to be called when new QR is detected"""
@@ -365,12 +312,14 @@ class CameraManager:
     def mark_qr_as_scanned(self, qr_data):
         """Mark QR code as scanned to prevent duplicate scanning"""
         self.scanned_qr_codes.add(qr_data)
+        self._mark_status_changed()
         logger.info(f"QR code marked as scanned: {qr_data}")
 
     def clear_scanned_qr(self, qr_data):
         """Remove QR code from scanned list to allow rescanning"""
         if qr_data in self.scanned_qr_codes:
             self.scanned_qr_codes.remove(qr_data)
+            self._mark_status_changed()
             # Also clear from validation cache
             if qr_data in self.validation_cache:
                 del self.validation_cache[qr_data]
@@ -382,6 +331,7 @@ class CameraManager:
         """Clear all scanned QR codes to allow rescanning of everything"""
         count = len(self.scanned_qr_codes)
         self.scanned_qr_codes.clear()
+        self._mark_status_changed()
         # Also clear validation cache
         self.validation_cache.clear()
         logger.info(f"Cleared {count} scanned QR codes and validation cache")
@@ -394,6 +344,7 @@ class CameraManager:
     def set_duplicate_prevention(self, enabled):
         """Enable or disable duplicate prevention"""
         self.duplicate_prevention_enabled = enabled
+        self._mark_status_changed()
         logger.info(f"Duplicate prevention {'enabled' if enabled else 'disabled'}")
 
     def get_duplicate_prevention_status(self):
@@ -489,37 +440,9 @@ class CameraManager:
 
     # QR Code Image Storage
     def save_qr_image(self, frame, qr_data, qr_bounds):
-        """Save an image of the detected QR code"""
+        """Queue an image of the detected QR code; returns its handle without waiting for disk"""
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-            clean_qr_data = qr_data.replace('/', '_').replace('\\', '_')[:20]
-            filename = f"qr_{timestamp}_{clean_qr_data}.jpg"
-            filepath = os.path.join(self.qr_images_dir, filename)
-            
-            # Crop image around QR code if bounds are available
-            if qr_bounds:
-                x, y, w, h = qr_bounds
-                padding = 50
-                x_start = max(0, x - padding)
-                y_start = max(0, y - padding)
-                x_end = min(frame.shape[1], x + w + padding)
-                y_end = min(frame.shape[0], y + h + padding)
-                
-                cropped_frame = frame[y_start:y_end, x_start:x_end]
-                cv2.imwrite(filepath, cropped_frame)
-            else:
-                cv2.imwrite(filepath, frame)
-            
-            # Convert image to base64
-            _, buffer = cv2.imencode('.jpg', cropped_frame if qr_bounds else frame)
-            img_base64 = base64.b64encode(buffer).decode('utf-8')
-            
-            logger.info(f"Saved QR image: {filename}")
-            return {
-                'filename': filename,
-                'filepath': filepath,
-                'base64': img_base64
-            }
+            return self.image_writer.submit(frame, qr_data, qr_bounds)
         except Exception as e:
             logger.error(f"Failed to save QR image: {e}")
             return None
@@ -555,7 +478,7 @@ class CameraManager:
             
         try:
             logger.info(f"Validating QR code: {qr_data} with backend at {BACKEND_SERVER}")
-            response = requests.post(
+            response = backend_http.post(
                 f'{BACKEND_SERVER}/api/validate-qr',
                 json={
                     'qr_data': qr_data,
@@ -602,8 +525,12 @@ class CameraManager:
         """Send QR history to the main backend server"""
         try:
             if self.scanned_qr_history:
+                # Give queued images a moment so their base64 is included
+                for entry in self.scanned_qr_history:
+                    if isinstance(entry.get('image_data'), QRImageHandle):
+                        entry['image_data'].wait(timeout=2)
                 logger.info(f"Syncing {len(self.scanned_qr_history)} QR scans to backend...")
-                response = requests.post(
+                response = backend_http.post(
                     f'{BACKEND_SERVER}/api/qr-scans',
                     json={'scans': self.scanned_qr_history},
                     timeout=5
@@ -633,6 +560,7 @@ class CameraManager:
         }
         
         self.scanned_qr_history.insert(0, history_entry)
+        self._mark_history_changed()
         
         # Keep only the last max_history entries
         if len(self.scanned_qr_history) > self.max_history:
@@ -661,6 +589,7 @@ class CameraManager:
         try:
             self.picam2.start()
             self.running = True
+            self._mark_status_changed()
             # Initialize scanning cycle
             self.scanning_enabled = False
             self.scan_start_time = time.time()
@@ -673,6 +602,7 @@ class CameraManager:
         except Exception as e:
             logger.error(f"Failed to start camera: {e}")
             self.running = False
+            self._mark_status_changed()
             try:
                 self.picam2.stop()
             except:
@@ -687,6 +617,7 @@ class CameraManager:
 
         try:
             self.running = False
+            self._mark_status_changed()
             # Reset scanning cycle state when camera stops
             self.scanning_enabled = False
             self.scan_start_time = None
@@ -697,6 +628,8 @@ class CameraManager:
             self.picam2.stop()
             if self.capture_thread:
                 self.capture_thread.join(timeout=2.0)
+            if not self.image_writer.close(timeout=5.0):
+                logger.warning("QR image writer did not finish its queue within 5s")
             logger.info("Camera stopped and scanning cycle reset")
             return True
         except Exception as e:
@@ -712,9 +645,10 @@ class CameraManager:
         while self.running:
             try:
                 # Attempt to capture frame with error recovery
-                frame = self._safe_capture_frame()
+                frame, gray = self._safe_capture_frame()
                 if frame is not None:
-                    frame_with_qr = self._scan_qr_code(frame)
+                    CAMERA_FRAMES.inc()
+                    frame_with_qr = self._scan_qr_code(frame, gray)
                     with self.lock:
                         self.frame = frame_with_qr
                     consecutive_errors = 0  # Reset error counter on success
@@ -726,9 +660,10 @@ class CameraManager:
                 if consecutive_errors >= max_consecutive_errors:
                     logger.error(f"Too many consecutive capture errors ({consecutive_errors}), stopping camera")
                     self.running = False
+                    self._mark_status_changed()
                     break
                     
-                time.sleep(0.03)  # ~30 FPS
+                time.sleep(self.frame_interval)
                 
             except Exception as e:
                 consecutive_errors += 1
@@ -738,16 +673,26 @@ class CameraManager:
                 if consecutive_errors >= max_consecutive_errors:
                     logger.error("Maximum consecutive errors reached, stopping capture loop")
                     self.running = False
+                    self._mark_status_changed()
                     break
                     
                 # Brief pause before retry
                 time.sleep(0.1)
 
+    def _capture_streams(self):
+        """Capture (preview frame, grayscale decode image or None)"""
+        if not self.dual_stream:
+            return self.picam2.capture_array(), None
+        (frame, lores), _ = self.picam2.capture_arrays(['main', 'lores'])
+        width, height = CAMERA_STREAMS['lores_size']
+        # The first `height` rows of a YUV420 buffer are the Y (luma) plane; slicing is a view, not a copy
+        return frame, lores[:height, :width]
+
     def _safe_capture_frame(self):
-        """Safely capture a frame with error handling for different PiCamera2 versions"""
+        """Safely capture (frame, decode image) with error handling for different PiCamera2 versions"""
         try:
             # Try to capture frame
-            return self.picam2.capture_array()
+            return self._capture_streams()
         except AttributeError as attr_error:
             if "'Picamera2' object has no attribute 'allocator'" in str(attr_error):
                 logger.error("PiCamera2 allocator error detected - this is a known version compatibility issue")
@@ -759,18 +704,18 @@ class CameraManager:
                     time.sleep(0.5)
                     self.picam2.start()
                     time.sleep(0.5)
-                    return self.picam2.capture_array()
+                    return self._capture_streams()
                 except Exception as recovery_error:
                     logger.error(f"Camera recovery failed: {recovery_error}")
                     # Return a mock frame as fallback
-                    return self._create_error_frame("Camera Error - Recovery Failed")
+                    return self._create_error_frame("Camera Error - Recovery Failed"), None
             else:
                 logger.error(f"Camera attribute error: {attr_error}")
-                return self._create_error_frame("Camera Attribute Error")
+                return self._create_error_frame("Camera Attribute Error"), None
                 
         except Exception as e:
             logger.error(f"Camera capture error: {e}")
-            return self._create_error_frame(f"Capture Error: {str(e)[:50]}")
+            return self._create_error_frame(f"Capture Error: {str(e)[:50]}"), None
 
     def _create_error_frame(self, error_message):
         """Create an error frame when camera capture fails"""
@@ -785,8 +730,12 @@ class CameraManager:
             logger.error(f"Failed to create error frame: {e}")
             return np.zeros((480, 640, 3), dtype=np.uint8)
 
-    def _scan_qr_code(self, frame):
-        """Main QR code scanning logic with display overlay and cycle management"""
+    def _scan_qr_code(self, frame, gray=None):
+        """Main QR code scanning logic with display overlay and cycle management.
+
+        gray is the lores Y plane in dual-stream mode; codes are decoded from it
+        and their coordinates scaled to the preview frame.
+        """
         try:
             current_time = time.time()
             
@@ -801,7 +750,13 @@ class CameraManager:
             self._update_display_messages(current_time, frame)
             
             # Decode QR codes with warning suppression
-            decoded_objects = self._decode_qr_codes_safely(frame)
+            with CAMERA_DECODE_SECONDS.time():
+                if gray is None:
+                    decoded_objects = self._decode_qr_codes_safely(frame)
+                else:
+                    decoded_objects = self._scale_decoded(self._decode_qr_codes_safely(gray), gray.shape, frame.shape)
+            if decoded_objects:
+                CAMERA_CODES.inc(len(decoded_objects))
             
             # Process each detected QR code
             for obj in decoded_objects:
@@ -882,22 +837,28 @@ class CameraManager:
             self._clear_display_messages()
 
     def _decode_qr_codes_safely(self, frame):
-        """Decode QR codes with comprehensive warning suppression"""
+        """Decode QR codes with the configured backend"""
         try:
-            with OSLevelStderrFilter():
-                original_stderr_fd = suppress_zbar_fd_warnings()
-                try:
-                    decoded_objects = decode(frame)
-                finally:
-                    restore_stderr_fd(original_stderr_fd)
-                return decoded_objects
+            return self.decoder.decode(frame)
         except Exception as decode_error:
-            # Fallback to regular decode
-            try:
-                return decode(frame)
-            except Exception:
-                logger.debug(f"QR decode failed: {decode_error}")
-                return []
+            logger.debug(f"QR decode failed: {decode_error}")
+            return []
+
+    def _scale_decoded(self, decoded_objects, source_shape, target_shape):
+        """Map decoded rects/polygons from the lores stream onto the main frame"""
+        scale_x = target_shape[1] / source_shape[1]
+        scale_y = target_shape[0] / source_shape[0]
+        if scale_x == 1 and scale_y == 1:
+            return decoded_objects
+        scaled = []
+        for obj in decoded_objects:
+            rect = obj.rect
+            scaled.append(obj._replace(
+                rect=type(rect)(int(rect.left * scale_x), int(rect.top * scale_y),
+                                int(rect.width * scale_x), int(rect.height * scale_y)),
+                polygon=[type(point)(int(point.x * scale_x), int(point.y * scale_y)) for point in obj.polygon]
+            ))
+        return scaled
 
     def _process_qr_code(self, obj, frame, current_time):
         """Process a single detected QR code"""
@@ -1062,6 +1023,8 @@ class CameraManager:
             "camera_running": self.running,
             "initialization_error": self.initialization_error,
             "has_camera": self.picam2 is not None,
+            "dual_stream": self.dual_stream,
+            "qr_decoder": self.decoder.name,
             "duplicate_prevention": self.get_duplicate_prevention_status()
         }
 
@@ -0,0 +1,25 @@
+"""
+Shared pytest fixtures for the backend tests
+"""
+
+import os
+import sys
+import importlib
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    """app.py imported with its working directory (database.db, app.log) in a scratch folder.
+
+    app.py opens its database relative to the working directory at import time,
+    so the module is reloaded for every test; monkeypatch restores the working
+    directory afterwards.
+    """
+    monkeypatch.chdir(tmp_path)
+    if 'app' in sys.modules:
+        return importlib.reload(sys.modules['app'])
+    return importlib.import_module('app')
@@ -0,0 +1,661 @@
+#!/usr/bin/env python3
+"""
+Conveyor Simulator
+Plays the ESP32 roles of the sorting line (belt A with IR A, actuator,
+loadcell, grabber 1, box size checker, stepper, grabber 2, belt B with IR B,
+proximity sensor and GSM module) against an MQTT broker, so the MQTTListener
+workflow in server.py can be driven end to end without the hardware.
+
+Parcels arrive on belt A at a configurable rate (fixed spacing or Poisson; no
+rate queues every parcel at once to measure capacity). Each device answers the
+server's commands on the firmware's topics, with the firmware's status
+messages, after a configurable device time. Every parcel records when it
+reached each milestone, and the report gives:
+- throughput in parcels/hour and the capacity implied by the station cycle;
+- per-step latency (p50/p95/max), split into device time and server reaction
+  time (which includes the server's fixed delays);
+- the bottleneck step, belt A queueing and whether the offered rate saturates
+  the line;
+- belt B findings: IR B triggers the server ignored, parcels a stopB caught
+  before they reached IR B (the cycle-end stop-all can land after startB,
+  and nothing restarts belt B until the next parcel's startB) and parcels
+  left stranded at the end of the run.
+
+server.py must use the same broker. Without Mosquitto, run the embedded one:
+    python mqtt_broker.py --port 1883
+    MQTT_BROKER_HOST=127.0.0.1 python server.py
+    python conveyor_simulator.py --broker 127.0.0.1 --parcels 20 --rate 120
+
+--time-scale multiplies every device time (0.1 runs the devices 10x faster);
+the server's own delays are real time and show up in the server steps.
+
+Usage:
+    python conveyor_simulator.py --parcels 10
+    python conveyor_simulator.py --parcels 50 --rate 200 --arrivals poisson --time-scale 0.5 --json sim.json
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import heapq
+import random
+import argparse
+import threading
+import logging
+from collections import Counter, deque
+
+import numpy as np
+import paho.mqtt.client as mqtt
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Device times in seconds (before --time-scale)
+SIMULATOR_TIMINGS = {
+    'belt_a_travel': 2.0,       # Belt A carries the next parcel to IR A
+    'motor_response': 0.1,      # Motor controller acknowledges a start/stop
+    'actuator_push': 1.5,       # Actuator pushes the parcel onto the loadcell
+    'loadcell_interval': 0.1,   # Time between raw loadcell readings
+    'loadcell_bounce': 0.8,     # Readings bounce this long after the push
+    'grabber1': 3.0,            # Grabber 1 carries the parcel to the size checker
+    'box_measure': 2.0,         # Size checker measures the parcel
+    'stepper_move': 1.5,        # Stepper moves to (or back from) a size lane
+    'grabber2': 3.0,            # Grabber 2 carries the parcel to belt B
+    'belt_b_travel': 2.0,       # Belt B carries the parcel to IR B
+    'gsm_send': 1.0,            # GSM module sends an SMS
+}
+
+# Parcel dimensions (inches) per size class, classified by server.py's determine_package_size
+PARCEL_SIZES = {
+    'small': (3.5, 5.5),
+    'medium': (6.5, 9.0),
+    'large': (12.5, 16.0),
+}
+
+# (step, start milestone, end milestone, kind); kind is 'device', 'server' or 'total'
+SIMULATION_STEPS = [
+    ('belt_a_queue', 'arrived', 'ir_a', 'queue'),
+    ('ir_a_to_stop_a', 'ir_a', 'stop_a_cmd', 'server'),
+    ('motor_a_to_loadcell', 'motor_a_stopped', 'loadcell_cmd', 'server'),
+    ('weighing', 'loadcell_cmd', 'settled', 'device'),
+    ('settled_to_grabber1', 'settled', 'grabber1_cmd', 'server'),
+    ('grabber1', 'grabber1_cmd', 'grabber1_done', 'device'),
+    ('grabber1_to_box', 'grabber1_done', 'box_cmd', 'server'),
+    ('box_measure', 'box_cmd', 'box_done', 'device'),
+    ('box_to_stepper', 'box_done', 'stepper_cmd', 'server'),
+    ('stepper_move', 'stepper_cmd', 'stepper_done', 'device'),
+    ('stepper_to_back', 'stepper_done', 'back_cmd', 'server'),
+    ('stepper_back', 'back_cmd', 'back_done', 'device'),
+    ('back_to_restart', 'back_done', 'restart_cmd', 'server'),
+    ('grabber2', 'grabber2_cmd', 'parcel2_done', 'device'),
+    ('grabber2_to_start_b', 'parcel2_done', 'start_b_cmd', 'server'),
+    ('belt_b', 'start_b_cmd', 'ir_b', 'device'),
+    ('ir_b_to_stop_b', 'ir_b', 'stop_b_cmd', 'server'),
+    ('station_cycle', 'ir_a', 'restart_cmd', 'total'),
+    ('end_to_end', 'arrived', 'restart_cmd', 'total'),
+]
+
+
+def summarize(values):
+    if not values:
+        return None
+    p50, p95 = np.percentile(values, [50, 95])
+    return {'count': len(values), 'mean': round(float(np.mean(values)), 3), 'p50': round(float(p50), 3),
+            'p95': round(float(p95), 3), 'max': round(float(max(values)), 3)}
+
+
+def make_parcels(count, rng, prefix='ORD-SIM'):
+    """Random parcels with a size class, dimensions and a weight (kg)"""
+    parcels = []
+    for i in range(count):
+        size = rng.choice(list(PARCEL_SIZES))
+        low, high = PARCEL_SIZES[size]
+        parcels.append({
+            'id': i + 1,
+            'order_number': f'{prefix}-{i + 1:04d}',
+            'size': size,
+            'dimensions': [round(rng.uniform(low, high), 2) for _ in range(3)],
+            'weight': round(rng.uniform(0.2, 3.0), 3),
+            'events': {},
+        })
+    return parcels
+
+
+class ConveyorSimulator:
+    """ESP32 device roles driven by the server's MQTT commands"""
+
+    def __init__(self, broker_host='127.0.0.1', broker_port=1883, timings=None, time_scale=1.0,
+                 metal_rate=0.0, server_url=None, seed=None):
+        self.broker_host = broker_host
+        self.broker_port = broker_port
+        self.timings = dict(SIMULATOR_TIMINGS, **(timings or {}))
+        self.time_scale = time_scale
+        self.metal_rate = metal_rate
+        self.server_url = server_url
+        self.rng = random.Random(seed)
+
+        self._lock = threading.RLock()
+        self._schedule = []
+        self._schedule_seq = 0
+        self._wakeup = threading.Condition(self._lock)
+        self._running = False
+
+        self.parcels = []
+        self.belt_a_queue = deque()
+        self.belt_a_transit = None
+        self.belt_a_running = True
+        self.station = None             # Parcel between IR A and the cycle restart
+        self.belt_b = []                # Parcels on belt B: {'parcel', 'remaining', 'since'}
+        self.belt_b_running = False
+        self._belt_b_generation = 0
+        self.ir_b_pending = deque()     # Parcels that reached IR B, awaiting stopB
+        self.ir_b_stop_requested = False  # IR B sensor stopped: the next stopB answers an IR B trigger
+        self.completed = []
+
+        self.loadcell_running = False
+        self.platform_weight = 0.0
+        self.bounce_until = 0.0
+        self.stepper_position = None
+
+        self.max_queue = 0
+        self.messages_published = 0
+        self.messages_received = 0
+        self.unexpected_commands = Counter()
+        self.size_mismatches = 0
+        self.metal_alerts = 0
+        self.sms_sent = 0
+
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION1, client_id=f"simulator_{uuid.uuid4().hex[:8]}",
+                                  clean_session=True)
+        self.client.on_connect = self.on_connect
+        self.client.on_message = self.on_message
+        self._connected = threading.Event()
+
+        self.handlers = {
+            'esp32/motor/request': self.handle_motor,
+            'esp32/actuator/request': self.handle_actuator,
+            'esp32/loadcell/request': self.handle_loadcell,
+            'esp32/grabber1/request': self.handle_grabber1,
+            'esp32/box/request': self.handle_box,
+            'esp32/stepper/request': self.handle_stepper,
+            'esp32/grabber2/request': self.handle_grabber2,
+            'esp32/irsensorB/request': self.handle_ir_b,
+            'esp32/gsm/send': self.handle_gsm,
+        }
+
+    # MQTT plumbing
+
+    def on_connect(self, client, userdata, flags, rc):
+        if rc == 0:
+            client.subscribe([(topic, 0) for topic in self.handlers])
+            self._connected.set()
+        else:
+            logger.error(f"Simulator MQTT connection failed with code {rc}")
+
+    def on_message(self, client, userdata, msg):
+        command = msg.payload.decode('utf-8', errors='replace').strip()
+        with self._lock:
+            self.messages_received += 1
+            handler = self.handlers.get(msg.topic)
+            if handler:
+                try:
+                    handler(command)
+                except Exception as e:
+                    logger.error(f"Simulator error handling {msg.topic} {command}: {e}")
+
+    def publish(self, topic, message):
+        self.messages_published += 1
+        self.client.publish(topic, message)
+
+    # Scheduler: device actions run on one thread in due-time order
+
+    def after(self, delay, callback, *args, scaled=True):
+        """Run callback(*args) after a device delay (scaled by time_scale)"""
+        due = time.monotonic() + (delay * self.time_scale if scaled else delay)
+        with self._lock:
+            self._schedule_seq += 1
+            heapq.heappush(self._schedule, (due, self._schedule_seq, callback, args))
+            self._wakeup.notify()
+
+    def _scheduler_loop(self):
+        with self._lock:
+            while self._running:
+                if not self._schedule:
+                    self._wakeup.wait(0.5)
+                    continue
+                due = self._schedule[0][0]
+                now = time.monotonic()
+                if due > now:
+                    self._wakeup.wait(due - now)
+                    continue
+                _, _, callback, args = heapq.heappop(self._schedule)
+                try:
+                    callback(*args)
+                except Exception as e:
+                    logger.error(f"Simulator error in {getattr(callback, '__name__', callback)}: {e}")
+
+    # Parcel bookkeeping
+
+    def mark(self, parcel, milestone):
+        if parcel is not None:
+            parcel['events'].setdefault(milestone, time.monotonic())
+
+    def unexpected(self, topic, command):
+        self.unexpected_commands[f'{topic} {command}'] += 1
+
+    def arrive(self, parcel):
+        self.mark(parcel, 'arrived')
+        self.belt_a_queue.append(parcel)
+        self.max_queue = max(self.max_queue, len(self.belt_a_queue))
+        self.feed_belt_a()
+
+    def feed_belt_a(self):
+        """Send the next queued parcel towards IR A once the station is free"""
+        if self.belt_a_running and self.station is None and self.belt_a_transit is None and self.belt_a_queue:
+            self.belt_a_transit = self.belt_a_queue.popleft()
+            self.after(self.timings['belt_a_travel'], self.reach_ir_a)
+
+    def reach_ir_a(self):
+        parcel, self.belt_a_transit = self.belt_a_transit, None
+        self.station = parcel
+        self.mark(parcel, 'ir_a')
+        self.publish('esp32/ir/status', 'IR A triggered')
+        if self.metal_rate and self.rng.random() < self.metal_rate:
+            self.metal_alerts += 1
+            self.publish('esp32/proximity/status', '⚠️ Metallic detected')
+
+    # Device roles
+
+    def handle_motor(self, command):
+        if command == 'stopA':
+            self.belt_a_running = False
+            if self.station is not None and 'motor_a_stopped' not in self.station['events']:
+                self.mark(self.station, 'stop_a_cmd')
+                self.after(self.timings['motor_response'], self.motor_a_stopped_by_ir, self.station)
+            else:
+                self.after(self.timings['motor_response'], self.publish, 'esp32/motor/status', 'Motor A stopped')
+        elif command == 'startA':
+            parcel = self.station
+            if parcel is not None and 'back_done' in parcel['events']:
+                self.mark(parcel, 'restart_cmd')
+                self.completed.append(parcel)
+                self.station = None
+            elif parcel is not None:
+                self.unexpected('esp32/motor/request', command)
+            self.belt_a_running = True
+            self.after(self.timings['motor_response'], self.publish, 'esp32/motor/status', 'Motor A started')
+            self.feed_belt_a()
+        elif command == 'startB':
+            for item in self.belt_b:
+                if item['parcel'] is not None:
+                    self.mark(item['parcel'], 'start_b_cmd')
+            if not self.belt_b_running:
+                self.belt_b_running = True
+                self._belt_b_generation += 1
+                for item in self.belt_b:
+                    item['since'] = time.monotonic()
+                    self.after(item['remaining'], self.reach_ir_b, item, self._belt_b_generation, scaled=False)
+            self.after(self.timings['motor_response'], self.publish, 'esp32/motor/status', 'Motor B started')
+        elif command == 'stopB':
+            # The cycle-end stop-all sequence also sends stopB; only the stop that follows
+            # the IR B sensor stop (the server's answer to an IR B trigger) counts for a parcel
+            if self.ir_b_stop_requested and self.ir_b_pending:
+                self.mark(self.ir_b_pending.popleft(), 'stop_b_cmd')
+            self.ir_b_stop_requested = False
+            if self.belt_b_running:
+                self.belt_b_running = False
+                self._belt_b_generation += 1
+                now = time.monotonic()
+                for item in self.belt_b:
+                    item['remaining'] = max(0.0, item['remaining'] - (now - item['since']))
+                    # Like the firmware, the belt just stops: the parcel waits for the next startB
+                    self.mark(item['parcel'], 'stopped_in_transit')
+            self.after(self.timings['motor_response'], self.publish, 'esp32/motor/status', 'Motor B stopped')
+
+    def motor_a_stopped_by_ir(self, parcel):
+        self.mark(parcel, 'motor_a_stopped')
+        self.publish('esp32/motor/status', 'Motor A stopped by IR A')
+
+    def handle_actuator(self, command):
+        if command != 'start':
+            return
+        parcel = self.station
+        self.mark(parcel, 'actuator_cmd')
+        self.publish('esp32/actuator/status', 'Actuator started - pushing parcel')
+        self.after(self.timings['actuator_push'], self.actuator_pushed, parcel)
+
+    def actuator_pushed(self, parcel):
+        if parcel is not None:
+            self.platform_weight = parcel['weight']
+            self.bounce_until = time.monotonic() + self.timings['loadcell_bounce'] * self.time_scale
+        self.publish('esp32/actuator/status', 'Actuator cycle complete')
+
+    def handle_loadcell(self, command):
+        if command == 'start':
+            self.mark(self.station, 'loadcell_cmd')
+            if not self.loadcell_running:
+                self.loadcell_running = True
+                self.publish('esp32/loadcell/status', 'Advanced load cell started')
+                self.after(self.timings['loadcell_interval'], self.loadcell_tick)
+        elif command == 'stop':
+            self.loadcell_running = False
+
+    def loadcell_tick(self):
+        if not self.loadcell_running:
+            return
+        reading = self.platform_weight
+        if reading > 0 and time.monotonic() < self.bounce_until:
+            reading += self.rng.uniform(-0.15, 0.15)
+        else:
+            reading += self.rng.gauss(0, 0.0008)
+            if self.platform_weight > 0:
+                self.mark(self.station, 'settled')
+        self.publish('esp32/loadcell/data', f'{max(reading, 0.0):.4f}')
+        self.after(self.timings['loadcell_interval'], self.loadcell_tick)
+
+    def handle_grabber1(self, command):
+        if command != 'start':
+            return
+        parcel = self.station
+        if parcel is None or 'grabber1_cmd' in parcel['events']:
+            self.unexpected('esp32/grabber1/request', command)
+            return
+        self.mark(parcel, 'grabber1_cmd')
+        self.publish('esp32/parcel1/status', '🚚 Parcel process 1 started')
+        self.after(self.timings['grabber1'] / 2, self.grabber1_moved)
+        self.after(self.timings['grabber1'], self.grabber1_done, parcel)
+
+    def grabber1_moved(self):
+        self.platform_weight = 0.0
+        self.publish('esp32/parcel1/status', '➡️ Moved to size checker')
+
+    def grabber1_done(self, parcel):
+        self.mark(parcel, 'grabber1_done')
+        self.publish('esp32/parcel1/status', '✅ Parcel process 1 complete')
+
+    def handle_box(self, command):
+        if command != 'start':
+            return
+        parcel = self.station
+        if parcel is None or 'box_cmd' in parcel['events']:
+            self.unexpected('esp32/box/request', command)
+            return
+        self.mark(parcel, 'box_cmd')
+        self.publish('esp32/box/status', 'Box system started')
+        self.after(self.timings['box_measure'], self.box_measured, parcel)
+
+    def box_measured(self, parcel):
+        width, length, height = parcel['dimensions']
+        self.publish('esp32/box/status',
+                     f"W: {width:.2f} in, L: {length:.2f} in, H: {height:.2f} in → 📦 {parcel['size'].title()}")
+        self.mark(parcel, 'box_done')
+        self.publish('esp32/box/status', '✅ Box process complete')
+
+    def handle_stepper(self, command):
+        parcel = self.station
+        if command in PARCEL_SIZES:
+            if parcel is None or 'stepper_cmd' in parcel['events']:
+                self.unexpected('esp32/stepper/request', command)
+                return
+            self.mark(parcel, 'stepper_cmd')
+            if command != parcel['size']:
+                self.size_mismatches += 1
+            self.after(self.timings['stepper_move'], self.stepper_moved, parcel, command)
+        elif command.endswith('back') and command[:-4] in PARCEL_SIZES:
+            if self.stepper_position is None or parcel is None or 'back_cmd' in parcel['events']:
+                # Already home: the firmware has nothing to do
+                self.unexpected('esp32/stepper/request', command)
+                return
+            self.mark(parcel, 'back_cmd')
+            self.after(self.timings['stepper_move'], self.stepper_returned, parcel, command)
+
+    def stepper_moved(self, parcel, size):
+        self.stepper_position = size
+        self.mark(parcel, 'stepper_done')
+        self.publish('esp32/stepper/status', f'{size} complete')
+
+    def stepper_returned(self, parcel, command):
+        self.stepper_position = None
+        self.mark(parcel, 'back_done')
+        self.publish('esp32/stepper/status', f'{command} complete')
+
+    def handle_grabber2(self, command):
+        if command != 'start':
+            return
+        parcel = self.station
+        if parcel is None or 'grabber2_cmd' in parcel['events']:
+            self.unexpected('esp32/grabber2/request', command)
+            return
+        self.mark(parcel, 'grabber2_cmd')
+        self.publish('esp32/parcel2/status', '📦 Parcel process 2 started')
+        self.after(self.timings['grabber2'] / 2, self.grabber2_moved, parcel)
+        self.after(self.timings['grabber2'], self.grabber2_done, parcel)
+
+    def grabber2_moved(self, parcel):
+        item = {'parcel': parcel, 'remaining': self.timings['belt_b_travel'] * self.time_scale,
+                'since': time.monotonic()}
+        self.belt_b.append(item)
+        if self.belt_b_running:
+            self.after(item['remaining'], self.reach_ir_b, item, self._belt_b_generation, scaled=False)
+        self.publish('esp32/parcel2/status', '➡️ Moved to conveyor 2')
+
+    def grabber2_done(self, parcel):
+        self.mark(parcel, 'parcel2_done')
+        self.publish('esp32/parcel2/status', '✅ Parcel process 2 complete')
+
+    def reach_ir_b(self, item, generation):
+        if generation != self._belt_b_generation or item not in self.belt_b:
+            return  # Belt B stopped (and maybe restarted) since this was scheduled
+        self.belt_b.remove(item)
+        self.mark(item['parcel'], 'ir_b')
+        self.ir_b_pending.append(item['parcel'])
+        self.publish('esp32/motor/status', '📍 IR B triggered')
+
+    def handle_ir_b(self, command):
+        if command == 'stop':
+            self.ir_b_stop_requested = True
+
+    def handle_gsm(self, command):
+        if command.startswith('start:'):
+            self.sms_sent += 1
+            self.after(self.timings['gsm_send'], self.publish, 'esp32/gsm/status', f'SMS sent to {command[6:]}')
+
+    def scan_qr(self, parcel):
+        """Stand-in for the camera: ask the server to process the parcel's QR code"""
+        try:
+            response = requests.post(f'{self.server_url}/debug/simulate-qr-scan',
+                                     json={'qr_code': parcel['order_number']}, timeout=15)
+            if response.status_code == 200:
+                with self._lock:
+                    self.mark(parcel, 'qr_scanned')
+        except requests.RequestException as e:
+            logger.warning(f"Simulated QR scan failed for {parcel['order_number']}: {e}")
+
+    # Running a simulation
+
+    def run(self, parcels, rate=None, arrivals='fixed', timeout=None):
+        """Push parcels through the line; rate is parcels/hour (None queues them all at once)"""
+        self.parcels = parcels
+        self._running = True
+        scheduler = threading.Thread(target=self._scheduler_loop, name='simulator-scheduler', daemon=True)
+        scheduler.start()
+        self.client.connect(self.broker_host, self.broker_port, 60)
+        self.client.loop_start()
+        if not self._connected.wait(10):
+            raise ConnectionError(f"Could not connect to MQTT broker {self.broker_host}:{self.broker_port}")
+
+        started = time.monotonic()
+        offset = 0.0
+        for parcel in parcels:
+            self.after(offset, self.arrive, parcel, scaled=False)
+            if rate:
+                offset += self.rng.expovariate(rate / 3600) if arrivals == 'poisson' else 3600 / rate
+
+        deadline = started + timeout if timeout else None
+        last_count, qr_threads = 0, []
+        while len(self.completed) < len(parcels):
+            if deadline and time.monotonic() > deadline:
+                logger.warning(f"Simulation timed out with {len(self.completed)}/{len(parcels)} parcels complete")
+                break
+            time.sleep(0.1)
+            with self._lock:
+                scanned = [p for p in parcels if 'stop_b_cmd' in p['events'] and 'qr_requested' not in p['events']]
+                for parcel in scanned:
+                    self.mark(parcel, 'qr_requested')
+            if self.server_url:
+                for parcel in scanned:
+                    thread = threading.Thread(target=self.scan_qr, args=(parcel,), daemon=True)
+                    thread.start()
+                    qr_threads.append(thread)
+            if len(self.completed) != last_count:
+                last_count = len(self.completed)
+                logger.info(f"Parcel {last_count}/{len(parcels)} complete")
+
+        time.sleep(self.timings['belt_b_travel'] * self.time_scale + 1.0)  # Let the last parcel clear belt B
+        for thread in qr_threads:
+            thread.join(timeout=15)
+        finished = time.monotonic()
+
+        self._running = False
+        with self._lock:
+            self._wakeup.notify()
+        self.client.loop_stop()
+        self.client.disconnect()
+        return self.report(rate, started, finished)
+
+    def report(self, rate, started, finished):
+        steps = {}
+        for name, start, end, kind in SIMULATION_STEPS:
+            values = [p['events'][end] - p['events'][start] for p in self.parcels
+                      if start in p['events'] and end in p['events']]
+            summary = summarize(values)
+            if summary:
+                summary['kind'] = kind
+                steps[name] = summary
+
+        completed = [p for p in self.parcels if 'restart_cmd' in p['events']]
+        window = (max(p['events']['restart_cmd'] for p in completed) -
+                  min(p['events']['arrived'] for p in self.parcels if 'arrived' in p['events'])) if completed else None
+        throughput = len(completed) * 3600 / window if window else None
+
+        cycle = steps.get('station_cycle', {}).get('mean')
+        # The next parcel reaches IR A one belt A trip after the restart
+        capacity = 3600 / (cycle + self.timings['belt_a_travel'] * self.time_scale) if cycle else None
+        utilization = rate / capacity if rate and capacity else None
+
+        station_steps = {name: s for name, s in steps.items()
+                         if s['kind'] in ('server', 'device') and name not in
+                         ('grabber2', 'grabber2_to_start_b', 'belt_b', 'ir_b_to_stop_b')}
+        bottleneck = max(station_steps, key=lambda name: station_steps[name]['mean']) if station_steps else None
+        server_time = sum(s['mean'] for s in station_steps.values() if s['kind'] == 'server')
+
+        reached_ir_b = [p for p in self.parcels if 'ir_b' in p['events']]
+        return {
+            'parcels': len(self.parcels),
+            'completed': len(completed),
+            'duration_s': round(finished - started, 2),
+            'time_scale': self.time_scale,
+            'offered_rate_per_hour': rate,
+            'throughput_per_hour': round(throughput, 1) if throughput else None,
+            'capacity_per_hour': round(capacity, 1) if capacity else None,
+            'utilization': round(utilization, 3) if utilization else None,
+            'saturated': rate is None or (utilization is not None and utilization >= 1.0),
+            'max_belt_a_queue': self.max_queue,
+            'bottleneck': bottleneck,
+            'server_share_of_cycle': round(server_time / cycle, 3) if cycle else None,
+            'steps': steps,
+            'belt_b': {
+                'reached_ir_b': len(reached_ir_b),
+                'stopped_by_server': sum('stop_b_cmd' in p['events'] for p in reached_ir_b),
+                'ignored_by_server': sum('stop_b_cmd' not in p['events'] for p in reached_ir_b),
+                'stopped_in_transit': sum('stopped_in_transit' in p['events'] for p in self.parcels),
+                'stranded': len(self.belt_b),
+                'qr_scanned': sum('qr_scanned' in p['events'] for p in self.parcels),
+            },
+            'size_mismatches': self.size_mismatches,
+            'unexpected_commands': dict(self.unexpected_commands),
+            'metal_alerts': self.metal_alerts,
+            'sms_sent': self.sms_sent,
+            'messages': {'published': self.messages_published, 'received': self.messages_received},
+        }
+
+
+def print_report(report):
+    print(f"\n📦 {report['completed']}/{report['parcels']} parcels completed in {report['duration_s']}s "
+          f"(device time x{report['time_scale']})")
+    offered = f"{report['offered_rate_per_hour']}/h offered" if report['offered_rate_per_hour'] else "all queued at start"
+    print(f"🚚 Throughput {report['throughput_per_hour']}/h ({offered}), capacity {report['capacity_per_hour']}/h, "
+          f"utilization {report['utilization']}")
+    print(f"\n{'step':<22} {'kind':<7} {'n':>4} {'mean s':>8} {'p50 s':>8} {'p95 s':>8} {'max s':>8}")
+    print("-" * 70)
+    for name, s in report['steps'].items():
+        print(f"{name:<22} {s['kind']:<7} {s['count']:>4} {s['mean']:>8.3f} {s['p50']:>8.3f} "
+              f"{s['p95']:>8.3f} {s['max']:>8.3f}")
+    if report['server_share_of_cycle'] is not None:
+        print(f"\n🐢 Bottleneck: {report['bottleneck']}; server steps take "
+              f"{report['server_share_of_cycle']:.0%} of the station cycle")
+    if report['saturated']:
+        print(f"⚠️ Line saturated: belt A queue reached {report['max_belt_a_queue']} parcels")
+    belt_b = report['belt_b']
+    if belt_b['ignored_by_server'] or belt_b['stranded'] or belt_b['stopped_in_transit']:
+        print(f"⚠️ Belt B: {belt_b['ignored_by_server']} IR B triggers ignored by the server, "
+              f"{belt_b['stopped_in_transit']} parcels stopped before IR B, {belt_b['stranded']} parcels stranded")
+    if report['unexpected_commands']:
+        print(f"⚠️ Unexpected commands: {report['unexpected_commands']}")
+    if report['size_mismatches']:
+        print(f"⚠️ Stepper sent to the wrong lane for {report['size_mismatches']} parcels")
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(
+        description="Drive server.py's conveyor workflow with simulated ESP32 devices",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__
+    )
+    parser.add_argument('--broker', default=os.getenv('MQTT_BROKER_HOST', '127.0.0.1'),
+                       help='MQTT broker host (default: MQTT_BROKER_HOST or 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=int(os.getenv('MQTT_BROKER_PORT', '1883')),
+                       help='MQTT broker port')
+    parser.add_argument('--parcels', type=int, default=10,
+                       help='Number of parcels to push through the line')
+    parser.add_argument('--rate', type=float,
+                       help='Arrival rate in parcels/hour (default: queue every parcel at the start)')
+    parser.add_argument('--arrivals', choices=['fixed', 'poisson'], default='fixed',
+                       help='Arrival process for --rate')
+    parser.add_argument('--time-scale', type=float, default=1.0,
+                       help='Multiplier for every device time (0.1 = devices 10x faster)')
+    parser.add_argument('--metal-rate', type=float, default=0.0,
+                       help='Fraction of parcels that trip the proximity sensor')
+    parser.add_argument('--server-url',
+                       help='server.py URL; when set, parcels stopped at IR B are scanned via /debug/simulate-qr-scan')
+    parser.add_argument('--seed', type=int,
+                       help='Random seed for parcels and arrivals')
+    parser.add_argument('--timeout', type=float, default=3600,
+                       help='Give up after this many seconds')
+    parser.add_argument('--json', dest='json_path',
+                       help='Also write the report to this JSON file')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    simulator = ConveyorSimulator(args.broker, args.port, time_scale=args.time_scale,
+                                  metal_rate=args.metal_rate, server_url=args.server_url, seed=args.seed)
+    parcels = make_parcels(args.parcels, simulator.rng)
+    print(f"🏭 Simulating {args.parcels} parcels against {args.broker}:{args.port}")
+    try:
+        report = simulator.run(parcels, args.rate, args.arrivals, args.timeout)
+    except ConnectionError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Loopback ESC/POS printer emulator
+Stands in for the thermal printer so the print path can be exercised and
+benchmarked without hardware. It parses the command stream ReceiptPrinter
+sends (ESC @, ESC a, ESC d, GS v 0 raster images, GS V cut, text and line
+feeds) and renders each job to a PNG for visual verification.
+
+In-process it is a printer sink (see printer_sink.py): pass it to
+ReceiptPrinter(sink=EscPosEmulator(...)). It can throttle writes to a serial
+baud rate (10 bits per byte, 8N1) and raise transient IOErrors on a fraction
+of jobs to exercise the retry path. Standalone it reads jobs from a FIFO, so
+server.py can run with PRINTER_SINK=fifo:<path> on a machine without a printer.
+
+Usage:
+    python escpos_emulator.py --fifo /tmp/printer --out printed
+    python escpos_emulator.py --fifo /tmp/printer --baud 19200 --out printed
+    python escpos_emulator.py job.bin --out job.png
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+import logging
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+logger = logging.getLogger(__name__)
+
+PRINT_WIDTH_DOTS = 384  # 58 mm head at 203 dpi
+LINE_HEIGHT_DOTS = 24  # One line feed of the default font
+FIFO_READ_SIZE = 4096
+
+
+def parse_escpos(data):
+    """Decode an ESC/POS byte stream into a list of (command, ...) tuples.
+
+    Raster images are ('raster', width_bytes, height, mode, bits); unknown
+    escape sequences are kept as ('unknown', bytes) instead of failing the job.
+    """
+    commands = []
+    text = bytearray()
+    i, size = 0, len(data)
+
+    def flush_text():
+        if text:
+            commands.append(('text', text.decode('cp437', errors='replace')))
+            text.clear()
+
+    while i < size:
+        byte = data[i]
+        if byte == 0x1b and i + 1 < size:  # ESC
+            op = data[i + 1]
+            if op == 0x40:
+                flush_text()
+                commands.append(('init',))
+                i += 2
+            elif op in (0x61, 0x64) and i + 2 < size:  # ESC a n (align), ESC d n (feed n lines)
+                flush_text()
+                commands.append(('align', data[i + 2]) if op == 0x61 else ('feed', data[i + 2]))
+                i += 3
+            else:
+                flush_text()
+                commands.append(('unknown', bytes(data[i:i + 2])))
+                i += 2
+        elif byte == 0x1d and i + 1 < size:  # GS
+            op = data[i + 1]
+            if op == 0x76 and i + 7 < size and data[i + 2] == 0x30:  # GS v 0 m xL xH yL yH d1...dk
+                flush_text()
+                mode = data[i + 3]
+                width_bytes = data[i + 4] | (data[i + 5] << 8)
+                height = data[i + 6] | (data[i + 7] << 8)
+                start = i + 8
+                bits = bytes(data[start:start + width_bytes * height])
+                if len(bits) < width_bytes * height:
+                    commands.append(('truncated', 'raster', len(bits), width_bytes * height))
+                    break
+                commands.append(('raster', width_bytes, height, mode, bits))
+                i = start + width_bytes * height
+            elif op == 0x56 and i + 2 < size:  # GS V m [n]
+                flush_text()
+                mode = data[i + 2]
+                if mode in (0x41, 0x42) and i + 3 < size:
+                    commands.append(('cut', mode, data[i + 3]))
+                    i += 4
+                else:
+                    commands.append(('cut', mode, 0))
+                    i += 3
+            else:
+                flush_text()
+                commands.append(('unknown', bytes(data[i:i + 2])))
+                i += 2
+        elif byte == 0x0a:  # LF prints the buffered text and feeds one line
+            flush_text()
+            commands.append(('feed', 1))
+            i += 1
+        else:
+            text.append(byte)
+            i += 1
+    flush_text()
+    return commands
+
+
+def render_commands(commands, width=PRINT_WIDTH_DOTS):
+    """Render parsed commands onto a paper strip; returns an 'L' mode PIL image"""
+    font = ImageFont.load_default()
+    blocks = []  # Row blocks of the strip, top to bottom
+    align = 0
+    for command in commands:
+        name = command[0]
+        if name == 'init':
+            align = 0
+        elif name == 'align':
+            align = command[1] % 48  # ESC a accepts 0-2 or '0'-'2'
+        elif name == 'raster':
+            _, width_bytes, height, mode, bits = command
+            rows = np.unpackbits(np.frombuffer(bits, dtype=np.uint8).reshape(height, width_bytes), axis=1)
+            if mode in (1, 49):  # Double width
+                rows = rows.repeat(2, axis=1)
+            if mode in (2, 3, 50, 51):  # Double height (3 is double both)
+                rows = rows.repeat(2, axis=0)
+                if mode in (3, 51):
+                    rows = rows.repeat(2, axis=1)
+            rows = rows[:, :width]
+            block = np.full((rows.shape[0], width), 255, dtype=np.uint8)
+            offset = {0: 0, 1: (width - rows.shape[1]) // 2, 2: width - rows.shape[1]}.get(align, 0)
+            block[:, offset:offset + rows.shape[1]][rows == 1] = 0
+            blocks.append(block)
+        elif name == 'text':
+            line = Image.new('L', (width, LINE_HEIGHT_DOTS), 255)
+            ImageDraw.Draw(line).text((0, 4), command[1], font=font, fill=0)
+            blocks.append(np.array(line))
+        elif name == 'feed':
+            blocks.append(np.full((LINE_HEIGHT_DOTS * command[1], width), 255, dtype=np.uint8))
+        elif name == 'cut':
+            blocks.append(np.full((2, width), 160, dtype=np.uint8))  # Grey cut mark
+    if not blocks:
+        return Image.new('L', (width, 1), 255)
+    return Image.fromarray(np.vstack(blocks))
+
+
+def render_job(data, path=None, width=PRINT_WIDTH_DOTS):
+    """Parse and render one job's bytes; saves a PNG when a path is given"""
+    image = render_commands(parse_escpos(data), width)
+    if path:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        image.save(path)
+    return image
+
+
+def raster_images(data):
+    """Every GS v 0 raster in a job as a 1-bit PIL image (black = set bit)"""
+    images = []
+    for command in parse_escpos(data):
+        if command[0] == 'raster':
+            _, width_bytes, height, _, bits = command
+            rows = np.unpackbits(np.frombuffer(bits, dtype=np.uint8).reshape(height, width_bytes), axis=1)
+            images.append(Image.fromarray(rows == 0))
+    return images
+
+
+class _EmulatorJob:
+    """File-like object for one job written to the loopback emulator"""
+
+    def __init__(self, emulator):
+        self.emulator = emulator
+        self.opened = time.perf_counter()
+        self.first_byte = None
+        self.buffer = bytearray()
+        self.closed = False
+
+    def write(self, data):
+        emulator = self.emulator
+        if self.first_byte is None:
+            self.first_byte = time.perf_counter()
+            if emulator._should_fail():
+                emulator.errors += 1
+                raise IOError("Simulated transient printer I/O error")
+        if emulator.baud:
+            time.sleep(len(data) * 10 / emulator.baud)  # Start + 8 data + stop bits per byte
+        self.buffer += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            if self.first_byte is not None and self.buffer:
+                self.emulator._finish(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.closed = True  # A failed job never reaches the paper
+        return False
+
+
+class EscPosEmulator:
+    """Loopback thermal printer: a printer sink that records, times and renders jobs"""
+
+    kind = 'emulator'
+
+    def __init__(self, baud=None, error_rate=0.0, seed=None, output_dir=None, width=PRINT_WIDTH_DOTS, max_jobs=1000):
+        self.path = 'emulator'
+        self.baud = baud
+        self.error_rate = error_rate
+        self.output_dir = output_dir
+        self.width = width
+        self.max_jobs = max_jobs
+        self.online = True
+        self.jobs = []
+        self.jobs_printed = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._fifo_thread = None
+        self._stop = threading.Event()
+
+    # Printer sink interface
+    def available(self):
+        return self.online
+
+    def open(self):
+        if not self.online:
+            raise IOError("Emulated printer is offline")
+        return _EmulatorJob(self)
+
+    def _should_fail(self):
+        with self._lock:
+            return self.error_rate > 0 and self._rng.random() < self.error_rate
+
+    def _finish(self, job):
+        self._record(bytes(job.buffer), job.opened, job.first_byte, time.perf_counter())
+
+    def _record(self, data, opened, first_byte, finished):
+        with self._lock:
+            self.jobs_printed += 1
+            number = self.jobs_printed
+            self.jobs.append({'number': number, 'opened': opened, 'first_byte': first_byte,
+                              'finished': finished, 'bytes': len(data), 'data': data})
+            del self.jobs[:-self.max_jobs]
+        if self.output_dir:
+            path = os.path.join(self.output_dir, f'job_{number:05d}.png')
+            render_job(data, path, self.width)
+            logger.info(f"🧾 Emulated print job {number}: {len(data)} bytes → {path}")
+
+    def last_job(self):
+        with self._lock:
+            return self.jobs[-1] if self.jobs else None
+
+    # FIFO mode: read jobs written by FifoPrinterSink (each writer close ends a job)
+    def serve_fifo(self, path):
+        if not os.path.exists(path):
+            os.mkfifo(path)
+        self._stop.clear()
+        self._fifo_thread = threading.Thread(target=self._fifo_loop, args=(path,), name='escpos-fifo', daemon=True)
+        self._fifo_thread.start()
+        return self._fifo_thread
+
+    def _fifo_loop(self, path):
+        while not self._stop.is_set():
+            with open(path, 'rb', buffering=0) as fifo:  # Blocks until a writer opens the pipe
+                opened = time.perf_counter()
+                first_byte = None
+                data = bytearray()
+                while True:
+                    chunk = fifo.read(FIFO_READ_SIZE)
+                    if not chunk:
+                        break
+                    if first_byte is None:
+                        first_byte = time.perf_counter()
+                    if self.baud:
+                        time.sleep(len(chunk) * 10 / self.baud)
+                    data += chunk
+            if data and not self._stop.is_set():
+                self._record(bytes(data), opened, first_byte, time.perf_counter())
+
+    def stop_fifo(self, path):
+        if self._fifo_thread is None:
+            return
+        self._stop.set()
+        try:
+            # Unblock the reader's open() with an empty writer
+            fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+            os.close(fd)
+        except OSError:
+            pass
+        self._fifo_thread.join(timeout=2)
+        self._fifo_thread = None
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(
+        description="Emulate an ESC/POS thermal printer and render its output to PNG",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__
+    )
+    parser.add_argument('job', nargs='?', help='Render a captured ESC/POS job file instead of serving a FIFO')
+    parser.add_argument('--fifo', help='Named pipe to read print jobs from (created if missing)')
+    parser.add_argument('--out', default='printed', help='Output directory (FIFO mode) or PNG path (job mode)')
+    parser.add_argument('--baud', type=int, help='Simulated serial baud rate (default: unlimited)')
+    args = parser.parse_args()
+
+    if args.job:
+        if not os.path.exists(args.job):
+            print(f"❌ Job file not found: {args.job}")
+            sys.exit(1)
+        with open(args.job, 'rb') as f:
+            data = f.read()
+        out = args.out if args.out.endswith('.png') else os.path.join(args.out, 'job.png')
+        image = render_job(data, out)
+        print(f"✅ Rendered {len(data)} bytes ({image.width}x{image.height}) to {out}")
+        return
+    if not args.fifo:
+        parser.error('either a job file or --fifo is required')
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    emulator = EscPosEmulator(baud=args.baud, output_dir=args.out)
+    emulator.serve_fifo(args.fifo)
+    print(f"🖨️ Emulated printer listening on {args.fifo} "
+          f"({f'{args.baud} baud' if args.baud else 'unlimited speed'}), rendering to {args.out}/")
+    print(f"   Start server.py with PRINTER_SINK=fifo:{args.fifo}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        emulator.stop_fifo(args.fifo)
+        print(f"\n✅ {emulator.jobs_printed} jobs printed")
+
+
+if __name__ == "__main__":
+    main()
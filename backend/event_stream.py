@@ -0,0 +1,100 @@
+"""
+Server-Sent Events stream for dashboard and scanner state
+Writers publish typed events (qr_scan, package_info, sensor_data,
+workflow_progress, camera_status) as state changes; each connected EventSource
+receives them as they happen instead of polling every endpoint on a timer.
+Recent events are kept in a ring buffer so a reconnecting client that sends
+Last-Event-ID gets exactly the events it missed.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from flask import request, Response, stream_with_context
+
+
+class EventStream:
+    """Thread-safe publish/subscribe buffer served as text/event-stream"""
+
+    def __init__(self, history_size=500, keepalive_interval=15, retry_ms=3000):
+        self._condition = threading.Condition()
+        self._events = deque(maxlen=history_size)  # (sequence, event_type, payload)
+        self._sequence = 0
+        # Event ids are "<epoch>-<sequence>" so ids from before a restart are recognised as stale
+        self.epoch = format(int(time.time()), 'x')
+        self.keepalive_interval = keepalive_interval
+        self.retry_ms = retry_ms
+
+    def publish(self, event_type, data):
+        """Append an event and wake every connected client; returns the event id"""
+        payload = json.dumps(data, default=str)
+        with self._condition:
+            self._sequence += 1
+            self._events.append((self._sequence, event_type, payload))
+            self._condition.notify_all()
+            return f"{self.epoch}-{self._sequence}"
+
+    def _parse_last_event_id(self, last_event_id):
+        """Sequence to resume after, or None if the id cannot be replayed from this buffer"""
+        if not last_event_id:
+            return None
+        epoch, _, sequence = last_event_id.partition('-')
+        if epoch != self.epoch or not sequence.isdigit():
+            return None
+        return int(sequence)
+
+    def _format(self, sequence, event_type, payload):
+        return f"id: {self.epoch}-{sequence}\nevent: {event_type}\ndata: {payload}\n\n"
+
+    def stream(self, last_event_id=None, event_types=None):
+        """Generator of SSE frames, resuming after last_event_id when possible"""
+        resume_after = self._parse_last_event_id(last_event_id)
+        with self._condition:
+            oldest = self._events[0][0] if self._events else self._sequence + 1
+            if resume_after is None or resume_after > self._sequence:
+                cursor = self._sequence
+                needs_resync = last_event_id is not None
+            else:
+                cursor = resume_after
+                # Events between the client's id and our oldest buffered event were dropped
+                needs_resync = resume_after + 1 < oldest
+
+        yield f"retry: {self.retry_ms}\n\n"
+        if needs_resync:
+            # The client missed events we no longer hold: tell it to refetch full state
+            yield self._format(cursor, 'resync', json.dumps({'reason': 'history_unavailable'}))
+
+        while True:
+            with self._condition:
+                if self._sequence == cursor:
+                    self._condition.wait(self.keepalive_interval)
+                pending = [event for event in self._events if event[0] > cursor]
+                cursor = self._sequence
+
+            if not pending:
+                yield ": keepalive\n\n"
+                continue
+            for sequence, event_type, payload in pending:
+                if event_types and event_type not in event_types:
+                    continue
+                yield self._format(sequence, event_type, payload)
+
+    def response(self):
+        """Flask response for a GET stream endpoint.
+
+        Resumes from the Last-Event-ID header (sent by EventSource on reconnect)
+        or the last_event_id query parameter, and optionally filters with
+        ?types=qr_scan,sensor_data.
+        """
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        types = request.args.get('types')
+        event_types = {t.strip() for t in types.split(',') if t.strip()} if types else None
+        return Response(
+            stream_with_context(self.stream(last_event_id, event_types)),
+            mimetype='text/event-stream',
+            headers={
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no'  # Keep reverse proxies from buffering the stream
+            }
+        )
@@ -0,0 +1,112 @@
+"""
+Streaming table export
+Rows are read in keyset-paginated chunks (id > last id), each chunk in its own
+short query, and encoded to CSV or NDJSON as they are read. Memory use stays
+constant regardless of table size, and no read transaction is held open for
+the length of the download, so writers are never blocked behind an export.
+The id range is fixed when the export starts, giving a stable end point.
+"""
+
+import csv
+import io
+import json
+import sqlite3
+import zlib
+from datetime import date, datetime, timedelta
+
+EXPORT_CHUNK_SIZE = 1000
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Exportable table -> timestamp expression used by since=/until= filters
+EXPORT_TABLES = {
+    'qr_scans': 'COALESCE(timestamp, created_at)',
+    'scanned_codes': 'scanned_at',
+    'package_information': 'COALESCE(timestamp, created_at)',
+}
+
+
+def date_range_clause(date_expression, since=None, until=None):
+    """WHERE fragments for an inclusive since/until range on ISO or SQLite timestamps.
+
+    A date-only until (YYYY-MM-DD) covers that whole day.
+    """
+    for value in (since, until):
+        if value:
+            datetime.fromisoformat(value)  # Raises ValueError for malformed dates
+    normalized = f"REPLACE({date_expression}, 'T', ' ')"
+    clauses, params = [], []
+    if since:
+        clauses.append(f"{normalized} >= ?")
+        params.append(since.replace('T', ' '))
+    if until:
+        if len(until) == 10:
+            clauses.append(f"{normalized} < ?")
+            params.append((date.fromisoformat(until) + timedelta(days=1)).isoformat())
+        else:
+            clauses.append(f"{normalized} <= ?")
+            params.append(until.replace('T', ' '))
+    return clauses, params
+
+
+def _encode_chunks(columns, rows_iter, fmt):
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        yield buffer.getvalue().encode('utf-8')
+        for rows in rows_iter:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(rows)
+            yield buffer.getvalue().encode('utf-8')
+    else:
+        for rows in rows_iter:
+            yield ''.join(json.dumps(dict(zip(columns, row)), default=str) + '\n' for row in rows).encode('utf-8')
+
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def stream_export(table, fmt='csv', since=None, until=None, compress=False, db_path='database.db'):
+    """Generator of encoded export bytes for one table"""
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Unknown export table: {table}")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    # Validate the date range before the response starts streaming
+    clauses, params = date_range_clause(EXPORT_TABLES[table], since, until)
+
+    def rows_iter(conn, max_id):
+        last_id = 0
+        where = ' AND '.join(['id > ?', 'id <= ?'] + clauses)
+        while True:
+            rows = conn.execute(
+                f"SELECT * FROM {table} WHERE {where} ORDER BY id LIMIT ?",
+                (last_id, max_id, *params, EXPORT_CHUNK_SIZE)
+            ).fetchall()
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1][0]
+
+    def generate():
+        conn = sqlite3.connect(db_path)
+        try:
+            cursor = conn.execute(f"SELECT * FROM {table} LIMIT 0")
+            columns = [description[0] for description in cursor.description]
+            max_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+            chunks = _encode_chunks(columns, rows_iter(conn, max_id), fmt)
+            yield from (_gzip_chunks(chunks) if compress else chunks)
+        finally:
+            conn.close()
+
+    return generate()
@@ -0,0 +1,142 @@
+"""
+Stability-detecting loadcell stream processor
+Raw readings from esp32/loadcell/data go into a fixed-size NumPy ring buffer.
+Once the moving window is full, its median and variance decide whether the
+platform has settled; the first settled window with a package on the platform
+produces exactly one "stable weight" event. The platform must be emptied (or
+the processor reset) before the next package can trigger another event.
+"""
+
+import threading
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Settle detection configuration (weights in kg)
+LOADCELL_STABILITY = {
+    'window_size': 8,         # Readings in the moving window
+    'tolerance': 0.005,       # Max standard deviation across the window to count as settled (kg)
+    'min_weight': 0.1,        # Readings at or below this mean the platform is empty (kg)
+}
+
+# Settings of the old spam filter (/api/spam-filter) -> their settle detection counterpart
+LEGACY_SPAM_FILTER_SETTINGS = {
+    'min_weight_threshold': 'min_weight',    # Weights below this were ignored
+    'weight_change_threshold': 'tolerance',  # Smaller changes counted as the same weight
+    'enabled': None,                         # Settle detection cannot be switched off
+}
+
+
+def translate_legacy_settings(settings):
+    """Map old spam filter keys onto LOADCELL_STABILITY keys; returns (settings, ignored keys)"""
+    translated, ignored = {}, []
+    for key, value in settings.items():
+        if key not in LEGACY_SPAM_FILTER_SETTINGS:
+            translated[key] = value
+        elif LEGACY_SPAM_FILTER_SETTINGS[key] is None:
+            ignored.append(key)
+        else:
+            translated.setdefault(LEGACY_SPAM_FILTER_SETTINGS[key], value)
+    return translated, ignored
+
+
+class LoadcellStream:
+    """Moving median/variance over recent readings with one-shot settle detection"""
+
+    def __init__(self, config=None, on_stable=None):
+        self.config = config if config is not None else LOADCELL_STABILITY
+        self.on_stable = on_stable
+        self._lock = threading.Lock()
+        self._allocate(self.config['window_size'])
+
+    def _allocate(self, window_size):
+        self._buffer = np.zeros(window_size, dtype=np.float64)
+        self._index = 0
+        self._count = 0
+        self.armed = True
+        self.median = None
+        self.variance = None
+        self.last_value = None
+        self.last_stable_weight = None
+
+    def reset(self):
+        """Clear the window and re-arm for the next package"""
+        with self._lock:
+            self._allocate(self.config['window_size'])
+
+    def configure(self, **settings):
+        """Update window_size, tolerance or min_weight; resizing the window resets it"""
+        updated = dict(self.config)
+        for key, value in settings.items():
+            if key not in updated:
+                raise ValueError(f"Unknown loadcell setting: {key}")
+            updated[key] = int(value) if key == 'window_size' else float(value)
+        if updated['window_size'] < 2:
+            raise ValueError("window_size must be at least 2")
+
+        with self._lock:
+            self.config.update(updated)
+            if self.config['window_size'] != len(self._buffer):
+                self._allocate(self.config['window_size'])
+
+    def add_reading(self, value):
+        """Feed one raw reading; returns the stable weight if this reading settled the window"""
+        with self._lock:
+            value = float(value)
+            self.last_value = value
+            self._buffer[self._index] = value
+            self._index = (self._index + 1) % len(self._buffer)
+            self._count = min(self._count + 1, len(self._buffer))
+
+            if self._count < len(self._buffer):
+                return None
+
+            self.median = float(np.median(self._buffer))
+            self.variance = float(np.var(self._buffer))
+
+            if self.median <= self.config['min_weight']:
+                # Empty platform: arm for the next package
+                self.armed = True
+                return None
+
+            if not self.armed or self.variance > self.config['tolerance'] ** 2:
+                return None
+
+            self.armed = False
+            self.last_stable_weight = round(self.median, 4)
+            stable_weight = self.last_stable_weight
+
+        if self.on_stable:
+            self.on_stable(stable_weight)
+        return stable_weight
+
+    def accept_external_weight(self, weight):
+        """Accept a final weight decided by the ESP32 firmware if no stable event fired yet"""
+        with self._lock:
+            if not self.armed:
+                return None
+            self.armed = False
+            self.last_stable_weight = weight
+
+        if self.on_stable:
+            self.on_stable(weight)
+        return weight
+
+    def is_empty_reading(self, value):
+        """True for readings at or below the empty-platform threshold"""
+        return value is not None and value <= self.config['min_weight']
+
+    def get_status(self):
+        """Current window statistics for diagnostics"""
+        with self._lock:
+            return {
+                'config': dict(self.config),
+                'readings_in_window': self._count,
+                'median': self.median,
+                'variance': self.variance,
+                'std_dev': float(np.sqrt(self.variance)) if self.variance is not None else None,
+                'armed': self.armed,
+                'last_value': self.last_value,
+                'last_stable_weight': self.last_stable_weight
+            }
@@ -0,0 +1,284 @@
+"""
+Non-blocking logging pipeline for server.py and app.py
+Loggers hand records to a QueueHandler, so a log call on a hot path (every
+MQTT message, frame error or validation) costs a couple of dict lookups and a
+queue put. A QueueListener thread does the formatting and I/O: JSON lines to a
+log file that rotates on size or age, and human-readable lines to the console.
+
+Before a record is queued it passes two filters, in the calling thread:
+
+- sampling: for components listed in LOG_SAMPLING (logger name = keep 1 in N,
+  e.g. "camera=10,loadcell=20") only every Nth DEBUG/INFO record of each call
+  site is kept; warnings and errors are never sampled.
+- rate limiting: each call site may log LOG_RATE_LIMIT records per second
+  (bursts up to LOG_RATE_BURST). Excess records are dropped and counted, and
+  the next record that gets through says how many similar ones were suppressed.
+
+If the queue is full the record is dropped rather than blocking the caller.
+Counts of sampled, rate-limited and dropped records are exported as
+log_records_total on /metrics.
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from metrics import metrics
+
+LOGGING_CONFIG = {
+    'level': os.getenv('LOG_LEVEL', 'INFO').upper(),
+    'file_format': os.getenv('LOG_FORMAT', 'json'),  # 'json' or 'text'
+    'console': os.getenv('LOG_CONSOLE', 'true').lower() in ('1', 'true', 'yes'),
+    'max_bytes': int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024))),
+    'rotate_hours': float(os.getenv('LOG_ROTATE_HOURS', '24')),  # 0 disables time-based rotation
+    'backup_count': int(os.getenv('LOG_BACKUP_COUNT', '5')),
+    'queue_size': int(os.getenv('LOG_QUEUE_SIZE', '10000')),
+    'sampling': os.getenv('LOG_SAMPLING', ''),
+    'rate_limit': float(os.getenv('LOG_RATE_LIMIT', '20')),  # Records per second per call site, 0 = off
+    'rate_burst': int(os.getenv('LOG_RATE_BURST', '50')),
+}
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Library noise dropped by the console and file handlers (previously server.py's StderrFilter)
+SUPPRESSED_MESSAGES = ('_zbar_decode_databar: Assertion', 'decoder/databar.c')
+
+# Attributes every LogRecord has; anything else came from extra= and goes into the JSON
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+LOG_RECORDS = metrics.counter('log_records', 'Log records by what happened to them', ('result',))
+
+
+def parse_sampling(spec):
+    """'camera=10,loadcell=20' -> {'camera': 10, 'loadcell': 20}"""
+    rules = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, every = item.partition('=')
+        rules[name.strip()] = max(1, int(every))
+    return rules
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def __init__(self, service=None):
+        super().__init__()
+        self.service = service
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName,
+            'src': f"{record.module}:{record.lineno}",
+        }
+        if self.service:
+            entry['service'] = self.service
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry['stack_info'] = record.stack_info
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SizeAndTimeRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler that also rolls over once the file is `rotate_hours` old"""
+
+    def __init__(self, filename, max_bytes=0, backup_count=0, rotate_hours=0, encoding='utf-8'):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding=encoding)
+        self.rotate_seconds = rotate_hours * 3600
+        self._next_rollover = self._compute_next_rollover()
+
+    def _compute_next_rollover(self):
+        if not self.rotate_seconds:
+            return None
+        try:
+            opened = os.path.getmtime(self.baseFilename) if os.path.getsize(self.baseFilename) else time.time()
+        except OSError:
+            opened = time.time()
+        return opened + self.rotate_seconds
+
+    def shouldRollover(self, record):
+        if self._next_rollover is not None and time.time() >= self._next_rollover:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        if self.rotate_seconds:
+            self._next_rollover = time.time() + self.rotate_seconds
+
+
+class SamplingFilter(logging.Filter):
+    """Keep 1 in N DEBUG/INFO records per call site for the configured loggers"""
+
+    def __init__(self, rules):
+        super().__init__()
+        self.rules = rules
+        self._seen = {}
+
+    def _every(self, name):
+        while name:
+            every = self.rules.get(name)
+            if every is not None:
+                return every
+            name = name.rpartition('.')[0]  # camera.decoder falls back to camera
+        return None
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not self.rules:
+            return True
+        every = self._every(record.name)
+        if every is None or every == 1:
+            return True
+        site = (record.pathname, record.lineno)
+        count = self._seen.get(site, 0)
+        self._seen[site] = count + 1
+        if count % every:
+            LOG_RECORDS.labels('sampled').inc()
+            return False
+        record.sampled = every
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket per call site; reports how many records were suppressed"""
+
+    def __init__(self, rate, burst):
+        super().__init__()
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._buckets = {}  # call site -> [tokens, last refill, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if not self.rate:
+            return True
+        site = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(site)
+            if bucket is None:
+                bucket = self._buckets[site] = [float(self.burst), now, 0]
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                LOG_RECORDS.labels('rate_limited').inc()
+                return False
+            bucket[0] -= 1
+            suppressed, bucket[2] = bucket[2], 0
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class MessageFilter(logging.Filter):
+    """Drops records containing any of the given substrings (runs on the listener thread)"""
+
+    def __init__(self, substrings):
+        super().__init__()
+        self.substrings = substrings
+
+    def filter(self, record):
+        message = record.getMessage()
+        return not any(substring in message for substring in self.substrings)
+
+
+class SuppressedNoteFormatter(logging.Formatter):
+    """Text formatter that appends the rate limiter's suppressed count"""
+
+    def format(self, record):
+        text = super().format(record)
+        suppressed = getattr(record, 'suppressed', None)
+        return f"{text} (+{suppressed} similar suppressed)" if suppressed else text
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that never formats or blocks in the caller"""
+
+    def prepare(self, record):
+        # Formatting happens on the listener thread; only pin down %-args that might change meanwhile
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+            LOG_RECORDS.labels('queued').inc()
+        except queue.Full:
+            LOG_RECORDS.labels('dropped').inc()
+
+
+class LogPipeline:
+    """The queue, the root QueueHandler and the listener writing file and console output"""
+
+    def __init__(self, log_file, service=None, config=None):
+        self.config = config if config is not None else LOGGING_CONFIG
+        self.log_file = log_file
+        self.queue = queue.Queue(self.config['queue_size'])
+
+        handlers = []
+        noise = MessageFilter(SUPPRESSED_MESSAGES)
+        if log_file:
+            file_handler = SizeAndTimeRotatingFileHandler(log_file, self.config['max_bytes'],
+                                                          self.config['backup_count'], self.config['rotate_hours'])
+            file_handler.setFormatter(JsonFormatter(service) if self.config['file_format'] == 'json'
+                                      else SuppressedNoteFormatter(TEXT_FORMAT))
+            file_handler.addFilter(noise)
+            handlers.append(file_handler)
+        if self.config['console']:
+            console = logging.StreamHandler(sys.stderr)
+            console.setFormatter(SuppressedNoteFormatter(TEXT_FORMAT))
+            console.addFilter(noise)
+            handlers.append(console)
+        self.handlers = handlers
+
+        self.queue_handler = NonBlockingQueueHandler(self.queue)
+        self.queue_handler.addFilter(SamplingFilter(parse_sampling(self.config['sampling'])))
+        self.queue_handler.addFilter(RateLimitFilter(self.config['rate_limit'], self.config['rate_burst']))
+        self.listener = QueueListener(self.queue, *handlers, respect_handler_level=True)
+
+    def start(self):
+        root = logging.getLogger()
+        for handler in list(root.handlers):  # e.g. basicConfig() from an earlier import
+            root.removeHandler(handler)
+            handler.close()
+        root.addHandler(self.queue_handler)
+        root.setLevel(self.config['level'])
+        logging.captureWarnings(True)
+        self.listener.start()
+        atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        """Flush what is queued and detach (idempotent)"""
+        if self.listener._thread is not None:
+            self.listener.stop()
+        logging.getLogger().removeHandler(self.queue_handler)
+        for handler in self.handlers:
+            handler.close()
+
+    def queue_depth(self):
+        return self.queue.qsize()
+
+
+def setup_logging(log_file, service=None, config=None):
+    """Route all logging through a LogPipeline writing to `log_file`; returns the started pipeline"""
+    pipeline = LogPipeline(log_file, service, config).start()
+    metrics.gauge('log_queue_depth', 'Log records waiting for the writer thread').set_function(pipeline.queue_depth)
+    return pipeline
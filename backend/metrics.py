@@ -0,0 +1,420 @@
+"""
+In-process metrics registry with Prometheus text exposition
+Counters, gauges and histograms shared by app.py and server.py and served as
+GET /metrics in the Prometheus text format (version 0.0.4), so throughput and
+saturation can be scraped instead of read out of log lines.
+
+Hot paths only pay for a dict lookup and a locked add: labelled children are
+created once and cached, histograms keep per-bucket counts and are only made
+cumulative when scraped. Gauges that are cheap to read on demand (queue
+depths, connection state) use set_function() and cost nothing between scrapes.
+
+Helpers wire the registry into the places both services share:
+instrument_flask() times every request by route, timed_connect() is a drop-in
+for sqlite3.connect that times each statement, and InstrumentedSession is a
+requests.Session that times outgoing HTTP calls by target path.
+"""
+
+import os
+import re
+import time
+import bisect
+import sqlite3
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from flask import request, g, Response
+
+METRICS_CONFIG = {
+    'enabled': os.getenv('METRICS_ENABLED', 'true').lower() != 'false',  # false removes the /metrics route
+}
+
+# Seconds; covers sub-millisecond SQLite statements up to slow backend calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+EXPOSITION_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+    suffix = ''  # Counters are declared and exposed as <name>_total
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._new_child()
+            self._children[()] = self._default
+
+    def labels(self, *values):
+        """Child for one combination of label values (created on first use)"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(tuple(str(v) for v in values), self._new_child())
+                self._children[values] = child
+        return child
+
+    def _samples(self):
+        """[(suffix, label values, extra label, value)] for exposition"""
+        seen = set()
+        samples = []
+        for values, child in list(self._children.items()):
+            if id(child) in seen:
+                continue  # Same child cached under raw and stringified label values
+            seen.add(id(child))
+            samples.extend(child._samples(tuple(str(v) for v in values)))
+        return samples
+
+    def render(self):
+        declared = self.name + self.suffix
+        lines = [f'# HELP {declared} {self.documentation}', f'# TYPE {declared} {self.kind}']
+        for suffix, values, extra, value in self._samples():
+            lines.append(f'{self.name}{suffix}{_format_labels(self.labelnames, values, extra)} {_format_value(value)}')
+        return '\n'.join(lines)
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def _samples(self, values):
+        return [('_total', values, None, self.value)]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count; exposed as <name>_total"""
+
+    kind = 'counter'
+    suffix = '_total'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    @property
+    def value(self):
+        return self._default.value
+
+
+class _GaugeChild:
+    __slots__ = ('value', 'function', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self.function = None
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set_function(self, function):
+        """Read the value from function() at scrape time instead"""
+        self.function = function
+
+    def _samples(self, values):
+        value = self.value
+        if self.function is not None:
+            try:
+                value = self.function()
+            except Exception:
+                return []  # A failing reader hides the sample instead of breaking the scrape
+        return [('', values, None, float(value))]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._default.set(value)
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def dec(self, amount=1):
+        self._default.dec(amount)
+
+    def set_function(self, function):
+        self._default.set_function(function)
+
+    @property
+    def value(self):
+        return self._default.value
+
+
+class _HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum', '_lock')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self):
+        return _Timer(self)
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def _samples(self, values):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        samples, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            samples.append(('_bucket', values, f'le="{_format_value(float(bound))}"', cumulative))
+        samples.append(('_sum', values, None, total))
+        samples.append(('_count', values, None, cumulative))
+        return samples
+
+
+class _Timer:
+    __slots__ = ('child', 'started')
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.child.observe(time.perf_counter() - self.started)
+        return False
+
+
+class Histogram(_Metric):
+    """Distribution of observations (seconds by convention) in fixed buckets"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    @property
+    def count(self):
+        return self._default.count
+
+
+class MetricsRegistry:
+    """Named metrics of one process; registering an existing name returns the same metric"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} already registered as a different {metric.kind}")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+# Process-wide registry shared by every module
+metrics = MetricsRegistry()
+
+PROCESS_START_TIME = metrics.gauge('process_start_time_seconds', 'Start time of the process since the epoch')
+PROCESS_START_TIME.set(time.time())
+
+
+def instrument_flask(app, registry=metrics, path='/metrics'):
+    """Time every request by route, report it in Server-Timing and add the /metrics endpoint"""
+    requests_total = registry.counter('http_requests', 'HTTP requests handled',
+                                      ('method', 'route', 'status'))
+    duration = registry.histogram('http_request_duration_seconds', 'Time to build the HTTP response',
+                                  ('method', 'route'))
+    in_flight = registry.gauge('http_requests_in_flight', 'HTTP requests currently being handled')
+
+    @app.before_request
+    def _start_request_timer():
+        g.metrics_started = time.perf_counter()
+        in_flight.inc()
+
+    @app.after_request
+    def _observe_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            in_flight.dec()
+            # The route template keeps label cardinality bounded (/api/orders/<id>, not every id)
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            elapsed = time.perf_counter() - started
+            duration.labels(request.method, route).observe(elapsed)
+            requests_total.labels(request.method, route, response.status_code).inc()
+            # Lets callers (tracing.TracedSession) split handler time from network time
+            response.headers['Server-Timing'] = f'app;dur={elapsed * 1000:.1f}'
+        return response
+
+    @app.teardown_request
+    def _abandon_request(exc):
+        # after_request is skipped when a view raises; keep the in-flight gauge balanced
+        if g.pop('metrics_started', None) is not None:
+            in_flight.dec()
+
+    if METRICS_CONFIG['enabled']:
+        def metrics_endpoint():
+            """Prometheus scrape endpoint"""
+            return Response(registry.render(), mimetype=None, content_type=EXPOSITION_CONTENT_TYPE)
+        app.add_url_rule(path, 'metrics', metrics_endpoint)
+
+
+# SQLite statement timing
+SQLITE_QUERY_SECONDS = metrics.histogram('sqlite_query_seconds', 'Time to execute a SQLite statement',
+                                         ('operation',))
+SQLITE_OPERATIONS = {'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'CREATE', 'DROP', 'ALTER', 'PRAGMA',
+                     'BEGIN', 'COMMIT', 'ROLLBACK', 'WITH', 'REPLACE', 'ANALYZE', 'VACUUM'}
+_sqlite_timers = {operation: SQLITE_QUERY_SECONDS.labels(operation) for operation in SQLITE_OPERATIONS | {'OTHER'}}
+
+
+def _sqlite_timer(sql):
+    head = sql.lstrip()[:10].split(None, 1)
+    return _sqlite_timers.get(head[0].upper() if head else 'OTHER', _sqlite_timers['OTHER'])
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that records execute()/executemany() time by statement type"""
+
+    def execute(self, sql, parameters=()):
+        timer = _sqlite_timer(sql)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            timer.observe(time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        timer = _sqlite_timer(sql)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            timer.observe(time.perf_counter() - started)
+
+
+class TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+
+def timed_connect(database, **kwargs):
+    """sqlite3.connect whose cursors (and conn.execute) are timed in sqlite_query_seconds"""
+    kwargs.setdefault('factory', TimedConnection)
+    return sqlite3.connect(database, **kwargs)
+
+
+# Outgoing HTTP calls
+HTTP_CLIENT_REQUESTS = metrics.counter('http_client_requests', 'Outgoing HTTP requests',
+                                       ('method', 'target', 'status'))
+HTTP_CLIENT_SECONDS = metrics.histogram('http_client_request_duration_seconds', 'Outgoing HTTP request time',
+                                        ('method', 'target'))
+_ID_SEGMENT = re.compile(r'^[^/]*\d[^/]*$')
+
+
+def url_target(url):
+    """Path of a URL with id-like segments (anything containing a digit) collapsed to :id"""
+    path = urlsplit(url).path or '/'
+    return '/'.join(':id' if _ID_SEGMENT.match(segment) else segment for segment in path.split('/'))
+
+
+class InstrumentedSession(requests.Session):
+    """requests.Session that records every call's duration and outcome (status code or exception name)"""
+
+    def request(self, method, url, *args, **kwargs):
+        method = method.upper()
+        target = url_target(url)
+        started = time.perf_counter()
+        status = 'error'
+        try:
+            response = super().request(method, url, *args, **kwargs)
+            status = response.status_code
+            return response
+        except requests.RequestException as e:
+            status = type(e).__name__
+            raise
+        finally:
+            HTTP_CLIENT_SECONDS.labels(method, target).observe(time.perf_counter() - started)
+            HTTP_CLIENT_REQUESTS.labels(method, target, status).inc()
@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+Versioned schema migrations for database.db
+Each migration has a version number and runs exactly once, inside its own
+BEGIN IMMEDIATE ... COMMIT transaction together with the schema_version row
+that records it; if it fails, nothing it did is kept and the version stays
+where it was. Once a database is current, app.py's startup costs one query
+(SELECT MAX(version) FROM schema_version).
+
+Migrations that rewrite or backfill a large table work through it in batches
+of MIGRATION_BATCH_SIZE rows (keyset on id) and log their progress.
+
+Databases created before schema_version existed start at version 0, so every
+migration up to BASELINE_VERSION also accepts the state the old startup
+checks may have left behind (tables or columns that already exist).
+
+To add a schema change, append a function decorated with
+@migration(<next version>, '<description>'); never edit one that has shipped.
+
+Usage:
+    python migrations.py                 # Apply pending migrations to database.db
+    python migrations.py --status        # Show applied and pending migrations
+    python migrations.py --db other.db --target 3 --batch-size 500
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import logging
+import argparse
+from datetime import datetime
+
+from analytics import init_analytics_tables, ANALYTICS_GRANULARITIES
+from metrics import timed_connect
+from order_numbers import sync_order_number_sequence, allocate_order_numbers
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_CONFIG = {
+    'batch_size': int(os.getenv('MIGRATION_BATCH_SIZE', '5000')),  # Rows per batch in table rewrites
+    'lock_timeout': float(os.getenv('MIGRATION_LOCK_TIMEOUT', '30')),  # Seconds to wait for another writer
+}
+
+# (version, name, function) in version order, filled in by @migration below
+MIGRATIONS = []
+
+# Migrations up to this version tolerate databases set up by the pre-versioning startup code
+BASELINE_VERSION = 7
+
+ORDER_COLUMNS = ('id', 'order_number', 'customer_name', 'contact_number', 'address',
+                 'product_id', 'product_name', 'amount', 'date')
+
+
+class MigrationError(Exception):
+    """A migration failed and was rolled back"""
+
+
+class Progress:
+    """Batch size and progress reporting handed to each migration"""
+
+    def __init__(self, version, name, batch_size, callback=None):
+        self.version = version
+        self.name = name
+        self.batch_size = batch_size
+        self.callback = callback
+
+    def report(self, done, total):
+        percent = done * 100 / total if total else 100
+        logger.info(f"⏳ Migration {self.version} ({self.name}): {done:,}/{total:,} rows ({percent:.0f}%)")
+        if self.callback:
+            self.callback(self.version, done, total)
+
+
+def migration(version, name):
+    """Register a migration function f(cursor, progress) under a version number"""
+    def register(function):
+        if MIGRATIONS and version <= MIGRATIONS[-1][0]:
+            raise ValueError(f"Migration {version} ({name}) is out of order")
+        MIGRATIONS.append((version, name, function))
+        return function
+    return register
+
+
+def table_columns(c, table):
+    c.execute(f"PRAGMA table_info({table})")
+    return [column[1] for column in c.fetchall()]
+
+
+def copy_in_batches(c, source, target, columns, progress):
+    """INSERT INTO target SELECT columns FROM source, batch_size rows at a time in id order"""
+    c.execute(f"SELECT COUNT(*) FROM {source}")
+    total = c.fetchone()[0]
+    column_list = ', '.join(columns)
+    copied, last_id = 0, 0
+    while True:
+        c.execute(f'''
+            INSERT INTO {target} ({column_list})
+            SELECT {column_list} FROM {source} WHERE id > ? ORDER BY id LIMIT ?
+        ''', (last_id, progress.batch_size))
+        if c.rowcount <= 0:
+            break
+        copied += c.rowcount
+        c.execute(f"SELECT MAX(id) FROM {target}")
+        last_id = c.fetchone()[0]
+        progress.report(copied, total)
+    return copied
+
+
+# --- Migrations -------------------------------------------------------------
+
+@migration(1, 'create core tables')
+def create_core_tables(c, progress):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_number TEXT NOT NULL,
+            customer_name TEXT NOT NULL,
+            contact_number TEXT NOT NULL,
+            address TEXT NOT NULL,
+            product_id TEXT NOT NULL,
+            product_name TEXT NOT NULL,
+            amount REAL NOT NULL,
+            date TEXT NOT NULL
+        )
+    ''')
+
+    # QR scan history
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS qr_scans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            qr_data TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            device TEXT NOT NULL,
+            is_valid BOOLEAN NOT NULL,
+            order_id INTEGER,
+            validation_message TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Physical package data, one row per completed parcel
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS package_information (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER,
+            order_number TEXT,
+            weight REAL,
+            width REAL,
+            height REAL,
+            length REAL,
+            timestamp TEXT NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            package_size TEXT,
+            loadcell_timestamp TEXT,
+            box_dimensions_timestamp TEXT,
+            FOREIGN KEY (order_id) REFERENCES orders (id)
+        )
+    ''')
+
+    # Verified scanned QR codes
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS scanned_codes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER NOT NULL,
+            order_number TEXT NOT NULL,
+            isverified TEXT NOT NULL CHECK(isverified IN ('yes', 'no')),
+            scanned_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            device TEXT DEFAULT 'raspberry_pi',
+            FOREIGN KEY (order_id) REFERENCES orders (id),
+            UNIQUE(order_id) -- Prevent duplicate entries for same order
+        )
+    ''')
+
+    # MQTT sensor data held until the parcel's QR code is validated
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS loaded_sensor_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            weight REAL,
+            width REAL,
+            height REAL,
+            length REAL,
+            package_size TEXT,
+            loadcell_timestamp TEXT,
+            box_dimensions_timestamp TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+@migration(2, 'drop status and email columns from orders')
+def drop_legacy_order_columns(c, progress):
+    legacy = [column for column in ('status', 'email') if column in table_columns(c, 'orders')]
+    if not legacy:
+        return
+    logger.info(f"Rebuilding orders table without {', '.join(legacy)}...")
+    c.execute('DROP TABLE IF EXISTS orders_new')
+    c.execute('''
+        CREATE TABLE orders_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_number TEXT NOT NULL,
+            customer_name TEXT NOT NULL,
+            contact_number TEXT NOT NULL,
+            address TEXT NOT NULL,
+            product_id TEXT NOT NULL,
+            product_name TEXT NOT NULL,
+            amount REAL NOT NULL,
+            date TEXT NOT NULL
+        )
+    ''')
+    copy_in_batches(c, 'orders', 'orders_new', ORDER_COLUMNS, progress)
+    c.execute('DROP TABLE orders')
+    c.execute('ALTER TABLE orders_new RENAME TO orders')
+
+
+@migration(3, 'add package size and sensor timestamp columns')
+def add_package_columns(c, progress):
+    wanted = {
+        'loaded_sensor_data': ('package_size',),
+        'package_information': ('package_size', 'loadcell_timestamp', 'box_dimensions_timestamp'),
+    }
+    for table, columns in wanted.items():
+        existing = table_columns(c, table)
+        for column in columns:
+            if column not in existing:
+                c.execute(f"ALTER TABLE {table} ADD COLUMN {column} TEXT")
+                logger.info(f"Added {column} column to {table} table")
+
+
+@migration(4, 'deduplicate scanned codes and index order ids')
+def index_order_ids(c, progress):
+    # Keep the oldest scan of each order so the unique index can be built
+    c.execute('''
+        DELETE FROM scanned_codes
+        WHERE id NOT IN (SELECT MIN(id) FROM scanned_codes GROUP BY order_id)
+    ''')
+    if c.rowcount > 0:
+        logger.info(f"Cleaned up {c.rowcount} duplicate scanned codes")
+    c.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_scanned_codes_order_id ON scanned_codes(order_id)')
+
+    # Package information is joined to scanned codes by order_id
+    c.execute('CREATE INDEX IF NOT EXISTS idx_package_information_order_id ON package_information(order_id)')
+
+
+@migration(5, 'create analytics rollup tables')
+def create_analytics_tables(c, progress):
+    init_analytics_tables(c)
+
+
+@migration(6, 'order number sequence and unique order numbers')
+def create_order_number_sequence(c, progress):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS order_number_sequence (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    ''')
+    sync_order_number_sequence(c)
+
+    # Renumber duplicates left behind by the old COUNT(*) numbering so the index can be built
+    c.execute('''
+        SELECT id, order_number FROM orders
+        WHERE id NOT IN (SELECT MIN(id) FROM orders GROUP BY order_number)
+        ORDER BY id
+    ''')
+    duplicates = c.fetchall()
+    if duplicates:
+        new_numbers = allocate_order_numbers(c, len(duplicates))
+        for (order_id, old_number), new_number in zip(duplicates, new_numbers):
+            logger.warning(f"Renumbering duplicate order {old_number} (id {order_id}) to {new_number}")
+            c.execute('UPDATE orders SET order_number = ? WHERE id = ?', (new_number, order_id))
+            c.execute('UPDATE scanned_codes SET order_number = ? WHERE order_id = ?', (new_number, order_id))
+            c.execute('UPDATE package_information SET order_number = ? WHERE order_id = ?', (new_number, order_id))
+
+    c.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_orders_order_number ON orders(order_number)')
+
+
+def classify_package_size(weight, width, height, length):
+    """Small / Medium / Large from weight (kg) and volume (cm³)"""
+    volume = (width or 0) * (height or 0) * (length or 0)
+    weight_kg = weight or 0
+    if weight_kg <= 0.3 and volume <= 1000:
+        return 'Small'
+    if weight_kg >= 1.5 or volume >= 8000:
+        return 'Large'
+    return 'Medium'
+
+
+@migration(7, 'backfill missing package sizes')
+def backfill_package_sizes(c, progress):
+    # Rows stored before the size was measured showed as 'Unknown' (previously fix_package_size.py)
+    c.execute("SELECT COUNT(*) FROM package_information WHERE package_size IS NULL OR package_size = ''")
+    total = c.fetchone()[0]
+    fixed, last_id = 0, 0
+    while fixed < total:
+        c.execute('''
+            SELECT id, weight, width, height, length FROM package_information
+            WHERE id > ? AND (package_size IS NULL OR package_size = '')
+            ORDER BY id LIMIT ?
+        ''', (last_id, progress.batch_size))
+        rows = c.fetchall()
+        if not rows:
+            break
+        c.executemany('UPDATE package_information SET package_size = ? WHERE id = ?',
+                      [(classify_package_size(*row[1:]), row[0]) for row in rows])
+        fixed += len(rows)
+        last_id = rows[-1][0]
+        progress.report(fixed, total)
+    if fixed:
+        logger.info(f"Assigned a package size to {fixed} package_information rows")
+
+
+@migration(8, 'rename analytics prints to verified_scans')
+def rename_analytics_prints(c, progress):
+    # The counter came from verified scans, which include validations with skip_print
+    for table, _ in ANALYTICS_GRANULARITIES.values():
+        if 'prints' in table_columns(c, table):
+            c.execute(f"ALTER TABLE {table} RENAME COLUMN prints TO verified_scans")
+
+
+# --- Runner -------------------------------------------------------------------
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    """Highest applied migration, 0 for a database that predates schema_version"""
+    try:
+        return conn.execute('SELECT MAX(version) FROM schema_version').fetchone()[0] or 0
+    except sqlite3.OperationalError:
+        return 0
+
+
+def applied_migrations(conn):
+    try:
+        return conn.execute('SELECT version, name, applied_at, duration_ms FROM schema_version ORDER BY version').fetchall()
+    except sqlite3.OperationalError:
+        return []
+
+
+def migrate(db_path='database.db', target=None, batch_size=None, progress=None, migrations=None):
+    """Bring db_path up to `target` (default: latest) and return the resulting version.
+
+    A failing migration is rolled back and raised as MigrationError; the ones
+    before it stay applied. Concurrent callers (app.py and a script starting
+    together) serialize on the write lock and each migration still runs once.
+    """
+    migrations = MIGRATIONS if migrations is None else migrations
+    target = migrations[-1][0] if target is None else target
+    batch_size = batch_size or MIGRATION_CONFIG['batch_size']
+
+    # isolation_level=None: transactions are only the explicit BEGIN/COMMIT below, DDL included
+    conn = timed_connect(db_path, timeout=MIGRATION_CONFIG['lock_timeout'], isolation_level=None)
+    try:
+        version = schema_version(conn)
+        if version >= target:
+            return version
+
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TEXT NOT NULL,
+                duration_ms REAL NOT NULL
+            )
+        ''')
+        logger.info(f"🗄️ Migrating {db_path} from schema version {version} to {target}")
+        for number, name, function in migrations:
+            if number > target:
+                break
+            if number <= version:
+                continue
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                version = schema_version(conn)
+                if number <= version:
+                    conn.execute('ROLLBACK')  # Applied by another process while we waited for the lock
+                    continue
+                started = time.perf_counter()
+                function(conn.cursor(), Progress(number, name, batch_size, progress))
+                duration_ms = round((time.perf_counter() - started) * 1000, 1)
+                conn.execute('INSERT INTO schema_version (version, name, applied_at, duration_ms) VALUES (?, ?, ?, ?)',
+                             (number, name, datetime.now().isoformat(timespec='seconds'), duration_ms))
+                conn.execute('COMMIT')
+            except Exception as e:
+                conn.execute('ROLLBACK')
+                logger.error(f"❌ Migration {number} ({name}) failed and was rolled back: {e}")
+                raise MigrationError(f"Migration {number} ({name}) failed: {e}") from e
+            version = number
+            logger.info(f"✅ Migration {number} ({name}) applied in {duration_ms:.0f} ms")
+        return version
+    finally:
+        conn.close()
+
+
+def print_status(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        version = schema_version(conn)
+        applied = {row[0]: row for row in applied_migrations(conn)}
+    finally:
+        conn.close()
+    print(f"🗄️ {db_path}: schema version {version} (latest {LATEST_VERSION})")
+    for number, name, _ in MIGRATIONS:
+        if number in applied:
+            print(f"   ✅ {number:>3}  {name}  ({applied[number][2]}, {applied[number][3]:.0f} ms)")
+        else:
+            print(f"   ⏳ {number:>3}  {name}  (pending)")
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(
+        description="Apply or inspect database.db schema migrations",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__
+    )
+    parser.add_argument('--db', default='database.db', help='SQLite database (default: database.db)')
+    parser.add_argument('--status', action='store_true', help='Show applied and pending migrations and exit')
+    parser.add_argument('--target', type=int, help='Stop at this version (default: latest)')
+    parser.add_argument('--batch-size', type=int, help='Rows per batch in table rewrites')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.status:
+        print_status(args.db)
+        return
+
+    try:
+        version = migrate(args.db, target=args.target, batch_size=args.batch_size)
+    except MigrationError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"✅ {args.db} is at schema version {version}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Minimal embedded MQTT broker
+A small MQTT 3.1.1 broker for running the conveyor simulator and tests on a
+machine without Mosquitto. It supports CONNECT, SUBSCRIBE/UNSUBSCRIBE with
++ and # wildcards, retained messages, PUBLISH at QoS 0/1/2 (acknowledged per
+the protocol, always delivered to subscribers at QoS 0), PINGREQ and
+DISCONNECT. There is no authentication or persistence; it is not meant for
+production use.
+
+    broker = start_broker('127.0.0.1', 1883)
+    ...
+    broker.shutdown()
+
+or standalone:
+    python mqtt_broker.py --host 0.0.0.0 --port 1883
+"""
+
+import time
+import socket
+import struct
+import argparse
+import socketserver
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+CONNECT, CONNACK, PUBLISH, PUBACK, PUBREC, PUBREL, PUBCOMP = 1, 2, 3, 4, 5, 6, 7
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK, PINGREQ, PINGRESP, DISCONNECT = 8, 9, 10, 11, 12, 13, 14
+
+
+def topic_matches(pattern, topic):
+    """MQTT topic filter matching with + (one level) and # (remaining levels)"""
+    pattern_levels = pattern.split('/')
+    topic_levels = topic.split('/')
+    for i, level in enumerate(pattern_levels):
+        if level == '#':
+            return True
+        if i >= len(topic_levels):
+            return False
+        if level != '+' and level != topic_levels[i]:
+            return False
+    return len(pattern_levels) == len(topic_levels)
+
+
+def _encode_length(length):
+    encoded = bytearray()
+    while True:
+        byte, length = length % 128, length // 128
+        encoded.append(byte | (0x80 if length else 0))
+        if not length:
+            return bytes(encoded)
+
+
+def _encode_string(value):
+    data = value.encode('utf-8')
+    return struct.pack('!H', len(data)) + data
+
+
+def publish_packet(topic, payload, retain=False):
+    """QoS 0 PUBLISH packet"""
+    body = _encode_string(topic) + payload
+    return bytes([(PUBLISH << 4) | (1 if retain else 0)]) + _encode_length(len(body)) + body
+
+
+class _Session:
+    def __init__(self, sock):
+        self.sock = sock
+        self.client_id = None
+        self.subscriptions = set()
+        self.write_lock = threading.Lock()
+
+    def send(self, packet):
+        with self.write_lock:
+            self.sock.sendall(packet)
+
+
+class _ClientHandler(socketserver.BaseRequestHandler):
+
+    def _read_exact(self, count):
+        data = bytearray()
+        while len(data) < count:
+            chunk = self.request.recv(count - len(data))
+            if not chunk:
+                raise ConnectionError("Client closed the connection")
+            data.extend(chunk)
+        return bytes(data)
+
+    def _read_packet(self):
+        header = self._read_exact(1)[0]
+        length, multiplier = 0, 1
+        while True:
+            byte = self._read_exact(1)[0]
+            length += (byte & 0x7F) * multiplier
+            if not byte & 0x80:
+                break
+            multiplier *= 128
+        return header >> 4, header & 0x0F, self._read_exact(length) if length else b''
+
+    def handle(self):
+        broker = self.server
+        session = _Session(self.request)
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            while True:
+                packet_type, flags, body = self._read_packet()
+                if packet_type == CONNECT:
+                    protocol_length = struct.unpack('!H', body[:2])[0]
+                    offset = 2 + protocol_length + 4  # name, level, flags, keepalive
+                    client_id_length = struct.unpack('!H', body[offset:offset + 2])[0]
+                    session.client_id = body[offset + 2:offset + 2 + client_id_length].decode('utf-8')
+                    broker.add_session(session)
+                    session.send(bytes([CONNACK << 4, 2, 0, 0]))
+                elif packet_type == PUBLISH:
+                    qos = (flags >> 1) & 0x03
+                    topic_length = struct.unpack('!H', body[:2])[0]
+                    topic = body[2:2 + topic_length].decode('utf-8')
+                    offset = 2 + topic_length
+                    if qos:
+                        packet_id = body[offset:offset + 2]
+                        offset += 2
+                        session.send(bytes([(PUBACK if qos == 1 else PUBREC) << 4, 2]) + packet_id)
+                    broker.route(topic, body[offset:], retain=bool(flags & 0x01))
+                elif packet_type == PUBREL:
+                    session.send(bytes([PUBCOMP << 4, 2]) + body[:2])
+                elif packet_type == SUBSCRIBE:
+                    packet_id, offset, granted, filters = body[:2], 2, bytearray(), []
+                    while offset < len(body):
+                        filter_length = struct.unpack('!H', body[offset:offset + 2])[0]
+                        filters.append(body[offset + 2:offset + 2 + filter_length].decode('utf-8'))
+                        offset += 2 + filter_length + 1
+                        granted.append(0)
+                    session.subscriptions.update(filters)
+                    session.send(bytes([SUBACK << 4]) + _encode_length(2 + len(granted)) + packet_id + bytes(granted))
+                    broker.send_retained(session, filters)
+                elif packet_type == UNSUBSCRIBE:
+                    offset = 2
+                    while offset < len(body):
+                        filter_length = struct.unpack('!H', body[offset:offset + 2])[0]
+                        session.subscriptions.discard(body[offset + 2:offset + 2 + filter_length].decode('utf-8'))
+                        offset += 2 + filter_length
+                    session.send(bytes([UNSUBACK << 4, 2]) + body[:2])
+                elif packet_type == PINGREQ:
+                    session.send(bytes([PINGRESP << 4, 0]))
+                elif packet_type == DISCONNECT:
+                    break
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            broker.remove_session(session)
+
+
+class EmbeddedBroker(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, _ClientHandler)
+        self._sessions = set()
+        self._retained = {}
+        self._lock = threading.Lock()
+        self.messages_routed = 0
+
+    def add_session(self, session):
+        with self._lock:
+            self._sessions.add(session)
+
+    def remove_session(self, session):
+        with self._lock:
+            self._sessions.discard(session)
+
+    def route(self, topic, payload, retain=False):
+        if retain:
+            with self._lock:
+                if payload:
+                    self._retained[topic] = payload
+                else:
+                    self._retained.pop(topic, None)
+        packet = publish_packet(topic, payload)
+        with self._lock:
+            sessions = list(self._sessions)
+            self.messages_routed += 1
+        for session in sessions:
+            if any(topic_matches(pattern, topic) for pattern in session.subscriptions):
+                try:
+                    session.send(packet)
+                except OSError:
+                    self.remove_session(session)
+
+    def send_retained(self, session, filters):
+        with self._lock:
+            retained = list(self._retained.items())
+        for topic, payload in retained:
+            if any(topic_matches(pattern, topic) for pattern in filters):
+                session.send(publish_packet(topic, payload, retain=True))
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+
+def start_broker(host='127.0.0.1', port=1883):
+    """Start a broker in a daemon thread; port 0 picks a free port (see broker.port)"""
+    broker = EmbeddedBroker((host, port))
+    threading.Thread(target=broker.serve_forever, name='mqtt-broker', daemon=True).start()
+    logger.info(f"Embedded MQTT broker listening on {host}:{broker.port}")
+    return broker
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(
+        description="Run a minimal MQTT broker for local testing",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__
+    )
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to listen on')
+    parser.add_argument('--port', type=int, default=1883, help='Port to listen on')
+    args = parser.parse_args()
+
+    broker = start_broker(args.host, args.port)
+    print(f"📡 MQTT broker listening on {args.host}:{broker.port} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        broker.shutdown()
+        print(f"\n🛑 Broker stopped after routing {broker.messages_routed} messages")
+
+
+if __name__ == "__main__":
+    main()
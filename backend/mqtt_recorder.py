@@ -0,0 +1,240 @@
+"""
+MQTT traffic recorder and deterministic replayer
+Capture mode for MQTTListener: every inbound and outbound message is appended
+to a compact binary log with a monotonic timestamp, so a conveyor incident can
+be replayed later. Enable it with MQTT_RECORD=<path> when starting server.py,
+or at runtime with POST /mqtt/recording.
+
+Log format (big-endian): an 8-byte magic, the wall-clock start time (double),
+then one record per message:
+    offset (double, seconds since start) | direction (u8: 0 in, 1 out) |
+    topic length (u16) | payload length (u32) | topic | payload
+Paths ending in .gz are gzip-compressed.
+
+MQTTReplayer feeds a recording's inbound messages back into a listener's
+on_message at 1x, Nx or maximum speed with the broker swapped out, captures
+the commands the workflow publishes and asserts them against the recorded
+outbound messages (see replay_mqtt.py).
+"""
+
+import os
+import gzip
+import time
+import struct
+import threading
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+RECORDING_MAGIC = b'MQTTREC1'
+RECORD_HEADER = struct.Struct('!dBHI')
+INBOUND, OUTBOUND = 0, 1
+
+# Recorder configuration
+MQTT_RECORDING_CONFIG = {
+    'flush_interval': float(os.getenv('MQTT_RECORD_FLUSH_INTERVAL', '1.0')),  # Seconds between file flushes
+    'directory': os.getenv('MQTT_RECORDINGS_DIR', 'recordings'),  # Where POST /mqtt/recording saves captures
+}
+
+
+def _open(path, mode):
+    return gzip.open(path, mode) if path.endswith('.gz') else open(path, mode)
+
+
+class MQTTRecorder:
+    """Appends MQTT messages to a binary recording; safe to call from any thread"""
+
+    def __init__(self, path, config=None):
+        self.config = config if config is not None else MQTT_RECORDING_CONFIG
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.started_at = time.time()
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+        self._file = _open(path, 'wb')
+        self._file.write(RECORDING_MAGIC + struct.pack('!d', self.started_at))
+        self._last_flush = self._started
+        self.counts = {INBOUND: 0, OUTBOUND: 0}
+        self.bytes_written = len(RECORDING_MAGIC) + 8
+        self.closed = False
+
+    def record(self, direction, topic, payload):
+        """Append one message; payload may be str or bytes"""
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        topic_bytes = topic.encode('utf-8')
+        now = time.monotonic()
+        with self._lock:
+            if self.closed:
+                return
+            record = RECORD_HEADER.pack(now - self._started, direction, len(topic_bytes), len(payload))
+            self._file.write(record + topic_bytes + payload)
+            self.counts[direction] += 1
+            self.bytes_written += len(record) + len(topic_bytes) + len(payload)
+            if now - self._last_flush >= self.config['flush_interval']:
+                self._file.flush()
+                self._last_flush = now
+
+    def close(self):
+        with self._lock:
+            if not self.closed:
+                self.closed = True
+                self._file.close()
+                logger.info(f"📼 MQTT recording closed: {self.path} "
+                            f"({self.counts[INBOUND]} in, {self.counts[OUTBOUND]} out)")
+
+    def get_status(self):
+        return {
+            'path': self.path,
+            'recording': not self.closed,
+            'started_at': self.started_at,
+            'duration_s': round(time.monotonic() - self._started, 1),
+            'inbound': self.counts[INBOUND],
+            'outbound': self.counts[OUTBOUND],
+            'bytes': self.bytes_written,
+        }
+
+
+def read_recording(path):
+    """(start wall time, [(offset, direction, topic, payload bytes)]) from a recording"""
+    records = []
+    with _open(path, 'rb') as f:
+        header = f.read(len(RECORDING_MAGIC) + 8)
+        if header[:len(RECORDING_MAGIC)] != RECORDING_MAGIC:
+            raise ValueError(f"Not an MQTT recording: {path}")
+        started_at = struct.unpack('!d', header[len(RECORDING_MAGIC):])[0]
+        while True:
+            raw = f.read(RECORD_HEADER.size)
+            if len(raw) < RECORD_HEADER.size:
+                break  # End of file (or a record cut off by a crash)
+            offset, direction, topic_length, payload_length = RECORD_HEADER.unpack(raw)
+            body = f.read(topic_length + payload_length)
+            if len(body) < topic_length + payload_length:
+                break
+            records.append((offset, direction, body[:topic_length].decode('utf-8'), body[topic_length:]))
+    return started_at, records
+
+
+class _ReplayMessage:
+    """Stands in for paho's MQTTMessage"""
+
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+        self.qos = 0
+        self.retain = False
+
+
+class _PublishResult:
+    rc = 0
+
+
+class _ReplayClient:
+    """Takes the place of the listener's paho client and captures what the workflow publishes"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.published = []
+        self._lock = threading.Lock()
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        with self._lock:
+            self.published.append((time.monotonic() - self.started, topic, payload or b''))
+        return _PublishResult()
+
+    def subscribe(self, *args, **kwargs):
+        return (0, 0)
+
+
+def _summarize(values):
+    if not values:
+        return None
+    p50, p95 = np.percentile(values, [50, 95])
+    return {'count': len(values), 'mean': round(float(np.mean(values)), 3), 'p50': round(float(p50), 3),
+            'p95': round(float(p95), 3), 'max': round(float(max(values)), 3)}
+
+
+class MQTTReplayer:
+    """Replays a recording through an MQTTListener-style router and checks its outbound commands"""
+
+    def __init__(self, listener, path):
+        self.listener = listener
+        self.path = path
+        self.started_at, self.records = read_recording(path)
+
+    def run(self, speed=1.0, settle=15.0, tolerance=0.5):
+        """Replay inbound messages; speed 0 (or None) replays as fast as the handlers run.
+
+        settle is how long to keep collecting outbound commands after the last inbound
+        message (handlers publish from delayed background threads); tolerance is the
+        allowed timing drift in seconds, checked at 1x only.
+        """
+        inbound = [r for r in self.records if r[1] == INBOUND]
+        expected = [r for r in self.records if r[1] == OUTBOUND]
+        base = self.records[0][0] if self.records else 0.0
+
+        client = _ReplayClient()
+        saved = (self.listener.client, self.listener.is_connected, getattr(self.listener, 'recorder', None))
+        self.listener.client, self.listener.is_connected, self.listener.recorder = client, True, None
+
+        handler_ms = {}
+        try:
+            for offset, _, topic, payload in inbound:
+                if speed:
+                    delay = (offset - base) / speed - (time.monotonic() - client.started)
+                    if delay > 0:
+                        time.sleep(delay)
+                started = time.perf_counter()
+                self.listener.on_message(client, None, _ReplayMessage(topic, payload))
+                handler_ms.setdefault(topic, []).append((time.perf_counter() - started) * 1000)
+            fed = time.monotonic() - client.started
+
+            deadline = time.monotonic() + settle
+            while time.monotonic() < deadline and len(client.published) < len(expected):
+                time.sleep(0.05)
+            time.sleep(0.2)  # Catch commands beyond the expected count
+        finally:
+            self.listener.client, self.listener.is_connected, self.listener.recorder = saved
+
+        return self._compare(expected, list(client.published), base, speed, tolerance, handler_ms, len(inbound), fed)
+
+    def _compare(self, expected, actual, base, speed, tolerance, handler_ms, inbound_count, fed):
+        unmatched = list(actual)
+        missing, drifts = [], []
+        for offset, _, topic, payload in expected:
+            match = next((item for item in unmatched if item[1] == topic and item[2] == payload), None)
+            if match is None:
+                missing.append({'offset': round(offset - base, 3), 'topic': topic,
+                                'payload': payload.decode('utf-8', errors='replace')})
+                continue
+            unmatched.remove(match)
+            if speed == 1:
+                drifts.append(match[0] - (offset - base))
+        unexpected = [{'offset': round(offset, 3), 'topic': topic, 'payload': payload.decode('utf-8', errors='replace')}
+                      for offset, topic, payload in unmatched]
+        late = [d for d in drifts if abs(d) > tolerance]
+
+        all_handler_ms = [ms for values in handler_ms.values() for ms in values]
+        return {
+            'recording': self.path,
+            'speed': speed or 'max',
+            'inbound': inbound_count,
+            'expected_outbound': len(expected),
+            'replayed_outbound': len(actual),
+            'matched': len(expected) - len(missing),
+            'missing': missing,
+            'unexpected': unexpected,
+            'timing_drift_s': _summarize(drifts),
+            'late': len(late),
+            'passed': not missing and not unexpected and not late,
+            'feed_seconds': round(fed, 3),
+            'messages_per_second': round(inbound_count / fed, 1) if fed else None,
+            'handler_ms': _summarize(all_handler_ms),
+            'handler_ms_by_topic': {topic: _summarize(values) for topic, values in sorted(handler_ms.items())},
+        }
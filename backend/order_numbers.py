@@ -0,0 +1,37 @@
+"""
+Order number allocation (ORD-001, ORD-002, ...)
+Numbers come from the single-row order_number_sequence table, created by the
+order number migration in migrations.py, so allocation is O(1) and numbers are
+never reused.
+"""
+
+ORDER_NUMBER_PREFIX = 'ORD-'
+
+
+def format_order_number(value):
+    return f"{ORDER_NUMBER_PREFIX}{str(value).zfill(3)}"
+
+
+def sync_order_number_sequence(c):
+    """Raise the order number sequence to at least the highest ORD-n already stored"""
+    c.execute('''
+        INSERT INTO order_number_sequence (name, value)
+        SELECT 'orders', COALESCE(MAX(CAST(SUBSTR(order_number, ?) AS INTEGER)), 0)
+        FROM orders WHERE order_number LIKE ?
+        ON CONFLICT(name) DO UPDATE SET value = MAX(value, excluded.value)
+    ''', (len(ORDER_NUMBER_PREFIX) + 1, ORDER_NUMBER_PREFIX + '%'))
+
+
+def allocate_order_numbers(c, count=1):
+    """Reserve count consecutive order numbers inside the caller's transaction.
+
+    The UPDATE takes SQLite's write lock, so allocations are serialized across
+    threads and processes and cost O(1) regardless of table size. Numbers are
+    never reused, even after orders are deleted.
+    """
+    c.execute('''
+        UPDATE order_number_sequence SET value = value + ?
+        WHERE name = 'orders' RETURNING value
+    ''', (count,))
+    last_value = c.fetchone()[0]
+    return [format_order_number(value) for value in range(last_value - count + 1, last_value + 1)]
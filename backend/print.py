@@ -3,12 +3,16 @@ import qrcode
 import json
 from datetime import datetime
 import os
-import pygame
 import threading
 import time
 import logging
 import requests
+import numpy as np
 from dotenv import load_dotenv
+from audio_cues import audio_cues
+from printer_sink import create_printer_sink
+from metrics import metrics
+from tracing import TracedSession
 
 # Load environment variables
 load_dotenv()
@@ -17,24 +21,49 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Printer configuration (the sink itself is chosen with PRINTER_SINK, see printer_sink.py)
+PRINTER_CONFIG = {
+    'max_retries': int(os.getenv('PRINTER_MAX_RETRIES', '3')),
+    'retry_delay': float(os.getenv('PRINTER_RETRY_DELAY', '1.0')),  # Seconds between attempts
+    'backup_dir': os.getenv('PRINTER_BACKUP_DIR', '/tmp'),  # Empty disables the PNG backup
+}
+
+backend_http = TracedSession()
+
+PRINT_JOBS = metrics.counter('print_jobs', 'Print jobs by outcome', ('result',))
+PRINT_JOB_SECONDS = metrics.histogram('print_job_seconds', 'Time to deliver a print job to the printer, including retries')
+PRINT_FAILED_ATTEMPTS = metrics.counter('print_failed_attempts', 'Print attempts that failed with an I/O error')
+PRINT_BYTES = metrics.counter('print_bytes', 'ESC/POS bytes delivered to the printer')
+
+
+def build_escpos_job(receipt_bw):
+    """Complete ESC/POS job for a 1-bit image: init, center, GS v 0 raster, feed and cut"""
+    width_bytes = (receipt_bw.width + 7) // 8
+    # Black pixels become set bits, MSB first, each row padded to a whole byte
+    raster = np.packbits(~np.array(receipt_bw, dtype=bool), axis=1).tobytes()
+    return b''.join([
+        b'\x1b\x40',  # ESC @ - Initialize printer
+        b'\x1b\x61\x01',  # Center alignment
+        b'\x1d\x76\x30\x00',  # Print raster bit image
+        bytes([width_bytes & 0xff, width_bytes >> 8]),
+        bytes([receipt_bw.height & 0xff, receipt_bw.height >> 8]),
+        raster,
+        b'\n\n\n\n',  # Feed paper
+        b'\x1d\x56\x41\x03',  # Cut paper
+    ])
+
+
 class ReceiptPrinter:
-    def __init__(self):
-        self.printer_device = '/dev/usb/lp0'
-        # Initialize pygame mixer once
-        self._init_pygame()
+    def __init__(self, sink=None, config=None):
+        self.config = config if config is not None else PRINTER_CONFIG
+        self.sink = sink or create_printer_sink()
+        self.printer_device = self.sink.path
+        # Initialize the shared audio cue engine once (mixer init + preloaded sounds)
+        audio_cues.start()
         self._init_fonts()
         # Add thread lock for printer access
         self.printer_lock = threading.Lock()
         
-    def _init_pygame(self):
-        """Initialize pygame mixer safely"""
-        try:
-            if not pygame.mixer.get_init():
-                pygame.mixer.init()
-            logger.info("Pygame mixer initialized successfully")
-        except Exception as e:
-            logger.warning(f"Failed to initialize pygame mixer: {e}")
-            
     def _init_fonts(self):
         """Initialize fonts with fallbacks"""
         try:
@@ -56,7 +85,7 @@ class ReceiptPrinter:
             api_url = f"{backend_url}/api/package-information/order/{order_number}"
             
             # Make API request to get package information
-            response = requests.get(api_url, timeout=10)
+            response = backend_http.get(api_url, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -227,44 +256,14 @@ class ReceiptPrinter:
             return None
 
     def _play_success_sound(self):
-        """Play success sound for QR code scanning in a separate thread to avoid blocking"""
-        def play_sound():
-            try:
-                if pygame.mixer.get_init():
-                    sound_path = "/home/test/Desktop/sound/success.mp3"
-                    if os.path.exists(sound_path):
-                        sound = pygame.mixer.Sound(sound_path)
-                        sound.play()
-                        logger.info("Success sound played (QR code scanning)")
-                    else:
-                        logger.warning(f"Sound file not found: {sound_path}")
-                else:
-                    logger.warning("Pygame mixer not initialized")
-            except Exception as e:
-                logger.error(f"Failed to play success sound: {e}")
-        
-        # Play sound in background thread to avoid blocking
-        threading.Thread(target=play_sound, daemon=True).start()
+        """Queue the success sound for QR code scanning (non-blocking)"""
+        if audio_cues.play('success'):
+            logger.info("Success sound queued (QR code scanning)")
 
     def _play_receipt_sound(self):
-        """Play success receipt sound for printing receipt details in a separate thread to avoid blocking"""
-        def play_sound():
-            try:
-                if pygame.mixer.get_init():
-                    sound_path = "/home/test/Desktop/sound/success_receipt.mp3"
-                    if os.path.exists(sound_path):
-                        sound = pygame.mixer.Sound(sound_path)
-                        sound.play()
-                        logger.info("Success receipt sound played (Receipt printing)")
-                    else:
-                        logger.warning(f"Sound file not found: {sound_path}")
-                else:
-                    logger.warning("Pygame mixer not initialized")
-            except Exception as e:
-                logger.error(f"Failed to play success receipt sound: {e}")
-        
-        # Play sound in background thread to avoid blocking
-        threading.Thread(target=play_sound, daemon=True).start()
+        """Queue the success receipt sound for printing receipt details (non-blocking)"""
+        if audio_cues.play('success_receipt'):
+            logger.info("Success receipt sound queued (Receipt printing)")
 
     def print_receipt(self, receipt, is_qr_only=False):
         """Print receipt with thread safety and better error handling"""
@@ -276,50 +275,37 @@ class ReceiptPrinter:
             try:
                 # Check printer availability
                 if not self.check_printer():
+                    PRINT_JOBS.labels('unavailable').inc()
                     return False, "Printer device not available"
 
+                started = time.perf_counter()
                 # Convert to 1-bit image for thermal printer
                 receipt_bw = receipt.convert('1')
                 
                 # Save backup copy before printing
-                backup_path = f"/tmp/receipt_backup_{int(time.time())}.png"
-                try:
-                    receipt.save(backup_path)
-                    logger.info(f"Receipt backup saved to {backup_path}")
-                except Exception as e:
-                    logger.warning(f"Failed to save backup: {e}")
+                if self.config['backup_dir']:
+                    backup_path = os.path.join(self.config['backup_dir'], f"receipt_backup_{int(time.time())}.png")
+                    try:
+                        receipt.save(backup_path)
+                        logger.info(f"Receipt backup saved to {backup_path}")
+                    except Exception as e:
+                        logger.warning(f"Failed to save backup: {e}")
+
+                # Encode once; the printer then receives the job in a single write
+                job = build_escpos_job(receipt_bw)
 
                 # Print with timeout and retries
-                max_retries = 3
+                max_retries = self.config['max_retries']
                 for attempt in range(max_retries):
                     try:
-                        with open(self.printer_device, 'wb') as p:
-                            # ESC/POS commands
-                            p.write(b'\x1b\x40')  # ESC @ - Initialize printer
-                            p.write(b'\x1b\x61\x01')  # Center alignment
-
-                            # Calculate image dimensions
-                            width_bytes = (receipt_bw.width + 7) // 8
-                            p.write(b'\x1d\x76\x30\x00')  # Print raster bit image
-                            p.write(bytes([width_bytes & 0xff, width_bytes >> 8]))
-                            p.write(bytes([receipt_bw.height & 0xff, receipt_bw.height >> 8]))
-
-                            # Send image data
-                            pixels = receipt_bw.load()
-                            for y in range(receipt_bw.height):
-                                for x in range(0, receipt_bw.width, 8):
-                                    byte = 0
-                                    for bit in range(min(8, receipt_bw.width - x)):
-                                        if pixels[x + bit, y] == 0:  # Black pixel
-                                            byte |= (1 << (7 - bit))
-                                    p.write(bytes([byte]))
-
-                            # Feed paper and cut
-                            p.write(b'\n\n\n\n')
-                            p.write(b'\x1d\x56\x41\x03')  # Cut paper
+                        with self.sink.open() as p:
+                            p.write(job)
                             p.flush()  # Ensure all data is sent
 
                         # If we get here, printing succeeded
+                        PRINT_JOB_SECONDS.observe(time.perf_counter() - started)
+                        PRINT_JOBS.labels('printed').inc()
+                        PRINT_BYTES.inc(len(job))
                         logger.info("Receipt printed successfully")
                         
                         # Play appropriate sound based on print type
@@ -332,7 +318,9 @@ class ReceiptPrinter:
 
                     except (IOError, OSError) as e:
                         logger.warning(f"Print attempt {attempt + 1} failed: {e}")
+                        PRINT_FAILED_ATTEMPTS.inc()
                         if attempt == max_retries - 1:
+                            PRINT_JOBS.labels('failed').inc()
                             # Save failed print for debugging
                             try:
                                 receipt.save('last_failed_print.png')
@@ -341,9 +329,10 @@ class ReceiptPrinter:
                                 logger.error(f"Failed to save failed print: {save_e}")
                             return False, f"Print failed after {max_retries} attempts: {str(e)}"
                         else:
-                            time.sleep(1)  # Wait before retry
+                            time.sleep(self.config['retry_delay'])  # Wait before retry
 
             except Exception as e:
+                PRINT_JOBS.labels('error').inc()
                 logger.error(f"Unexpected error during printing: {e}")
                 return False, f"Print failed: {str(e)}"
 
@@ -406,7 +395,7 @@ class ReceiptPrinter:
     def check_printer(self):
         """Check if printer device is available"""
         try:
-            is_available = os.path.exists(self.printer_device)
+            is_available = self.sink.available()
             logger.debug(f"Printer check: {self.printer_device} - {'Available' if is_available else 'Not available'}")
             return is_available
         except Exception as e:
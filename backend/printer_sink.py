@@ -0,0 +1,118 @@
+"""
+Printer sinks for ReceiptPrinter
+A sink is where the ESC/POS byte stream of a print job goes. ReceiptPrinter used
+to hardcode /dev/usb/lp0; the sink is now chosen with PRINTER_SINK:
+
+    device:/dev/usb/lp0   USB/parallel printer device node (default, PRINTER_DEVICE)
+    fifo:/tmp/printer     named pipe read by escpos_emulator.py --fifo
+    memory                in-memory capture of every job (tests, dry runs)
+
+Every sink has the same small interface: available() for the status checks,
+open() returning a writable context manager for one job, and a `path` label.
+escpos_emulator.EscPosEmulator implements it too, as a loopback printer.
+"""
+
+import os
+import io
+import stat
+import errno
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRINTER_DEVICE = os.getenv('PRINTER_DEVICE', '/dev/usb/lp0')
+
+
+class DevicePrinterSink:
+    """Printer device node opened per job (the original /dev/usb/lp0 behaviour)"""
+
+    kind = 'device'
+
+    def __init__(self, path=DEFAULT_PRINTER_DEVICE):
+        self.path = path
+
+    def available(self):
+        return os.path.exists(self.path)
+
+    def open(self):
+        return open(self.path, 'wb')
+
+
+class FifoPrinterSink:
+    """Named pipe; a job only starts when a reader (e.g. the ESC/POS emulator) is attached"""
+
+    kind = 'fifo'
+
+    def __init__(self, path):
+        self.path = path
+
+    def available(self):
+        try:
+            return stat.S_ISFIFO(os.stat(self.path).st_mode)
+        except OSError:
+            return False
+
+    def open(self):
+        # Opening a FIFO for writing blocks until a reader appears; fail fast instead
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_NONBLOCK)
+        except OSError as e:
+            if e.errno == errno.ENXIO:
+                raise IOError(f"No reader attached to printer FIFO {self.path}") from e
+            raise
+        os.set_blocking(fd, True)
+        return os.fdopen(fd, 'wb')
+
+
+class _MemoryJob(io.BytesIO):
+    def __init__(self, sink):
+        super().__init__()
+        self._sink = sink
+
+    def close(self):
+        if not self.closed:
+            self._sink._store(self.getvalue())
+        super().close()
+
+
+class MemoryPrinterSink:
+    """Keeps every job's bytes in memory, newest last"""
+
+    kind = 'memory'
+    path = 'memory'
+
+    def __init__(self, max_jobs=100):
+        self.max_jobs = max_jobs
+        self.jobs = []
+        self._lock = threading.Lock()
+
+    def available(self):
+        return True
+
+    def open(self):
+        return _MemoryJob(self)
+
+    def _store(self, data):
+        with self._lock:
+            self.jobs.append(data)
+            del self.jobs[:-self.max_jobs]
+
+    def last_job(self):
+        with self._lock:
+            return self.jobs[-1] if self.jobs else None
+
+
+def create_printer_sink(spec=None):
+    """Build a sink from a spec such as 'device:/dev/usb/lp0', 'fifo:/tmp/printer' or 'memory'"""
+    spec = spec or os.getenv('PRINTER_SINK') or f'device:{DEFAULT_PRINTER_DEVICE}'
+    kind, _, path = spec.partition(':')
+    if kind == 'memory':
+        return MemoryPrinterSink()
+    if kind == 'fifo' and path:
+        return FifoPrinterSink(path)
+    if kind == 'device':
+        return DevicePrinterSink(path or DEFAULT_PRINTER_DEVICE)
+    if not path and kind.startswith('/'):
+        return DevicePrinterSink(kind)  # Bare device path
+    raise ValueError(f"Unknown printer sink: {spec}")
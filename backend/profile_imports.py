@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Import-Time Profile
+Imports a module (server by default) in a fresh interpreter with
+`python -X importtime` and reports the total import time, the slowest
+modules by cumulative and by self time, and which of the heavy optional
+subsystems (OpenCV, pygame, PIL, qrcode, pyzbar, Picamera2) were pulled in.
+With STARTUP_MODE=lazy none of them should appear for server.py; they are
+imported when the camera, printer and audio subsystems are first used.
+
+Usage:
+    python profile_imports.py
+    python profile_imports.py --module app --top 30
+    python profile_imports.py --repeat 5 --json imports.json
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+import statistics
+
+HEAVY_MODULES = ('cv2', 'pygame', 'PIL', 'qrcode', 'pyzbar', 'picamera2', 'camera', 'print')
+
+
+def run_importtime(module, python=sys.executable, cwd=None, env=None):
+    """Import `module` in a subprocess; returns [(module, self_us, cumulative_us, depth)] in import order"""
+    result = subprocess.run([python, '-X', 'importtime', '-c', f'import {module}'], cwd=cwd, env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return entries
+
+
+def summarize(entries, top):
+    total_us = sum(cumulative for _, _, cumulative, depth in entries if depth == 0)
+    imported = {name.split('.')[0] for name, _, _, _ in entries}
+    return {
+        'total_ms': round(total_us / 1000, 1),
+        'modules': len(entries),
+        'heavy_imported': [name for name in HEAVY_MODULES if name in imported],
+        'top_cumulative': [{'module': name, 'cumulative_ms': round(cumulative / 1000, 1)}
+                           for name, _, cumulative, _ in sorted(entries, key=lambda e: e[2], reverse=True)[:top]],
+        'top_self': [{'module': name, 'self_ms': round(self_us / 1000, 1)}
+                     for name, self_us, _, _ in sorted(entries, key=lambda e: e[1], reverse=True)[:top]],
+    }
+
+
+def print_report(module, report, totals):
+    print(f"\n📦 import {module}: {report['total_ms']:.0f} ms across {report['modules']} modules"
+          + (f" (median of {len(totals)} runs, min {min(totals):.0f} ms)" if len(totals) > 1 else ""))
+    if report['heavy_imported']:
+        print(f"⚠️ Heavy subsystems imported: {', '.join(report['heavy_imported'])}")
+    else:
+        print("✅ No heavy subsystems imported")
+    print(f"\n{'cumulative ms':>14}  module{' ' * 26}{'self ms':>9}  module")
+    print("-" * 80)
+    for by_cumulative, by_self in zip(report['top_cumulative'], report['top_self']):
+        print(f"{by_cumulative['cumulative_ms']:>14.1f}  {by_cumulative['module'][:30]:<32}"
+              f"{by_self['self_ms']:>9.1f}  {by_self['module'][:30]}")
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(
+        description="Report where a service spends its import time",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__
+    )
+    parser.add_argument('--module', default='server', help='Module to import (default: server)')
+    parser.add_argument('--top', type=int, default=15, help='Modules to list per table')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs to take the median of')
+    parser.add_argument('--json', dest='json_path', help='Also write the report to this JSON file')
+    args = parser.parse_args()
+
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    runs = []
+    try:
+        for _ in range(max(1, args.repeat)):
+            runs.append(summarize(run_importtime(args.module, cwd=cwd), args.top))
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    totals = [run['total_ms'] for run in runs]
+    report = sorted(runs, key=lambda run: run['total_ms'])[len(runs) // 2]
+    report['total_ms'] = round(statistics.median(totals), 1)
+    print_report(args.module, report, totals)
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(dict(report, module=args.module, runs_ms=totals), f, indent=2)
+        print(f"\n💾 Report written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+In-process sampling profiler for the Pi service
+Samples the Python stack of every thread (camera capture loop, MQTT loop,
+status broadcaster, Flask and worker threads) at a fixed interval for a given
+number of seconds and aggregates the samples as collapsed stacks, the
+"thread;outer;...;inner count" format that flamegraph.pl, speedscope and
+inferno read directly.
+
+In 'cpu' mode a thread is only sampled when its CPU clock advanced since the
+previous tick, so threads blocked in sleep(), select() or a queue don't fill
+the flamegraph; 'wall' mode samples every thread every tick (useful to see
+where something waits). Per-thread CPU time is read from each thread's own
+counter (/proc/self/task/<tid>/schedstat on Linux), independent of sampling. Nothing runs between
+profiles; the sampler thread only exists while a profile is being taken.
+"""
+
+import os
+import sys
+import time
+import threading
+import logging
+from collections import Counter
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+PROFILER_CONFIG = {
+    'interval': float(os.getenv('PROFILER_INTERVAL', '0.01')),  # Seconds between samples
+    'max_seconds': float(os.getenv('PROFILER_MAX_SECONDS', '120')),
+    'output_dir': os.getenv('PROFILER_OUTPUT_DIR', 'profiles'),
+    'max_depth': 128,  # Frames kept per stack (innermost)
+}
+
+PROFILE_MODES = ('cpu', 'wall')
+
+
+def thread_cpu_time(native_id):
+    """CPU seconds used so far by a thread of this process, or None (exited, or not Linux)"""
+    try:
+        with open(f'/proc/self/task/{native_id}/schedstat', 'rb') as f:
+            return int(f.read().split()[0]) / 1e9
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class ProfileBusyError(RuntimeError):
+    """Another profile is already running"""
+
+
+class SamplingProfiler:
+    """Collects collapsed stacks from all threads; one profile at a time"""
+
+    def __init__(self, config=None):
+        self.config = config if config is not None else PROFILER_CONFIG
+        self._lock = threading.Lock()
+        self._frame_names = {}  # code object -> "function (file.py:line)"
+        self.last_profile = None
+
+    @property
+    def running(self):
+        return self._lock.locked()
+
+    def _frame_name(self, code):
+        name = self._frame_names.get(code)
+        if name is None:
+            name = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self._frame_names[code] = name
+        return name
+
+    def _stack(self, frame):
+        names = []
+        while frame is not None and len(names) < self.config['max_depth']:
+            names.append(self._frame_name(frame.f_code))
+            frame = frame.f_back
+        names.reverse()
+        return names
+
+    def profile(self, seconds, interval=None, mode='cpu'):
+        """Sample all threads for `seconds` (blocking) and return the profile dict"""
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"mode must be one of {', '.join(PROFILE_MODES)}")
+        seconds = min(float(seconds), self.config['max_seconds'])
+        interval = max(float(interval or self.config['interval']), 0.001)
+        if not self._lock.acquire(blocking=False):
+            raise ProfileBusyError("A profile is already running")
+        try:
+            result = {}
+            sampler = threading.Thread(target=self._sample, args=(seconds, interval, mode, result),
+                                       name='sampling-profiler', daemon=True)
+            sampler.start()
+            sampler.join()
+            self.last_profile = result
+            return result
+        finally:
+            self._lock.release()
+
+    def _sample(self, seconds, interval, mode, result):
+        me = threading.get_ident()
+        own_cpu_started = time.thread_time()
+        stacks = Counter()
+        threads = {}  # ident -> {'name', 'native_id', 'cpu_start', 'cpu_last', 'samples'}
+        started_at = datetime.now()
+        started = time.monotonic()
+        deadline = started + seconds
+        ticks = 0
+
+        next_tick = started
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            alive = {t.ident: t for t in threading.enumerate()}
+            frames = sys._current_frames()
+            for ident, frame in frames.items():
+                if ident == me:
+                    continue
+                info = threads.get(ident)
+                if info is None:
+                    thread = alive.get(ident)
+                    native_id = getattr(thread, 'native_id', None)
+                    cpu = thread_cpu_time(native_id) if native_id is not None else None
+                    info = threads[ident] = {'name': thread.name if thread else f'thread-{ident}',
+                                             'native_id': native_id if cpu is not None else None,
+                                             'cpu_start': cpu, 'cpu_last': cpu, 'samples': 0}
+                if info['native_id'] is not None:
+                    cpu = thread_cpu_time(info['native_id'])
+                    if cpu is not None:
+                        idle = cpu == info['cpu_last']
+                        info['cpu_last'] = cpu
+                        if idle and mode == 'cpu':
+                            continue  # Used no CPU since the last tick
+                info['samples'] += 1
+                stacks[';'.join([info['name'].replace(';', ':')] + self._stack(frame))] += 1
+            frames = frame = alive = None  # Don't keep other threads' frames alive between ticks
+            ticks += 1
+            next_tick += interval
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+        elapsed = time.monotonic() - started
+
+        thread_stats = []
+        for ident, info in threads.items():
+            cpu = None
+            if info['native_id'] is not None:
+                cpu_end = thread_cpu_time(info['native_id'])  # None once the thread has exited
+                cpu = (cpu_end if cpu_end is not None else info['cpu_last']) - info['cpu_start']
+            thread_stats.append({
+                'name': info['name'],
+                'ident': ident,
+                'cpu_seconds': round(cpu, 4) if cpu is not None else None,
+                'cpu_percent': round(cpu / elapsed * 100, 1) if cpu is not None and elapsed else None,
+                'samples': info['samples'],
+            })
+        thread_stats.sort(key=lambda t: (t['cpu_seconds'] or 0, t['samples']), reverse=True)
+
+        leaf_samples = Counter()
+        for stack, count in stacks.items():
+            leaf_samples[stack.rsplit(';', 1)[-1]] += count
+        total_samples = sum(stacks.values())
+        own_cpu = time.thread_time() - own_cpu_started
+
+        result.update({
+            'started_at': started_at.isoformat(),
+            'duration_s': round(elapsed, 3),
+            'interval_ms': round(interval * 1000, 2),
+            'mode': mode,
+            'ticks': ticks,
+            'samples': total_samples,
+            'threads': thread_stats,
+            'top_functions': [{'function': name, 'self_samples': count,
+                               'percent': round(count / total_samples * 100, 1)}
+                              for name, count in leaf_samples.most_common(20)],
+            'profiler_cpu_seconds': round(own_cpu, 4),
+            'collapsed': stacks,
+        })
+
+
+def collapsed_text(profile):
+    """The profile's stacks in collapsed format, one "stack count" line each"""
+    return ''.join(f"{stack} {count}\n" for stack, count in sorted(profile['collapsed'].items()))
+
+
+def save_profile(profile, output_dir=None):
+    """Write <output_dir>/profile_<timestamp>_<mode>.folded; returns the path"""
+    output_dir = output_dir or PROFILER_CONFIG['output_dir']
+    os.makedirs(output_dir, exist_ok=True)
+    stamp = datetime.fromisoformat(profile['started_at']).strftime('%Y%m%d_%H%M%S')
+    path = os.path.join(output_dir, f"profile_{stamp}_{profile['mode']}.folded")
+    with open(path, 'w') as f:
+        f.write(collapsed_text(profile))
+    logger.info(f"🔥 Profile saved to {path} ({profile['samples']} samples)")
+    return path
+
+
+def profile_summary(profile):
+    """The profile without its stacks (for JSON responses)"""
+    summary = {key: value for key, value in profile.items() if key != 'collapsed'}
+    summary['stacks'] = len(profile['collapsed'])
+    return summary
+
+
+# Process-wide profiler used by server.py's /debug/profile
+profiler = SamplingProfiler()
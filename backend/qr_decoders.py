@@ -0,0 +1,154 @@
+"""
+Interchangeable QR decoder backends
+Every backend takes a grayscale (2-D) or BGR image and returns DecodedQR tuples
+with the same data/rect/polygon fields as pyzbar results, so camera.py does not
+care which one is in use.
+
+- pyzbar: ZBar restricted to ZBarSymbol.QRCODE. Skipping the 1-D and DataBar
+  scanners is faster and avoids the databar.c assertion spam on stderr.
+- opencv: cv2.QRCodeDetector (multi-code), needs no native ZBar library.
+- multiscale:<backend>: retries another backend at extra scales when the
+  full-resolution pass finds nothing.
+
+Pick one with QR_DECODER (default 'pyzbar', falling back to 'opencv' when the
+ZBar shared library is missing).
+"""
+
+import os
+import logging
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+Point = namedtuple('Point', ['x', 'y'])
+Rect = namedtuple('Rect', ['left', 'top', 'width', 'height'])
+DecodedQR = namedtuple('DecodedQR', ['data', 'type', 'rect', 'polygon'])
+
+QR_DECODER_CONFIG = {
+    'backend': os.getenv('QR_DECODER', 'pyzbar'),
+    'scales': (1.0, 0.5, 1.5),   # Tried in order by the multiscale wrapper
+}
+
+
+def _gray(image):
+    if image.ndim == 2:
+        return image
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+class PyzbarDecoder:
+    """ZBar via pyzbar, QR symbols only"""
+
+    name = 'pyzbar'
+
+    def __init__(self):
+        from pyzbar.pyzbar import decode, ZBarSymbol  # ImportError if libzbar is missing
+        self._decode = decode
+        self._symbols = [ZBarSymbol.QRCODE]
+
+    def decode(self, image):
+        results = []
+        for obj in self._decode(_gray(image), symbols=self._symbols):
+            rect = obj.rect
+            results.append(DecodedQR(
+                obj.data, 'QRCODE',
+                Rect(rect.left, rect.top, rect.width, rect.height),
+                [Point(point.x, point.y) for point in obj.polygon]
+            ))
+        return results
+
+
+class OpenCVDecoder:
+    """cv2.QRCodeDetector, decodes several codes per frame"""
+
+    name = 'opencv'
+
+    def __init__(self):
+        self._detector = cv2.QRCodeDetector()
+
+    def decode(self, image):
+        ok, texts, points, _ = self._detector.detectAndDecodeMulti(_gray(image))
+        if not ok or points is None:
+            return []
+        results = []
+        for text, corners in zip(texts, points):
+            if not text:
+                continue  # Located but not decodable
+            corners = corners.astype(np.int32)
+            x, y, w, h = cv2.boundingRect(corners)
+            results.append(DecodedQR(
+                text.encode('utf-8'), 'QRCODE',
+                Rect(int(x), int(y), int(w), int(h)),
+                [Point(int(px), int(py)) for px, py in corners]
+            ))
+        return results
+
+
+class MultiScaleDecoder:
+    """Runs another backend at each scale until one of them finds a code"""
+
+    def __init__(self, inner, scales=None):
+        self.inner = inner
+        self.scales = tuple(scales or QR_DECODER_CONFIG['scales'])
+        self.name = f'multiscale:{inner.name}'
+
+    def decode(self, image):
+        for scale in self.scales:
+            if scale == 1.0:
+                results = self.inner.decode(image)
+            else:
+                interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+                scaled = cv2.resize(image, None, fx=scale, fy=scale, interpolation=interpolation)
+                results = [self._unscale(obj, scale) for obj in self.inner.decode(scaled)]
+            if results:
+                return results
+        return []
+
+    @staticmethod
+    def _unscale(obj, scale):
+        rect = obj.rect
+        return obj._replace(
+            rect=Rect(int(rect.left / scale), int(rect.top / scale),
+                      int(rect.width / scale), int(rect.height / scale)),
+            polygon=[Point(int(point.x / scale), int(point.y / scale)) for point in obj.polygon]
+        )
+
+
+QR_DECODER_BACKENDS = {
+    'pyzbar': PyzbarDecoder,
+    'opencv': OpenCVDecoder,
+}
+
+
+def create_decoder(spec):
+    """Build a decoder from 'pyzbar', 'opencv' or 'multiscale:<backend>'"""
+    if spec.startswith('multiscale:'):
+        return MultiScaleDecoder(create_decoder(spec.split(':', 1)[1]))
+    if spec not in QR_DECODER_BACKENDS:
+        raise ValueError(f"Unknown QR decoder backend: {spec}")
+    return QR_DECODER_BACKENDS[spec]()
+
+
+def available_backends():
+    """Backend specs that can be created on this machine"""
+    specs = []
+    for name in QR_DECODER_BACKENDS:
+        try:
+            create_decoder(name)
+        except Exception:
+            continue
+        specs.extend([name, f'multiscale:{name}'])
+    return specs
+
+
+def default_decoder():
+    """Decoder from QR_DECODER, falling back to OpenCV if it cannot be created"""
+    spec = QR_DECODER_CONFIG['backend']
+    try:
+        return create_decoder(spec)
+    except Exception as e:
+        logger.warning(f"QR decoder '{spec}' unavailable ({e}), using OpenCV QRCodeDetector")
+        return OpenCVDecoder()
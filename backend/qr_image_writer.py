@@ -0,0 +1,179 @@
+"""
+Asynchronous QR image writer
+The capture thread hands each QR crop to a worker thread and gets a handle back
+immediately. The worker encodes the crop once (JPEG or WebP at the configured
+quality) and uses that one buffer for both the file on disk and the base64
+preview sent to the frontend, so no encoding or disk I/O happens on the
+capture path.
+"""
+
+import os
+import queue
+import base64
+import threading
+import time
+import logging
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Image format -> (file extension, MIME type, OpenCV quality flag)
+QR_IMAGE_FORMATS = {
+    'jpeg': ('.jpg', 'image/jpeg', cv2.IMWRITE_JPEG_QUALITY),
+    'webp': ('.webp', 'image/webp', cv2.IMWRITE_WEBP_QUALITY),
+}
+
+QR_IMAGE_CONFIG = {
+    'format': os.getenv('QR_IMAGE_FORMAT', 'jpeg').lower(),
+    'quality': int(os.getenv('QR_IMAGE_QUALITY', '85')),
+    'padding': 50,          # Pixels kept around the QR bounds
+    'queue_size': 32,       # Pending crops; new ones are dropped when full
+}
+
+
+class QRImageHandle(dict):
+    """Image metadata returned as soon as a crop is queued.
+
+    It is a plain dict (filename, filepath, mime_type, base64) so it can go
+    straight into the QR history and JSON responses; 'base64' stays None until
+    the worker has encoded the image. wait() blocks until then.
+    """
+
+    def __init__(self, filename, filepath, mime_type):
+        super().__init__(filename=filename, filepath=filepath, mime_type=mime_type, base64=None)
+        self._done = threading.Event()
+        self.error = None
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Wait for the image to be written; returns True once it is available"""
+        return self._done.wait(timeout) and self.error is None
+
+
+class QRImageWriter:
+    """Single worker thread that encodes and writes QR crops"""
+
+    def __init__(self, directory='qr_images', config=None, on_written=None):
+        self.directory = directory
+        self.on_written = on_written  # Called with each handle once its image is available
+        self.config = dict(config or QR_IMAGE_CONFIG)
+        if self.config['format'] not in QR_IMAGE_FORMATS:
+            raise ValueError(f"Unsupported QR image format: {self.config['format']}")
+        os.makedirs(self.directory, exist_ok=True)
+        self._queue = queue.Queue(maxsize=self.config['queue_size'])
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self.stats = {'written': 0, 'dropped': 0, 'failed': 0, 'bytes_written': 0, 'encode_ms_total': 0.0}
+
+    def _ensure_worker(self):
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='qr-image-writer', daemon=True)
+                self._worker.start()
+
+    def crop(self, frame, qr_bounds):
+        """Padded crop around the QR bounds (a view into frame)"""
+        if not qr_bounds:
+            return frame
+        x, y, w, h = qr_bounds
+        padding = self.config['padding']
+        return frame[max(0, y - padding):min(frame.shape[0], y + h + padding),
+                     max(0, x - padding):min(frame.shape[1], x + w + padding)]
+
+    def submit(self, frame, qr_data, qr_bounds=None):
+        """Queue the crop for writing and return its QRImageHandle immediately.
+
+        The crop is copied here because the capture loop keeps drawing overlays
+        on the frame after this call returns. Returns None if the queue is full.
+        """
+        extension, mime_type, _ = QR_IMAGE_FORMATS[self.config['format']]
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        clean_qr_data = qr_data.replace('/', '_').replace('\\', '_')[:20]
+        filename = f"qr_{timestamp}_{clean_qr_data}{extension}"
+        handle = QRImageHandle(filename, os.path.join(self.directory, filename), mime_type)
+
+        image = np.ascontiguousarray(self.crop(frame, qr_bounds)).copy()
+        try:
+            self._queue.put_nowait((handle, image))
+        except queue.Full:
+            self.stats['dropped'] += 1
+            logger.warning(f"QR image queue full, dropped image for {qr_data}")
+            return None
+        self._ensure_worker()
+        return handle
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:  # close() sentinel
+                self._queue.task_done()
+                return
+            handle, image = item
+            try:
+                self._write(handle, image)
+            except Exception as e:
+                handle.error = str(e)
+                self.stats['failed'] += 1
+                logger.error(f"Failed to save QR image {handle['filename']}: {e}")
+            finally:
+                handle._done.set()
+                self._queue.task_done()
+
+    def _write(self, handle, image):
+        extension, _, quality_flag = QR_IMAGE_FORMATS[self.config['format']]
+        started = time.perf_counter()
+        ok, buffer = cv2.imencode(extension, image, [quality_flag, self.config['quality']])
+        if not ok:
+            raise RuntimeError(f"Could not encode image as {self.config['format']}")
+        self.stats['encode_ms_total'] += (time.perf_counter() - started) * 1000
+
+        data = buffer.tobytes()
+        with open(handle['filepath'], 'wb') as f:
+            f.write(data)
+        handle['base64'] = base64.b64encode(data).decode('utf-8')
+        self.stats['written'] += 1
+        self.stats['bytes_written'] += len(data)
+        logger.info(f"Saved QR image: {handle['filename']}")
+        if self.on_written:
+            self.on_written(handle)
+
+    def flush(self, timeout=None):
+        """Block until every queued image has been written (used in tests and shutdown)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout=5.0):
+        """Write every queued image, then stop the worker; returns False if it did not finish in time.
+
+        A later submit() starts a new worker, so the writer can be reused after the camera restarts.
+        """
+        # Holding the start lock makes a concurrent submit() wait and then start a fresh worker
+        with self._start_lock:
+            worker = self._worker
+            if worker is None or not worker.is_alive():
+                return True
+            self._queue.put(None)  # After the pending crops, so they are written first
+            worker.join(timeout)
+            return not worker.is_alive()
+
+    def get_status(self):
+        written = self.stats['written']
+        return {
+            'format': self.config['format'],
+            'quality': self.config['quality'],
+            'pending': self._queue.qsize(),
+            **self.stats,
+            'encode_ms_total': round(self.stats['encode_ms_total'], 1),
+            'avg_encode_ms': round(self.stats['encode_ms_total'] / written, 2) if written else None,
+            'avg_bytes': round(self.stats['bytes_written'] / written) if written else None,
+        }
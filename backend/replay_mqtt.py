@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+MQTT Recording Replayer
+Feeds a recording made in capture mode (MQTT_RECORD=<path> or POST
+/mqtt/recording) back through server.py's MQTTListener without a broker.
+The commands the workflow publishes are asserted against the recording:
+missing, unexpected and (at 1x) late commands fail the replay, so a recorded
+shift doubles as a regression test for workflow timing changes. Handler
+latency per topic and the maximum message rate are reported as a benchmark.
+
+Replay starts from a fresh server state, so record from an idle line (or
+expect the first cycle to differ). The server's own delays run in real time,
+so at Nx speed only the command sequence is checked, not its timing.
+
+Usage:
+    python replay_mqtt.py recordings/mqtt_20251001_120000.mqrec
+    python replay_mqtt.py incident.mqrec.gz --speed 10
+    python replay_mqtt.py incident.mqrec --speed max --json replay.json
+    python replay_mqtt.py incident.mqrec --dump
+"""
+
+import os
+import sys
+import json
+import argparse
+import logging
+from datetime import datetime
+
+from mqtt_recorder import MQTTReplayer, read_recording, INBOUND
+
+
+def dump_recording(path):
+    started_at, records = read_recording(path)
+    print(f"📼 {path}: {len(records)} messages, started {datetime.fromtimestamp(started_at).isoformat()}")
+    for offset, direction, topic, payload in records:
+        arrow = '→' if direction == INBOUND else '←'
+        print(f"{offset:10.3f}s {arrow} {topic}: {payload.decode('utf-8', errors='replace')}")
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(
+        description="Replay an MQTT recording through server.py's MQTT router",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__
+    )
+    parser.add_argument('recording', help='Recording file (.mqrec, or .mqrec.gz)')
+    parser.add_argument('--speed', default='1',
+                       help="Replay speed: 1 for real time, N for N times faster, 'max' for as fast as possible")
+    parser.add_argument('--settle', type=float, default=15.0,
+                       help='Seconds to wait for delayed commands after the last inbound message')
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                       help='Allowed command timing drift in seconds at 1x')
+    parser.add_argument('--dump', action='store_true',
+                       help='Print the recording instead of replaying it')
+    parser.add_argument('--json', dest='json_path',
+                       help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.recording):
+        print(f"❌ Recording not found: {args.recording}")
+        sys.exit(1)
+    if args.dump:
+        dump_recording(args.recording)
+        return
+
+    speed = 0 if args.speed == 'max' else float(args.speed)
+    # Imported here: loading server.py builds the whole Pi service (without starting MQTT)
+    import server
+    logging.getLogger().setLevel(logging.WARNING)
+
+    replayer = MQTTReplayer(server.mqtt_listener, args.recording)
+    print(f"▶️ Replaying {len(replayer.records)} messages from {args.recording} at "
+          f"{'max speed' if not speed else f'{speed:g}x'}")
+    results = replayer.run(speed, args.settle, args.tolerance)
+
+    print(f"📨 {results['inbound']} inbound messages in {results['feed_seconds']}s "
+          f"({results['messages_per_second']} msg/s)")
+    if results['handler_ms']:
+        handler = results['handler_ms']
+        print(f"⏱️ Handler ms: p50 {handler['p50']}  p95 {handler['p95']}  max {handler['max']}")
+    print(f"📤 Commands: {results['matched']}/{results['expected_outbound']} matched, "
+          f"{len(results['unexpected'])} unexpected")
+    for item in results['missing'][:20]:
+        print(f"   ❌ missing  {item['offset']:>9.3f}s {item['topic']}: {item['payload']}")
+    for item in results['unexpected'][:20]:
+        print(f"   ⚠️ extra    {item['offset']:>9.3f}s {item['topic']}: {item['payload']}")
+    if results['timing_drift_s']:
+        drift = results['timing_drift_s']
+        print(f"🕒 Timing drift s: p50 {drift['p50']}  p95 {drift['p95']}  max {drift['max']} "
+              f"({results['late']} beyond ±{args.tolerance}s)")
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results written to {args.json_path}")
+
+    print("✅ Replay matches the recording" if results['passed'] else "❌ Replay differs from the recording")
+    sys.exit(0 if results['passed'] else 1)
+
+
+if __name__ == "__main__":
+    main()
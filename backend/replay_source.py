@@ -0,0 +1,176 @@
+"""
+Replay capture source
+Feeds recorded frames from a video file or an image directory (for example the
+scanner's own qr_images/) into the camera pipeline in place of a Pi camera:
+
+    MockPicamera2(frame_source=ReplaySource('qr_images', fps=15))
+
+or, for server.py, CAMERA_REPLAY=<path> [CAMERA_REPLAY_FPS=<fps>].
+
+Frames are paced at the requested rate (fps=0 replays as fast as they are
+pulled). Each frame can carry a ground-truth label, the QR data it is expected
+to decode to, taken from:
+- a labels JSON file: {"<filename>": "<data>"} for image directories,
+  {"<frame index>": "<data>"} for videos;
+- <directory>/labels.json or <video>.labels.json when present;
+- the QR data embedded in saved scanner filenames (qr_<timestamp>_<data>.jpg).
+The time each label is first served is recorded, so scan latency can be
+measured end to end.
+"""
+
+import os
+import re
+import json
+import time
+import threading
+import logging
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+FRAME_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+SAVED_FRAME_PATTERN = re.compile(r'^qr_\d{8}_\d{6}_\d+_(.+)\.\w+$')
+
+
+def clean_label(data):
+    """Same cleaning the image writer applies to QR data in filenames"""
+    return data.replace('/', '_').replace('\\', '_')[:20]
+
+
+def _default_labels_path(path):
+    candidate = os.path.join(path, 'labels.json') if os.path.isdir(path) else f'{path}.labels.json'
+    return candidate if os.path.exists(candidate) else None
+
+
+class ReplaySource:
+    """Paced frame source over a video file or a directory of images"""
+
+    def __init__(self, path, fps=None, loop=True, labels=None):
+        """fps=None uses the video's own rate (10 fps for image directories); fps=0 is unthrottled"""
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Replay source not found: {path}")
+        self.path = path
+        self.loop = loop
+        self.is_directory = os.path.isdir(path)
+        self.labels = self._load_labels(labels or _default_labels_path(path))
+
+        self._lock = threading.Lock()
+        self._capture = None
+        if self.is_directory:
+            self.files = sorted(name for name in os.listdir(path) if name.lower().endswith(FRAME_EXTENSIONS))
+            if not self.files:
+                raise ValueError(f"No frames in {path}")
+            native_fps = 10.0
+        else:
+            self._capture = cv2.VideoCapture(path)
+            if not self._capture.isOpened():
+                raise ValueError(f"Cannot open video: {path}")
+            native_fps = self._capture.get(cv2.CAP_PROP_FPS) or 30.0
+        self.fps = native_fps if fps is None else float(fps)
+
+        self.index = -1             # Index of the frame most recently served
+        self.current_label = None
+        self.frames_served = 0
+        self.loops = 0
+        self.first_served = {}      # label -> time.monotonic() it was first served
+        self._next_due = None
+        self._last_frame = None
+
+    def _load_labels(self, labels):
+        if labels is None:
+            return {}
+        if isinstance(labels, dict):
+            return {str(key): value for key, value in labels.items()}
+        with open(labels) as f:
+            return {str(key): value for key, value in json.load(f).items()}
+
+    def label_for(self, index):
+        """Ground-truth QR data for a frame index, or None"""
+        if self.is_directory:
+            filename = self.files[index]
+            if filename in self.labels:
+                return self.labels[filename]
+            match = SAVED_FRAME_PATTERN.match(filename)
+            return match.group(1) if match else None
+        return self.labels.get(str(index))
+
+    def _read_next(self):
+        """Next raw frame and its index, rewinding when looping"""
+        next_index = self.index + 1
+        if self.is_directory:
+            for _ in range(len(self.files)):
+                if next_index >= len(self.files):
+                    if not self.loop:
+                        return None, None
+                    next_index = 0
+                    self.loops += 1
+                frame = cv2.imread(os.path.join(self.path, self.files[next_index]), cv2.IMREAD_COLOR)
+                if frame is not None:
+                    return frame, next_index
+                next_index += 1  # Skip unreadable files
+            return None, None
+
+        ok, frame = self._capture.read()
+        if not ok:
+            if not self.loop or next_index == 0:
+                return None, None
+            self._capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            self.loops += 1
+            next_index = 0
+            ok, frame = self._capture.read()
+            if not ok:
+                return None, None
+        return frame, next_index
+
+    def _pace(self):
+        if not self.fps:
+            return
+        now = time.monotonic()
+        if self._next_due is None:
+            self._next_due = now
+        elif self._next_due > now:
+            time.sleep(self._next_due - now)
+        # Schedule against the previous deadline so the average rate does not drift
+        self._next_due = max(self._next_due + 1.0 / self.fps, time.monotonic() - 1.0 / self.fps)
+
+    def next_frame(self):
+        """(frame, label) for the next frame at the configured rate; (None, None) when exhausted"""
+        with self._lock:
+            self._pace()
+            frame, index = self._read_next()
+            if frame is None:
+                return None, None
+            self.index = index
+            self.current_label = self.label_for(index)
+            self.frames_served += 1
+            if self.current_label is not None:
+                self.first_served.setdefault(self.current_label, time.monotonic())
+            self._last_frame = frame
+            return frame, self.current_label
+
+    def read(self):
+        """Frame-only form used as MockPicamera2's frame_source; repeats the last frame once exhausted.
+
+        Returns a copy because the camera draws overlays on the frames it is given.
+        """
+        self.next_frame()
+        if self._last_frame is None:
+            raise RuntimeError(f"Replay source {self.path} produced no frames")
+        return self._last_frame.copy()
+
+    def close(self):
+        if self._capture is not None:
+            self._capture.release()
+
+    def get_status(self):
+        return {
+            'path': self.path,
+            'fps': self.fps,
+            'loop': self.loop,
+            'frames_served': self.frames_served,
+            'loops': self.loops,
+            'current_index': self.index,
+            'current_label': self.current_label,
+            'labelled_codes': len(self.first_served),
+        }
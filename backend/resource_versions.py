@@ -0,0 +1,80 @@
+"""
+Resource versioning for polled read endpoints
+Each resource carries a monotonically increasing version that writers bump
+whenever the underlying state changes. Read endpoints expose it as an ETag, so
+an unchanged poll answers 304 Not Modified without querying SQLite or
+re-encoding JSON, and a changed poll is encoded once and served from cache
+until the next bump.
+"""
+
+import threading
+import zlib
+from flask import request, Response
+
+
+class ResourceVersions:
+    """Thread-safe version counters plus the last encoded response per resource"""
+
+    def __init__(self, max_cached_responses=64):
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._responses = {}  # (resource, query_string) -> (etag, body, mimetype, headers)
+        self.max_cached_responses = max_cached_responses
+
+    def bump(self, *resources):
+        """Mark one or more resources as changed"""
+        with self._lock:
+            for resource in resources:
+                self._versions[resource] = self._versions.get(resource, 0) + 1
+
+    def get(self, resource):
+        """Current version number of a resource"""
+        with self._lock:
+            return self._versions.get(resource, 0)
+
+    def _etag(self, resource, version, query_string):
+        if query_string:
+            return f"{resource}-{version}-{zlib.crc32(query_string):08x}"
+        return f"{resource}-{version}"
+
+    def conditional_response(self, resource, build_response, version=None):
+        """Serve a GET endpoint through its resource version.
+
+        build_response is the endpoint body and must return a Flask response
+        (or a (response, status) tuple). version defaults to the resource's
+        counter; pass a composite value for resources derived from state
+        that is not bumped explicitly. Only 200 responses are cached.
+        """
+        if version is None:
+            version = self.get(resource)
+        query_string = request.query_string
+        etag = self._etag(resource, version, query_string)
+        not_modified_headers = {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
+
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers=not_modified_headers)
+
+        cache_key = (resource, query_string)
+        with self._lock:
+            cached = self._responses.get(cache_key)
+        if cached and cached[0] == etag:
+            _, body, mimetype, headers = cached
+            return Response(body, status=200, mimetype=mimetype, headers=headers)
+
+        result = build_response()
+        response, status = result if isinstance(result, tuple) else (result, None)
+        if status is not None:
+            response.status_code = status
+        if response.status_code != 200:
+            return response
+
+        response.headers.update(not_modified_headers)
+        headers = {key: value for key, value in response.headers.items()
+                   if key.lower() not in ('content-length', 'content-type')}
+        with self._lock:
+            self._responses.pop(cache_key, None)
+            if len(self._responses) >= self.max_cached_responses:
+                # Drop the least recently stored entry (dicts keep insertion order)
+                del self._responses[next(iter(self._responses))]
+            self._responses[cache_key] = (etag, response.get_data(), response.mimetype, headers)
+        return response
@@ -0,0 +1,185 @@
+"""
+Retention and archival for scan history and QR images
+- archive_qr_scans() moves qr_scans rows older than the retention window into
+  monthly archive databases (archive/qr_scans_YYYYMM.db) in small batches.
+- vacuum_database() switches the database to incremental auto-vacuum (a
+  one-time full VACUUM) and then returns free pages to the filesystem.
+- prune_directory() deletes saved QR images past a maximum age, then the
+  oldest remaining ones until the directory fits its disk quota.
+Each step returns a report of what it reclaimed.
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import logging
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+RETENTION_CONFIG = {
+    'qr_scans_days': int(os.getenv('QR_SCANS_RETENTION_DAYS', '90')),
+    'archive_dir': os.getenv('ARCHIVE_DIR', 'archive'),
+    'archive_batch_size': 5000,
+    'qr_images_days': int(os.getenv('QR_IMAGES_RETENTION_DAYS', '30')),
+    'qr_images_max_mb': int(os.getenv('QR_IMAGES_MAX_MB', '500')),
+    'interval_hours': 24,
+}
+
+# UTC time of a qr_scans row: the Pi's ISO timestamp is local time (converted
+# with SQLite's 'utc' modifier), created_at is already UTC CURRENT_TIMESTAMP
+SCAN_TIME = "COALESCE(datetime(REPLACE(timestamp, 'T', ' '), 'utc'), created_at)"
+SCAN_MONTH = f"SUBSTR({SCAN_TIME}, 1, 7)"
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _archive_table_sql(c, table):
+    c.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    create_sql = c.fetchone()[0]
+    return re.sub(rf'^CREATE TABLE\s+"?{table}"?', f'CREATE TABLE IF NOT EXISTS archive.{table}', create_sql)
+
+
+def archive_qr_scans(db_path='database.db', older_than_days=None, archive_dir=None, batch_size=None):
+    """Move old qr_scans rows into archive/qr_scans_YYYYMM.db (UTC months); returns a report"""
+    older_than_days = older_than_days if older_than_days is not None else RETENTION_CONFIG['qr_scans_days']
+    archive_dir = archive_dir or RETENTION_CONFIG['archive_dir']
+    batch_size = batch_size or RETENTION_CONFIG['archive_batch_size']
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=older_than_days)).strftime('%Y-%m-%d %H:%M:%S')
+
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    report = {'cutoff': cutoff, 'rows_archived': 0, 'archives': {}}
+    try:
+        c = conn.cursor()
+        c.execute(f"SELECT DISTINCT {SCAN_MONTH} FROM qr_scans WHERE {SCAN_TIME} < ?", (cutoff,))
+        months = [row[0] for row in c.fetchall() if row[0]]
+        if not months:
+            return report
+
+        os.makedirs(archive_dir, exist_ok=True)
+        for month in months:
+            archive_path = os.path.join(archive_dir, f"qr_scans_{month.replace('-', '')}.db")
+            c.execute('ATTACH DATABASE ? AS archive', (archive_path,))
+            try:
+                c.execute(_archive_table_sql(c, 'qr_scans'))
+                # Explicit column list so archives created before a schema change keep working
+                columns = ', '.join(row[1] for row in c.execute('PRAGMA archive.table_info(qr_scans)').fetchall())
+                moved = 0
+                while True:
+                    # One short transaction per batch keeps writers unblocked; the
+                    # copy and delete commit atomically across both databases
+                    c.execute('BEGIN IMMEDIATE')
+                    try:
+                        c.execute(f'''
+                            SELECT json_group_array(id) FROM (
+                                SELECT id FROM qr_scans
+                                WHERE {SCAN_MONTH} = ? AND {SCAN_TIME} < ?
+                                ORDER BY id LIMIT ?
+                            )
+                        ''', (month, cutoff, batch_size))
+                        ids = c.fetchone()[0]
+                        count = len(json.loads(ids))
+                        if count:
+                            c.execute(f'''
+                                INSERT OR IGNORE INTO archive.qr_scans ({columns})
+                                SELECT {columns} FROM main.qr_scans WHERE id IN (SELECT value FROM json_each(?))
+                            ''', (ids,))
+                            c.execute('DELETE FROM main.qr_scans WHERE id IN (SELECT value FROM json_each(?))', (ids,))
+                        c.execute('COMMIT')
+                    except Exception:
+                        c.execute('ROLLBACK')
+                        raise
+                    moved += count
+                    if count < batch_size:
+                        break
+            finally:
+                c.execute('DETACH DATABASE archive')
+
+            report['archives'][archive_path] = moved
+            report['rows_archived'] += moved
+            logger.info(f"📦 RETENTION: Archived {moved} qr_scans rows from {month} to {archive_path}")
+    finally:
+        conn.close()
+    return report
+
+
+def vacuum_database(db_path='database.db'):
+    """Return free pages to the filesystem with incremental vacuum; returns a report"""
+    size_before = _file_size(db_path)
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    try:
+        c = conn.cursor()
+        converted = False
+        if c.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            # auto_vacuum can only change on an empty database or through a full VACUUM (one time)
+            logger.info("🧹 RETENTION: Enabling incremental auto-vacuum (one-time full VACUUM)")
+            c.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            c.execute('VACUUM')
+            converted = True
+        free_pages = c.execute('PRAGMA freelist_count').fetchone()[0]
+        page_size = c.execute('PRAGMA page_size').fetchone()[0]
+        c.execute('PRAGMA incremental_vacuum')
+    finally:
+        conn.close()
+
+    size_after = _file_size(db_path)
+    return {
+        'converted_to_incremental': converted,
+        'free_pages_released': free_pages,
+        'page_size': page_size,
+        'size_before': size_before,
+        'size_after': size_after,
+        'bytes_reclaimed': max(0, size_before - size_after)
+    }
+
+
+def prune_directory(directory, max_age_days=None, max_bytes=None, extensions=('.jpg', '.jpeg', '.png', '.webp')):
+    """Delete files older than max_age_days, then the oldest until under max_bytes"""
+    max_age_days = max_age_days if max_age_days is not None else RETENTION_CONFIG['qr_images_days']
+    max_bytes = max_bytes if max_bytes is not None else RETENTION_CONFIG['qr_images_max_mb'] * 1024 * 1024
+    report = {'directory': directory, 'files_removed': 0, 'bytes_reclaimed': 0,
+              'remaining_files': 0, 'remaining_bytes': 0}
+    if not os.path.isdir(directory):
+        return report
+
+    files = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.lower().endswith(extensions):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+    files.sort()  # Oldest first
+
+    def remove(path, size):
+        try:
+            os.remove(path)
+            report['files_removed'] += 1
+            report['bytes_reclaimed'] += size
+            return True
+        except OSError as e:
+            logger.warning(f"⚠️ RETENTION: Could not remove {path}: {e}")
+            return False
+
+    age_cutoff = time.time() - max_age_days * 86400
+    kept = [(mtime, size, path) for mtime, size, path in files
+            if not (mtime < age_cutoff and remove(path, size))]
+
+    total = sum(size for _, size, _ in kept)
+    while kept and total > max_bytes:
+        _, size, path = kept.pop(0)
+        if remove(path, size):
+            total -= size
+
+    report['remaining_files'] = len(kept)
+    report['remaining_bytes'] = total
+    if report['files_removed']:
+        logger.info(f"🧹 RETENTION: Removed {report['files_removed']} images from {directory}, "
+                    f"reclaimed {report['bytes_reclaimed'] / 1024 / 1024:.1f} MB")
+    return report
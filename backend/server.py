@@ -1,8 +1,18 @@
 from flask import Flask, jsonify, request, Response
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit
-from print import ReceiptPrinter
-from camera import CameraManager
+from resource_versions import ResourceVersions
+from event_stream import EventStream
+from audio_cues import audio_cues
+from loadcell import LoadcellStream, LOADCELL_STABILITY, translate_legacy_settings
+from telemetry import TelemetryForwarder
+from retention import prune_directory, RETENTION_CONFIG
+from mqtt_recorder import MQTTRecorder, INBOUND, OUTBOUND, MQTT_RECORDING_CONFIG
+from metrics import metrics, instrument_flask, timed_connect
+from tracing import tracer, TracedSession, render_waterfall, step_name, BELT_B
+from profiler import profiler, ProfileBusyError, collapsed_text, save_profile, profile_summary
+from log_pipeline import setup_logging
+from startup import LazySubsystem, startup_timer, start_warm_up, STARTUP_CONFIG
 import paho.mqtt.client as mqtt
 import logging
 from datetime import datetime
@@ -11,38 +21,19 @@ import time
 import requests
 import os
 import re
-import sqlite3
-import pygame
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-# Initialize pygame mixer for alarm sounds
-try:
-    pygame.mixer.init()
-    PYGAME_AVAILABLE = True
-    logger = logging.getLogger(__name__)
-    logger.info("✅ Pygame mixer initialized for alarm sounds")
-except Exception as e:
-    PYGAME_AVAILABLE = False
-    logger = logging.getLogger(__name__)
-    logger.warning(f"⚠️ Pygame mixer not available: {e}")
-
 # Database helper function
 def dict_factory(cursor, row):
     """Convert sqlite row to dictionary"""
     return {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
 
-# Configure logging with improved format and separate levels
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('server.log'),
-        logging.StreamHandler()
-    ]
-)
+# Configure logging: JSON lines to server.log (rotated) and text to the console, written by a
+# background thread so hot paths only enqueue (see log_pipeline.py for sampling and rate limits)
+log_pipeline = setup_logging('server.log', service='server')
 logger = logging.getLogger(__name__)
 
 # Set specific log levels for different components
@@ -50,29 +41,12 @@ logging.getLogger('paho').setLevel(logging.WARNING)  # Reduce MQTT client verbos
 logging.getLogger('werkzeug').setLevel(logging.WARNING)  # Reduce Flask verbosity
 
 # Suppress ZBar decoder warnings
-import sys
 import warnings
 
-# Suppress ZBar warnings at the Python level
+# Suppress ZBar warnings at the Python level (log records mentioning them are dropped by log_pipeline)
 warnings.filterwarnings("ignore", message=".*zbar.*")
 warnings.filterwarnings("ignore", message=".*databar.*")
 
-# Filter ZBar warnings from stderr output
-class StderrFilter:
-    def __init__(self):
-        self.original_stderr = sys.stderr
-        
-    def write(self, s):
-        # Filter out ZBar decoder warnings
-        if '_zbar_decode_databar: Assertion' not in s and 'decoder/databar.c' not in s and 'WARNING: decoder/databar.c' not in s:
-            self.original_stderr.write(s)
-            
-    def flush(self):
-        self.original_stderr.flush()
-
-# Apply stderr filter to suppress ZBar C library warnings
-sys.stderr = StderrFilter()
-
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-raspi'
 
@@ -83,6 +57,12 @@ CORS(app,
      allow_headers=["Content-Type", "Authorization"],
      supports_credentials=True)  # Allow credentials
 
+# Request, MQTT, camera, printer and backend-call metrics, scraped from /metrics
+instrument_flask(app)
+
+# Calls to the backend reuse connections and are timed in http_client_request_duration_seconds
+backend_http = TracedSession()
+
 # Initialize SocketIO with minimal configuration to avoid conflicts
 socketio = SocketIO(app, 
                    cors_allowed_origins="*", 
@@ -93,8 +73,37 @@ socketio = SocketIO(app,
                    ping_timeout=60,
                    ping_interval=25)
 
-printer = ReceiptPrinter()
-camera = CameraManager()
+def create_printer():
+    """Receipt printer (PIL, qrcode, fonts) and, through it, the audio cue engine"""
+    from print import ReceiptPrinter
+    return ReceiptPrinter()
+
+def create_camera():
+    """Camera manager (OpenCV, QR decoder, Picamera2) with the status and QR callbacks registered"""
+    from camera import CameraManager
+    manager = CameraManager()
+    manager.add_status_callback(lambda status: event_stream.publish('camera_status', status))
+    manager.add_qr_callback(on_qr_detected)
+    logger.info("QR detection callback registered")
+    return manager
+
+# Built on first use or by the warm-up after startup (see startup.py), so the control plane comes up first
+printer = LazySubsystem('printer', create_printer)
+camera = LazySubsystem('camera', create_camera)
+
+# Versions of polled read resources, exposed as ETags for conditional GETs
+response_versions = ResourceVersions()
+
+# Raw sensor telemetry, batched and forwarded to the backend's telemetry store
+telemetry = TelemetryForwarder(f'{os.getenv("BACKEND_URL", "http://10.194.125.225:5000")}/api/telemetry', session=backend_http)
+
+# Typed state-change events pushed to dashboards over /stream
+event_stream = EventStream()
+
+def emit_event(event_type, data):
+    """Emit an event to SocketIO clients and publish it on the SSE stream"""
+    socketio.emit(event_type, data)
+    event_stream.publish(event_type, data)
 
 # Global state variables for Motor B and IR B cycle control
 motor_b_cycle_state = {
@@ -106,11 +115,6 @@ motor_b_cycle_state = {
     'qr_validated': False          # Whether QR validation has occurred
 }
 
-# Alarm cooldown system to prevent spam
-alarm_cooldown = {
-    'last_alarm_time': None,
-    'cooldown_duration': 15  # 15 seconds cooldown between alarms
-}
 
 def reset_motor_b_cycle():
     """Reset the Motor B and IR B cycle state for a new cycle"""
@@ -127,41 +131,20 @@ def reset_motor_b_cycle():
 
 def play_alarm_sound():
     """Play alarm sound when metallic item is detected with cooldown to prevent spam"""
-    global alarm_cooldown
-    current_time = time.time()
-    
-    # Check if we're still in cooldown period
-    if (alarm_cooldown['last_alarm_time'] is not None and 
-        current_time - alarm_cooldown['last_alarm_time'] < alarm_cooldown['cooldown_duration']):
-        
-        remaining_time = alarm_cooldown['cooldown_duration'] - (current_time - alarm_cooldown['last_alarm_time'])
+    # Preloaded cue, played from the audio worker thread to avoid blocking
+    if not audio_cues.play('alarm'):
+        remaining_time = audio_cues.cooldown_remaining('alarm')
         logger.info(f"🔇 ALARM COOLDOWN: Metallic item detected but alarm in cooldown ({remaining_time:.1f}s remaining)")
         return False  # Return False to indicate alarm was not played due to cooldown
     
-    def play_sound():
-        try:
-            if PYGAME_AVAILABLE and pygame.mixer.get_init():
-                # Path to alarm sound on Raspberry Pi
-                alarm_path = "/sound/alarm.mp3"
-                if os.path.exists(alarm_path):
-                    sound = pygame.mixer.Sound(alarm_path)
-                    sound.play()
-                    logger.info("🚨 ALARM: Metallic item detected - Alarm sound played")
-                else:
-                    logger.warning(f"⚠️ ALARM: Sound file not found: {alarm_path}")
-            else:
-                logger.warning("⚠️ ALARM: Pygame mixer not available")
-        except Exception as e:
-            logger.error(f"❌ ALARM: Failed to play alarm sound: {e}")
-    
-    # Update last alarm time
-    alarm_cooldown['last_alarm_time'] = current_time
-    
-    # Play alarm sound in background thread to avoid blocking
-    threading.Thread(target=play_sound, daemon=True).start()
+    logger.info("🚨 ALARM: Metallic item detected - Alarm sound queued")
     return True  # Return True to indicate alarm was played
     logger.info("✅ CYCLE RESET: Motor B and IR B cycle state reset complete")
 
+# MQTT metrics: the handler histogram's _count doubles as the inbound message counter
+MQTT_HANDLER_SECONDS = metrics.histogram('mqtt_handler_seconds', 'Time spent handling an inbound MQTT message', ('topic',))
+MQTT_PUBLISHED = metrics.counter('mqtt_published_messages', 'MQTT messages published by the server', ('topic', 'result'))
+
 # MQTT Listener Class
 class MQTTListener:
     def __init__(self, broker_host="localhost", broker_port=1883):
@@ -175,6 +158,7 @@ class MQTTListener:
         self.client.on_message = self.on_message
         self.client.on_disconnect = self.on_disconnect
         self.is_connected = False
+        self.recorder = None  # MQTTRecorder while capture mode is on
         
     def on_connect(self, client, userdata, flags, rc):
         if rc == 0:
@@ -191,6 +175,22 @@ class MQTTListener:
             self.is_connected = False
 
     def on_message(self, client, userdata, msg):
+        recorder = self.recorder  # stop_recording() may clear it from another thread
+        if recorder:
+            recorder.record(INBOUND, msg.topic, msg.payload)
+        message = msg.payload.decode('utf-8', errors='replace')
+        trace_id = tracer.inbound(msg.topic, message)
+        started = time.monotonic()
+        try:
+            with tracer.bind(trace_id):
+                self._handle_message(msg)
+        finally:
+            finished = time.monotonic()
+            MQTT_HANDLER_SECONDS.labels(msg.topic).observe(finished - started)
+            if trace_id:
+                tracer.add_span(trace_id, step_name('mqtt ←', msg.topic, message), started, finished)
+
+    def _handle_message(self, msg):
         timestamp = datetime.now().strftime('%H:%M:%S')
         try:
             message = msg.payload.decode('utf-8')
@@ -202,99 +202,28 @@ class MQTTListener:
         
         # Process specific MQTT topics for sensor data
         global mqtt_sensor_data
+        loadcell_reading = None
         try:
             # Handle loadcell weight data (Step 3: Load Sensor gets weight)
             # Support both /loadcell and esp32/loadcell/data topics
             if topic.lower() in ['/loadcell', 'esp32/loadcell/data']:
                 try:
-                    # Extract weight value from message - handle both raw numbers and formatted messages
-                    weight = None
-                    
-                    # Check if message contains formatted weight (e.g., "📦 Final Weight: 418.6 g")
                     if "Final Weight:" in message:
-                        # Extract the numeric value from formatted message
+                        # Firmware summary line (e.g. "📦 Final Weight: 418.6 g"); only used when the
+                        # stream processor has not already settled on a weight for this package
                         weight_match = re.search(r'Final Weight:\s*([0-9]+\.?[0-9]*)', message)
-                        if weight_match:
-                            weight_grams = float(weight_match.group(1))
-                            weight = weight_grams / 1000  # Convert grams to kg for consistent storage
-                            logger.info(f"LOADCELL: Parsed formatted weight: {weight_grams}g ({weight}kg) from message: {message}")
-                            
-                            # Store weight in database first, then start grabber1
-                            def process_final_weight():
-                                try:
-                                    logger.info("STEP 3 - FINAL WEIGHT RECEIVED: Storing in database...")
-                                    
-                                    # Store weight data in database (weight is already in kg)
-                                    mqtt_sensor_data['loadcell']['weight'] = weight
-                                    mqtt_sensor_data['loadcell']['timestamp'] = datetime.now().isoformat()
-                                    
-                                    # Store weight in loaded_sensor_data database
-                                    store_weight_data_in_db()
-                                    
-                                    logger.info("STEP 4 - WEIGHT STORED: Starting Grabber1...")
-                                    
-                                    # Send grabber1 start request via MQTT
-                                    success = mqtt_listener.publish_message('esp32/grabber1/request', 'start')
-                                    if success:
-                                        logger.info("SUCCESS: Grabber1 START request sent (esp32/grabber1/request > start)")
-                                        
-                                        # Emit WebSocket notification
-                                        socketio.emit('workflow_progress', {
-                                            'step': 4,
-                                            'status': 'grabber1_start_requested',
-                                            'message': 'Weight stored in DB - Grabber1 start requested',
-                                            'timestamp': datetime.now().isoformat(),
-                                            'triggered_by': 'loadcell_final_weight',
-                                            'weight': weight
-                                        })
-                                    else:
-                                        logger.error("FAILED: Could not send grabber1 start request")
-                                        
-                                except Exception as e:
-                                    logger.error(f"Error processing final weight: {e}")
-                            
-                            # Start processing in background thread
-                            request_thread = threading.Thread(target=process_final_weight, daemon=True)
-                            request_thread.start()
-                    else:
-                        # Try to parse as direct numeric value
-                        weight = float(message)
-                    
-                    if weight is None:
-                        raise ValueError(f"Could not extract weight from: {message}")
-                    
-                    # Apply spam filtering if enabled
-                    if LOADCELL_SPAM_FILTER['enabled']:
-                        # Filter out spam messages - only process if weight is meaningful
-                        # and different from last reading
-                        min_weight = LOADCELL_SPAM_FILTER['min_weight_threshold']
-                        change_threshold = LOADCELL_SPAM_FILTER['weight_change_threshold']
-                        
-                        if (weight > min_weight and 
-                            (mqtt_sensor_data['loadcell']['weight'] is None or 
-                             abs(weight - (mqtt_sensor_data['loadcell']['weight'] or 0)) > change_threshold)):
-                            
-                            mqtt_sensor_data['loadcell']['weight'] = weight
-                            mqtt_sensor_data['loadcell']['timestamp'] = datetime.now().isoformat()
-                            weight_grams = weight * 1000  # Convert kg to grams
-                            logger.info(f"STEP 3 - LOADCELL: Weight captured {weight_grams:.1f}g")
-                            
-                            # Store ONLY weight data in database (first entry)
-                            store_weight_data_in_db()
+                        if not weight_match:
+                            raise ValueError(f"Could not extract weight from: {message}")
+                        weight = float(weight_match.group(1)) / 1000  # Convert grams to kg for consistent storage
+                        if loadcell_stream.accept_external_weight(weight) is not None:
+                            logger.info(f"LOADCELL: Using firmware final weight {weight * 1000:.1f}g")
                         else:
-                            # Suppress spam logging for zero or very small weight readings
-                            if weight <= min_weight:
-                                pass  # Don't log zero/near-zero readings
-                            else:
-                                weight_grams = weight * 1000  # Convert kg to grams
-                                logger.debug(f"LOADCELL: Ignoring similar weight reading {weight_grams:.1f}g")
+                            logger.debug(f"LOADCELL: Firmware final weight {weight * 1000:.1f}g ignored (already settled)")
                     else:
-                        # No filtering - process all weight readings
-                        mqtt_sensor_data['loadcell']['weight'] = weight
-                        mqtt_sensor_data['loadcell']['timestamp'] = datetime.now().isoformat()
-                        weight_grams = weight * 1000  # Convert kg to grams
-                        logger.info(f"STEP 3 - LOADCELL: Weight captured {weight_grams:.1f}g")
-                        store_weight_data_in_db()
+                        # Raw reading: the stream processor emits one stable weight per package
+                        loadcell_reading = float(message)
+                        telemetry.record('loadcell_raw', loadcell_reading)
+                        loadcell_stream.add_reading(loadcell_reading)
                     
                 except ValueError as e:
                     logger.warning(f"Invalid weight value received: {message} - Error: {e}")
@@ -334,7 +263,7 @@ class MQTTListener:
                         logger.info("✅ LOADCELL: Advanced load cell started successfully")
                         
                         # Emit loadcell start status via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 2.1,
                             'status': 'loadcell_started',
                             'message': 'Load cell started and ready for measurement',
@@ -346,7 +275,7 @@ class MQTTListener:
                         logger.info("📊 LOADCELL: Weight detected, starting data collection")
                         
                         # Emit weight detection status via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 2.2,
                             'status': 'weight_detected',
                             'message': 'Weight detected on load cell - collecting measurement data',
@@ -358,7 +287,7 @@ class MQTTListener:
                         logger.info("⏹️ LOADCELL: Load cell stopped")
                         
                         # Emit loadcell stop status via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 2.9,
                             'status': 'loadcell_stopped',
                             'message': 'Load cell measurement stopped',
@@ -387,7 +316,7 @@ class MQTTListener:
                         logger.info("🔧 ACTUATOR: Actuator pushing (autonomous ESP32 operation)")
                         
                         # Emit actuator start status via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 2.1,
                             'status': 'actuator_pushing',
                             'message': 'Actuator pushing (ESP32 autonomous)',
@@ -399,7 +328,7 @@ class MQTTListener:
                         logger.info("✅ ACTUATOR: Actuator cycle complete (loadcell already started simultaneously)")
                         
                         # Just emit status update - loadcell was already started simultaneously
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 2.1,
                             'status': 'actuator_complete',
                             'message': 'Actuator cycle complete (loadcell already started)',
@@ -411,7 +340,7 @@ class MQTTListener:
                         logger.info("⚡ ACTUATOR: Actuator started - Will start loadcell after completion")
                         
                         # Emit actuator start status via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 2.1,
                             'status': 'actuator_started',
                             'message': 'Actuator started - Will start loadcell after completion',
@@ -423,7 +352,7 @@ class MQTTListener:
                         logger.info("⏹️ ACTUATOR: Actuator stopped")
                         
                         # Emit actuator stop status via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 2.9,
                             'status': 'actuator_stopped',
                             'message': 'Actuator stopped',
@@ -450,6 +379,7 @@ class MQTTListener:
                     # Check for IR sensor triggered message from ESP32 hardware
                     if 'triggered' in message.lower() or 'detected' in message.lower() or message.strip() == '1':
                         logger.info("STEP 1 - IR SENSOR: ESP32 IR sensor detected object - Stopping Motor A")
+                        telemetry.record('ir_a', 1)
                         
                         # Reset Motor B cycle at the start of a new process
                         reset_motor_b_cycle()
@@ -466,7 +396,7 @@ class MQTTListener:
                                     logger.info("SUCCESS: Motor A STOP request sent (esp32/motor/request > stopA)")
                                     
                                     # Emit immediate IR sensor status via WebSocket
-                                    socketio.emit('workflow_progress', {
+                                    emit_event('workflow_progress', {
                                         'step': 1,
                                         'status': 'ir_triggered_motor_stopping',
                                         'message': 'IR A triggered - Motor A stop requested',
@@ -478,7 +408,7 @@ class MQTTListener:
                                     logger.error("FAILED: Could not send Motor A stop request")
                                     
                                     # Emit error status
-                                    socketio.emit('workflow_progress', {
+                                    emit_event('workflow_progress', {
                                         'step': 1,
                                         'status': 'error',
                                         'message': 'IR A triggered but failed to stop Motor A',
@@ -527,7 +457,7 @@ class MQTTListener:
                                     logger.error("FAILED: Could not send loadcell start request")
                                 
                                 # Emit WebSocket notification for simultaneous start
-                                socketio.emit('workflow_progress', {
+                                emit_event('workflow_progress', {
                                     'step': 2.1,
                                     'status': 'actuator_and_loadcell_start_requested',
                                     'message': 'Actuator and Loadcell started simultaneously (no delay)',
@@ -552,7 +482,7 @@ class MQTTListener:
                         parallel_thread.start()
                         
                         # Emit immediate motor status via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 2,
                             'status': 'motor_a_stopped_parallel_sequence',
                             'message': 'Motor A stopped by IR A - Starting actuator and loadcell immediately',
@@ -562,6 +492,7 @@ class MQTTListener:
                     
                     # Check for IR B triggered message - only if IR B is enabled
                     elif '📍 IR B triggered' in message:
+                        telemetry.record('ir_b', 1)
                         if motor_b_cycle_state['ir_b_enabled'] and motor_b_cycle_state['motor_b_first_run']:
                             logger.info(f"STEP - IR B: IR B triggered - Object detected, disabling IR B and starting QR validation")
                             
@@ -587,7 +518,7 @@ class MQTTListener:
                                         logger.info("SUCCESS: Motor B STOP request sent (esp32/motor/request > stopB)")
                                         
                                         # Emit WebSocket notification for Motor B stop
-                                        socketio.emit('workflow_progress', {
+                                        emit_event('workflow_progress', {
                                             'step': 'motor_b_stop',
                                             'status': 'motor_b_stop_requested',
                                             'message': 'IR B triggered - Motor B stopped, IR B disabled, starting QR validation',
@@ -618,7 +549,7 @@ class MQTTListener:
                         logger.info(f"STEP - MOTOR B: Motor B stopped successfully")
                         
                         # Emit WebSocket notification for Motor B stopped
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 'motor_b_stopped',
                             'status': 'motor_b_stopped_complete',
                             'message': 'Motor B stopped successfully',
@@ -643,7 +574,7 @@ class MQTTListener:
                                     logger.info("SUCCESS: Motor B RESTART request sent (esp32/motor/request > startB)")
                                     
                                     # Emit WebSocket notification for Motor B restart
-                                    socketio.emit('workflow_progress', {
+                                    emit_event('workflow_progress', {
                                         'step': 'motor_b_restart',
                                         'status': 'motor_b_restart_requested',
                                         'message': 'Motor B restart requested after timeout',
@@ -677,7 +608,7 @@ class MQTTListener:
                                     logger.info("STEP 3 TRIGGER: Sent loadcell request (esp32/loadcell/request > start)")
                                     
                                     # Emit workflow progress via WebSocket
-                                    socketio.emit('workflow_progress', {
+                                    emit_event('workflow_progress', {
                                         'step': 2.5,
                                         'status': 'loadcell_requested',
                                         'message': 'Object detected, loadcell reading requested',
@@ -694,7 +625,7 @@ class MQTTListener:
                         request_thread.start()
                         
                         # Emit immediate motor status via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 2,
                             'status': 'object_detected',
                             'message': 'Object detected! Motor paused, requesting weight measurement',
@@ -727,7 +658,7 @@ class MQTTListener:
                         logger.info("🤖 STEP 4 ACTIVE: Parcel grabber operation initiated")
                         
                         # Emit grabber started status via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 4,
                             'status': 'active',
                             'message': 'Parcel grabber started - beginning pickup sequence',
@@ -738,7 +669,7 @@ class MQTTListener:
                         logger.info("🔧 STEP 4 PROGRESS: Grabbing parcel...")
                         
                         # Emit grabbing progress via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 4.1,
                             'status': 'grabbing',
                             'message': 'Grabbing parcel with servo arms',
@@ -749,7 +680,7 @@ class MQTTListener:
                         logger.info("🔄 STEP 4 PROGRESS: Rotating 90° forward...")
                         
                         # Emit rotation progress via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 4.2,
                             'status': 'rotating',
                             'message': 'Rotating package 90° forward',
@@ -760,7 +691,7 @@ class MQTTListener:
                         logger.info("🤲 STEP 4 PROGRESS: Releasing parcel...")
                         
                         # Emit release progress via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 4.3,
                             'status': 'releasing',
                             'message': 'Releasing parcel at destination',
@@ -771,7 +702,7 @@ class MQTTListener:
                         logger.info("🔁 STEP 4 PROGRESS: Rotating back to start position...")
                         
                         # Emit return rotation progress via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 4.4,
                             'status': 'returning',
                             'message': 'Returning grabber to start position',
@@ -798,7 +729,7 @@ class MQTTListener:
                                     logger.info("SUCCESS: Motor startB request sent (esp32/motor/request > startB)")
                                     
                                     # Emit WebSocket notification
-                                    socketio.emit('workflow_progress', {
+                                    emit_event('workflow_progress', {
                                         'step': 6,
                                         'status': 'motor_b_start_requested',
                                         'message': 'Parcel process 2 complete - Motor B start requested',
@@ -819,7 +750,7 @@ class MQTTListener:
                         logger.info("🛑 PARCEL GRABBER: Operation stopped")
                         
                         # Emit stopped status via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 4,
                             'status': 'stopped',
                             'message': 'Parcel grabber operation stopped',
@@ -839,7 +770,7 @@ class MQTTListener:
                         logger.info("🤖 STEP 4 ACTIVE: Parcel grabber 1 operation initiated")
                         
                         # Emit grabber started status via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 4,
                             'status': 'active',
                             'message': 'Parcel grabber 1 started - beginning pickup sequence',
@@ -850,7 +781,7 @@ class MQTTListener:
                         logger.info("🔄 STEP 4 PROGRESS: Moved to size checker...")
                         
                         # Emit movement progress via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 4.2,
                             'status': 'moving',
                             'message': 'Moving parcel to size checker',
@@ -876,7 +807,7 @@ class MQTTListener:
                                     logger.info("SUCCESS: Box START request sent (esp32/box/request > start)")
                                     
                                     # Emit WebSocket notification for box start
-                                    socketio.emit('workflow_progress', {
+                                    emit_event('workflow_progress', {
                                         'step': 4.5,
                                         'status': 'box_start_requested',
                                         'message': 'Box system start requested after 5s delay',
@@ -894,7 +825,7 @@ class MQTTListener:
                         request_thread.start()
                         
                         # Emit completion status via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 4,
                             'status': 'complete',
                             'message': 'Parcel grabber 1 process complete',
@@ -958,7 +889,7 @@ class MQTTListener:
                         logger.info("✅ STEP 4.75 COMPLETE: 🏠 Sensor returned to home position")
                         
                         # Emit sensor home position status via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 4.75,
                             'status': 'complete',
                             'message': '🏠 Sensor returned to home position',
@@ -999,7 +930,7 @@ class MQTTListener:
                                         mqtt_sensor_data['stepper']['current_size'] = package_size
                                         
                                         # Emit WebSocket notification for stepper positioning
-                                        socketio.emit('workflow_progress', {
+                                        emit_event('workflow_progress', {
                                             'step': 5.2,
                                             'status': 'stepper_positioning',
                                             'message': f'Stepper positioning for {package_size} package (from COMPLETE PACKAGE DATA)',
@@ -1022,7 +953,7 @@ class MQTTListener:
                                     logger.info("SUCCESS: Grabber2 START request sent (esp32/grabber2/request > start)")
                                     
                                     # Emit WebSocket notification for grabber2 start
-                                    socketio.emit('workflow_progress', {
+                                    emit_event('workflow_progress', {
                                         'step': 6,
                                         'status': 'grabber2_start_requested',
                                         'message': 'Box data stored - Grabber2 start requested',
@@ -1042,7 +973,7 @@ class MQTTListener:
                         request_thread.start()
                         
                         # Emit box completion status via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 5,
                             'status': 'complete',
                             'message': 'Box system process complete - Storing size data',
@@ -1053,7 +984,7 @@ class MQTTListener:
                         logger.info("🤖 STEP 4.5 ACTIVE: Box system operation initiated")
                         
                         # Emit box started status via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 4.5,
                             'status': 'active',
                             'message': 'Box system started',
@@ -1073,7 +1004,7 @@ class MQTTListener:
                         logger.info("✅ STEP 4.75 COMPLETE: 🏠 Sensor returned to home position")
                         
                         # Emit sensor home position status via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 4.75,
                             'status': 'complete',
                             'message': '🏠 Sensor returned to home position',
@@ -1084,7 +1015,7 @@ class MQTTListener:
                         logger.info("🔄 STEP 4.75 ACTIVE: Sensor returning to home position")
                         
                         # Emit sensor returning status via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 4.75,
                             'status': 'active',
                             'message': 'Sensor returning to home position',
@@ -1121,6 +1052,7 @@ class MQTTListener:
                         
                         # Store current size for back command
                         mqtt_sensor_data['stepper']['current_size'] = size
+                        telemetry.record('stepper_size', {'small': 1, 'medium': 2, 'large': 3}[size])
                         
                         # Schedule back command after 5 seconds
                         def send_stepper_back_command():
@@ -1136,7 +1068,7 @@ class MQTTListener:
                                     logger.info(f"SUCCESS: Stepper back request sent (esp32/stepper/request > {back_command})")
                                     
                                     # Emit WebSocket notification
-                                    socketio.emit('workflow_progress', {
+                                    emit_event('workflow_progress', {
                                         'step': 'stepper_back',
                                         'status': 'stepper_back_requested',
                                         'message': f'Stepper {back_command} command sent after 5s delay',
@@ -1153,7 +1085,7 @@ class MQTTListener:
                         threading.Thread(target=send_stepper_back_command, daemon=True).start()
                         
                         # Emit WebSocket notification for stepper positioning complete
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 'stepper_positioned',
                             'status': 'stepper_positioned_complete',
                             'message': f'Stepper positioned for {size} package - back command scheduled',
@@ -1236,7 +1168,7 @@ class MQTTListener:
                         threading.Thread(target=stop_and_restart_sequence, daemon=True).start()
                         
                         # Emit WebSocket notification about back completion
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 'stepper_back_complete',
                             'status': 'complete',
                             'message': 'Stepper back process complete - Restarting system loop',
@@ -1283,7 +1215,7 @@ class MQTTListener:
                         threading.Thread(target=start_motor_sequence, daemon=True).start()
                         
                         # Emit WebSocket notification
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 'stepper_complete',
                             'status': 'complete',
                             'message': 'Stepper process complete - Starting motor sequence',
@@ -1303,7 +1235,7 @@ class MQTTListener:
                         logger.info("🤖 STEP 5 ACTIVE: Parcel grabber 2 operation initiated")
                         
                         # Emit grabber2 started status via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 5,
                             'status': 'active',
                             'message': 'Parcel grabber 2 started - beginning pickup sequence',
@@ -1314,7 +1246,7 @@ class MQTTListener:
                         logger.info("🔄 STEP 5 PROGRESS: Moved to conveyor 2...")
                         
                         # Emit movement progress via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 5.1,
                             'status': 'moving',
                             'message': 'Moving parcel to conveyor 2',
@@ -1350,7 +1282,7 @@ class MQTTListener:
                                     motor_b_cycle_state['motor_b_first_run'] = True
                                     
                                     # Emit WebSocket notification
-                                    socketio.emit('workflow_progress', {
+                                    emit_event('workflow_progress', {
                                         'step': 5.3,
                                         'status': 'motor_b_and_ir_b_started',
                                         'message': 'Motor B and IR B sensor started after grabber2 returned to conveyor belt 1',
@@ -1370,7 +1302,7 @@ class MQTTListener:
                         motor_b_thread.start()
                         
                         # Emit return movement progress via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 5.2,
                             'status': 'returned_starting_motor_b',
                             'message': 'Grabber returned to conveyor belt 1 - Starting Motor B',
@@ -1406,7 +1338,7 @@ class MQTTListener:
                                     motor_b_cycle_state['motor_b_first_run'] = True
                                     
                                     # Emit WebSocket notification
-                                    socketio.emit('workflow_progress', {
+                                    emit_event('workflow_progress', {
                                         'step': 6,
                                         'status': 'motor_b_and_ir_b_first_run_started',
                                         'message': 'Motor B and IR B sensor started for first run after grabber2 completion',
@@ -1424,7 +1356,7 @@ class MQTTListener:
                         request_thread.start()
                         
                         # Emit completion status via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 5,
                             'status': 'complete',
                             'message': 'Parcel grabber 2 process complete',
@@ -1444,7 +1376,7 @@ class MQTTListener:
                         logger.info("✅ IR B SENSOR: IR B sensor started and active")
                         
                         # Emit IR B sensor started status via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 'ir_b_sensor',
                             'status': 'active',
                             'message': 'IR B sensor started and monitoring for objects',
@@ -1456,7 +1388,7 @@ class MQTTListener:
                         logger.info("🟢 IR B SENSOR: IR B sensor ready for detection")
                         
                         # Emit IR B sensor ready status via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 'ir_b_sensor',
                             'status': 'ready',
                             'message': 'IR B sensor ready for object detection',
@@ -1468,7 +1400,7 @@ class MQTTListener:
                         logger.info("🛑 IR B SENSOR: IR B sensor stopped/disabled")
                         
                         # Emit IR B sensor stopped status via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 'ir_b_sensor',
                             'status': 'stopped',
                             'message': 'IR B sensor stopped/disabled',
@@ -1496,7 +1428,7 @@ class MQTTListener:
                             workflow_message = 'METALLIC ITEM DETECTED - Security alert triggered'
                         else:
                             # Alarm was in cooldown
-                            remaining_time = alarm_cooldown['cooldown_duration'] - (time.time() - alarm_cooldown['last_alarm_time'])
+                            remaining_time = audio_cues.cooldown_remaining('alarm')
                             alert_message = f'METALLIC ITEM DETECTED! Alarm in cooldown ({remaining_time:.1f}s remaining).'
                             workflow_message = f'METALLIC ITEM DETECTED - Alarm in cooldown ({remaining_time:.1f}s remaining)'
                         
@@ -1511,7 +1443,7 @@ class MQTTListener:
                         })
                         
                         # Also emit as workflow progress for monitoring
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 'proximity_alert',
                             'status': 'metallic_detected',
                             'message': workflow_message,
@@ -1525,7 +1457,7 @@ class MQTTListener:
                         logger.info("✅ PROXIMITY SENSOR: Proximity sensor started and active")
                         
                         # Emit proximity sensor started status via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 'proximity_sensor',
                             'status': 'active',
                             'message': 'Proximity sensor started and monitoring for metallic items',
@@ -1537,7 +1469,7 @@ class MQTTListener:
                         logger.info("🟢 PROXIMITY SENSOR: Proximity sensor ready for detection")
                         
                         # Emit proximity sensor ready status via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 'proximity_sensor',
                             'status': 'ready',
                             'message': 'Proximity sensor ready for metallic item detection',
@@ -1549,7 +1481,7 @@ class MQTTListener:
                         logger.info("🛑 PROXIMITY SENSOR: Proximity sensor stopped/disabled")
                         
                         # Emit proximity sensor stopped status via WebSocket
-                        socketio.emit('workflow_progress', {
+                        emit_event('workflow_progress', {
                             'step': 'proximity_sensor',
                             'status': 'stopped',
                             'message': 'Proximity sensor stopped/disabled',
@@ -1569,14 +1501,9 @@ class MQTTListener:
         # Log to file (filter out spam messages)
         should_log_to_file = True
         
-        # Filter loadcell spam from file logging
-        if LOADCELL_SPAM_FILTER['enabled'] and topic.lower() in ['esp32/loadcell/data', '/loadcell']:
-            try:
-                weight_value = float(message)
-                if weight_value <= LOADCELL_SPAM_FILTER['min_weight_threshold']:
-                    should_log_to_file = False
-            except ValueError:
-                pass  # If not a number, log normally
+        # Filter empty-platform loadcell readings from file logging
+        if loadcell_stream.is_empty_reading(loadcell_reading):
+            should_log_to_file = False
         
         if should_log_to_file:
             try:
@@ -1590,13 +1517,8 @@ class MQTTListener:
         should_emit_websocket = True
         
         # Filter loadcell spam (zero or very small readings)
-        if LOADCELL_SPAM_FILTER['enabled'] and topic.lower() in ['esp32/loadcell/data', '/loadcell']:
-            try:
-                weight_value = float(message)
-                if weight_value <= LOADCELL_SPAM_FILTER['min_weight_threshold']:
-                    should_emit_websocket = False
-            except ValueError:
-                pass  # If not a number, emit normally
+        if loadcell_stream.is_empty_reading(loadcell_reading):
+            should_emit_websocket = False
         
         if should_emit_websocket:
             mqtt_data = {
@@ -1657,7 +1579,12 @@ class MQTTListener:
         try:
             if self.is_connected:
                 result = self.client.publish(topic, message)
+                MQTT_PUBLISHED.labels(topic, 'ok' if result.rc == 0 else 'failed').inc()
                 if result.rc == 0:
+                    recorder = self.recorder
+                    if recorder:
+                        recorder.record(OUTBOUND, topic, message)
+                    tracer.outbound(topic, message)
                     logger.info(f"MQTT: Successfully published '{message}' to topic '{topic}'")
                     return True
                 else:
@@ -1672,12 +1599,30 @@ class MQTTListener:
 
     def get_status(self):
         """Get MQTT connection status"""
+        recorder = self.recorder
         return {
             'connected': self.is_connected,
             'broker_host': self.broker_host,
-            'broker_port': self.broker_port
+            'broker_port': self.broker_port,
+            'recording': recorder.get_status() if recorder else None
         }
 
+    def start_recording(self, path):
+        """Capture every inbound and outbound message to a binary recording (see mqtt_recorder.py)"""
+        self.stop_recording()
+        recorder = MQTTRecorder(path)
+        self.recorder = recorder
+        logger.info(f"📼 MQTT: Recording traffic to {path}")
+        return recorder.get_status()
+
+    def stop_recording(self):
+        """Stop capture mode; returns the final recording status or None"""
+        recorder, self.recorder = self.recorder, None
+        if recorder is None:
+            return None
+        recorder.close()
+        return recorder.get_status()
+
     def send_sms_notification(self, phone_number, message):
         """Send SMS notification via ESP32 GSM module"""
         try:
@@ -1703,13 +1648,53 @@ mqtt_listener = MQTTListener(
     broker_host=os.getenv('MQTT_BROKER_HOST', '10.194.125.227'), 
     broker_port=int(os.getenv('MQTT_BROKER_PORT', '1883'))
 )
+metrics.gauge('mqtt_connected', 'Whether the MQTT listener is connected to the broker').set_function(
+    lambda: mqtt_listener.is_connected)
 
-# Spam filtering configuration
-LOADCELL_SPAM_FILTER = {
-    'min_weight_threshold': 0.1,  # Minimum weight to consider (kg)
-    'weight_change_threshold': 0.05,  # Minimum change to log new reading (kg)
-    'enabled': True  # Enable/disable spam filtering
-}
+def handle_stable_weight(weight):
+    """Loadcell settled on a package weight (kg): store it, then start Grabber1"""
+    weight_grams = weight * 1000  # Convert kg to grams
+    logger.info(f"STEP 3 - LOADCELL: Stable weight {weight_grams:.1f}g")
+    
+    # Store weight in database first, then start grabber1
+    def process_final_weight():
+        try:
+            logger.info("STEP 3 - FINAL WEIGHT RECEIVED: Storing in database...")
+            
+            # Store weight data in database (weight is already in kg)
+            mqtt_sensor_data['loadcell']['weight'] = weight
+            mqtt_sensor_data['loadcell']['timestamp'] = datetime.now().isoformat()
+            
+            # Store weight in loaded_sensor_data database
+            store_weight_data_in_db()
+            
+            logger.info("STEP 4 - WEIGHT STORED: Starting Grabber1...")
+            
+            # Send grabber1 start request via MQTT
+            success = mqtt_listener.publish_message('esp32/grabber1/request', 'start')
+            if success:
+                logger.info("SUCCESS: Grabber1 START request sent (esp32/grabber1/request > start)")
+                
+                # Emit WebSocket notification
+                emit_event('workflow_progress', {
+                    'step': 4,
+                    'status': 'grabber1_start_requested',
+                    'message': 'Weight stored in DB - Grabber1 start requested',
+                    'timestamp': datetime.now().isoformat(),
+                    'triggered_by': 'loadcell_final_weight',
+                    'weight': weight
+                })
+            else:
+                logger.error("FAILED: Could not send grabber1 start request")
+                
+        except Exception as e:
+            logger.error(f"Error processing final weight: {e}")
+    
+    # Start processing in background thread so the MQTT loop keeps reading
+    threading.Thread(target=process_final_weight, daemon=True).start()
+
+# Loadcell stream processor (settle detection replaces the old spam filter thresholds)
+loadcell_stream = LoadcellStream(LOADCELL_STABILITY, on_stable=handle_stable_weight)
 
 # Temporary storage for MQTT sensor data
 mqtt_sensor_data = {
@@ -1794,7 +1779,7 @@ def get_contact_number_from_qr(qr_data):
         backend_url = f'{os.getenv("BACKEND_URL", "http://10.194.125.225:5000")}/api/validate-qr'
         payload = {'qr_data': qr_data}
         
-        response = requests.post(backend_url, json=payload, timeout=10)
+        response = backend_http.post(backend_url, json=payload, timeout=10)
         
         if response.status_code == 200:
             result = response.json()
@@ -1823,7 +1808,7 @@ def check_for_new_qr_scans():
     
     try:
         backend_url = f'{os.getenv("BACKEND_URL", "http://10.194.125.225:5000")}/api/qr-scans?limit=1'
-        response = requests.get(backend_url, timeout=5)
+        response = backend_http.get(backend_url, timeout=5)
         
         if response.status_code == 200:
             scans = response.json()
@@ -1855,7 +1840,7 @@ def check_for_new_qr_scans():
                                 order_number = latest_scan.get('order_number', qr_data)
                                 
                                 # Get order details from database for printing
-                                conn = sqlite3.connect('database.db')
+                                conn = timed_connect('database.db')
                                 conn.row_factory = dict_factory
                                 c = conn.cursor()
                                 c.execute('SELECT * FROM orders WHERE order_number = ?', (order_number,))
@@ -1877,7 +1862,7 @@ def check_for_new_qr_scans():
                                     }
                                     
                                     # Call Raspberry Pi print service directly
-                                    receipt_response = requests.post(
+                                    receipt_response = backend_http.post(
                                         f'{os.getenv("RASPBERRY_PI_URL", "http://10.194.125.227:5001")}/print-receipt',
                                         json=printer_data,
                                         timeout=10
@@ -1901,7 +1886,7 @@ def check_for_new_qr_scans():
                                     motor_b_cycle_state['motor_b_second_run'] = True
                                     
                                     # Emit WebSocket notification
-                                    socketio.emit('workflow_progress', {
+                                    emit_event('workflow_progress', {
                                         'step': 'qr_motor_b_start',
                                         'status': 'motor_b_started_after_qr',
                                         'message': 'Receipt printed - Motor B started after QR validation',
@@ -1946,7 +1931,7 @@ def check_for_new_qr_scans():
                                     logger.info(f"SUCCESS: Stepper back command sent (esp32/stepper/request > {back_command})")
                                     
                                     # Emit WebSocket notification
-                                    socketio.emit('workflow_progress', {
+                                    emit_event('workflow_progress', {
                                         'step': 'qr_stepper_back',
                                         'status': 'stepper_back_after_qr',
                                         'message': f'QR validation complete - Stepper {back_command} sent after 5s delay',
@@ -1975,7 +1960,7 @@ def check_for_new_qr_scans():
                                 
                                 # Get current sensor data
                                 backend_url = f'{os.getenv("BACKEND_URL", "http://10.194.125.225:5000")}/api/sensor-data'
-                                sensor_response = requests.get(backend_url, timeout=5)
+                                sensor_response = backend_http.get(backend_url, timeout=5)
                                 
                                 if sensor_response.status_code == 200:
                                     sensor_data = sensor_response.json()
@@ -1995,7 +1980,7 @@ def check_for_new_qr_scans():
                                     
                                     # Update sensor data with order info
                                     sensor_update_url = f'{os.getenv("BACKEND_URL", "http://10.194.125.225:5000")}/api/sensor-data'
-                                    sensor_update_response = requests.put(sensor_update_url, json=update_sensor_with_order_data, timeout=5)
+                                    sensor_update_response = backend_http.put(sensor_update_url, json=update_sensor_with_order_data, timeout=5)
                                     
                                     if sensor_update_response.status_code in [200, 201]:
                                         logger.info(f"✅ SENSOR DATA UPDATED: Order {order_number} linked to sensor data")
@@ -2003,7 +1988,7 @@ def check_for_new_qr_scans():
                                     # Create package information record
                                     package_info_data = update_sensor_with_order_data.copy()
                                     package_url = f'{os.getenv("BACKEND_URL", "http://10.194.125.225:5000")}/api/package-information'
-                                    package_response = requests.post(package_url, json=package_info_data, timeout=5)
+                                    package_response = backend_http.post(package_url, json=package_info_data, timeout=5)
                                     
                                     if package_response.status_code in [200, 201]:
                                         logger.info(f"✅ PACKAGE INFO CREATED: Order {order_number} package record created")
@@ -2040,7 +2025,7 @@ def check_for_new_qr_scans():
                                 logger.info("🕐 CYCLE RESTART: Starting 10-second delay before restarting cycle...")
                                 
                                 # Emit WebSocket notification about the delay
-                                socketio.emit('workflow_progress', {
+                                emit_event('workflow_progress', {
                                     'step': 'cycle_delay',
                                     'status': 'waiting',
                                     'message': '10-second delay before cycle restart',
@@ -2149,7 +2134,7 @@ def clear_mqtt_sensor_data():
         
         # Clear sensor data from main backend database
         backend_url = f'{os.getenv("BACKEND_URL", "http://10.194.125.225:5000")}/api/sensor-data'
-        response = requests.delete(backend_url, timeout=5)
+        response = backend_http.delete(backend_url, timeout=5)
         
         if response.status_code == 200:
             logger.info("Sensor data cleared from database successfully!")
@@ -2169,7 +2154,7 @@ def start_qr_monitoring():
     # Initialize last_scan_id to current latest scan to avoid processing old scans
     try:
         backend_url = f'{os.getenv("BACKEND_URL", "http://10.194.125.225:5000")}/api/qr-scans?limit=1'
-        response = requests.get(backend_url, timeout=5)
+        response = backend_http.get(backend_url, timeout=5)
         if response.status_code == 200:
             scans = response.json()
             if scans and len(scans) > 0:
@@ -2239,9 +2224,10 @@ def store_weight_data_in_db():
         
         # Only send if we have weight data
         if sensor_data['weight'] is not None:
-            response = requests.post(backend_url, json=sensor_data, timeout=5)
+            response = backend_http.post(backend_url, json=sensor_data, timeout=5)
             if response.status_code == 200:
                 logger.info("✅ STEP 3 COMPLETE: Weight data stored in database")
+                event_stream.publish('sensor_data', sensor_data)
                 sensor_data_loaded = True  # Mark that we have sensor data loaded
                 
                 weight = sensor_data['weight']
@@ -2252,7 +2238,7 @@ def store_weight_data_in_db():
                 logger.info("📦 Package weight recorded - waiting for workflow trigger")
                 
                 # Emit weight capture completion via WebSocket
-                socketio.emit('workflow_progress', {
+                emit_event('workflow_progress', {
                     'step': 3,
                     'status': 'complete',
                     'message': f'Weight captured: {weight_grams:.1f}g - Ready for next step',
@@ -2260,7 +2246,7 @@ def store_weight_data_in_db():
                 })
                 
                 # Emit weight capture progress update via WebSocket
-                socketio.emit('workflow_progress', {
+                emit_event('workflow_progress', {
                     'step': 3,
                     'status': 'completed',
                     'message': f'Weight captured: {weight_grams:.1f}g',
@@ -2299,7 +2285,7 @@ def update_sensor_data_with_dimensions():
         }
         
         # Send complete data (this overwrites the previous weight-only entry)
-        response = requests.post(backend_url, json=sensor_data, timeout=5)
+        response = backend_http.post(backend_url, json=sensor_data, timeout=5)
         if response.status_code == 200:
             logger.info("✅ STEP 5 COMPLETE: Package data updated with dimensions")
             
@@ -2315,9 +2301,10 @@ def update_sensor_data_with_dimensions():
             
             # Store the calculated package size in mqtt_sensor_data for stepper use
             mqtt_sensor_data['package_size'] = package_size
+            event_stream.publish('sensor_data', sensor_data)
             
             # Emit workflow completion via WebSocket
-            socketio.emit('workflow_progress', {
+            emit_event('workflow_progress', {
                 'step': 5,
                 'status': 'completed',
                 'message': f'Package complete: {weight_display}, {width}x{height}x{length}cm ({package_size})',
@@ -2372,11 +2359,13 @@ def clear_sensor_data():
         mqtt_sensor_data['box_dimensions']['length'] = None
         mqtt_sensor_data['box_dimensions']['timestamp'] = None
         sensor_data_loaded = False  # Mark that sensor data is cleared
+        loadcell_stream.reset()  # Re-arm settle detection for the next package
         
         # Emit update via WebSocket
         socketio.emit('sensor_data_cleared', {
             'timestamp': datetime.now().isoformat()
         })
+        event_stream.publish('sensor_data', {'cleared': True, 'timestamp': datetime.now().isoformat()})
         
         logger.info("🗑️ Sensor data manually cleared")
         
@@ -2447,7 +2436,7 @@ def apply_package_data():
         
         # Validate order exists by calling main backend
         backend_url = 'http://10.194.125.225:5000/api/validate-qr'
-        validation_response = requests.post(backend_url, json={'qr_data': order_number}, timeout=10)
+        validation_response = backend_http.post(backend_url, json={'qr_data': order_number}, timeout=10)
         
         if validation_response.status_code != 200:
             return jsonify({
@@ -2485,7 +2474,7 @@ def apply_package_data():
         
         # Send package data to main backend
         backend_package_url = 'http://10.194.125.225:5000/api/package-information'
-        package_response = requests.post(backend_package_url, json=package_data, timeout=10)
+        package_response = backend_http.post(backend_package_url, json=package_data, timeout=10)
         
         if package_response.status_code == 200 or package_response.status_code == 201:
             # NOTE: Sensor data clearing disabled to preserve frontend display
@@ -2503,6 +2492,7 @@ def apply_package_data():
                 'package_data': package_data,
                 'timestamp': datetime.now().isoformat()
             })
+            event_stream.publish('package_info', package_data)
             
             return jsonify({
                 'message': 'Package data applied successfully',
@@ -2531,9 +2521,29 @@ def apply_package_data():
 @app.route('/status')
 def status():
     """General status endpoint"""
+    return response_versions.conditional_response('status', build_status_response, version=status_version())
+
+def status_version():
+    """Version of the /status payload: changes whenever any part of it would"""
+    # Printer and MQTT state are cheap flags, so they are folded into the version
+    camera_version = camera.status_version if camera.try_get() is not None else 'error'
+    printer_ready = printer.try_get() is not None and printer.check_printer()
+    version = f"{camera_version}.{int(printer_ready)}.{int(mqtt_listener.is_connected)}"
+    recording = mqtt_listener.get_status()['recording']
+    if recording:
+        # Counts and duration move while recording, so the payload is rebuilt on every change
+        version += f".rec-{recording['inbound']}-{recording['outbound']}-{recording['duration_s']}"
+    return version
+
+def build_status_response():
+    """Build the general status payload"""
     try:
-        printer_status = "available" if printer.check_printer() else "unavailable"
-        camera_data = camera.get_status()
+        # try_get() does not retry a failed construction, so polling stays cheap (see startup.py)
+        printer_status = "available" if printer.try_get() is not None and printer.check_printer() else "unavailable"
+        if camera.try_get() is not None:
+            camera_data = camera.get_status()
+        else:
+            camera_data = {'initialization_error': camera.subsystem_status()['error']}
         
         # Simplify camera status for frontend
         if camera_data.get('initialization_error'):
@@ -2550,8 +2560,7 @@ def status():
             "status": "running",
             "printer": printer_status,
             "camera": camera_status,
-            "mqtt": mqtt_status,
-            "timestamp": datetime.now().isoformat()
+            "mqtt": mqtt_status
         })
     except Exception as e:
         logger.error(f"Error getting status: {str(e)}")
@@ -2560,6 +2569,27 @@ def status():
             "error": str(e)
         }), 500
 
+@app.route('/audio/status')
+def audio_status():
+    """Audio cue engine status with per-cue trigger-to-play latency"""
+    return jsonify(audio_cues.get_status())
+
+@app.route('/maintenance/qr-images/prune', methods=['POST'])
+def prune_qr_images():
+    """Prune saved QR images now; optional max_age_days and max_mb override the defaults"""
+    try:
+        data = request.get_json(silent=True) or {}
+        max_mb = data.get('max_mb')
+        report = prune_directory(
+            camera.qr_images_dir,
+            max_age_days=data.get('max_age_days'),
+            max_bytes=int(float(max_mb) * 1024 * 1024) if max_mb is not None else None
+        )
+        return jsonify(report)
+    except Exception as e:
+        logger.error(f"Error pruning QR images: {str(e)}")
+        return jsonify({'error': 'Failed to prune QR images', 'details': str(e)}), 500
+
 @app.route('/mqtt/status')
 def mqtt_status():
     """Get MQTT listener status"""
@@ -2591,6 +2621,137 @@ def restart_mqtt():
             'details': str(e)
         }), 500
 
+@app.route('/mqtt/recording', methods=['GET', 'POST'])
+def mqtt_recording():
+    """Capture mode status; POST {"action": "start"|"stop", "name": optional} to control it
+
+    Recordings are always written under MQTT_RECORDING_CONFIG['directory']
+    (recordings/); name must be a plain file name ("path" is accepted as an
+    older alias for it).
+    """
+    try:
+        if request.method == 'GET':
+            return jsonify({'recording': mqtt_listener.get_status()['recording']})
+
+        data = request.get_json(silent=True) or {}
+        action = data.get('action', 'start')
+        if action == 'start':
+            name = data.get('name') or data.get('path') or f"mqtt_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mqrec"
+            if not isinstance(name, str) or os.path.basename(name) != name or name.startswith('.') or '\\' in name:
+                return jsonify({
+                    'error': 'Invalid recording name',
+                    'details': 'Use a plain file name; recordings are always saved under recordings/'
+                }), 400
+            path = os.path.join(MQTT_RECORDING_CONFIG['directory'], name)
+            return jsonify({'message': 'MQTT recording started', 'recording': mqtt_listener.start_recording(path)})
+        elif action == 'stop':
+            return jsonify({'message': 'MQTT recording stopped', 'recording': mqtt_listener.stop_recording()})
+        return jsonify({'error': f"Unknown action: {action}"}), 400
+    except Exception as e:
+        logger.error(f"Error controlling MQTT recording: {str(e)}")
+        return jsonify({
+            'error': 'Failed to control MQTT recording',
+            'details': str(e)
+        }), 500
+
+@app.route('/api/traces')
+def list_parcel_traces():
+    """Recent parcel traces, newest first (?limit=50)"""
+    try:
+        limit = request.args.get('limit', 50, type=int)
+        return jsonify({'traces': tracer.list_traces(limit)})
+    except Exception as e:
+        logger.error(f"Error listing parcel traces: {str(e)}")
+        return jsonify({
+            'error': 'Failed to list parcel traces',
+            'details': str(e)
+        }), 500
+
+@app.route('/api/traces/steps')
+def parcel_step_latency():
+    """Step latency percentiles across finished parcels (?limit=N for the last N)"""
+    try:
+        return jsonify(tracer.step_stats(request.args.get('limit', type=int)))
+    except Exception as e:
+        logger.error(f"Error computing parcel step latency: {str(e)}")
+        return jsonify({
+            'error': 'Failed to compute parcel step latency',
+            'details': str(e)
+        }), 500
+
+@app.route('/api/traces/<trace_id>')
+def get_parcel_trace(trace_id):
+    """Waterfall of one parcel; ?format=text for a plain-text rendering"""
+    try:
+        trace = tracer.get_trace(trace_id)
+        if trace is None:
+            return jsonify({'error': f'Trace {trace_id} not found'}), 404
+        if request.args.get('format') == 'text':
+            return Response(render_waterfall(trace), mimetype='text/plain')
+        return jsonify(trace)
+    except Exception as e:
+        logger.error(f"Error getting parcel trace: {str(e)}")
+        return jsonify({
+            'error': 'Failed to get parcel trace',
+            'details': str(e)
+        }), 500
+
+@app.route('/debug/startup')
+def startup_status():
+    """Startup milestones and which deferred subsystems have been initialized"""
+    try:
+        return jsonify({
+            'mode': STARTUP_CONFIG['mode'],
+            'milestones': startup_timer.marks,
+            'subsystems': {
+                'camera': camera.subsystem_status(),
+                'printer': printer.subsystem_status(),
+                'audio': {'loaded': audio_cues.started, 'available': audio_cues.available},
+            }
+        })
+    except Exception as e:
+        logger.error(f"Error getting startup status: {str(e)}")
+        return jsonify({
+            'error': 'Failed to get startup status',
+            'details': str(e)
+        }), 500
+
+@app.route('/debug/profile')
+def profile_threads():
+    """Sample every thread for ?seconds=10 and return where the CPU went
+
+    mode=cpu (default) only samples threads that used CPU since the last tick,
+    mode=wall samples every thread; interval_ms sets the sampling period.
+    format=collapsed returns the stacks as flamegraph.pl/speedscope input,
+    otherwise JSON with per-thread CPU and the hottest functions. save=1 also
+    writes the stacks to profiles/profile_<timestamp>_<mode>.folded.
+    """
+    try:
+        seconds = request.args.get('seconds', 10, type=float)
+        interval_ms = request.args.get('interval_ms', type=float)
+        mode = request.args.get('mode', 'cpu')
+        logger.info(f"🔥 Profiling all threads for {seconds}s ({mode} mode)")
+        result = profiler.profile(seconds, interval_ms / 1000 if interval_ms else None, mode)
+        path = save_profile(result) if request.args.get('save', '').lower() in ('1', 'true', 'yes') else None
+
+        if request.args.get('format') == 'collapsed':
+            response = Response(collapsed_text(result), mimetype='text/plain')
+            response.headers['Content-Disposition'] = f"inline; filename=profile_{mode}.folded"
+            return response
+        summary = profile_summary(result)
+        summary['file'] = path
+        return jsonify(summary)
+    except ProfileBusyError as e:
+        return jsonify({'error': str(e)}), 409
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error profiling threads: {str(e)}")
+        return jsonify({
+            'error': 'Failed to profile threads',
+            'details': str(e)
+        }), 500
+
 @app.route('/api/start-motor', methods=['POST'])
 def start_motor():
     """Start motor system and proximity sensor by sending MQTT commands to ESP32"""
@@ -2634,7 +2795,7 @@ def start_motor():
             })
             
             # Also emit initial system status
-            socketio.emit('workflow_progress', {
+            emit_event('workflow_progress', {
                 'step': 0,
                 'status': 'system_started',
                 'message': 'System started - Proximity sensor and Motor A active, monitoring for objects',
@@ -2780,49 +2941,51 @@ def get_motor_status():
             'details': str(e)
         }), 500
 
-@app.route('/api/spam-filter', methods=['GET'])
-def get_spam_filter_config():
-    """Get current spam filter configuration"""
+@app.route('/api/loadcell/stability', methods=['GET'])
+@app.route('/api/spam-filter', methods=['GET'])  # Legacy alias
+def get_loadcell_stability():
+    """Get loadcell settle detection configuration and live window statistics"""
     return jsonify({
-        'spam_filter': LOADCELL_SPAM_FILTER,
+        'stability': LOADCELL_STABILITY,
+        'status': loadcell_stream.get_status(),
         'description': {
-            'min_weight_threshold': 'Minimum weight to consider (kg)',
-            'weight_change_threshold': 'Minimum change to log new reading (kg)',
-            'enabled': 'Enable/disable spam filtering'
+            'window_size': 'Readings in the moving window',
+            'tolerance': 'Max standard deviation across the window to count as settled (kg)',
+            'min_weight': 'Readings at or below this mean the platform is empty (kg)'
         },
         'timestamp': datetime.now().isoformat()
     })
 
-@app.route('/api/spam-filter', methods=['POST'])
-def update_spam_filter_config():
-    """Update spam filter configuration"""
+@app.route('/api/loadcell/stability', methods=['POST'])
+@app.route('/api/spam-filter', methods=['POST'])  # Legacy alias
+def update_loadcell_stability():
+    """Update loadcell settle detection configuration"""
     try:
-        global LOADCELL_SPAM_FILTER
-        data = request.get_json()
-        
-        # Update configuration with provided values
-        if 'min_weight_threshold' in data:
-            LOADCELL_SPAM_FILTER['min_weight_threshold'] = float(data['min_weight_threshold'])
-        
-        if 'weight_change_threshold' in data:
-            LOADCELL_SPAM_FILTER['weight_change_threshold'] = float(data['weight_change_threshold'])
+        data = request.get_json() or {}
+        ignored = []
+        if request.path == '/api/spam-filter':
+            # Old clients still send the spam filter keys
+            data, ignored = translate_legacy_settings(data)
+            if ignored:
+                logger.warning(f"⚠️ Ignoring spam filter settings with no loadcell stability equivalent: {ignored}")
+        loadcell_stream.configure(**data)
         
-        if 'enabled' in data:
-            LOADCELL_SPAM_FILTER['enabled'] = bool(data['enabled'])
-        
-        logger.info(f"🔧 Spam filter configuration updated: {LOADCELL_SPAM_FILTER}")
+        logger.info(f"🔧 Loadcell stability configuration updated: {LOADCELL_STABILITY}")
         
         return jsonify({
             'success': True,
-            'message': 'Spam filter configuration updated',
-            'new_config': LOADCELL_SPAM_FILTER,
+            'message': 'Loadcell stability configuration updated',
+            'new_config': LOADCELL_STABILITY,
+            'ignored': ignored,
             'timestamp': datetime.now().isoformat()
         })
         
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': 'Invalid loadcell stability configuration', 'details': str(e)}), 400
     except Exception as e:
-        logger.error(f"Error updating spam filter config: {str(e)}")
+        logger.error(f"Error updating loadcell stability config: {str(e)}")
         return jsonify({
-            'error': 'Failed to update spam filter configuration',
+            'error': 'Failed to update loadcell stability configuration',
             'details': str(e)
         }), 500
 def after_request(response):
@@ -2835,8 +2998,11 @@ def after_request(response):
 @app.route('/')
 def home():
     """Health check endpoint"""
-    printer_status = "available" if printer.check_printer() else "unavailable"
-    camera_data = camera.get_status()
+    printer_status = "available" if printer.try_get() is not None and printer.check_printer() else "unavailable"
+    if camera.try_get() is not None:
+        camera_data = camera.get_status()
+    else:
+        camera_data = {'initialization_error': camera.subsystem_status()['error']}
     
     # Simplify camera status for frontend
     if camera_data.get('initialization_error'):
@@ -3001,23 +3167,34 @@ def print_receipt():
             'timestamp': datetime.now().isoformat()
         }), 500
 
-def generate_frames():
+def generate_frames(cam):
     while True:
-        frame = camera.get_frame()
+        frame = cam.get_frame()
         if frame is not None:
             yield (b'--frame\r\n'
                    b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
 
+@app.route('/stream')
+def stream_events():
+    """Server-Sent Events stream of qr_scan, package_info, sensor_data,
+    workflow_progress and camera_status events (resumes via Last-Event-ID)"""
+    return event_stream.response()
+
 @app.route('/video_feed')
 def video_feed():
     """Video streaming route"""
-    return Response(generate_frames(),
+    cam = camera.try_get()
+    if cam is None:
+        return camera_unavailable_response()
+    return Response(generate_frames(cam),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
 @app.route('/camera/start', methods=['POST'])
 def start_camera():
     """Start the camera"""
     try:
+        if camera.failed:
+            camera.reset()  # An explicit start retries a construction that failed earlier
         if camera.start_camera():
             logger.info("Camera started successfully")
             return jsonify({
@@ -3056,9 +3233,24 @@ def stop_camera():
             'details': str(e)
         }), 500
 
+def camera_unavailable_response():
+    """503 for routes that need the camera when its construction failed (see LazySubsystem)"""
+    return jsonify({
+        'error': 'Camera unavailable',
+        'details': camera.subsystem_status()['error']
+    }), 503
+
 @app.route('/camera/status')
 def camera_status():
     """Get camera status"""
+    cam = camera.try_get()
+    if cam is None:
+        return camera_unavailable_response()
+    return response_versions.conditional_response(
+        'camera_status', build_camera_status_response, version=cam.status_version)
+
+def build_camera_status_response():
+    """Build the camera status payload"""
     try:
         status = camera.get_status()
         return jsonify(status)
@@ -3087,6 +3279,14 @@ def get_last_qr():
 @app.route('/camera/qr-history')
 def get_qr_history():
     """Get the history of scanned QR codes"""
+    cam = camera.try_get()
+    if cam is None:
+        return camera_unavailable_response()
+    return response_versions.conditional_response(
+        'qr_history', build_qr_history_response, version=cam.history_version)
+
+def build_qr_history_response():
+    """Build the QR history payload"""
     try:
         history = camera.get_qr_history()
         return jsonify({
@@ -3293,7 +3493,7 @@ def validate_qr():
         
         # Forward the validation request to the main backend server
         backend_url = 'http://10.194.125.225:5000/api/validate-qr'
-        response = requests.post(backend_url, json={'qr_data': qr_data}, timeout=10)
+        response = backend_http.post(backend_url, json={'qr_data': qr_data}, timeout=10)
         
         if response.status_code == 200:
             return response.json()
@@ -3320,13 +3520,25 @@ def validate_qr():
 def on_qr_detected(qr_data, validation_result):
     """Callback function called when new QR is detected"""
     try:
+        # The QR is read while the parcel waits at IR B
+        trace_id = tracer.current(BELT_B)
+        tracer.add_span(trace_id, 'qr detected', time.monotonic(),
+                        valid=bool(validation_result.get('valid')), order_number=validation_result.get('order_number'))
+        event_stream.publish('qr_scan', {
+            'qr_data': qr_data,
+            'valid': validation_result.get('valid', False),
+            'order_number': validation_result.get('order_number'),
+            'message': validation_result.get('message'),
+            'timestamp': datetime.now().isoformat()
+        })
+        
         # Check if QR code is valid - process asynchronously to avoid blocking camera
         if validation_result.get('valid'):
             logger.info(f"VALID QR DETECTED: {qr_data} - Starting async processing")
             # Process valid QR in background thread to avoid blocking camera
             threading.Thread(
                 target=process_valid_qr_async, 
-                args=(qr_data, validation_result), 
+                args=(qr_data, validation_result, trace_id), 
                 daemon=True
             ).start()
         else:
@@ -3335,7 +3547,7 @@ def on_qr_detected(qr_data, validation_result):
     except Exception as e:
         logger.error(f"Error in QR detection callback: {e}")
 
-def process_valid_qr_async(qr_data, validation_result):
+def process_valid_qr_async(qr_data, validation_result, trace_id=None):
     """Process valid QR code asynchronously to avoid blocking camera"""
     try:
         logger.info(f"ASYNC QR PROCESSING: Starting background processing for {qr_data}")
@@ -3355,9 +3567,11 @@ def process_valid_qr_async(qr_data, validation_result):
             }
             
             # Create and print receipt without QR code
-            receipt = printer.create_receipt(receipt_data)
+            with tracer.bind(trace_id), tracer.span('create receipt', BELT_B, trace_id):
+                receipt = printer.create_receipt(receipt_data)
             if receipt:
-                success, message = printer.print_receipt(receipt)
+                with tracer.span('print receipt', BELT_B, trace_id):
+                    success, message = printer.print_receipt(receipt)
                 if success:
                     logger.info(f"RECEIPT PRINTED: Successfully printed receipt for order {qr_data}")
                 else:
@@ -3395,6 +3609,8 @@ def process_valid_qr_async(qr_data, validation_result):
             logger.error(f"MOTOR ERROR: Error sending motor startB command for QR {qr_data}: {motor_error}")
             
         logger.info(f"ASYNC QR PROCESSING: Completed background processing for {qr_data}")
+        if trace_id:
+            tracer.finish(trace_id=trace_id)
         
     except Exception as e:
         logger.error(f"ASYNC QR PROCESSING ERROR: Unexpected error processing QR {qr_data}: {e}")
@@ -3415,6 +3631,15 @@ def periodic_status_broadcast():
         
         time.sleep(5)  # Broadcast status every 5 seconds
 
+def qr_image_retention_task():
+    """Keep the saved QR images within their age limit and disk quota"""
+    while True:
+        try:
+            prune_directory(camera.qr_images_dir)
+        except Exception as e:
+            logger.error(f"QR image pruning error: {e}")
+        time.sleep(RETENTION_CONFIG['interval_hours'] * 3600)
+
 # SocketIO event handlers with better error handling
 @socketio.on('connect')
 def handle_connect():
@@ -3777,7 +4002,7 @@ def simulate_qr_scan():
         
         # Validate the QR code using the same method as camera
         backend_url = 'http://10.194.125.225:5000/api/validate-qr'
-        validation_response = requests.post(backend_url, json={'qr_data': qr_code}, timeout=10)
+        validation_response = backend_http.post(backend_url, json={'qr_data': qr_code}, timeout=10)
         
         if validation_response.status_code == 200:
             validation_data = validation_response.json()
@@ -3822,6 +4047,14 @@ def simulate_qr_scan():
             'details': str(e)
         }), 500
 
+@app.route('/camera/image-writer')
+def camera_image_writer_status():
+    """QR image writer format, queue depth and encode statistics"""
+    cam = camera.try_get()
+    if cam is None:
+        return camera_unavailable_response()
+    return jsonify(cam.image_writer.get_status())
+
 @app.route('/camera/qr-image/<filename>')
 def get_qr_image(filename):
     """Serve QR code images"""
@@ -3863,7 +4096,7 @@ def test_qr_image():
         # Validate the QR code
         backend_url = 'http://10.194.125.225:5000/api/validate-qr'
         try:
-            validation_response = requests.post(backend_url, json={'qr_data': qr_code}, timeout=10)
+            validation_response = backend_http.post(backend_url, json={'qr_data': qr_code}, timeout=10)
             if validation_response.status_code == 200:
                 validation_data = validation_response.json()
             else:
@@ -3910,17 +4143,14 @@ def test_qr_image():
             'details': str(e)
         }), 500
 
-if __name__ == '__main__':
+def warm_up_subsystems():
+    """Bring up the printer, audio cues and camera (background thread unless STARTUP_MODE=eager)"""
     # Check printer availability at startup
     if printer.check_printer():
         logger.info("Printer is available")
     else:
         logger.warning("Printer is not available - please check connection")
     
-    # Register QR detection callback
-    camera.add_qr_callback(on_qr_detected)
-    logger.info("QR detection callback registered")
-    
     # Auto-start the camera at startup
     try:
         if camera.start_camera():
@@ -3930,13 +4160,25 @@ if __name__ == '__main__':
     except Exception as e:
         logger.warning(f"Failed to auto-start camera at startup: {str(e)}")
     
-    # Start periodic status broadcast thread
+    # Both report on / prune for the camera, so they start once it exists
     status_thread = threading.Thread(target=periodic_status_broadcast, daemon=True)
     status_thread.start()
     logger.info("Status broadcast thread started")
     
+    # Start QR image retention thread
+    threading.Thread(target=qr_image_retention_task, daemon=True).start()
+    logger.info("QR image retention thread started")
+
+startup_timer.mark('imported')
+
+if __name__ == '__main__':
+    if STARTUP_CONFIG['mode'] == 'eager':
+        start_warm_up(warm_up_subsystems)
+    
     # Start MQTT listener at startup
     try:
+        if os.getenv('MQTT_RECORD'):
+            mqtt_listener.start_recording(os.getenv('MQTT_RECORD'))
         mqtt_listener.start()
         logger.info("MQTT listener started at startup")
     except Exception as e:
@@ -3949,6 +4191,10 @@ if __name__ == '__main__':
     except Exception as e:
         logger.error(f"Failed to start QR scan monitoring at startup: {str(e)}")
     
+    startup_timer.mark('control_plane_ready')
+    if STARTUP_CONFIG['mode'] != 'eager':
+        start_warm_up(warm_up_subsystems)
+    
     # Test GSM SMS functionality (uncomment the line below to test)
     # test_gsm_sms("09123456789")  # Replace with your test phone number
     
@@ -0,0 +1,171 @@
+"""
+Deferred startup of the Pi service's heavy subsystems
+Constructing the camera (OpenCV, pyzbar, Picamera2), the receipt printer (PIL,
+qrcode, fonts) and the audio engine (pygame mixer) dominates server.py's
+startup, yet the HTTP/MQTT control plane needs none of them to come up.
+server.py wraps them in LazySubsystem proxies: each is built on first use, or
+by the background warm-up started once MQTT is listening.
+
+STARTUP_MODE=eager warms everything up before the server starts accepting
+requests, as before. startup_timer records when each stage finished relative
+to process start (and to boot, which is what matters after a Pi reboot); see
+GET /debug/startup and profile_imports.py for the import-time breakdown.
+"""
+
+import os
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+STARTUP_CONFIG = {
+    'mode': os.getenv('STARTUP_MODE', 'lazy'),  # 'lazy' or 'eager'
+    'warmup_delay': float(os.getenv('STARTUP_WARMUP_DELAY', '0')),  # Seconds before the background warm-up
+}
+
+
+def process_age():
+    """Seconds since this process started (Linux), else None"""
+    try:
+        with open('/proc/self/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return uptime - int(fields[19]) / os.sysconf('SC_CLK_TCK')  # Field 22: starttime in clock ticks
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def system_uptime():
+    try:
+        with open('/proc/uptime') as f:
+            return float(f.read().split()[0])
+    except (OSError, ValueError):
+        return None
+
+
+class StartupTimer:
+    """Named milestones, in seconds since process start"""
+
+    def __init__(self):
+        age = process_age()
+        # Anchor on the real process start so interpreter and import time are included
+        self._origin = time.monotonic() - (age if age is not None else 0.0)
+        self.marks = []
+
+    def mark(self, name):
+        seconds = round(time.monotonic() - self._origin, 3)
+        uptime = system_uptime()
+        self.marks.append({'stage': name, 'seconds': seconds,
+                           'since_boot': round(uptime, 1) if uptime is not None else None})
+        logger.info(f"⏱️ Startup: {name} after {seconds:.2f}s")
+        return seconds
+
+
+class SubsystemUnavailable(RuntimeError):
+    """Raised on use of a LazySubsystem whose construction already failed"""
+
+
+class LazySubsystem:
+    """Stands in for an expensive object and builds it on first attribute access.
+
+    Attribute reads and writes are forwarded to the real object, so code using
+    `camera.start_camera()` or `camera.frame_interval = x` is unchanged. A
+    failed construction is remembered: later uses raise SubsystemUnavailable
+    straight away instead of running the factory again (pollers such as
+    /status would otherwise retry it on every request) until reset().
+    """
+
+    def __init__(self, name, factory):
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_instance', None)
+        object.__setattr__(self, '_lock', threading.Lock())
+        object.__setattr__(self, '_init_seconds', None)
+        object.__setattr__(self, '_error', None)
+        object.__setattr__(self, '_failed', False)
+
+    def get(self):
+        """The real object, constructing it if needed (concurrent callers wait for one construction)"""
+        instance = self._instance
+        if instance is not None:
+            return instance
+        with self._lock:
+            if self._failed:
+                raise SubsystemUnavailable(f"{self._name} failed to initialize: {self._error}")
+            if self._instance is None:
+                logger.info(f"⏳ Initializing {self._name}...")
+                started = time.monotonic()
+                try:
+                    instance = self._factory()
+                except Exception as e:
+                    object.__setattr__(self, '_error', str(e))
+                    object.__setattr__(self, '_failed', True)
+                    logger.error(f"❌ Failed to initialize {self._name}: {e}")
+                    raise
+                object.__setattr__(self, '_init_seconds', round(time.monotonic() - started, 3))
+                object.__setattr__(self, '_error', None)
+                object.__setattr__(self, '_instance', instance)
+                logger.info(f"✅ {self._name.capitalize()} initialized in {self._init_seconds:.2f}s")
+            return self._instance
+
+    def try_get(self):
+        """The real object, or None if its construction failed (now or earlier)"""
+        try:
+            return self.get()
+        except Exception:
+            return None
+
+    def reset(self):
+        """Forget a failed construction so the next use runs the factory again"""
+        with self._lock:
+            object.__setattr__(self, '_failed', False)
+
+    @property
+    def is_loaded(self):
+        return self._instance is not None
+
+    @property
+    def failed(self):
+        return self._failed
+
+    def subsystem_status(self):
+        return {'loaded': self.is_loaded, 'failed': self._failed,
+                'init_seconds': self._init_seconds, 'error': self._error}
+
+    def __getattr__(self, name):
+        # Only called for names not found on the proxy itself
+        return getattr(self.get(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.get(), name, value)
+
+    def __repr__(self):
+        return f"<LazySubsystem {self._name} ({'loaded' if self.is_loaded else 'not loaded'})>"
+
+
+def start_warm_up(warm_up, mode=None, delay=None):
+    """Run warm_up() now (eager) or in a background thread (lazy); returns the thread or None"""
+    mode = mode or STARTUP_CONFIG['mode']
+    delay = STARTUP_CONFIG['warmup_delay'] if delay is None else delay
+
+    def run():
+        if delay:
+            time.sleep(delay)
+        try:
+            warm_up()
+        except Exception as e:
+            logger.error(f"❌ Subsystem warm-up failed: {e}")
+        startup_timer.mark('subsystems_ready')
+
+    if mode == 'eager':
+        run()
+        return None
+    thread = threading.Thread(target=run, name='warm-up', daemon=True)
+    thread.start()
+    return thread
+
+
+# Milestones of this process (server.py marks imports, control plane and warm-up)
+startup_timer = StartupTimer()
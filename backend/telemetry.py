@@ -0,0 +1,259 @@
+"""
+Historical sensor telemetry store
+Loadcell, box dimension, IR and stepper readings are appended to a separate
+SQLite file (telemetry.db) as narrow (timestamp_ms, channel, value) rows in one
+table per month, written in batches by a background flusher. Each flush also
+folds the batch into 1-second and 1-minute rollups so charts can read
+count/min/max/avg per bucket without scanning raw rows.
+
+TelemetryForwarder gives server.py the same record() API and ships its batches
+to the backend's POST /api/telemetry endpoint instead of a local file.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Channel name -> compact integer id stored in every row (append only, never renumber)
+TELEMETRY_CHANNELS = {
+    'loadcell_weight': 1,   # kg
+    'box_width': 2,         # as reported by the size sensor
+    'box_height': 3,
+    'box_length': 4,
+    'ir_a': 5,              # 1 = object detected
+    'ir_b': 6,
+    'stepper_size': 7,      # 1 = small, 2 = medium, 3 = large
+    'loadcell_raw': 8,      # kg, every reading from esp32/loadcell/data
+}
+
+TELEMETRY_ROLLUPS = {
+    '1s': 1000,
+    '1m': 60000,
+}
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def partition_table(timestamp_ms):
+    """Monthly raw sample table for a timestamp, e.g. samples_202510"""
+    return datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc).strftime('samples_%Y%m')
+
+
+class TelemetryBuffer(ABC):
+    """Collects readings in memory and flushes them in batches from one thread"""
+
+    def __init__(self, batch_size=200, flush_interval=1.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flusher = None
+
+    def record(self, channel, value, timestamp_ms=None):
+        """Queue one reading; unknown channels raise ValueError"""
+        if channel not in TELEMETRY_CHANNELS:
+            raise ValueError(f"Unknown telemetry channel: {channel}")
+        if value is None:
+            return
+        with self._lock:
+            self._pending.append((timestamp_ms or now_ms(), TELEMETRY_CHANNELS[channel], float(value)))
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run, name='telemetry-flush', daemon=True)
+                self._flusher.start()
+            if len(self._pending) >= self.batch_size:
+                self._wake.set()
+
+    def flush(self):
+        """Write everything queued so far; returns the number of readings written"""
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if batch:
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                logger.error(f"Telemetry flush failed, {len(batch)} readings requeued: {e}")
+                with self._lock:
+                    self._pending[:0] = batch
+                return 0
+        return len(batch)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    @abstractmethod
+    def _write_batch(self, batch):
+        """Persist [(timestamp_ms, channel id, value)]; raising requeues the batch"""
+
+
+class TelemetryStore(TelemetryBuffer):
+    """Append-only telemetry in its own SQLite file with 1 s / 1 min rollups"""
+
+    def __init__(self, path='telemetry.db', **kwargs):
+        super().__init__(**kwargs)
+        self.path = os.path.abspath(path)  # The flush thread must not follow later chdir()s
+        self._partitions = set()
+        self._init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def _init_db(self):
+        conn = self._connect()
+        c = conn.cursor()
+        c.execute('PRAGMA journal_mode=WAL')
+        for name in TELEMETRY_ROLLUPS:
+            c.execute(f'''
+                CREATE TABLE IF NOT EXISTS rollup_{name} (
+                    channel INTEGER NOT NULL,
+                    bucket_ms INTEGER NOT NULL,
+                    count INTEGER NOT NULL,
+                    total REAL NOT NULL,
+                    min_value REAL NOT NULL,
+                    max_value REAL NOT NULL,
+                    last_value REAL NOT NULL,
+                    PRIMARY KEY (channel, bucket_ms)
+                ) WITHOUT ROWID
+            ''')
+        c.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'samples_%'")
+        self._partitions = {row[0] for row in c.fetchall()}
+        conn.commit()
+        conn.close()
+
+    def _create_partition(self, c, table):
+        c.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                timestamp_ms INTEGER NOT NULL,
+                channel INTEGER NOT NULL,
+                value REAL NOT NULL
+            )
+        ''')
+        c.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_channel_time ON {table}(channel, timestamp_ms)')
+
+    def _write_batch(self, batch):
+        batch.sort()
+        by_partition = {}
+        for sample in batch:
+            by_partition.setdefault(partition_table(sample[0]), []).append(sample)
+
+        conn = self._connect()
+        created = set()
+        try:
+            c = conn.cursor()
+            for table, samples in by_partition.items():
+                if table not in self._partitions:
+                    self._create_partition(c, table)
+                    created.add(table)
+                c.executemany(f'INSERT INTO {table} (timestamp_ms, channel, value) VALUES (?, ?, ?)', samples)
+
+            for name, bucket_size in TELEMETRY_ROLLUPS.items():
+                buckets = {}
+                for timestamp_ms, channel, value in batch:
+                    key = (channel, timestamp_ms - timestamp_ms % bucket_size)
+                    bucket = buckets.get(key)
+                    if bucket is None:
+                        buckets[key] = [1, value, value, value, value]
+                    else:
+                        bucket[0] += 1
+                        bucket[1] += value
+                        bucket[2] = min(bucket[2], value)
+                        bucket[3] = max(bucket[3], value)
+                        bucket[4] = value  # batch is time ordered
+                c.executemany(f'''
+                    INSERT INTO rollup_{name} (channel, bucket_ms, count, total, min_value, max_value, last_value)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(channel, bucket_ms) DO UPDATE SET
+                        count = count + excluded.count,
+                        total = total + excluded.total,
+                        min_value = MIN(min_value, excluded.min_value),
+                        max_value = MAX(max_value, excluded.max_value),
+                        last_value = excluded.last_value
+                ''', [(channel, bucket_ms, *values) for (channel, bucket_ms), values in buckets.items()])
+            conn.commit()
+            self._partitions |= created
+        finally:
+            conn.close()
+
+    def query(self, channel, since_ms=None, until_ms=None, resolution='1m', limit=1000):
+        """Readings for one channel, oldest first.
+
+        resolution is 'raw' (individual samples from the monthly tables) or a
+        TELEMETRY_ROLLUPS key, which returns one row per bucket.
+        """
+        if channel not in TELEMETRY_CHANNELS:
+            raise ValueError(f"Unknown telemetry channel: {channel}")
+        if resolution != 'raw' and resolution not in TELEMETRY_ROLLUPS:
+            raise ValueError(f"Unknown resolution: {resolution}")
+        self.flush()
+
+        channel_id = TELEMETRY_CHANNELS[channel]
+        since_ms = since_ms if since_ms is not None else 0
+        until_ms = until_ms if until_ms is not None else now_ms()
+
+        conn = self._connect()
+        try:
+            c = conn.cursor()
+            if resolution != 'raw':
+                c.execute(f'''
+                    SELECT bucket_ms, count, total / count, min_value, max_value, last_value
+                    FROM rollup_{resolution}
+                    WHERE channel = ? AND bucket_ms >= ? AND bucket_ms <= ?
+                    ORDER BY bucket_ms LIMIT ?
+                ''', (channel_id, since_ms, until_ms, limit))
+                return [dict(zip(('timestamp_ms', 'count', 'avg', 'min', 'max', 'last'), row))
+                        for row in c.fetchall()]
+
+            rows = []
+            tables = sorted(t for t in self._partitions
+                            if partition_table(since_ms) <= t <= partition_table(until_ms))
+            for table in tables:
+                c.execute(f'''
+                    SELECT timestamp_ms, value FROM {table}
+                    WHERE channel = ? AND timestamp_ms >= ? AND timestamp_ms <= ?
+                    ORDER BY timestamp_ms LIMIT ?
+                ''', (channel_id, since_ms, until_ms, limit - len(rows)))
+                rows.extend({'timestamp_ms': ts, 'value': value} for ts, value in c.fetchall())
+                if len(rows) >= limit:
+                    break
+            return rows
+        finally:
+            conn.close()
+
+
+class TelemetryForwarder(TelemetryBuffer):
+    """Batches readings and POSTs them to the backend's /api/telemetry"""
+
+    def __init__(self, url, session=None, **kwargs):
+        kwargs.setdefault('flush_interval', 5.0)
+        super().__init__(**kwargs)
+        self.url = url
+        self.http = session or requests  # A requests.Session reuses the backend connection
+        self.max_pending = 10000  # Drop the oldest readings if the backend stays unreachable
+
+    def _write_batch(self, batch):
+        names = {channel_id: name for name, channel_id in TELEMETRY_CHANNELS.items()}
+        try:
+            response = self.http.post(self.url, json={'readings': [
+                {'timestamp_ms': timestamp_ms, 'channel': names[channel], 'value': value}
+                for timestamp_ms, channel, value in batch
+            ]}, timeout=5)
+            response.raise_for_status()
+        except requests.RequestException:
+            with self._lock:
+                overflow = len(self._pending) + len(batch) - self.max_pending
+            if overflow > 0:
+                del batch[:overflow]
+            raise
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Test script for the analytics rollups
+Runs refresh_rollups against a scratch database and checks that rows stamped
+in local time (the app's own timestamps) and in UTC (SQLite CURRENT_TIMESTAMP)
+for the same parcel land in the same UTC hour, that a bounded refresh leaves
+the backlog for the next run, and that migrating an older database renames
+the prints counter to verified_scans.
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+import logging
+
+from analytics import refresh_rollups, query_rollups, COUNTER_COLUMNS
+from migrations import migrate, table_columns
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def in_timezone(zone, function):
+    """Run function() with the process local time set to `zone`"""
+    saved = os.environ.get('TZ')
+    os.environ['TZ'] = zone
+    time.tzset()
+    try:
+        return function()
+    finally:
+        if saved is None:
+            del os.environ['TZ']
+        else:
+            os.environ['TZ'] = saved
+        time.tzset()
+
+
+def test_mixed_clocks_share_one_bucket():
+    """A scan, its verified claim and its package row land in the same UTC hour on a UTC+8 Pi"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'database.db')
+        migrate(path)
+        conn = sqlite3.connect(path)
+        conn.execute("INSERT INTO qr_scans (qr_data, timestamp, device, is_valid) VALUES ('ORD-001', '2025-01-01T09:30:00', 'pi', 1)")
+        conn.execute("INSERT INTO qr_scans (qr_data, timestamp, device, is_valid, created_at) "
+                     "VALUES ('bad', '', 'pi', 0, '2025-01-01 01:35:00')")  # No app timestamp: created_at (UTC)
+        conn.execute("INSERT INTO scanned_codes (order_id, order_number, isverified, scanned_at) "
+                     "VALUES (1, 'ORD-001', 'yes', '2025-01-01 01:40:00')")
+        conn.execute("INSERT INTO package_information (order_id, order_number, weight, package_size, timestamp, "
+                     "loadcell_timestamp, box_dimensions_timestamp) "
+                     "VALUES (1, 'ORD-001', 0.4, 'Small', '2025-01-01T09:45:00', '2025-01-01T09:44:00', '2025-01-01T09:44:30')")
+        conn.commit()
+
+        assert in_timezone('Asia/Manila', lambda: refresh_rollups(path)) == 4
+        buckets, summary = query_rollups(conn.cursor(), 'hour')
+        assert [bucket['bucket'] for bucket in buckets] == ['2025-01-01 01']
+        bucket = buckets[0]
+        assert (bucket['scans'], bucket['invalid_scans'], bucket['verified_scans'], bucket['packages']) == (2, 1, 1, 1)
+        assert bucket['avg_step_seconds'] == {'weigh_to_measure': 30.0, 'measure_to_scan': 30.0}
+
+        assert query_rollups(conn.cursor(), 'hour', since='2025-01-01T09:00:00+08:00')[0] == buckets
+        assert query_rollups(conn.cursor(), 'hour', since='2025-01-01 02:00')[0] == []
+        try:
+            query_rollups(conn.cursor(), 'hour', since='yesterday')
+            assert False, "unparseable since is rejected"
+        except ValueError:
+            pass
+        conn.close()
+
+
+def test_bounded_refresh():
+    """max_batches=1 folds in one batch and leaves the rest for the background task"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'database.db')
+        migrate(path)
+        conn = sqlite3.connect(path)
+        conn.executemany("INSERT INTO qr_scans (qr_data, timestamp, device, is_valid) VALUES (?, '2025-01-01T10:00:00', 'pi', 1)",
+                         [(f'ORD-{i}',) for i in range(25)])
+        conn.commit()
+
+        assert refresh_rollups(path, batch_size=10, max_batches=1) == 10
+        assert refresh_rollups(path, batch_size=10) == 15
+        assert refresh_rollups(path, batch_size=10) == 0
+        assert query_rollups(conn.cursor(), 'day')[1]['scans'] == 25
+        conn.close()
+
+
+def test_prints_column_renamed_by_migration():
+    """Rollup tables created with the old prints counter keep their data under verified_scans"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'database.db')
+        migrate(path, target=4)
+        conn = sqlite3.connect(path)
+        old_columns = [column if column != 'verified_scans' else 'prints' for column in COUNTER_COLUMNS]
+        for table in ('analytics_hourly', 'analytics_daily'):
+            counters = ', '.join(f'{column} REAL NOT NULL DEFAULT 0' for column in old_columns)
+            conn.execute(f'CREATE TABLE {table} (bucket TEXT PRIMARY KEY, {counters}, weight_histogram TEXT)')
+        conn.execute("INSERT INTO analytics_daily (bucket, prints) VALUES ('2025-01-01', 3)")
+        conn.commit()
+        conn.close()
+
+        migrate(path)
+        conn = sqlite3.connect(path)
+        assert 'prints' not in table_columns(conn.cursor(), 'analytics_hourly')
+        assert query_rollups(conn.cursor(), 'day')[1]['verified_scans'] == 3
+        conn.close()
+
+
+if __name__ == "__main__":
+    print("Testing analytics rollups...")
+    print("=" * 50)
+
+    try:
+        test_mixed_clocks_share_one_bucket()
+        test_bounded_refresh()
+        test_prints_column_renamed_by_migration()
+        print("\n" + "=" * 50)
+        print("All tests completed successfully!")
+
+    except Exception as e:
+        logger.error(f"Test failed with error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
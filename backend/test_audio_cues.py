@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test script for the audio cue engine
+Checks the per-cue cooldown, that a cue dropped on a full queue does not use
+up its cooldown, and that the worker drains queued cues even when the mixer
+or the sound files are unavailable.
+"""
+
+import sys
+import time
+import threading
+import logging
+
+from audio_cues import AudioCueEngine
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+TEST_CUES = {
+    'alarm': {'path': '/nonexistent/alarm.mp3', 'channel': 0, 'cooldown': 15},
+    'success': {'path': '/nonexistent/success.mp3', 'channel': 1, 'cooldown': 0},
+}
+
+
+def stalled_engine(queue_size):
+    """Engine whose worker never drains the queue, so it can be filled on purpose"""
+    engine = AudioCueEngine(cues=TEST_CUES, queue_size=queue_size)
+    engine._worker = threading.Thread(target=lambda: None)
+    return engine
+
+
+def test_cooldown():
+    """A cue with a cooldown plays once per window; cues without one always play"""
+    engine = stalled_engine(queue_size=8)
+    assert engine.play('alarm') is True
+    assert engine.play('alarm') is False
+    assert 14 < engine.cooldown_remaining('alarm') <= 15
+    assert engine.play('success') is True and engine.play('success') is True
+
+    engine.last_played['alarm'] -= 15  # Window over
+    assert engine.play('alarm') is True
+    status = engine.get_status()['cues']['alarm']
+    assert status['skipped_cooldown'] == 1 and status['dropped'] == 0
+
+
+def test_dropped_cue_keeps_cooldown_free():
+    """A full queue drops the alarm without starting its cooldown, so the next trigger still plays"""
+    engine = stalled_engine(queue_size=1)
+    assert engine.play('success') is True  # Fills the queue
+    assert engine.play('alarm') is False
+    assert engine.cooldown_remaining('alarm') == 0
+    assert engine.get_status()['cues']['alarm']['dropped'] == 1
+
+    engine._queue.get_nowait()  # Space again
+    assert engine.play('alarm') is True
+    assert engine.get_status()['cues']['alarm']['skipped_cooldown'] == 0
+
+
+def test_worker_drains_without_sounds():
+    """Without loaded sounds the worker still consumes the queue instead of stalling"""
+    engine = AudioCueEngine(cues=TEST_CUES, queue_size=2)
+    for _ in range(5):
+        engine.play('success')
+        deadline = time.monotonic() + 2
+        while engine._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+    status = engine.get_status()
+    assert status['started'] and status['queued'] == 0
+    assert status['cues']['success']['dropped'] == 0 and not status['cues']['success']['loaded']
+
+
+if __name__ == "__main__":
+    print("Testing audio cue engine...")
+    print("=" * 50)
+
+    try:
+        test_cooldown()
+        test_dropped_cue_keeps_cooldown_free()
+        test_worker_drains_without_sounds()
+        print("\n" + "=" * 50)
+        print("All tests completed successfully!")
+
+    except Exception as e:
+        logger.error(f"Test failed with error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test script for dual-stream camera capture
+Runs CameraManager against MockPicamera2 with a smaller lores stream and checks
+that the decoder gets the lores Y plane and that detections are mapped back
+onto the preview frame.
+"""
+
+import sys
+import logging
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+import camera
+from camera import CameraManager, MockPicamera2
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+Point = namedtuple('Point', ['x', 'y'])
+Rect = namedtuple('Rect', ['left', 'top', 'width', 'height'])
+Decoded = namedtuple('Decoded', 'data type rect polygon quality orientation')
+
+ORIGINAL_STREAMS = dict(camera.CAMERA_STREAMS)
+
+
+def teardown_function():
+    camera.CAMERA_STREAMS.update(ORIGINAL_STREAMS)
+
+
+def make_camera(lores_size=(320, 240)):
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    cv2.rectangle(frame, (200, 100), (400, 300), (255, 255, 255), -1)
+    camera.CAMERA_STREAMS.update({'dual_stream': True, 'lores_size': lores_size})
+    manager = CameraManager()
+    manager.picam2 = MockPicamera2(frame_source=lambda: frame.copy())
+    manager._configure_streams()
+    return manager, frame
+
+
+def test_lores_y_plane_is_decode_input():
+    """The decode image is the lores luma plane, a view into the YUV420 buffer"""
+    manager, frame = make_camera()
+    preview, gray = manager._safe_capture_frame()
+
+    assert manager.dual_stream is True
+    assert preview.shape == (480, 640, 3)
+    assert gray.shape == (240, 320) and gray.dtype == np.uint8
+    assert gray.base is not None  # Sliced from the lores buffer, not copied
+    # YUV420 luma is limited range (16-235)
+    expected = 16 + cv2.cvtColor(cv2.resize(frame, (320, 240)), cv2.COLOR_BGR2GRAY) / 255 * 219
+    assert np.abs(gray - expected).max() <= 2
+
+
+def test_detections_scaled_to_preview():
+    """Rects and polygons found on the lores stream land on the main frame"""
+    manager, _ = make_camera()
+    polygon = [Point(100, 50), Point(200, 50), Point(200, 150), Point(100, 150)]
+    detected = Decoded(b'ORD-001', 'QRCODE', Rect(100, 50, 100, 100), polygon, 1, 'UP')
+
+    scaled = manager._scale_decoded([detected], (240, 320), (480, 640, 3))[0]
+    assert scaled.rect == (200, 100, 200, 200)
+    assert [(p.x, p.y) for p in scaled.polygon] == [(200, 100), (400, 100), (400, 300), (200, 300)]
+    assert scaled.data == b'ORD-001'
+
+
+def test_single_stream_fallback():
+    """With dual stream disabled the full frame is decoded as before"""
+    camera.CAMERA_STREAMS['dual_stream'] = False
+    manager = CameraManager()
+    frame, gray = manager._safe_capture_frame()
+    assert manager.dual_stream is False
+    assert gray is None and frame.shape == (480, 640, 3)
+
+
+if __name__ == "__main__":
+    print("Testing dual-stream camera capture...")
+    print("=" * 50)
+
+    try:
+        test_lores_y_plane_is_decode_input()
+        test_detections_scaled_to_preview()
+        test_single_stream_fallback()
+        teardown_function()
+        print("\n" + "=" * 50)
+        print("All tests completed successfully!")
+
+    except Exception as e:
+        logger.error(f"Test failed with error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
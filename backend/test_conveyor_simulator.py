@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Test script for the embedded MQTT broker and the conveyor simulator
+Checks broker topic matching and delivery, then runs the simulator against a
+scripted stand-in for server.py's MQTTListener (same topics and messages,
+no fixed delays) at the default device timings and checks every parcel
+completes with a full report. Without the server's delays, the cycle-end
+stopB and grabber 2's startB race, so a parcel may be stopped on belt B;
+the report has to account for it either way.
+"""
+
+import sys
+import time
+import threading
+import logging
+
+import paho.mqtt.client as mqtt
+
+from mqtt_broker import start_broker, topic_matches
+from conveyor_simulator import ConveyorSimulator, make_parcels
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def connect_client(port, on_message, subscriptions):
+    connected = threading.Event()
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION1, clean_session=True)
+    client.on_connect = lambda c, userdata, flags, rc: (c.subscribe(subscriptions), connected.set())
+    client.on_message = on_message
+    client.connect('127.0.0.1', port, 60)
+    client.loop_start()
+    assert connected.wait(5)
+    time.sleep(0.1)  # Let the SUBSCRIBE land
+    return client
+
+
+def scripted_server(client, userdata, msg):
+    """The command chain of server.py's MQTTListener without its sleeps or HTTP calls"""
+    message = msg.payload.decode('utf-8')
+    replies = []
+    if msg.topic == 'esp32/ir/status' and 'triggered' in message:
+        replies = [('esp32/motor/request', 'stopA')]
+    elif msg.topic == 'esp32/motor/status' and 'Motor A stopped by IR A' in message:
+        replies = [('esp32/actuator/request', 'start'), ('esp32/loadcell/request', 'start')]
+    elif msg.topic == 'esp32/motor/status' and '📍 IR B triggered' in message:
+        replies = [('esp32/irsensorB/request', 'stop'), ('esp32/motor/request', 'stopB')]
+    elif msg.topic == 'esp32/loadcell/data':
+        userdata['readings'].append(float(message))
+        recent = userdata['readings'][-8:]
+        if len(recent) == 8 and min(recent) > 0.1 and max(recent) - min(recent) < 0.01 and userdata['armed']:
+            userdata['armed'] = False
+            replies = [('esp32/grabber1/request', 'start')]
+        elif recent and recent[-1] <= 0.1:
+            userdata['armed'] = True
+    elif msg.topic == 'esp32/parcel1/status' and 'Parcel process 1 complete' in message:
+        replies = [('esp32/box/request', 'start')]
+    elif msg.topic == 'esp32/box/status' and '📦' in message:
+        userdata['size'] = message.rsplit(' ', 1)[-1].lower()
+    elif msg.topic == 'esp32/box/status' and 'Box process complete' in message:
+        replies = [('esp32/stepper/request', userdata['size']), ('esp32/grabber2/request', 'start')]
+    elif msg.topic == 'esp32/stepper/status' and 'back' not in message:
+        replies = [('esp32/stepper/request', f"{message.split()[0]}back")]
+    elif msg.topic == 'esp32/stepper/status':
+        replies = [('esp32/motor/request', 'stopA'), ('esp32/motor/request', 'stopB'),
+                   ('esp32/loadcell/request', 'stop'), ('esp32/motor/request', 'startA')]
+    elif msg.topic == 'esp32/parcel2/status' and 'Parcel process 2 complete' in message:
+        replies = [('esp32/motor/request', 'startB'), ('esp32/irsensorB/request', 'start')]
+    for topic, command in replies:
+        client.publish(topic, command)
+
+
+def test_broker_routing():
+    """Wildcard subscriptions receive matching publishes only"""
+    assert topic_matches('esp32/#', 'esp32/motor/status')
+    assert topic_matches('esp32/+/request', 'esp32/motor/request')
+    assert not topic_matches('esp32/+/request', 'esp32/motor/status')
+    assert not topic_matches('esp32/motor', 'esp32/motor/status')
+
+    broker = start_broker('127.0.0.1', 0)
+    try:
+        received = []
+        subscriber = connect_client(broker.port, lambda c, u, msg: received.append((msg.topic, msg.payload)),
+                                    [('esp32/+/status', 0)])
+        publisher = connect_client(broker.port, None, [('unused/topic', 0)])
+        publisher.publish('esp32/motor/status', 'Motor A stopped', qos=1)
+        publisher.publish('esp32/motor/request', 'startA')
+        publisher.publish('esp32/box/status', 'Box system started')
+        deadline = time.monotonic() + 5
+        while len(received) < 2 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        time.sleep(0.1)
+        assert received == [('esp32/motor/status', b'Motor A stopped'), ('esp32/box/status', b'Box system started')]
+        for client in (subscriber, publisher):
+            client.loop_stop()
+            client.disconnect()
+    finally:
+        broker.shutdown()
+
+
+def test_simulated_parcels_complete():
+    """Every parcel runs the full cycle and the report covers each step"""
+    broker = start_broker('127.0.0.1', 0)
+    server = connect_client(broker.port, scripted_server,
+                            [('esp32/+/status', 0), ('esp32/loadcell/data', 0)])
+    server.user_data_set({'readings': [], 'armed': True, 'size': None})
+    try:
+        simulator = ConveyorSimulator('127.0.0.1', broker.port, time_scale=0.05, seed=7)
+        report = simulator.run(make_parcels(3, simulator.rng), timeout=60)
+        logger.info(f"Simulated throughput: {report['throughput_per_hour']} parcels/hour")
+
+        assert report['completed'] == 3
+        # Grabber 2 and the stepper round trip both take 3 s, so the cycle-end stopB may land after
+        # startB: that parcel is stopped before IR B and, if it was the last one, stays stranded
+        belt_b = report['belt_b']
+        assert belt_b['stopped_by_server'] + belt_b['stranded'] == 3 and belt_b['ignored_by_server'] == 0
+        assert belt_b['stranded'] <= belt_b['stopped_in_transit']
+        assert report['size_mismatches'] == 0 and not report['unexpected_commands']
+        assert report['steps']['station_cycle']['count'] == 3
+        assert report['bottleneck'] in report['steps']
+        assert report['throughput_per_hour'] > 0 and report['saturated']
+    finally:
+        server.loop_stop()
+        server.disconnect()
+        broker.shutdown()
+
+
+if __name__ == "__main__":
+    print("Testing embedded MQTT broker and conveyor simulator...")
+    print("=" * 50)
+
+    try:
+        test_broker_routing()
+        test_simulated_parcels_complete()
+        print("\n" + "=" * 50)
+        print("All tests completed successfully!")
+
+    except Exception as e:
+        logger.error(f"Test failed with error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
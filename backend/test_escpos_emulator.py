@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Test script for the printer sinks and the loopback ESC/POS emulator
+Prints receipts through ReceiptPrinter into the emulator, a memory sink and a
+FIFO, checks the printed raster against the rendered image and the original
+per-pixel encoder, and exercises the retry path with injected IOErrors.
+"""
+
+import os
+import sys
+import time
+import tempfile
+import logging
+
+from PIL import Image, ImageDraw
+
+from escpos_emulator import EscPosEmulator, parse_escpos, raster_images, render_job
+from printer_sink import FifoPrinterSink, MemoryPrinterSink, DevicePrinterSink, create_printer_sink
+from print import ReceiptPrinter, PRINTER_CONFIG, build_escpos_job
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+TEST_CONFIG = dict(PRINTER_CONFIG, backup_dir='', retry_delay=0.01)
+
+
+def make_image(width=384, height=120):
+    image = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([5, 5, width - 20, 40], outline='black', width=3)
+    draw.text((10, 60), "ORD-TEST-0001", fill='black')
+    return image
+
+
+def reference_raster(receipt_bw):
+    """The original per-pixel loop from print_receipt"""
+    pixels = receipt_bw.load()
+    data = bytearray()
+    for y in range(receipt_bw.height):
+        for x in range(0, receipt_bw.width, 8):
+            byte = 0
+            for bit in range(min(8, receipt_bw.width - x)):
+                if pixels[x + bit, y] == 0:
+                    byte |= (1 << (7 - bit))
+            data.append(byte)
+    return bytes(data)
+
+
+def test_job_encoding_and_round_trip():
+    """The vectorised job matches the old encoder; the emulator prints exactly the receipt image"""
+    for width in (384, 203):  # 203 exercises the partial last byte of each row
+        receipt_bw = make_image(width).convert('1')
+        commands = parse_escpos(build_escpos_job(receipt_bw))
+        assert [c[0] for c in commands] == ['init', 'align', 'raster', 'feed', 'feed', 'feed', 'feed', 'cut']
+        assert commands[2][4] == reference_raster(receipt_bw)
+
+    emulator = EscPosEmulator()
+    printer = ReceiptPrinter(sink=emulator, config=TEST_CONFIG)
+    assert printer.check_printer() and printer.printer_device == 'emulator'
+    image = make_image()
+    success, _ = printer.print_receipt(image)
+    assert success and emulator.jobs_printed == 1
+    printed = raster_images(emulator.last_job()['data'])[0]
+    assert printed.tobytes() == image.convert('1').tobytes()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'job.png')
+        rendered = render_job(emulator.last_job()['data'], path)
+        assert os.path.exists(path) and rendered.width == 384 and rendered.height > image.height
+
+    memory = MemoryPrinterSink()
+    assert ReceiptPrinter(sink=memory, config=TEST_CONFIG).print_receipt(image)[0]
+    assert memory.last_job() == emulator.last_job()['data']
+    assert isinstance(create_printer_sink('memory'), MemoryPrinterSink)
+    assert create_printer_sink('device:/dev/usb/lp9').path == '/dev/usb/lp9'
+    assert not DevicePrinterSink('/nonexistent/lp0').available()
+
+
+def test_transient_errors_and_fifo():
+    """Injected IOErrors are retried, persistent ones fail; a FIFO sink delivers to the emulator"""
+    image = make_image()
+    flaky = EscPosEmulator(error_rate=0.5, seed=3)
+    printer = ReceiptPrinter(sink=flaky, config=TEST_CONFIG)
+    results = [printer.print_receipt(image)[0] for _ in range(10)]
+    assert flaky.errors > 0 and sum(results) == flaky.jobs_printed
+
+    broken = EscPosEmulator(error_rate=1.0)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)  # The final failure saves last_failed_print.png in the working directory
+        try:
+            success, message = ReceiptPrinter(sink=broken, config=TEST_CONFIG).print_receipt(image)
+            assert os.path.exists('last_failed_print.png')
+        finally:
+            os.chdir(cwd)
+    assert not success and 'after 3 attempts' in message and broken.errors == 3 and broken.jobs_printed == 0
+
+    offline = EscPosEmulator()
+    offline.online = False
+    assert ReceiptPrinter(sink=offline, config=TEST_CONFIG).print_receipt(image) == (False, "Printer device not available")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'printer')
+        os.mkfifo(path)
+        sink = FifoPrinterSink(path)
+        assert sink.available()
+        try:
+            sink.open()
+            assert False, "opening a FIFO without a reader should fail"
+        except IOError:
+            pass
+
+        emulator = EscPosEmulator()
+        emulator.serve_fifo(path)
+        try:
+            assert ReceiptPrinter(sink=sink, config=dict(TEST_CONFIG, retry_delay=0.1)).print_receipt(image)[0]
+            for _ in range(200):
+                if emulator.jobs_printed:
+                    break
+                time.sleep(0.01)
+            assert raster_images(emulator.last_job()['data'])[0].tobytes() == image.convert('1').tobytes()
+        finally:
+            emulator.stop_fifo(path)
+
+
+if __name__ == "__main__":
+    print("Testing printer sinks and ESC/POS emulator...")
+    print("=" * 50)
+
+    try:
+        test_job_encoding_and_round_trip()
+        test_transient_errors_and_fifo()
+        print("\n" + "=" * 50)
+        print("All tests completed successfully!")
+
+    except Exception as e:
+        logger.error(f"Test failed with error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test script for the Server-Sent Events stream
+Reads frames straight from EventStream generators and checks live delivery,
+resuming after a Last-Event-ID, the resync event for ids the ring buffer no
+longer holds or that come from before a restart, type filtering and
+keepalives.
+"""
+
+import sys
+import json
+import logging
+
+from flask import Flask
+
+from event_stream import EventStream
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def parse_frame(frame):
+    """'id: x\\nevent: y\\ndata: {...}\\n\\n' -> {'id': x, 'event': y, 'data': {...}}"""
+    fields = dict(line.split(': ', 1) for line in frame.strip().split('\n'))
+    fields['data'] = json.loads(fields['data'])
+    return fields
+
+
+def read_events(stream, count):
+    """Next `count` event frames (skipping the retry hint)"""
+    events = []
+    while len(events) < count:
+        frame = next(stream)
+        if frame.startswith('id:'):
+            events.append(parse_frame(frame))
+    return events
+
+
+def test_live_delivery_and_resume():
+    """A new client sees only new events; Last-Event-ID replays exactly what was missed"""
+    events = EventStream(history_size=10, keepalive_interval=0.05)
+    old_id = events.publish('qr_scan', {'qr': 'ORD-001'})
+
+    live = events.stream()
+    assert next(live) == f"retry: {events.retry_ms}\n\n"
+    assert next(live) == ": keepalive\n\n"  # Nothing new within the keepalive interval
+    second_id = events.publish('sensor_data', {'weight': 0.4})
+    assert read_events(live, 1) == [{'id': second_id, 'event': 'sensor_data', 'data': {'weight': 0.4}}]
+
+    events.publish('qr_scan', {'qr': 'ORD-002'})
+    resumed = read_events(events.stream(last_event_id=old_id), 2)
+    assert [event['event'] for event in resumed] == ['sensor_data', 'qr_scan']
+    assert resumed[1]['data'] == {'qr': 'ORD-002'}
+
+    filtered = read_events(events.stream(last_event_id=old_id, event_types={'qr_scan'}), 1)
+    assert filtered[0]['data'] == {'qr': 'ORD-002'}
+
+
+def test_resync_when_history_is_gone():
+    """Ids older than the buffer, or from a previous process, get a resync event first"""
+    events = EventStream(history_size=2, keepalive_interval=0.05)
+    first_id = events.publish('qr_scan', {'n': 1})
+    for n in range(2, 6):
+        events.publish('qr_scan', {'n': n})
+
+    frames = read_events(events.stream(last_event_id=first_id), 3)
+    assert frames[0]['event'] == 'resync' and frames[0]['data'] == {'reason': 'history_unavailable'}
+    assert [frame['data']['n'] for frame in frames[1:]] == [4, 5]  # What the buffer still holds
+
+    restarted = events.stream(last_event_id='0-3')  # Epoch of an earlier process
+    assert read_events(restarted, 1)[0]['event'] == 'resync'
+    events.publish('qr_scan', {'n': 6})
+    assert read_events(restarted, 1)[0]['data'] == {'n': 6}  # Continues from now, no replay
+
+
+def test_response_reads_last_event_id_header():
+    """The Flask response resumes from the Last-Event-ID header and filters with ?types="""
+    app = Flask(__name__)
+    events = EventStream(keepalive_interval=0.05)
+    last_seen = events.publish('qr_scan', {'n': 1})
+    events.publish('sensor_data', {'n': 2})
+    events.publish('qr_scan', {'n': 3})
+
+    with app.test_request_context('/api/stream?types=qr_scan', headers={'Last-Event-ID': last_seen}):
+        response = events.response()
+        assert response.mimetype == 'text/event-stream' and response.headers['Cache-Control'] == 'no-cache'
+        frames = read_events(iter(response.response), 1)
+    assert frames[0]['data'] == {'n': 3}
+
+
+if __name__ == "__main__":
+    print("Testing event stream...")
+    print("=" * 50)
+
+    try:
+        test_live_delivery_and_resume()
+        test_resync_when_history_is_gone()
+        test_response_reads_last_event_id_header()
+        print("\n" + "=" * 50)
+        print("All tests completed successfully!")
+
+    except Exception as e:
+        logger.error(f"Test failed with error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
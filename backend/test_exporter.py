@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test script for the streaming table export
+Exports a scratch database in small chunks and checks that CSV and NDJSON
+carry every row exactly once with one encoded chunk per keyset page, that
+rows inserted after the export started are left out, that since=/until=
+limit the rows, and that the gzip stream decompresses to the same bytes.
+"""
+
+import os
+import sys
+import csv
+import io
+import json
+import gzip
+import sqlite3
+import tempfile
+import logging
+
+import exporter
+from exporter import stream_export
+from migrations import migrate
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def scratch_database(directory, count):
+    """database.db with `count` scans, one per day from 2025-01-01"""
+    path = os.path.join(directory, 'database.db')
+    migrate(path)
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO qr_scans (qr_data, timestamp, device, is_valid) VALUES (?, ?, 'pi', 1)",
+                     [(f'ORD-{i:03d}', f'2025-01-{i:02d}T12:00:00') for i in range(1, count + 1)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def exported(table, fmt, path, **options):
+    """Run a full export with a 3-row chunk size; returns the list of yielded chunks"""
+    saved = exporter.EXPORT_CHUNK_SIZE
+    exporter.EXPORT_CHUNK_SIZE = 3
+    try:
+        return list(stream_export(table, fmt, db_path=path, **options))
+    finally:
+        exporter.EXPORT_CHUNK_SIZE = saved
+
+
+def test_csv_and_ndjson_chunks():
+    """7 rows in 3-row pages: header + 3 CSV chunks, 3 NDJSON chunks, every row once"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = scratch_database(directory, 7)
+
+        chunks = exported('qr_scans', 'csv', path)
+        assert len(chunks) == 4
+        rows = list(csv.reader(io.StringIO(b''.join(chunks).decode('utf-8'))))
+        assert rows[0][:2] == ['id', 'qr_data']
+        assert [row[1] for row in rows[1:]] == [f'ORD-{i:03d}' for i in range(1, 8)]
+
+        chunks = exported('qr_scans', 'ndjson', path)
+        assert len(chunks) == 3
+        records = [json.loads(line) for line in b''.join(chunks).decode('utf-8').splitlines()]
+        assert [record['id'] for record in records] == list(range(1, 8))
+        assert records[0]['qr_data'] == 'ORD-001' and records[0]['is_valid'] == 1
+
+
+def test_stable_end_point_and_date_range():
+    """Rows written mid-export are not included; since/until (date-only until = whole day) filter rows"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = scratch_database(directory, 5)
+        saved = exporter.EXPORT_CHUNK_SIZE
+        exporter.EXPORT_CHUNK_SIZE = 2
+        try:
+            stream = stream_export('qr_scans', 'ndjson', db_path=path)
+            first = next(stream)
+            conn = sqlite3.connect(path)
+            conn.execute("INSERT INTO qr_scans (qr_data, timestamp, device, is_valid) VALUES ('LATE', '2025-01-06T12:00:00', 'pi', 1)")
+            conn.commit()
+            conn.close()
+            body = first + b''.join(stream)
+        finally:
+            exporter.EXPORT_CHUNK_SIZE = saved
+        assert [json.loads(line)['qr_data'] for line in body.decode('utf-8').splitlines()] == \
+            [f'ORD-{i:03d}' for i in range(1, 6)]
+
+        chunks = exported('qr_scans', 'ndjson', path, since='2025-01-02', until='2025-01-04')
+        assert [json.loads(line)['qr_data'] for line in b''.join(chunks).decode('utf-8').splitlines()] == \
+            ['ORD-002', 'ORD-003', 'ORD-004']
+
+        for bad in ({'since': 'last week'}, {'fmt': 'xml'}, {'table': 'orders'}):
+            options = {'table': 'qr_scans', 'fmt': 'csv', **bad}
+            try:
+                stream_export(options.pop('table'), options.pop('fmt'), db_path=path, **options)
+                assert False, f"{bad} is rejected before streaming"
+            except ValueError:
+                pass
+
+
+def test_gzip_matches_plain():
+    """gzip=1 output is one valid gzip stream of the same CSV bytes"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = scratch_database(directory, 7)
+        plain = b''.join(exported('qr_scans', 'csv', path))
+        compressed = b''.join(exported('qr_scans', 'csv', path, compress=True))
+        assert compressed[:2] == b'\x1f\x8b'
+        assert gzip.decompress(compressed) == plain
+
+
+if __name__ == "__main__":
+    print("Testing table export...")
+    print("=" * 50)
+
+    try:
+        test_csv_and_ndjson_chunks()
+        test_stable_end_point_and_date_range()
+        test_gzip_matches_plain()
+        print("\n" + "=" * 50)
+        print("All tests completed successfully!")
+
+    except Exception as e:
+        logger.error(f"Test failed with error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests for keyset pagination and field projection on list endpoints
+Seeds a scratch database and walks /api/orders and /api/scanned-codes with
+cursor=, since=, limit= and fields=, checking that every row is returned
+exactly once across pages (also when an order has several package rows) and
+that unpaginated /api/orders keeps its date ordering.
+"""
+
+import sys
+import sqlite3
+import logging
+
+import pytest
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def seed(orders):
+    """orders: [(order_number, date)]; orders 1-3 get scans, order 2 gets two package rows"""
+    conn = sqlite3.connect('database.db')
+    c = conn.cursor()
+    c.executemany('''
+        INSERT INTO orders (order_number, customer_name, contact_number, address,
+                            product_id, product_name, amount, date)
+        VALUES (?, 'Customer', '0912', 'Address', 'P001', 'Product', 10, ?)
+    ''', orders)
+    c.executemany("INSERT INTO scanned_codes (order_id, order_number, isverified) VALUES (?, ?, 'yes')",
+                  [(1, orders[0][0]), (2, orders[1][0]), (3, orders[2][0])])
+    c.executemany("INSERT INTO package_information (order_id, order_number, weight, timestamp) VALUES (?, ?, ?, 't')",
+                  [(2, orders[1][0], 0.5), (2, orders[1][0], 0.7), (3, orders[2][0], 1.1)])
+    conn.commit()
+    conn.close()
+
+
+def walk_pages(client, url, key):
+    """Follow cursors until the last page; returns every row seen"""
+    rows, cursor = [], None
+    while True:
+        response = client.get(url + (f'&cursor={cursor}' if cursor is not None else ''))
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        page = body[key] if key else body
+        rows.extend(page)
+        cursor = body['next_cursor'] if key else response.headers.get('X-Next-Cursor')
+        if cursor is None:
+            return rows
+
+
+def test_orders_pagination_and_fields(app_module):
+    """Unpaged orders are by date; pages walk ids without gaps; fields= and since= narrow the result"""
+    client = app_module.app.test_client()
+    seed([('ORD-001', '2025-01-03'), ('ORD-002', '2025-01-01'), ('ORD-003', '2025-01-05'),
+          ('ORD-004', '2025-01-02'), ('ORD-005', '2025-01-04')])
+
+    by_date = client.get('/api/orders').get_json()
+    assert [order['order_number'] for order in by_date] == ['ORD-003', 'ORD-005', 'ORD-001', 'ORD-004', 'ORD-002']
+
+    response = client.get('/api/orders?limit=2&fields=order_number')
+    assert response.get_json() == [{'order_number': 'ORD-005'}, {'order_number': 'ORD-004'}]
+    assert response.headers['X-Next-Cursor'] == '4'
+
+    pages = walk_pages(client, '/api/orders?limit=2&fields=id,order_number', None)
+    assert [order['id'] for order in pages] == [5, 4, 3, 2, 1]
+
+    newer = client.get('/api/orders?since=3&fields=id').get_json()
+    assert newer == [{'id': 5}, {'id': 4}]
+
+    response = client.get('/api/orders?fields=order_number,password')
+    assert response.status_code == 400 and 'password' in response.get_json()['error']
+
+
+def test_scanned_codes_one_row_per_scan(app_module):
+    """An order with several package rows still yields one row per scan, with the latest package"""
+    client = app_module.app.test_client()
+    seed([('ORD-001', '2025-01-01'), ('ORD-002', '2025-01-02'), ('ORD-003', '2025-01-03')])
+
+    rows = walk_pages(client, '/api/scanned-codes?limit=1&fields=order_number,weight', 'scanned_codes')
+    assert rows == [{'order_number': 'ORD-003', 'weight': 1.1},
+                    {'order_number': 'ORD-002', 'weight': 0.7},
+                    {'order_number': 'ORD-001', 'weight': None}]
+
+    body = client.get('/api/scanned-codes?since=1&fields=scan_id').get_json()
+    assert body['scanned_codes'] == [{'scan_id': 3}, {'scan_id': 2}] and body['next_cursor'] is None
+
+
+if __name__ == "__main__":
+    print("Testing list endpoint pagination...")
+    print("=" * 50)
+    # The tests take the app_module fixture from conftest.py, so they run through pytest
+    sys.exit(pytest.main([__file__, "-q"]))
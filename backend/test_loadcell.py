@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test script for the loadcell stream processor
+Feeds synthetic loadcell readings (noise, settling, removal) through
+LoadcellStream and checks that exactly one stable weight is emitted per package.
+"""
+
+import sys
+import logging
+import numpy as np
+from loadcell import LoadcellStream, translate_legacy_settings
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def make_stream():
+    events = []
+    config = {'window_size': 8, 'tolerance': 0.005, 'min_weight': 0.1}
+    return LoadcellStream(config, on_stable=events.append), events
+
+
+def test_single_stable_event_per_package():
+    """A settling package produces one event; removing it re-arms for the next"""
+    stream, events = make_stream()
+    rng = np.random.default_rng(42)
+
+    readings = [0.0] * 10                                    # Empty platform
+    readings += [0.1, 0.3, 0.45, 0.40, 0.43]                 # Package dropped, bouncing
+    readings += list(0.418 + rng.normal(0, 0.001, 30))       # Settled around 418 g
+    readings += [0.2, 0.0] + [0.0] * 10                      # Package removed
+    readings += list(0.250 + rng.normal(0, 0.001, 20))       # Second package
+
+    for reading in readings:
+        stream.add_reading(reading)
+
+    assert len(events) == 2, events
+    assert abs(events[0] - 0.418) < 0.002
+    assert abs(events[1] - 0.250) < 0.002
+    logger.info(f"Stable weights: {events}")
+
+
+def test_noisy_readings_never_settle():
+    """Readings that keep moving more than the tolerance never emit"""
+    stream, events = make_stream()
+    for reading in np.linspace(0.2, 0.6, 40):
+        stream.add_reading(reading)
+    assert events == []
+    assert stream.get_status()['armed'] is True
+
+
+def test_firmware_weight_only_used_when_not_settled():
+    """The ESP32 'Final Weight' fallback does not double-trigger after settling"""
+    stream, events = make_stream()
+    assert stream.accept_external_weight(0.5) == 0.5
+    for reading in [0.5] * 10:
+        stream.add_reading(reading)
+    assert stream.accept_external_weight(0.5) is None
+    assert events == [0.5]
+
+
+def test_legacy_spam_filter_settings():
+    """Old /api/spam-filter keys map onto settle detection; 'enabled' has no equivalent"""
+    settings, ignored = translate_legacy_settings({'min_weight_threshold': 0.05, 'weight_change_threshold': 0.01,
+                                                   'enabled': False, 'window_size': 6})
+    assert settings == {'min_weight': 0.05, 'tolerance': 0.01, 'window_size': 6} and ignored == ['enabled']
+
+    stream, _ = make_stream()
+    stream.configure(**settings)
+    assert stream.config['min_weight'] == 0.05 and stream.config['window_size'] == 6
+
+
+if __name__ == "__main__":
+    print("Testing loadcell stream processor...")
+    print("=" * 50)
+
+    try:
+        test_single_stable_event_per_package()
+        test_noisy_readings_never_settle()
+        test_firmware_weight_only_used_when_not_settled()
+        test_legacy_spam_filter_settings()
+        print("\n" + "=" * 50)
+        print("All tests completed successfully!")
+
+    except Exception as e:
+        logger.error(f"Test failed with error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
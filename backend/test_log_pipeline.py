@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Test script for the queued logging pipeline
+Logs through a LogPipeline into a temporary file and checks the JSON lines,
+per-component sampling, the per-call-site rate limiter, size and time based
+rotation, and that a full queue drops records instead of blocking the caller.
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import logging
+
+from log_pipeline import (LogPipeline, LOGGING_CONFIG, SizeAndTimeRotatingFileHandler, parse_sampling,
+                          NonBlockingQueueHandler, LOG_RECORDS)
+
+logger = logging.getLogger(__name__)
+
+TEST_CONFIG = dict(LOGGING_CONFIG, level='DEBUG', file_format='json', console=False, sampling='',
+                   rate_limit=0, max_bytes=0, rotate_hours=0)
+
+
+def run_pipeline(directory, config, emit):
+    """Start a pipeline on a temp file, run emit(), stop, and return the JSON records written"""
+    path = os.path.join(directory, 'test.log')
+    root = logging.getLogger()
+    saved_handlers, saved_level = list(root.handlers), root.level
+    pipeline = LogPipeline(path, service='test', config=config)
+    root.handlers = [pipeline.queue_handler]
+    root.setLevel(config['level'])
+    pipeline.listener.start()
+    try:
+        emit()
+    finally:
+        pipeline.stop()
+        root.handlers, root.level = saved_handlers, saved_level
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_json_records_and_sampling():
+    """Records become JSON with extras and tracebacks; listed components are sampled per call site"""
+    component = logging.getLogger('camera.decoder')
+
+    def emit():
+        logger.info("parcel %s weighed %.1f g", 'ORD-1', 418.6, extra={'order_number': 'ORD-1'})
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            logger.exception("🔥 failed")
+        for i in range(20):
+            component.info(f"frame {i}")
+        for i in range(3):
+            component.warning(f"decoder warning {i}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        records = run_pipeline(directory, dict(TEST_CONFIG, sampling='camera=5'), emit)
+
+    first = records[0]
+    assert first['message'] == 'parcel ORD-1 weighed 418.6 g' and first['order_number'] == 'ORD-1'
+    assert first['service'] == 'test' and first['level'] == 'INFO' and first['src'].startswith('test_log_pipeline:')
+    assert records[1]['message'] == '🔥 failed' and 'ZeroDivisionError' in records[1]['exc_info']
+    frames = [r for r in records if r['logger'] == 'camera.decoder' and r['level'] == 'INFO']
+    assert [r['message'] for r in frames] == ['frame 0', 'frame 5', 'frame 10', 'frame 15']
+    assert all(r['sampled'] == 5 for r in frames)
+    assert len([r for r in records if r['level'] == 'WARNING']) == 3  # Never sampled
+    assert parse_sampling(' camera=10, loadcell = 2,') == {'camera': 10, 'loadcell': 2}
+
+
+def test_rate_limit():
+    """A call site flooding the log keeps its burst, then reports what it suppressed"""
+    def frame_errors(numbers):
+        for i in numbers:
+            logger.error(f"frame error {i}")  # One call site
+
+    def emit():
+        frame_errors(range(200))
+        time.sleep(0.25)
+        logger.error("frame error after pause")  # Another call site has its own budget
+        frame_errors(range(200, 202))
+
+    with tempfile.TemporaryDirectory() as directory:
+        records = run_pipeline(directory, dict(TEST_CONFIG, rate_limit=10, rate_burst=5), emit)
+
+    flood = [r for r in records if r['message'] != 'frame error after pause']
+    assert [r['message'] for r in flood] == [f'frame error {i}' for i in (0, 1, 2, 3, 4, 200, 201)]
+    assert flood[5]['suppressed'] == 195 and 'suppressed' not in flood[6]  # Reported once, after the pause
+    assert records[5]['message'] == 'frame error after pause' and 'suppressed' not in records[5]
+
+
+def test_rotation_and_full_queue():
+    """Files roll over on size and on age; a full queue never blocks the logger"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'size.log')
+        handler = SizeAndTimeRotatingFileHandler(path, max_bytes=200, backup_count=2)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        for i in range(20):
+            handler.emit(logging.makeLogRecord({'msg': f'line {i:02d} ' + 'x' * 40}))
+        handler.close()
+        assert sorted(os.listdir(directory)) == ['size.log', 'size.log.1', 'size.log.2']
+
+        path = os.path.join(directory, 'time.log')
+        handler = SizeAndTimeRotatingFileHandler(path, rotate_hours=0.1 / 3600, backup_count=2)
+        handler.emit(logging.makeLogRecord({'msg': 'before'}))
+        time.sleep(0.15)
+        handler.emit(logging.makeLogRecord({'msg': 'after'}))
+        handler.close()
+        assert open(path + '.1').read() == 'before\n' and open(path).read() == 'after\n'
+
+    import queue
+    handler = NonBlockingQueueHandler(queue.Queue(2))
+    dropped_before = LOG_RECORDS.labels('dropped').value
+    started = time.perf_counter()
+    for i in range(100):
+        handler.handle(logging.makeLogRecord({'msg': 'record %d', 'args': (i,)}))
+    elapsed = time.perf_counter() - started
+    assert LOG_RECORDS.labels('dropped').value == dropped_before + 98
+    assert handler.queue.get_nowait().msg == 'record 0'  # %-args resolved before queuing
+    logger.info(f"100 log calls against a full queue: {elapsed * 1e6 / 100:.1f} µs each")
+    assert elapsed < 0.5
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    print("Testing logging pipeline...")
+    print("=" * 50)
+
+    try:
+        test_json_records_and_sampling()
+        test_rate_limit()
+        test_rotation_and_full_queue()
+        print("\n" + "=" * 50)
+        print("All tests completed successfully!")
+
+    except Exception as e:
+        logger.error(f"Test failed with error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
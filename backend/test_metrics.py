@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test script for the metrics registry
+Checks the Prometheus text exposition of counters, gauges and histograms, the
+Flask request instrumentation and /metrics endpoint, SQLite statement timing
+and outgoing HTTP call accounting, and reports the per-observation overhead.
+"""
+
+import os
+import sys
+import time
+import tempfile
+import logging
+
+import requests
+from flask import Flask
+
+from metrics import MetricsRegistry, metrics, instrument_flask, timed_connect, InstrumentedSession, url_target
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def test_exposition_format():
+    """Counters get _total, histograms are cumulative with +Inf, label values are escaped"""
+    registry = MetricsRegistry()
+    jobs = registry.counter('jobs', 'Jobs done', ('result',))
+    jobs.labels('ok').inc()
+    jobs.labels('ok').inc(2)
+    jobs.labels('say "hi"\n').inc()
+    depth = registry.gauge('queue_depth', 'Items waiting')
+    depth.set_function(lambda: 7)
+    latency = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3):
+        latency.observe(value)
+    assert registry.counter('jobs', 'Jobs done', ('result',)) is jobs  # Re-registering returns the same metric
+
+    text = registry.render()
+    assert '# TYPE jobs_total counter' in text
+    assert 'jobs_total{result="ok"} 3' in text
+    assert 'jobs_total{result="say \\"hi\\"\\n"} 1' in text
+    assert 'queue_depth 7' in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1"} 3' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in text
+    assert 'latency_seconds_count 4' in text and 'latency_seconds_sum 4.05' in text
+
+    try:
+        registry.gauge('jobs', 'Not a counter')
+        assert False, "a name cannot change type"
+    except ValueError:
+        pass
+
+    started = time.perf_counter()
+    for _ in range(100000):
+        latency.observe(0.01)
+    per_call_us = (time.perf_counter() - started) * 10
+    logger.info(f"Histogram observe: {per_call_us:.2f} µs per call")
+    assert per_call_us < 50
+
+
+def test_flask_sqlite_and_http_instrumentation():
+    """Requests are counted by route template, statements by type, HTTP calls by target path"""
+    directory = tempfile.mkdtemp()
+    app = Flask(__name__)
+
+    @app.route('/api/orders/<order_id>')
+    def get_order(order_id):
+        conn = timed_connect(os.path.join(directory, 'test.db'))
+        conn.execute('CREATE TABLE IF NOT EXISTS orders (id TEXT)')
+        cursor = conn.cursor()
+        cursor.executemany('INSERT INTO orders VALUES (?)', [(order_id,)])
+        cursor.execute('  select * from orders')
+        rows = cursor.fetchall()
+        conn.close()
+        return {'rows': len(rows)}
+
+    instrument_flask(app)
+    client = app.test_client()
+    selects_before = metrics.get('sqlite_query_seconds').labels('SELECT').count
+    for order_id in ('ORD-1', 'ORD-2', 'ORD-3'):
+        assert client.get(f'/api/orders/{order_id}').status_code == 200
+    assert client.get('/nope').status_code == 404
+
+    response = client.get('/metrics')
+    assert response.status_code == 200 and response.content_type.startswith('text/plain; version=0.0.4')
+    text = response.get_data(as_text=True)
+    assert 'http_requests_total{method="GET",route="/api/orders/<order_id>",status="200"} 3' in text
+    assert 'http_requests_total{method="GET",route="unmatched",status="404"} 1' in text
+    assert 'http_requests_in_flight 1' in text  # The scrape itself
+    assert metrics.get('sqlite_query_seconds').labels('SELECT').count == selects_before + 3
+    assert metrics.get('sqlite_query_seconds').labels('INSERT').count >= 3
+
+    assert url_target('http://pi:5001/api/package-information/order/ORD-2025-0001') == \
+        '/api/package-information/order/:id'
+    session = InstrumentedSession()
+    try:
+        session.get('http://127.0.0.1:9/api/orders/ORD-7', timeout=1)
+        assert False, "nothing listens on port 9"
+    except requests.ConnectionError:
+        pass
+    text = metrics.render()
+    assert 'http_client_requests_total{method="GET",target="/api/orders/:id",status="ConnectionError"} 1' in text
+
+
+if __name__ == "__main__":
+    print("Testing metrics registry...")
+    print("=" * 50)
+
+    try:
+        test_exposition_format()
+        test_flask_sqlite_and_http_instrumentation()
+        print("\n" + "=" * 50)
+        print("All tests completed successfully!")
+
+    except Exception as e:
+        logger.error(f"Test failed with error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Test script for the versioned schema migrations
+Migrates a fresh database and one laid out like the pre-versioning schema
+(orders with status and email columns, missing package columns, duplicate
+scans and order numbers, sizes never filled in), and checks that each
+migration runs once, rewrites are batched with progress reports, a failing
+migration is rolled back, and an up-to-date database is left untouched.
+"""
+
+import os
+import sys
+import sqlite3
+import tempfile
+import logging
+
+from migrations import (migrate, schema_version, applied_migrations, table_columns, MIGRATIONS, LATEST_VERSION,
+                        MigrationError)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def create_legacy_database(path, orders):
+    """Tables as an early app.py created them"""
+    conn = sqlite3.connect(path)
+    c = conn.cursor()
+    c.execute('''
+        CREATE TABLE orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, order_number TEXT NOT NULL, customer_name TEXT NOT NULL,
+            email TEXT, contact_number TEXT NOT NULL, address TEXT NOT NULL, product_id TEXT NOT NULL,
+            product_name TEXT NOT NULL, amount REAL NOT NULL, date TEXT NOT NULL, status TEXT
+        )
+    ''')
+    c.executemany('INSERT INTO orders VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', [
+        (i, f'ORD-{min(i, orders - 1):03d}', f'Customer {i}', 'a@b.c', '0912', 'Address', 'P001', 'Product',
+         10.0 * i, '2025-01-01', 'pending')
+        for i in range(1, orders + 1)
+    ])
+    c.execute('''
+        CREATE TABLE package_information (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, order_id INTEGER, order_number TEXT, weight REAL,
+            width REAL, height REAL, length REAL, timestamp TEXT NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    c.executemany('INSERT INTO package_information (order_id, order_number, weight, width, height, length, timestamp) '
+                  'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                  [(1, 'ORD-001', 0.2, 5, 5, 5, 't'), (2, 'ORD-002', 0.8, 10, 10, 10, 't'),
+                   (3, 'ORD-003', 2.0, 10, 10, 10, 't')])
+    c.execute('''
+        CREATE TABLE scanned_codes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, order_id INTEGER NOT NULL, order_number TEXT NOT NULL,
+            isverified TEXT NOT NULL, scanned_at DATETIME DEFAULT CURRENT_TIMESTAMP, device TEXT
+        )
+    ''')
+    c.executemany('INSERT INTO scanned_codes (order_id, order_number, isverified) VALUES (?, ?, ?)',
+                  [(1, 'ORD-001', 'yes'), (1, 'ORD-001', 'yes'), (2, 'ORD-002', 'yes')])
+    conn.commit()
+    conn.close()
+
+
+def test_fresh_database_and_fast_path():
+    """An empty file gets every migration once; a second run only checks the version"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'database.db')
+        assert migrate(path) == LATEST_VERSION
+
+        conn = sqlite3.connect(path)
+        assert [row[0] for row in applied_migrations(conn)] == [number for number, _, _ in MIGRATIONS]
+        assert 'email' not in table_columns(conn.cursor(), 'orders')
+        assert conn.execute("SELECT value FROM order_number_sequence WHERE name = 'orders'").fetchone() == (0,)
+        conn.close()
+
+        statements = []
+        conn = sqlite3.connect(path)
+        conn.set_trace_callback(statements.append)
+        assert schema_version(conn) == LATEST_VERSION
+        conn.close()
+        assert len(statements) == 1
+
+        modified = os.stat(path).st_mtime_ns
+        assert migrate(path) == LATEST_VERSION
+        assert os.stat(path).st_mtime_ns == modified
+
+
+def test_legacy_database():
+    """The old layout is rebuilt in batches with its data kept, duplicates fixed and sizes backfilled"""
+    reports = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'database.db')
+        create_legacy_database(path, orders=25)
+        assert migrate(path, batch_size=10, progress=lambda *report: reports.append(report)) == LATEST_VERSION
+
+        conn = sqlite3.connect(path)
+        c = conn.cursor()
+        assert 'status' not in table_columns(c, 'orders') and 'email' not in table_columns(c, 'orders')
+        assert c.execute('SELECT COUNT(*), SUM(amount) FROM orders').fetchone() == (25, 3250.0)
+        numbers = [row[0] for row in c.execute('SELECT order_number FROM orders ORDER BY id')]
+        assert len(set(numbers)) == 25 and numbers[-1] == 'ORD-025'  # Duplicate ORD-024 renumbered
+        assert c.execute('SELECT COUNT(*) FROM scanned_codes').fetchone() == (2,)
+        sizes = [row[0] for row in c.execute('SELECT package_size FROM package_information ORDER BY id')]
+        assert sizes == ['Small', 'Medium', 'Large']
+        assert 'loadcell_timestamp' in table_columns(c, 'package_information')
+        conn.close()
+
+    assert [report for report in reports if report[0] == 2] == [(2, 10, 25), (2, 20, 25), (2, 25, 25)]
+    assert (7, 3, 3) in reports
+
+
+def test_failing_migration_rolls_back():
+    """A migration that raises leaves no trace and the version stays put; the next run retries it"""
+    attempts = []
+
+    def half_done(c, progress):
+        c.execute('CREATE TABLE half_done (id INTEGER)')
+        c.execute("INSERT INTO orders (order_number, customer_name, contact_number, address, product_id, "
+                  "product_name, amount, date) VALUES ('ORD-X', 'c', 'n', 'a', 'p', 'p', 1, 'd')")
+        attempts.append(True)
+        if len(attempts) == 1:
+            raise sqlite3.IntegrityError("simulated failure")
+
+    candidates = MIGRATIONS + [(LATEST_VERSION + 1, 'half done', half_done)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'database.db')
+        try:
+            migrate(path, migrations=candidates)
+            assert False, "the failure propagates"
+        except MigrationError:
+            pass
+        conn = sqlite3.connect(path)
+        assert schema_version(conn) == LATEST_VERSION
+        assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'half_done'").fetchone() == (0,)
+        assert conn.execute('SELECT COUNT(*) FROM orders').fetchone() == (0,)
+        conn.close()
+
+        assert migrate(path, migrations=candidates) == LATEST_VERSION + 1
+        assert migrate(path, migrations=candidates) == LATEST_VERSION + 1
+        assert len(attempts) == 2
+
+
+if __name__ == "__main__":
+    print("Testing schema migrations...")
+    print("=" * 50)
+
+    try:
+        test_fresh_database_and_fast_path()
+        test_legacy_database()
+        test_failing_migration_rolls_back()
+        print("\n" + "=" * 50)
+        print("All tests completed successfully!")
+
+    except Exception as e:
+        logger.error(f"Test failed with error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
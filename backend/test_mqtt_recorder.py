@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Test script for the MQTT recorder and replayer
+Round-trips messages through the binary log (plain and gzip, including a
+record cut off by a crash), replays a recording through a small
+MQTTListener-style router, checking the outbound command assertions, and
+checks that server.py's /mqtt/recording only writes under recordings/.
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+import logging
+
+from mqtt_recorder import MQTTRecorder, MQTTReplayer, read_recording, INBOUND, OUTBOUND
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class EchoListener:
+    """Minimal router in the shape of server.py's MQTTListener: IR trigger → delayed stopA"""
+
+    def __init__(self, delay=0.05, command='stopA'):
+        self.client = None
+        self.is_connected = False
+        self.recorder = None
+        self.delay = delay
+        self.command = command
+
+    def on_message(self, client, userdata, msg):
+        if self.recorder:
+            self.recorder.record(INBOUND, msg.topic, msg.payload)
+        if msg.topic == 'esp32/ir/status':
+            def stop_motor():
+                time.sleep(self.delay)
+                self.publish_message('esp32/motor/request', self.command)
+            threading.Thread(target=stop_motor, daemon=True).start()
+
+    def publish_message(self, topic, message):
+        if not self.is_connected:
+            return False
+        if self.client.publish(topic, message).rc == 0 and self.recorder:
+            self.recorder.record(OUTBOUND, topic, message)
+        return True
+
+
+def make_recording(path, triggers=3):
+    recorder = MQTTRecorder(path)
+    for i in range(triggers):
+        recorder.record(INBOUND, 'esp32/ir/status', 'IR A triggered')
+        recorder.record(INBOUND, 'esp32/loadcell/data', f'{0.5 + i:.4f}')
+        time.sleep(0.05)
+        recorder.record(OUTBOUND, 'esp32/motor/request', 'stopA')
+        time.sleep(0.05)
+    recorder.close()
+    return recorder
+
+
+def test_recording_round_trip():
+    """Records read back in order, from plain and gzip files, tolerating a truncated tail"""
+    with tempfile.TemporaryDirectory() as directory:
+        for name in ('run.mqrec', 'run.mqrec.gz'):
+            path = os.path.join(directory, 'nested', name)
+            recorder = make_recording(path)
+            assert recorder.get_status()['inbound'] == 6 and recorder.get_status()['outbound'] == 3
+
+            _, records = read_recording(path)
+            assert [(d, t) for _, d, t, _ in records[:3]] == [
+                (INBOUND, 'esp32/ir/status'), (INBOUND, 'esp32/loadcell/data'), (OUTBOUND, 'esp32/motor/request')]
+            assert records[1][3] == b'0.5000'
+            offsets = [offset for offset, _, _, _ in records]
+            assert offsets == sorted(offsets)
+
+        plain = os.path.join(directory, 'nested', 'run.mqrec')
+        with open(plain, 'ab') as f:
+            f.write(b'\x00\x01\x02')  # Partial record from a crash
+        assert len(read_recording(plain)[1]) == 9
+
+
+def test_replay_asserts_outbound_commands():
+    """A faithful router passes at 1x and max speed; a changed command is reported"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'run.mqrec')
+        listener = EchoListener()
+        make_recording(path)
+
+        results = MQTTReplayer(listener, path).run(speed=1, settle=2, tolerance=0.2)
+        assert results['passed'], results
+        assert results['matched'] == 3 and results['timing_drift_s']['count'] == 3
+        assert listener.is_connected is False  # Listener state restored
+
+        fast = MQTTReplayer(listener, path).run(speed=0, settle=2)
+        assert fast['passed'] and fast['timing_drift_s'] is None
+        logger.info(f"Max-speed replay: {fast['messages_per_second']} msg/s")
+
+        changed = MQTTReplayer(EchoListener(command='stopB'), path).run(speed=0, settle=0.5)
+        assert not changed['passed']
+        assert len(changed['missing']) == 3 and len(changed['unexpected']) == 3
+
+        slow = MQTTReplayer(EchoListener(delay=0.4), path).run(speed=1, settle=2, tolerance=0.2)
+        assert not slow['passed'] and slow['late'] == 3
+
+
+def test_recording_route_stays_in_recordings_dir():
+    """POST /mqtt/recording takes a plain file name; paths and dot files are rejected with a 400"""
+    os.environ.setdefault('BACKEND_URL', 'http://127.0.0.1:9')
+    os.environ.setdefault('MQTT_BROKER_HOST', '127.0.0.1')
+    os.environ.setdefault('MQTT_BROKER_PORT', '9')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    original_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        os.chdir(scratch_dir)
+        try:
+            import server
+            client = server.app.test_client()
+            try:
+                for name in ('../server.py', '/tmp/capture.mqrec', 'sub/capture.mqrec', '..', '.hidden', 'a\\b.mqrec'):
+                    response = client.post('/mqtt/recording', json={'action': 'start', 'name': name})
+                    assert response.status_code == 400, name
+                assert client.post('/mqtt/recording', json={'action': 'start', 'path': '../x.mqrec'}).status_code == 400
+                assert client.get('/mqtt/recording').get_json()['recording'] is None
+
+                started = client.post('/mqtt/recording', json={'action': 'start', 'name': 'shift1.mqrec'})
+                assert started.status_code == 200
+                assert started.get_json()['recording']['path'] == os.path.join('recordings', 'shift1.mqrec')
+                assert os.path.exists(os.path.join(scratch_dir, 'recordings', 'shift1.mqrec'))
+                assert client.post('/mqtt/recording', json={'action': 'stop'}).get_json()['recording']['recording'] is False
+            finally:
+                server.mqtt_listener.stop_recording()
+        finally:
+            os.chdir(original_cwd)
+
+
+if __name__ == "__main__":
+    print("Testing MQTT recorder and replayer...")
+    print("=" * 50)
+
+    try:
+        test_recording_round_trip()
+        test_replay_asserts_outbound_commands()
+        test_recording_route_stays_in_recordings_dir()
+        print("\n" + "=" * 50)
+        print("All tests completed successfully!")
+
+    except Exception as e:
+        logger.error(f"Test failed with error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test script for the sampling profiler
+Profiles a CPU-bound thread next to a sleeping one and checks the collapsed
+stacks, the per-thread CPU attribution, cpu vs wall mode and that only one
+profile runs at a time.
+"""
+
+import sys
+import time
+import tempfile
+import threading
+import logging
+
+from profiler import SamplingProfiler, ProfileBusyError, PROFILER_CONFIG, collapsed_text, save_profile, profile_summary
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(2000))
+
+
+def idle_loop(stop):
+    while not stop.is_set():
+        stop.wait(0.05)
+
+
+def start_workers():
+    stop = threading.Event()
+    for name, target in (('busy-worker', busy_loop), ('idle-worker', idle_loop)):
+        threading.Thread(target=target, args=(stop,), name=name, daemon=True).start()
+    return stop
+
+
+def test_cpu_attribution_and_collapsed_stacks():
+    """The busy thread dominates CPU and samples; idle threads drop out in cpu mode"""
+    profiler = SamplingProfiler(dict(PROFILER_CONFIG, interval=0.005))
+    stop = start_workers()
+    try:
+        cpu = profiler.profile(0.6)
+        wall = profiler.profile(0.3, mode='wall')
+    finally:
+        stop.set()
+
+    threads = {t['name']: t for t in cpu['threads']}
+    busy, idle = threads['busy-worker'], threads.get('idle-worker')
+    logger.info(f"busy-worker: {busy['cpu_percent']}% CPU, {busy['samples']} samples; "
+                f"profiler: {cpu['profiler_cpu_seconds']}s CPU over {cpu['duration_s']}s")
+    assert cpu['threads'][0]['name'] == 'busy-worker' and busy['cpu_percent'] > 20
+    assert idle is None or idle['samples'] < busy['samples'] / 5
+    assert cpu['profiler_cpu_seconds'] < cpu['duration_s']
+
+    lines = collapsed_text(cpu).splitlines()
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+    assert any(line.startswith('busy-worker;') and 'busy_loop (test_profiler.py:' in line for line in lines)
+    assert cpu['top_functions'][0]['function'].startswith(('<genexpr> (test_profiler.py', 'busy_loop'))
+
+    wall_threads = {t['name']: t for t in wall['threads']}
+    assert wall_threads['idle-worker']['samples'] >= wall['ticks'] - 1  # Sampled even while waiting
+    assert any('idle_loop (test_profiler.py:' in stack for stack in wall['collapsed'])
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = save_profile(cpu, directory)
+        assert path.endswith('_cpu.folded') and open(path).read() == collapsed_text(cpu)
+    summary = profile_summary(cpu)
+    assert 'collapsed' not in summary and summary['stacks'] == len(cpu['collapsed'])
+
+
+def test_one_profile_at_a_time():
+    """A second request while profiling is refused; bad modes are rejected"""
+    profiler = SamplingProfiler()
+    runner = threading.Thread(target=profiler.profile, args=(0.3,))
+    runner.start()
+    time.sleep(0.05)
+    try:
+        profiler.profile(0.1)
+        assert False, "a second concurrent profile should be refused"
+    except ProfileBusyError:
+        pass
+    runner.join()
+    assert not profiler.running and profiler.last_profile['duration_s'] >= 0.3
+
+    try:
+        profiler.profile(0.1, mode='gpu')
+        assert False, "unknown modes are rejected"
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    print("Testing sampling profiler...")
+    print("=" * 50)
+
+    try:
+        test_cpu_attribution_and_collapsed_stacks()
+        test_one_profile_at_a_time()
+        print("\n" + "=" * 50)
+        print("All tests completed successfully!")
+
+    except Exception as e:
+        logger.error(f"Test failed with error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
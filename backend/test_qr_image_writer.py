@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Test script for the asynchronous QR image writer
+Submits synthetic frames and checks that submit() returns before the image is
+written, that flush() waits for (or times out on) the queue, that a full queue
+drops new crops, and that close() writes what is still queued, stops the
+worker and leaves the writer usable again.
+"""
+
+import os
+import sys
+import time
+import base64
+import tempfile
+import threading
+import logging
+
+import numpy as np
+
+from qr_image_writer import QRImageWriter, QR_IMAGE_CONFIG
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def blocking_writer(directory, queue_size=32):
+    """Writer whose worker stops after each image until `gate` is set"""
+    gate = threading.Event()
+    writer = QRImageWriter(directory, config={**QR_IMAGE_CONFIG, 'queue_size': queue_size},
+                           on_written=lambda handle: gate.wait(5))
+    return writer, gate
+
+
+def frame():
+    return np.full((200, 300, 3), 128, dtype=np.uint8)
+
+
+def test_flush_waits_for_queue():
+    """Handles come back immediately; flush() times out while the worker is held, then completes"""
+    with tempfile.TemporaryDirectory() as directory:
+        writer, gate = blocking_writer(directory)
+        handles = [writer.submit(frame(), f'ORD-{i}', (100, 50, 40, 40)) for i in range(3)]
+        assert all(handle is not None for handle in handles)
+        assert handles[-1]['base64'] is None and not handles[-1].done
+
+        assert writer.flush(timeout=0.05) is False
+        gate.set()
+        assert writer.flush(timeout=5) is True
+        for handle in handles:
+            assert handle.wait(0) and os.path.exists(handle['filepath'])
+            with open(handle['filepath'], 'rb') as f:
+                assert base64.b64decode(handle['base64']) == f.read()
+        status = writer.get_status()
+        assert (status['written'], status['pending'], status['dropped']) == (3, 0, 0)
+
+
+def test_full_queue_drops():
+    """With the worker held on one image and the queue full, the next crop is dropped"""
+    with tempfile.TemporaryDirectory() as directory:
+        writer, gate = blocking_writer(directory, queue_size=1)
+        writer.submit(frame(), 'ORD-1')
+        while writer._queue.qsize():  # Worker has taken the first crop and is held
+            time.sleep(0.01)
+        assert writer.submit(frame(), 'ORD-2') is not None
+        assert writer.submit(frame(), 'ORD-3') is None
+        gate.set()
+        assert writer.flush(timeout=5) and writer.get_status()['dropped'] == 1
+
+
+def test_close_drains_and_restarts():
+    """close() writes everything still queued and stops the worker; a later submit starts a new one"""
+    with tempfile.TemporaryDirectory() as directory:
+        writer = QRImageWriter(directory)
+        assert writer.close() is True  # Nothing started yet
+        handles = [writer.submit(frame(), f'ORD-{i}') for i in range(5)]
+        worker = writer._worker
+
+        assert writer.close(timeout=5) is True
+        assert not worker.is_alive() and all(handle.done for handle in handles)
+        assert writer.get_status()['written'] == 5
+
+        handle = writer.submit(frame(), 'ORD-after-close')
+        assert handle.wait(5) and writer._worker is not worker
+        assert writer.close(timeout=5) and len(os.listdir(directory)) == 6
+
+
+if __name__ == "__main__":
+    print("Testing QR image writer...")
+    print("=" * 50)
+
+    try:
+        test_flush_waits_for_queue()
+        test_full_queue_drops()
+        test_close_drains_and_restarts()
+        print("\n" + "=" * 50)
+        print("All tests completed successfully!")
+
+    except Exception as e:
+        logger.error(f"Test failed with error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test script for the replay capture source
+Builds a small directory of synthetic QR frames, replays it through
+ReplaySource and through CameraManager's capture loop, and checks labels,
+pacing and that every labelled code reaches the QR callbacks.
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import logging
+
+import cv2
+import numpy as np
+
+from camera import CameraManager
+from qr_decoders import OpenCVDecoder
+from replay_source import ReplaySource
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def make_frames(directory, codes=('ORD-001', 'ORD-002', 'ORD-003'), frames_per_code=3):
+    """Saved-scanner style frames (label in the filename) plus one unlabelled blank frame"""
+    encoder = cv2.QRCodeEncoder.create()
+    for i, code in enumerate(codes):
+        qr = cv2.resize(encoder.encode(code), (200, 200), interpolation=cv2.INTER_NEAREST)
+        for k in range(frames_per_code):
+            frame = np.full((480, 640, 3), 200, dtype=np.uint8)
+            frame[140:340, 100 + k * 50:300 + k * 50] = qr[:, :, None]
+            cv2.imwrite(os.path.join(directory, f'qr_20251001_120000_{i:03d}{k:03d}_{code}.jpg'), frame)
+    cv2.imwrite(os.path.join(directory, 'zz_blank.png'), np.zeros((480, 640, 3), dtype=np.uint8))
+
+
+def test_labels_and_looping():
+    """Labels come from filenames or labels.json; exhausting without loop ends the replay"""
+    with tempfile.TemporaryDirectory() as directory:
+        make_frames(directory)
+        with open(os.path.join(directory, 'labels.json'), 'w') as f:
+            json.dump({'zz_blank.png': 'BLANK'}, f)
+
+        source = ReplaySource(directory, fps=0, loop=False)
+        labels = []
+        while True:
+            frame, label = source.next_frame()
+            if frame is None:
+                break
+            labels.append(label)
+        assert labels == ['ORD-001'] * 3 + ['ORD-002'] * 3 + ['ORD-003'] * 3 + ['BLANK']
+        assert source.frames_served == 10 and source.loops == 0
+
+        looping = ReplaySource(directory, fps=0, loop=True)
+        for _ in range(15):
+            looping.next_frame()
+        assert looping.loops == 1 and looping.index == 4
+
+
+def test_rate_control():
+    """Frames are served at the requested rate"""
+    with tempfile.TemporaryDirectory() as directory:
+        make_frames(directory)
+        source = ReplaySource(directory, fps=50)
+        started = time.monotonic()
+        for _ in range(11):
+            source.read()
+        elapsed = time.monotonic() - started
+        assert 0.18 <= elapsed <= 0.4, elapsed
+
+
+def test_camera_pipeline_reports_every_code():
+    """Replayed through CameraManager, each labelled code reaches the QR callbacks"""
+    with tempfile.TemporaryDirectory() as directory:
+        make_frames(directory)
+        manager = CameraManager()
+        manager.use_replay_source(ReplaySource(directory, fps=30))
+        manager.decoder = OpenCVDecoder()
+        manager.image_writer.directory = directory
+        manager.validate_qr_with_database = lambda qr_data: {'valid': True, 'order_number': qr_data}
+        manager.sync_qr_history_to_backend = lambda: None
+
+        seen = []
+        manager.add_qr_callback(lambda qr_data, result: seen.append(qr_data))
+        manager.start_camera()
+        manager.start_scanning_session_immediately()
+        deadline = time.monotonic() + 10
+        while len(set(seen)) < 3 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        manager.stop_camera()
+        manager.image_writer.flush(timeout=5)
+
+        assert sorted(set(seen)) == ['ORD-001', 'ORD-002', 'ORD-003'], seen
+        logger.info(f"Codes reported: {seen}")
+
+
+if __name__ == "__main__":
+    print("Testing replay capture source...")
+    print("=" * 50)
+
+    try:
+        test_labels_and_looping()
+        test_rate_control()
+        test_camera_pipeline_reports_every_code()
+        print("\n" + "=" * 50)
+        print("All tests completed successfully!")
+
+    except Exception as e:
+        logger.error(f"Test failed with error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test script for ETag / 304 responses on polled read endpoints
+Checks ResourceVersions on a small Flask app (304 on a matching
+If-None-Match, cached bodies until a bump, per-query-string ETags, errors
+never cached) and that server.py's /status changes its ETag when the MQTT
+recording state changes instead of serving a stale body.
+"""
+
+import os
+import sys
+import tempfile
+import logging
+
+from flask import Flask, jsonify
+
+from resource_versions import ResourceVersions
+from startup import LazySubsystem
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def test_conditional_responses():
+    """Unchanged polls get 304, bumps and other query strings get a fresh body, errors are not cached"""
+    app = Flask(__name__)
+    versions = ResourceVersions()
+    builds = []
+    state = {'fail': False}
+
+    @app.route('/items')
+    def items():
+        def build():
+            builds.append(1)
+            if state['fail']:
+                return jsonify({'error': 'boom'}), 500
+            return jsonify({'items': len(builds)})
+        return versions.conditional_response('items', build)
+
+    client = app.test_client()
+    first = client.get('/items')
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and etag == '"items-0"' and first.headers['Cache-Control'] == 'no-cache'
+
+    assert client.get('/items', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/items').get_json() == {'items': 1} and len(builds) == 1  # Served from cache
+
+    filtered = client.get('/items?limit=5')
+    assert filtered.headers['ETag'] not in (etag, None) and len(builds) == 2
+
+    versions.bump('items')
+    changed = client.get('/items', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] == '"items-1"' and len(builds) == 3
+
+    versions.bump('items')
+    state['fail'] = True
+    assert client.get('/items').status_code == 500
+    assert client.get('/items').status_code == 500 and len(builds) == 5
+
+
+class FakeCamera:
+    status_version = 1
+
+    def get_status(self):
+        return {'has_camera': True, 'camera_running': True}
+
+
+class FakePrinter:
+    def check_printer(self):
+        return True
+
+
+def test_server_status_tracks_recording():
+    """/status answers 304 until the recording state changes"""
+    os.environ.setdefault('BACKEND_URL', 'http://127.0.0.1:9')
+    os.environ.setdefault('MQTT_BROKER_HOST', '127.0.0.1')
+    os.environ.setdefault('MQTT_BROKER_PORT', '9')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    original_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        os.chdir(scratch_dir)
+        try:
+            import server
+            saved = server.camera, server.printer
+            server.camera, server.printer = LazySubsystem('camera', FakeCamera), LazySubsystem('printer', FakePrinter)
+            try:
+                client = server.app.test_client()
+                idle = client.get('/status')
+                assert idle.status_code == 200 and idle.get_json()['mqtt']['recording'] is None
+                assert 'timestamp' not in idle.get_json()
+                assert client.get('/status', headers={'If-None-Match': idle.headers['ETag']}).status_code == 304
+
+                server.mqtt_listener.start_recording(os.path.join(scratch_dir, 'capture.mqrec'))
+                recording = client.get('/status', headers={'If-None-Match': idle.headers['ETag']})
+                assert recording.status_code == 200 and recording.get_json()['mqtt']['recording']['recording']
+
+                server.mqtt_listener.stop_recording()
+                stopped = client.get('/status', headers={'If-None-Match': recording.headers['ETag']})
+                assert stopped.status_code == 200 and stopped.get_json()['mqtt']['recording'] is None
+            finally:
+                server.mqtt_listener.stop_recording()
+                server.camera, server.printer = saved
+        finally:
+            os.chdir(original_cwd)
+
+
+if __name__ == "__main__":
+    print("Testing conditional responses...")
+    print("=" * 50)
+
+    try:
+        test_conditional_responses()
+        test_server_status_tracks_recording()
+        print("\n" + "=" * 50)
+        print("All tests completed successfully!")
+
+    except Exception as e:
+        logger.error(f"Test failed with error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Test script for retention and archival
+Archives a scratch database on a UTC+8 clock and checks that rows stamped in
+local time (the app's timestamps) and in UTC (created_at) are both cut at the
+same instant, that moved rows land in their monthly archive across several
+batches, and that prune_directory removes images by age first, then the
+oldest ones until the directory fits its quota.
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+import logging
+from datetime import datetime, timedelta, timezone
+
+from retention import archive_qr_scans, prune_directory
+from migrations import migrate
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def in_timezone(zone, function):
+    """Run function() with the process local time set to `zone`"""
+    saved = os.environ.get('TZ')
+    os.environ['TZ'] = zone
+    time.tzset()
+    try:
+        return function()
+    finally:
+        if saved is None:
+            del os.environ['TZ']
+        else:
+            os.environ['TZ'] = saved
+        time.tzset()
+
+
+def test_archive_cutoff_is_utc():
+    """With a 10 day window, rows 2 hours either side of the cutoff go the right way whatever their clock"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'database.db')
+        migrate(path)
+
+        def run():
+            now = datetime.now(timezone.utc)
+            old, recent = now - timedelta(days=10, hours=2), now - timedelta(days=10) + timedelta(hours=2)
+            local = lambda moment: moment.astimezone().replace(tzinfo=None).isoformat()
+            utc = lambda moment: moment.strftime('%Y-%m-%d %H:%M:%S')
+            conn = sqlite3.connect(path)
+            for qr_data, timestamp, created_at in (
+                ('old-local', local(old), utc(now)),
+                ('recent-local', local(recent), utc(now)),
+                ('old-utc', '', utc(old)),  # No app timestamp: created_at decides
+                ('recent-utc', '', utc(recent)),
+            ):
+                conn.execute("INSERT INTO qr_scans (qr_data, timestamp, device, is_valid, created_at) VALUES (?, ?, 'pi', 1, ?)",
+                             (qr_data, timestamp, created_at))
+            conn.executemany("INSERT INTO qr_scans (qr_data, timestamp, device, is_valid) VALUES (?, ?, 'pi', 1)",
+                             [(f'old-{i}', local(old - timedelta(minutes=i))) for i in range(5)])
+            conn.commit()
+            conn.close()
+            return old, archive_qr_scans(path, older_than_days=10, archive_dir=os.path.join(directory, 'archive'), batch_size=2)
+
+        old, report = in_timezone('Asia/Manila', run)
+        assert report['rows_archived'] == 7
+        archive_path = os.path.join(directory, 'archive', f"qr_scans_{old.strftime('%Y%m')}.db")
+        if old.strftime('%Y%m') == (old - timedelta(minutes=5)).strftime('%Y%m'):
+            assert report['archives'] == {archive_path: 7}
+
+        conn = sqlite3.connect(path)
+        assert sorted(row[0] for row in conn.execute('SELECT qr_data FROM qr_scans')) == ['recent-local', 'recent-utc']
+        conn.close()
+        archived = set()
+        for archive in report['archives']:
+            conn = sqlite3.connect(archive)
+            archived.update(row[0] for row in conn.execute('SELECT qr_data FROM qr_scans'))
+            conn.close()
+        assert archived == {'old-local', 'old-utc', 'old-0', 'old-1', 'old-2', 'old-3', 'old-4'}
+
+        assert archive_qr_scans(path, older_than_days=10, archive_dir=os.path.join(directory, 'archive'))['rows_archived'] == 0
+
+
+def test_prune_by_age_then_quota():
+    """Files past max age go first, then the oldest until under max_bytes; other extensions are left alone"""
+    with tempfile.TemporaryDirectory() as directory:
+        now = time.time()
+        for name, age_days in (('expired.jpg', 40), ('oldest.jpg', 20), ('older.png', 10), ('newest.jpg', 1), ('notes.txt', 90)):
+            file_path = os.path.join(directory, name)
+            with open(file_path, 'wb') as f:
+                f.write(b'x' * 1000)
+            os.utime(file_path, (now - age_days * 86400, now - age_days * 86400))
+
+        report = prune_directory(directory, max_age_days=30, max_bytes=2000)
+        assert sorted(os.listdir(directory)) == ['newest.jpg', 'notes.txt', 'older.png']
+        assert (report['files_removed'], report['bytes_reclaimed']) == (2, 2000)
+        assert (report['remaining_files'], report['remaining_bytes']) == (2, 2000)
+
+        assert prune_directory(os.path.join(directory, 'missing'))['files_removed'] == 0
+
+
+if __name__ == "__main__":
+    print("Testing retention...")
+    print("=" * 50)
+
+    try:
+        test_archive_cutoff_is_utc()
+        test_prune_by_age_then_quota()
+        print("\n" + "=" * 50)
+        print("All tests completed successfully!")
+
+    except Exception as e:
+        logger.error(f"Test failed with error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Test script for deferred subsystem startup
+Checks that LazySubsystem builds its object once on first use (also under
+concurrent first use) and forwards attribute reads and writes, that a failed
+construction is not retried until reset() (so /status answers instead of
+rebuilding the camera on every poll), that the warm-up runs inline or in the
+background depending on the mode, and that importing server.py no longer
+pulls in OpenCV, pygame, PIL or qrcode.
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+import logging
+
+from startup import LazySubsystem, SubsystemUnavailable, start_warm_up, startup_timer
+from profile_imports import run_importtime, summarize
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class SlowDevice:
+    built = 0
+
+    def __init__(self):
+        time.sleep(0.1)
+        SlowDevice.built += 1
+        self.interval = 0.03
+
+    def start(self):
+        return True
+
+
+def test_lazy_subsystem():
+    """Nothing is built until first use; concurrent first users share one construction"""
+    SlowDevice.built = 0
+    device = LazySubsystem('device', SlowDevice)
+    assert not device.is_loaded and SlowDevice.built == 0 and device  # Truthy without loading
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(device.start())) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [True] * 5 and SlowDevice.built == 1
+    status = device.subsystem_status()
+    assert status['loaded'] and status['init_seconds'] >= 0.1 and status['error'] is None
+
+    device.interval = 0.05  # Writes reach the real object
+    assert device.get().interval == 0.05 and device.interval == 0.05
+
+
+def test_failed_construction_is_cached():
+    """The first use sees the real error; later uses fail fast until reset() allows another try"""
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError("no camera")
+        return SlowDevice()
+    failing = LazySubsystem('camera', flaky)
+    try:
+        failing.start()
+        assert False, "construction errors propagate"
+    except OSError:
+        pass
+    for _ in range(3):
+        try:
+            failing.start()
+            assert False, "a failed subsystem stays unavailable"
+        except SubsystemUnavailable as e:
+            assert 'no camera' in str(e)
+    assert failing.try_get() is None and len(attempts) == 1
+    status = failing.subsystem_status()
+    assert not status['loaded'] and status['failed'] and status['error'] == 'no camera'
+
+    failing.reset()
+    assert failing.start() is True and len(attempts) == 2
+    assert failing.subsystem_status() == {'loaded': True, 'failed': False,
+                                          'init_seconds': failing._init_seconds, 'error': None}
+
+
+def test_status_with_failed_camera():
+    """/status reports the camera as an error and camera routes answer JSON without rebuilding it;
+    /camera/start tries again"""
+    os.environ.setdefault('BACKEND_URL', 'http://127.0.0.1:9')
+    os.environ.setdefault('MQTT_BROKER_HOST', '127.0.0.1')
+    os.environ.setdefault('MQTT_BROKER_PORT', '9')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    attempts = []
+
+    def broken_camera():
+        attempts.append(1)
+        raise RuntimeError("Picamera2 not found")
+
+    class FakePrinter:
+        def check_printer(self):
+            return True
+
+    original_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        os.chdir(scratch_dir)
+        try:
+            import server
+            saved = server.camera, server.printer
+            server.camera = LazySubsystem('camera', broken_camera)
+            server.printer = LazySubsystem('printer', FakePrinter)
+            try:
+                client = server.app.test_client()
+                for _ in range(3):
+                    response = client.get('/status')
+                    assert response.status_code == 200
+                    assert response.get_json()['camera'] == 'error' and response.get_json()['printer'] == 'available'
+                for route in ('/camera/status', '/camera/qr-history', '/camera/image-writer', '/video_feed'):
+                    response = client.get(route)
+                    assert response.status_code == 503, route
+                    assert response.get_json() == {'error': 'Camera unavailable', 'details': 'Picamera2 not found'}
+                assert client.get('/').get_json()['camera'] == 'error'
+                for route in ('/camera/last-qr', '/camera/duplicate-prevention/status',
+                              '/camera/duplicate-prevention/scanned-codes', '/camera/scanning-status'):
+                    response = client.get(route)
+                    assert response.status_code == 500 and response.is_json, route
+                for route in ('/camera/stop', '/camera/reset-cycle', '/camera/duplicate-prevention/clear-all'):
+                    assert client.post(route, json={}).is_json, route
+                assert len(attempts) == 1
+
+                assert client.post('/camera/start').status_code == 500 and len(attempts) == 2
+            finally:
+                server.camera, server.printer = saved
+        finally:
+            os.chdir(original_cwd)
+
+
+def test_warm_up_modes():
+    """Eager warm-up finishes before returning; lazy runs in a background thread"""
+    calls = []
+    assert start_warm_up(lambda: calls.append('eager'), mode='eager', delay=0) is None
+    assert calls == ['eager'] and startup_timer.marks[-1]['stage'] == 'subsystems_ready'
+
+    started = threading.Event()
+    thread = start_warm_up(lambda: (time.sleep(0.05), started.set()), mode='lazy', delay=0)
+    assert thread is not None and not started.is_set()
+    thread.join(2)
+    assert started.is_set()
+
+
+def test_server_import_skips_heavy_subsystems():
+    """server.py's import leaves the camera, printer and audio stacks for later"""
+    backend = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=backend, BACKEND_URL='http://127.0.0.1:9',
+               MQTT_BROKER_HOST='127.0.0.1', MQTT_BROKER_PORT='9')
+    with tempfile.TemporaryDirectory() as directory:
+        report = summarize(run_importtime('server', cwd=directory, env=env), top=5)
+    logger.info(f"import server: {report['total_ms']:.0f} ms, slowest: {report['top_cumulative'][1]}")
+    assert report['heavy_imported'] == [], report['heavy_imported']
+
+
+if __name__ == "__main__":
+    print("Testing deferred startup...")
+    print("=" * 50)
+
+    try:
+        test_lazy_subsystem()
+        test_failed_construction_is_cached()
+        test_status_with_failed_camera()
+        test_warm_up_modes()
+        test_server_import_skips_heavy_subsystems()
+        print("\n" + "=" * 50)
+        print("All tests completed successfully!")
+
+    except Exception as e:
+        logger.error(f"Test failed with error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Test script for the telemetry store and /api/sensor-data
+Writes readings into a scratch telemetry.db and reads them back raw and as
+rollups, checks that TelemetryBuffer cannot be used without a writer, and
+that /api/sensor-data accepts missing readings but rejects non-numeric ones
+with a 400.
+"""
+
+import os
+import sys
+import sqlite3
+import tempfile
+import logging
+
+import pytest
+
+from telemetry import TelemetryBuffer, TelemetryStore
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def test_store_roundtrip():
+    """Raw samples and per-second rollups come back for the recorded channel; None is skipped"""
+    try:
+        TelemetryBuffer()
+        assert False, "TelemetryBuffer needs a _write_batch implementation"
+    except TypeError:
+        pass
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = TelemetryStore(os.path.join(directory, 'telemetry.db'))
+        base = 1_760_000_000_000
+        for offset, value in ((0, 0.40), (300, 0.44), (1200, 0.42)):
+            store.record('loadcell_weight', value, timestamp_ms=base + offset)
+        store.record('loadcell_weight', None, timestamp_ms=base + 1500)
+        assert store.flush() == 3
+
+        raw = store.query('loadcell_weight', since_ms=base, until_ms=base + 2000, resolution='raw')
+        assert [row['value'] for row in raw] == [0.40, 0.44, 0.42]
+        seconds = store.query('loadcell_weight', since_ms=base - 1000, until_ms=base + 2000, resolution='1s')
+        assert [row['count'] for row in seconds] == [2, 1] and seconds[0]['max'] == 0.44
+
+
+def test_sensor_data_validation(app_module):
+    """Missing readings are stored as before; a non-numeric one is a client error, not a 500"""
+    client = app_module.app.test_client()
+    assert client.post('/api/sensor-data', json={'package_size': 'Small'}).status_code == 200
+    assert client.post('/api/sensor-data', json={'weight': '0.42'}).status_code == 200
+
+    response = client.post('/api/sensor-data', json={'weight': 0.4, 'width': 'wide', 'height': 3})
+    assert response.status_code == 400 and 'width' in response.get_json()['details']
+
+    conn = sqlite3.connect('database.db')
+    assert conn.execute('SELECT weight, width FROM loaded_sensor_data').fetchall() == [(0.42, None)]
+    conn.close()
+
+
+if __name__ == "__main__":
+    print("Testing telemetry...")
+    print("=" * 50)
+    # The tests take the app_module fixture from conftest.py, so they run through pytest
+    sys.exit(pytest.main([__file__, "-q"]))
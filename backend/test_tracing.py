@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Test script for per-parcel tracing
+Feeds a parcel's MQTT traffic through the tracer (IR A, grabbers, handoff to
+belt B, QR validation, printing) while the next parcel arrives at the station,
+checks that steps land on the right parcel, and checks the waterfall, step
+percentiles and the X-Parcel-Id / Server-Timing exchange over real HTTP.
+"""
+
+import sys
+import time
+import threading
+import logging
+
+from flask import Flask, request, jsonify
+from werkzeug.serving import make_server
+
+from metrics import instrument_flask
+from tracing import ParcelTracer, TracedSession, TRACING_CONFIG, TRACE_HEADER, BELT_B, STATION, render_waterfall, step_name
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def feed(tracer, topic, message, handler_seconds=0.0):
+    """What MQTTListener.on_message does"""
+    trace_id = tracer.inbound(topic, message)
+    started = time.monotonic()
+    time.sleep(handler_seconds)
+    tracer.add_span(trace_id, step_name('mqtt ←', topic, message), started, time.monotonic())
+    return trace_id
+
+
+def test_parcels_follow_the_line():
+    """Station and belt B parcels are tracked separately; handoff and finish close the right ones"""
+    tracer = ParcelTracer()
+    first = feed(tracer, 'esp32/ir/status', 'IR A triggered')
+    assert first and tracer.current(STATION) == first
+    assert feed(tracer, 'esp32/loadcell/data', '123.4') is None  # Untraced high-rate topic
+    assert feed(tracer, 'esp32/parcel1/status', 'Grabber 1 moving', 0.01) == first
+    tracer.outbound('esp32/motor/request', 'stopA')
+    assert feed(tracer, 'esp32/parcel2/status', '✅ Parcel process 2 complete') == first
+    assert tracer.current(STATION) is None and tracer.current(BELT_B) == first
+
+    second = feed(tracer, 'esp32/ir/status', 'IR A triggered')  # Next parcel arrives meanwhile
+    assert second != first
+    assert feed(tracer, 'esp32/irsensorB/status', 'IR B triggered') == first
+    tracer.outbound('esp32/motor/request', 'stopB')
+    with tracer.span('print receipt', BELT_B):
+        time.sleep(0.02)
+    assert tracer.finish() == first
+
+    trace = tracer.get_trace(first)
+    names = [span['name'] for span in trace['spans']]
+    assert names == ['mqtt ← esp32/ir/status: IR A triggered', 'mqtt ← esp32/parcel1/status: Grabber # moving',
+                     'mqtt → esp32/motor/request: stopA', 'mqtt ← esp32/parcel2/status: ✅ Parcel process # complete',
+                     'mqtt ← esp32/irsensorB/status: IR B triggered', 'mqtt → esp32/motor/request: stopB',
+                     'print receipt']
+    assert trace['status'] == 'complete' and trace['spans'][-1]['duration_ms'] >= 20
+    assert [span['offset_ms'] for span in trace['spans']] == sorted(span['offset_ms'] for span in trace['spans'])
+    assert 'print receipt' in render_waterfall(trace)
+
+    # A parcel that never reached belt B is closed when the next one arrives
+    third = feed(tracer, 'esp32/ir/status', 'IR A triggered')
+    assert tracer.get_trace(second)['status'] == 'abandoned'
+    listed = tracer.list_traces()
+    assert [t['trace_id'] for t in listed] == [third, second, first] and listed[0]['status'] == 'open'
+
+    stats = tracer.step_stats()
+    assert stats['parcels'] == 1 and stats['spans']['print receipt']['count'] == 1
+    gaps = [gap['step'] for gap in stats['gaps']]
+    assert 'mqtt ← esp32/irsensorB/status: IR B triggered ⇒ mqtt → esp32/motor/request: stopB' in gaps
+    assert [gap['p50_ms'] for gap in stats['gaps']] == sorted((gap['p50_ms'] for gap in stats['gaps']), reverse=True)
+
+
+def test_limits_and_staleness():
+    """The ring buffer and per-parcel span cap bound memory; idle parcels expire"""
+    tracer = ParcelTracer(config=dict(TRACING_CONFIG, max_traces=3, max_spans=5, stale_after=0.05))
+    for _ in range(5):
+        tracer.start_parcel()
+        tracer.handoff()
+        tracer.finish()
+    assert len(tracer.list_traces()) == 3
+
+    trace_id = tracer.start_parcel()
+    for i in range(8):
+        tracer.add_span(trace_id, f'step {i}', time.monotonic())
+    assert tracer.get_trace(trace_id)['dropped_spans'] == 3
+    time.sleep(0.1)
+    assert tracer.list_traces(1)[0]['status'] == 'stale' and tracer.current(STATION) is None
+
+
+def test_http_calls_carry_the_parcel_id():
+    """Bound calls send X-Parcel-Id and record the server's own time from Server-Timing"""
+    app = Flask(__name__)
+    seen = []
+
+    @app.route('/api/validate-qr', methods=['POST'])
+    def validate_qr():
+        seen.append(request.headers.get(TRACE_HEADER))
+        time.sleep(0.02)
+        return jsonify({'valid': True})
+
+    instrument_flask(app)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+    try:
+        tracer = ParcelTracer()
+        session = TracedSession(tracer)
+        session.post(f'{base}/api/validate-qr', json={}, timeout=5)  # No parcel on belt B: not traced
+        trace_id = tracer.start_parcel()
+        tracer.handoff()
+        session.post(f'{base}/api/validate-qr', json={}, timeout=5)  # Mapped to the belt B parcel
+        with tracer.bind(trace_id):
+            session.get(f'{base}/api/orders/ORD-1', timeout=5)
+        session.get(f'{base}/api/orders/ORD-2', timeout=5)  # Unbound, unmapped: not traced
+
+        assert seen == [None, trace_id]
+        spans = tracer.get_trace(trace_id)['spans']
+        assert [(s['name'], s['status']) for s in spans] == [('http POST /api/validate-qr', 200),
+                                                             ('http GET /api/orders/:id', 404)]
+        assert 20 <= spans[0]['server_ms'] <= spans[0]['duration_ms']
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    print("Testing parcel tracing...")
+    print("=" * 50)
+
+    try:
+        test_parcels_follow_the_line()
+        test_limits_and_staleness()
+        test_http_calls_carry_the_parcel_id()
+        print("\n" + "=" * 50)
+        print("All tests completed successfully!")
+
+    except Exception as e:
+        logger.error(f"Test failed with error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Concurrency tests for /api/validate-qr and order creation
+Fires parallel validations for the same order against a scratch database and
+checks that exactly one request claims the order and receives the sensor data,
+and that parallel order creation never hands out the same order number twice.
+"""
+
+import sys
+import sqlite3
+import threading
+import logging
+
+import pytest
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+PARALLEL_REQUESTS = 16
+
+
+def seed_order(order_number):
+    conn = sqlite3.connect('database.db')
+    c = conn.cursor()
+    c.execute('''
+        INSERT INTO orders (
+            order_number, customer_name, contact_number, address,
+            product_id, product_name, amount, date
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (order_number, 'Test Customer', '09123456789', 'Test Address', 'P001', 'Test Product', 99.0, '2025-01-01'))
+    c.execute('''
+        INSERT INTO loaded_sensor_data
+        (weight, width, height, length, package_size, loadcell_timestamp, box_dimensions_timestamp)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (0.42, 4.0, 3.0, 5.0, 'Small', '2025-01-01T00:00:00', '2025-01-01T00:00:05'))
+    conn.commit()
+    conn.close()
+
+
+def test_parallel_validations_claim_once(app_module):
+    """Only one of many simultaneous validations of the same order may claim it"""
+    seed_order('ORD-900')
+
+    barrier = threading.Barrier(PARALLEL_REQUESTS)
+    results = []
+    results_lock = threading.Lock()
+
+    def validate():
+        client = app_module.app.test_client()
+        barrier.wait()
+        response = client.post('/api/validate-qr', json={
+            'qr_data': 'ORD-900',
+            'source': 'test',
+            'skip_print': True
+        })
+        with results_lock:
+            results.append((response.status_code, response.get_json()))
+
+    threads = [threading.Thread(target=validate) for _ in range(PARALLEL_REQUESTS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == PARALLEL_REQUESTS
+    assert all(status == 200 for status, _ in results), results
+    assert all(body['valid'] for _, body in results)
+
+    claimed = [body for _, body in results if not body['already_scanned']]
+    assert len(claimed) == 1, f"{len(claimed)} requests claimed the same order"
+    assert claimed[0]['sensor_data_applied'] is True
+    assert claimed[0]['package_information']['weight'] == 0.42
+    logger.info(f"Order claimed once out of {PARALLEL_REQUESTS} parallel validations")
+
+    conn = sqlite3.connect('database.db')
+    c = conn.cursor()
+    assert c.execute('SELECT COUNT(*) FROM scanned_codes').fetchone()[0] == 1
+    assert c.execute('SELECT COUNT(*) FROM package_information').fetchone()[0] == 1
+    assert c.execute('SELECT COUNT(*) FROM loaded_sensor_data').fetchone()[0] == 0
+    conn.close()
+
+
+def test_unknown_order_is_invalid(app_module):
+    """Validating a QR code that matches no order does not create a scan"""
+    client = app_module.app.test_client()
+    response = client.post('/api/validate-qr', json={'qr_data': 'ORD-404', 'skip_print': True})
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body['valid'] is False
+    assert body['already_scanned'] is False
+
+    conn = sqlite3.connect('database.db')
+    assert conn.execute('SELECT COUNT(*) FROM scanned_codes').fetchone()[0] == 0
+    conn.close()
+
+
+def test_parallel_manual_orders_get_unique_numbers(app_module):
+    """Simultaneous manual orders receive distinct numbers that are not reused after a delete"""
+    barrier = threading.Barrier(PARALLEL_REQUESTS)
+    numbers = []
+    numbers_lock = threading.Lock()
+
+    def create():
+        client = app_module.app.test_client()
+        barrier.wait()
+        response = client.post('/api/manual-orders', json={
+            'customerName': 'Test Customer',
+            'contactNumber': '09123456789',
+            'address': 'Test Address',
+            'productName': 'Test Product',
+            'price': 10
+        })
+        assert response.status_code == 201, response.get_json()
+        with numbers_lock:
+            numbers.append(response.get_json()['order']['order_number'])
+
+    threads = [threading.Thread(target=create) for _ in range(PARALLEL_REQUESTS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(numbers) == PARALLEL_REQUESTS
+    assert len(set(numbers)) == PARALLEL_REQUESTS, numbers
+
+    conn = sqlite3.connect('database.db')
+    conn.execute('DELETE FROM orders WHERE order_number = ?', (max(numbers),))
+    conn.commit()
+    conn.close()
+
+    response = app_module.app.test_client().post('/api/manual-orders', json={
+        'customerName': 'Test Customer',
+        'contactNumber': '09123456789',
+        'address': 'Test Address',
+        'productName': 'Test Product',
+        'price': 10
+    })
+    assert response.get_json()['order']['order_number'] not in numbers
+    logger.info(f"{PARALLEL_REQUESTS} parallel orders numbered {min(numbers)}..{max(numbers)} without collisions")
+
+
+if __name__ == "__main__":
+    print("Testing concurrent QR validation...")
+    print("=" * 50)
+    # The tests take the app_module fixture from conftest.py, so they run through pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,354 @@
+"""
+Per-parcel latency tracing for the conveyor workflow
+A parcel trace opens when IR A fires and collects every step the server takes
+for that parcel: inbound MQTT messages (with the time their handler took),
+outbound commands, Pi→backend HTTP calls (QR validation, package data) and
+printing, each timestamped relative to the IR A trigger. Completed traces are
+kept in a ring buffer and served by server.py as a waterfall per parcel plus
+step-latency percentiles across recent parcels, answering "where did the
+40 seconds for this parcel go?".
+
+The ESP32 messages carry no parcel id, so traffic is attributed by position
+on the line (PARCEL_TRACE_RULES): the parcel at the station (IR A through
+grabber 2) and the parcel on belt B (Motor B, IR B, QR validation) are
+tracked separately, which keeps the next parcel's IR A trigger from being
+booked against the one still waiting for its QR scan. HTTP calls made while
+handling a parcel's message (or bound to it with tracer.bind) are recorded as
+its spans and carry its id in the X-Parcel-Id header.
+"""
+
+import os
+import re
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import requests
+
+from metrics import InstrumentedSession, url_target
+
+TRACE_HEADER = 'X-Parcel-Id'
+
+TRACING_CONFIG = {
+    'max_traces': int(os.getenv('TRACE_MAX_PARCELS', '200')),  # Completed parcels kept in memory
+    'max_spans': 1000,  # Per parcel; later spans are counted but dropped
+    'stale_after': float(os.getenv('TRACE_STALE_AFTER', '600')),  # Seconds without activity before a trace is closed
+}
+
+# How MQTT traffic and HTTP calls map onto parcel traces (all matching is lowercase)
+PARCEL_TRACE_RULES = {
+    # Inbound messages that open a new parcel trace (topic, any of these substrings)
+    'start': [('esp32/ir/status', ('triggered', 'detected')),
+              ('/ir/sensor', ('triggered', 'detected')),
+              ('esp32/sensor/ir', ('triggered', 'detected'))],
+    # Inbound messages after which the station parcel is on belt B
+    'handoff': [('esp32/parcel2/status', ('parcel process 2 complete',)),
+                ('esp32/parcel/status', ('parcel process 2 complete',))],
+    # Traffic about belt B belongs to the parcel on belt B, everything else to the station parcel
+    'belt_b_topics': {'esp32/irsensorb/status', 'esp32/irsensorb/request'},
+    'belt_b_keywords': ('motor b', 'ir b', 'startb', 'stopb'),
+    # Calls made outside a traced handler that still belong to a parcel (camera validation)
+    'http_targets': {'/api/validate-qr': 'belt_b'},
+    # High-rate readings that would drown the waterfall
+    'untraced_topics': {'esp32/loadcell/data', '/loadcell'},
+}
+
+STATION, BELT_B = 'station', 'belt_b'
+
+_NUMBER = re.compile(r'\d+(?:\.\d+)?')
+
+
+def step_name(prefix, topic, message):
+    """Stable span name for a message: numbers become # so readings group together"""
+    return f"{prefix} {topic}: {_NUMBER.sub('#', message.strip())[:60]}"
+
+
+def _matches(rules, topic, message):
+    return any(topic == rule_topic and any(word in message for word in words) for rule_topic, words in rules)
+
+
+def trace_location(topic, message, rules=PARCEL_TRACE_RULES):
+    """'belt_b' for traffic about belt B, else 'station'"""
+    topic, message = topic.lower(), message.lower()
+    if topic in rules['belt_b_topics'] or any(word in message for word in rules['belt_b_keywords']):
+        return BELT_B
+    return STATION
+
+
+def _percentiles(values):
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'count': len(values), 'p50_ms': round(float(p50), 1), 'p95_ms': round(float(p95), 1),
+            'p99_ms': round(float(p99), 1), 'max_ms': round(float(max(values)), 1)}
+
+
+class ParcelTracer:
+    """Open parcel traces by line position plus a ring buffer of finished ones; thread-safe"""
+
+    def __init__(self, config=None, rules=None):
+        self.config = config if config is not None else TRACING_CONFIG
+        self.rules = rules if rules is not None else PARCEL_TRACE_RULES
+        self._lock = threading.Lock()
+        self._slots = {STATION: None, BELT_B: None}
+        self._open = {}  # trace id -> trace, including ones handed on but not yet finished
+        self._finished = deque(maxlen=self.config['max_traces'])
+        self._sequence = 0
+        self._bound = threading.local()
+
+    # Trace lifecycle
+
+    def start_parcel(self, **attributes):
+        """Open a trace for the parcel now at the station; returns its id"""
+        now = time.monotonic()
+        with self._lock:
+            self._expire_stale(now)
+            previous = self._slots[STATION]
+            if previous is not None:
+                self._close(previous, 'abandoned', now)  # Never reached belt B
+            self._sequence += 1
+            trace_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{self._sequence:04d}"
+            trace = {
+                'trace_id': trace_id,
+                'started_at': time.time(),
+                'started': now,
+                'last_activity': now,
+                'ended': None,
+                'status': 'open',
+                'location': STATION,
+                'attributes': dict(attributes),
+                'spans': [],
+                'dropped_spans': 0,
+            }
+            self._open[trace_id] = trace
+            self._slots[STATION] = trace
+            return trace_id
+
+    def handoff(self):
+        """The station parcel moved onto belt B; a parcel still waiting there is closed"""
+        now = time.monotonic()
+        with self._lock:
+            trace = self._slots[STATION]
+            if trace is None:
+                return None
+            waiting = self._slots[BELT_B]
+            if waiting is not None:
+                self._close(waiting, 'superseded', now)
+            trace['location'] = BELT_B
+            self._slots[STATION], self._slots[BELT_B] = None, trace
+            return trace['trace_id']
+
+    def finish(self, location=BELT_B, status='complete', trace_id=None):
+        """Close a parcel's trace (by id, or the one at a line position)"""
+        with self._lock:
+            trace = self._open.get(trace_id) if trace_id else self._slots[location]
+            if trace is None:
+                return None
+            self._close(trace, status, time.monotonic())
+            return trace['trace_id']
+
+    def _close(self, trace, status, now):
+        trace['status'] = status
+        trace['ended'] = now
+        self._open.pop(trace['trace_id'], None)
+        for location, slot in self._slots.items():
+            if slot is trace:
+                self._slots[location] = None
+        self._finished.append(trace)
+
+    def _expire_stale(self, now):
+        for trace in list(self._open.values()):
+            if now - trace['last_activity'] > self.config['stale_after']:
+                self._close(trace, 'stale', trace['last_activity'])
+
+    def current(self, location=STATION):
+        trace = self._slots.get(location)
+        return trace['trace_id'] if trace is not None else None
+
+    @contextmanager
+    def bind(self, trace_id):
+        """Attribute work done on this thread (HTTP calls) to a parcel"""
+        previous = getattr(self._bound, 'trace_id', None)
+        self._bound.trace_id = trace_id
+        try:
+            yield trace_id
+        finally:
+            self._bound.trace_id = previous
+
+    def bound(self):
+        return getattr(self._bound, 'trace_id', None)
+
+    # Recording
+
+    def add_span(self, trace_id, name, start, end=None, **attributes):
+        """Record a step of a parcel; start/end are time.monotonic() values"""
+        if trace_id is None:
+            return
+        end = start if end is None else end
+        with self._lock:
+            trace = self._open.get(trace_id)
+            if trace is None:
+                return  # Finished (or expired) while the step was running
+            if len(trace['spans']) >= self.config['max_spans']:
+                trace['dropped_spans'] += 1
+                return
+            trace['spans'].append((start, end, name, threading.current_thread().name, attributes))
+            trace['last_activity'] = max(trace['last_activity'], end)
+
+    @contextmanager
+    def span(self, name, location=STATION, trace_id=None, **attributes):
+        """Time a block of work for the parcel at `location` (or an explicit trace id)"""
+        trace_id = trace_id or self.current(location)
+        started = time.monotonic()
+        try:
+            yield trace_id
+        except Exception as e:
+            attributes['error'] = str(e)
+            raise
+        finally:
+            self.add_span(trace_id, name, started, time.monotonic(), **attributes)
+
+    def inbound(self, topic, message):
+        """Apply the start/handoff rules to an inbound MQTT message; returns the parcel it belongs to"""
+        topic_lower = topic.lower()
+        if topic_lower in self.rules['untraced_topics']:
+            return None
+        message_lower = message.lower()
+        if _matches(self.rules['start'], topic_lower, message_lower):
+            return self.start_parcel(trigger=f"{topic}: {message.strip()}")
+        if _matches(self.rules['handoff'], topic_lower, message_lower):
+            return self.handoff()
+        return self.current(trace_location(topic, message, self.rules))
+
+    def outbound(self, topic, message):
+        """Record a command the server published"""
+        if topic.lower() in self.rules['untraced_topics']:
+            return
+        message = message if isinstance(message, str) else str(message)
+        self.add_span(self.current(trace_location(topic, message, self.rules)),
+                      step_name('mqtt →', topic, message), time.monotonic())
+
+    # Reporting
+
+    def _snapshot(self, trace):
+        now = time.monotonic()
+        end = trace['ended'] if trace['ended'] is not None else now
+        spans = sorted(trace['spans'], key=lambda span: span[0])
+        return {
+            'trace_id': trace['trace_id'],
+            'status': trace['status'],
+            'location': trace['location'] if trace['ended'] is None else None,
+            'started_at': datetime.fromtimestamp(trace['started_at']).isoformat(),
+            'duration_ms': round((end - trace['started']) * 1000, 1),
+            'attributes': trace['attributes'],
+            'dropped_spans': trace['dropped_spans'],
+            'spans': [{
+                'name': name,
+                'offset_ms': round((start - trace['started']) * 1000, 1),
+                'duration_ms': round((stop - start) * 1000, 1),
+                'thread': thread,
+                **attributes,
+            } for start, stop, name, thread, attributes in spans],
+        }
+
+    def get_trace(self, trace_id):
+        with self._lock:
+            trace = self._open.get(trace_id) or next(
+                (t for t in self._finished if t['trace_id'] == trace_id), None)
+            return self._snapshot(trace) if trace is not None else None
+
+    def list_traces(self, limit=50):
+        """Newest first: open parcels, then finished ones (without their spans)"""
+        with self._lock:
+            self._expire_stale(time.monotonic())
+            traces = sorted(self._open.values(), key=lambda t: t['started'], reverse=True)
+            traces += list(reversed(self._finished))
+            summaries = []
+            for trace in traces[:limit]:
+                summary = self._snapshot(trace)
+                summary['span_count'] = len(summary.pop('spans'))
+                summaries.append(summary)
+            return summaries
+
+    def step_stats(self, limit=None):
+        """Latency percentiles over finished parcels.
+
+        'spans' aggregates the duration of each named step (handler time, HTTP
+        calls, printing); 'gaps' aggregates the time between consecutive steps,
+        which is where device time (belt travel, grabbers, stepper) shows up.
+        """
+        with self._lock:
+            traces = list(self._finished)[-limit:] if limit else list(self._finished)
+            traces = [self._snapshot(t) for t in traces if t['status'] == 'complete'] or \
+                     [self._snapshot(t) for t in traces]
+        durations, gaps, totals = {}, {}, []
+        for trace in traces:
+            totals.append(trace['duration_ms'])
+            previous = None
+            for span in trace['spans']:
+                durations.setdefault(span['name'], []).append(span['duration_ms'])
+                if previous is not None:
+                    gap = span['offset_ms'] - (previous['offset_ms'] + previous['duration_ms'])
+                    gaps.setdefault(f"{previous['name']} ⇒ {span['name']}", []).append(max(gap, 0.0))
+                previous = span
+        return {
+            'parcels': len(traces),
+            'total': _percentiles(totals) if totals else None,
+            'spans': {name: _percentiles(values) for name, values in sorted(durations.items())},
+            # Slowest first; a list so JSON encoding keeps the order
+            'gaps': sorted(({'step': name, **_percentiles(values)} for name, values in gaps.items()),
+                           key=lambda gap: gap['p50_ms'], reverse=True),
+        }
+
+
+def render_waterfall(trace, width=40):
+    """Plain-text waterfall of a trace snapshot (GET /api/traces/<id>?format=text)"""
+    total = max(trace['duration_ms'], 1.0)
+    lines = [f"Parcel {trace['trace_id']} ({trace['status']}): {trace['duration_ms'] / 1000:.2f}s"]
+    for span in trace['spans']:
+        start = int(span['offset_ms'] / total * width)
+        length = max(1, int(span['duration_ms'] / total * width))
+        bar = ' ' * start + '█' * length
+        lines.append(f"{span['offset_ms'] / 1000:8.3f}s {bar:<{width + 1}} {span['duration_ms']:8.1f} ms  {span['name']}")
+    return '\n'.join(lines) + '\n'
+
+
+# Process-wide tracer shared by server.py, camera.py and print.py
+tracer = ParcelTracer()
+
+
+class TracedSession(InstrumentedSession):
+    """InstrumentedSession that books calls made for a traced parcel as spans and sends X-Parcel-Id"""
+
+    def __init__(self, parcel_tracer=None):
+        super().__init__()
+        self.tracer = parcel_tracer or tracer
+
+    def request(self, method, url, *args, **kwargs):
+        target = url_target(url)
+        trace_id = self.tracer.bound()
+        if trace_id is None and target in self.tracer.rules['http_targets']:
+            trace_id = self.tracer.current(self.tracer.rules['http_targets'][target])
+        if trace_id is None:
+            return super().request(method, url, *args, **kwargs)
+
+        kwargs['headers'] = dict(kwargs.get('headers') or {}, **{TRACE_HEADER: trace_id})
+        attributes = {'status': 'error'}
+        started = time.monotonic()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+            attributes['status'] = response.status_code
+            # instrument_flask reports the server's own time, splitting network from handler time
+            timing = response.headers.get('Server-Timing', '')
+            if 'dur=' in timing:
+                try:
+                    attributes['server_ms'] = float(timing.split('dur=', 1)[1].split(',')[0].split(';')[0])
+                except ValueError:
+                    pass
+            return response
+        except requests.RequestException as e:
+            attributes['status'] = type(e).__name__
+            raise
+        finally:
+            self.tracer.add_span(trace_id, f'http {method.upper()} {target}', started, time.monotonic(), **attributes)
@@ -1386,7 +1386,7 @@ export default function Scanner() {
                             </Typography>
                             <Paper sx={{ p: 1, bgcolor: 'grey.50', display: 'inline-block' }}>
                               <img 
-                                src={`data:image/jpeg;base64,${scan.image_data.base64}`}
+                                src={`data:${scan.image_data.mime_type || 'image/jpeg'};base64,${scan.image_data.base64}`}
                                 alt="QR Code"
                                 style={{ 
                                   maxWidth: isSmallScreen ? '150px' : '200px',